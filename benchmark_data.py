@@ -0,0 +1,289 @@
+"""
+Generador de datos sintéticos para pruebas de volumen.
+
+Llena la base de datos actual con un año de operación de la tienda,
+multiplicado por scale: productos, clientes, ventas de contado y fiadas
+con sus detalles, abonos, lotes de compras, gastos y pérdidas. Con la
+misma semilla genera siempre los mismos datos.
+
+Distribuciones:
+- Popularidad de productos y clientes tipo Zipf (pocos concentran la
+  mayoría de las ventas); precios log-normales y costo entre 55% y 80%.
+- Más ventas los fines de semana, entre las 7:00 y las 20:00, con 1 a 6
+  líneas por venta.
+- Una parte de las ventas son fiadas; la mayoría de los clientes abona
+  días después, total o parcialmente. Al final, reconcile_clients() deja
+  deudas y estados de venta consistentes con los movimientos.
+
+Uso:
+    python benchmark_data.py ruta.db [--scale N] [--seed S]
+"""
+
+import argparse
+import contextlib
+import io
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from config.database import connection_manager, init_database, db_connection, TIMESTAMP_FORMAT
+from utils.paths import get_db_path
+
+# Volumen con scale=1 (aproximadamente un año de la tienda actual)
+BASE_COUNTS = {
+    'products': 300,
+    'clients': 80,
+    'sales': 6000,
+    'purchase_lots': 100,
+    'expenses': 150,
+    'losses': 80,
+}
+DAYS = 365
+CREDIT_RATIO   = 0.25   # Ventas fiadas
+PAYMENT_RATIO  = 0.8    # Ventas fiadas que reciben al menos un abono
+PARTIAL_RATIO  = 0.3    # Abonos que cubren solo parte de la venta
+WEEKDAY_WEIGHTS = [0.8, 0.8, 0.9, 1.0, 1.2, 1.6, 1.4]   # Lunes a domingo
+LINE_WEIGHTS    = [35, 25, 18, 12, 6, 4]                # 1 a 6 líneas por venta
+QUANTITY_WEIGHTS = [55, 25, 10, 6, 4]                   # 1 a 5 unidades
+LOSS_TYPES = ["Vencimiento", "Daño", "Robo", "Otro"]
+EXPENSE_CATEGORIES = {
+    "Servicios": (80000, 250000),
+    "Transporte": (5000, 40000),
+    "Empaques": (10000, 60000),
+    "Mantenimiento": (20000, 150000),
+    "Otros": (2000, 30000),
+}
+MONTHLY_EXPENSES = [("Arriendo local", "Arriendo", 900000), ("Nómina", "Nómina", 1400000)]
+SUPPLIERS = ["Distribuidora Central", "Lácteos del Valle", "Cárnicos La Granja", "Mayorista Andino"]
+
+
+def scaled_counts(scale=1.0):
+    """Cantidad de registros de cada tipo para scale"""
+    return {name: max(1, int(round(count * scale))) for name, count in BASE_COUNTS.items()}
+
+
+def _zipf_weights(n, exponent=1.1):
+    return [1 / (rank ** exponent) for rank in range(1, n + 1)]
+
+
+def _timestamp(moment):
+    return moment.strftime(TIMESTAMP_FORMAT)
+
+
+def _sale_moments(rng, n_sales, start):
+    """n_sales fechas ordenadas dentro de DAYS días, con más ventas el fin de semana"""
+    days = [start + timedelta(days=offset) for offset in range(DAYS)]
+    weights = [WEEKDAY_WEIGHTS[day.weekday()] for day in days]
+    moments = []
+    for day in rng.choices(days, weights=weights, k=n_sales):
+        seconds = rng.randint(7 * 3600, 20 * 3600)
+        moments.append(day + timedelta(seconds=seconds))
+    moments.sort()
+    return moments
+
+
+def generate(scale=1.0, seed=42, end=None):
+    """
+    Inserta los datos sintéticos en la base de datos actual (ya inicializada
+    con init_database) y retorna {tabla: filas insertadas}.
+    """
+    from models.reconciliation import reconcile_clients
+
+    rng = random.Random(seed)
+    counts = scaled_counts(scale)
+    end = end or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=DAYS)
+    inserted = {}
+
+    with db_connection() as conn:
+        cursor = conn.cursor()
+
+        def next_id(table):
+            cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}')
+            return cursor.fetchone()[0] + 1
+
+        cursor.execute("SELECT id FROM users ORDER BY id LIMIT 1")
+        row = cursor.fetchone()
+        user_id = row[0] if row else None
+
+        # Productos: precios log-normales alrededor de $6.000
+        first_product = next_id('products')
+        products = []
+        for i in range(counts['products']):
+            price = round(math.exp(rng.gauss(math.log(6000), 0.7)), -1)
+            cost = round(price * rng.uniform(0.55, 0.8), 2)
+            products.append((first_product + i, f"Producto sintético {first_product + i:05d}",
+                             price, rng.randint(0, 200), cost))
+        cursor.executemany(
+            "INSERT INTO products (id, name, price, stock, cost_price) VALUES (?, ?, ?, ?, ?)", products)
+        product_weights = _zipf_weights(len(products))
+        inserted['products'] = len(products)
+
+        # Clientes
+        first_client = next_id('clients')
+        clients = [(first_client + i, f"Cliente sintético {first_client + i:05d}",
+                    f"300{rng.randint(1000000, 9999999)}", rng.choice([0, 100000, 300000, 500000]))
+                   for i in range(counts['clients'])]
+        cursor.executemany(
+            "INSERT INTO clients (id, name, phone, credit_limit, total_debt) VALUES (?, ?, ?, ?, 0)", clients)
+        client_ids = [client[0] for client in clients]
+        client_weights = _zipf_weights(len(client_ids), exponent=0.9)
+        inserted['clients'] = len(clients)
+
+        # Ventas, detalles, débitos de las fiadas y abonos
+        sale_id = next_id('sales')
+        sales, details, transactions = [], [], []
+        for moment in _sale_moments(rng, counts['sales'], start):
+            created_at = _timestamp(moment)
+            lines = rng.choices(range(1, len(LINE_WEIGHTS) + 1), weights=LINE_WEIGHTS)[0]
+            total = 0.0
+            for product in rng.choices(products, weights=product_weights, k=lines):
+                quantity = rng.choices(range(1, len(QUANTITY_WEIGHTS) + 1), weights=QUANTITY_WEIGHTS)[0]
+                subtotal = quantity * product[2]
+                total += subtotal
+                details.append((sale_id, product[0], quantity, product[2], product[2], subtotal, product[4]))
+
+            if rng.random() < CREDIT_RATIO:
+                client_id = rng.choices(client_ids, weights=client_weights)[0]
+                sales.append((sale_id, client_id, total, 'credit', 'credit', 0.0, total,
+                              'pending', user_id, created_at))
+                transactions.append((client_id, 'debit', total, f"Venta #{sale_id}", sale_id, created_at))
+                if rng.random() < PAYMENT_RATIO:
+                    paid_at = moment + timedelta(days=rng.randint(1, 30), hours=rng.randint(0, 4))
+                    if paid_at < end:
+                        amount = total if rng.random() > PARTIAL_RATIO else round(total * rng.uniform(0.2, 0.8), -1)
+                        transactions.append((client_id, 'credit', amount, "Abono", None, _timestamp(paid_at)))
+            else:
+                sales.append((sale_id, None, total, 'cash', 'cash', total, 0.0, 'paid', user_id, created_at))
+            sale_id += 1
+
+        cursor.executemany('''
+            INSERT INTO sales (id, client_id, total, payment_type, payment_method, paid_amount,
+                               remaining_debt, status, user_id, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', sales)
+        cursor.executemany('''
+            INSERT INTO sale_details (sale_id, product_id, quantity, unit_price, sale_price, subtotal, cost_price)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', details)
+        transactions.sort(key=lambda item: item[5])
+        cursor.executemany('''
+            INSERT INTO client_transactions (client_id, transaction_type, amount, description, sale_id, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', transactions)
+        inserted['sales'] = len(sales)
+        inserted['sale_details'] = len(details)
+        inserted['client_transactions'] = len(transactions)
+
+        # Lotes de compras: un registro por producto, el flete en el primero
+        purchase_id = next_id('purchases')
+        purchases, purchase_details = [], []
+        lot_days = sorted(rng.uniform(0, DAYS) for _ in range(counts['purchase_lots']))
+        for lot, offset in enumerate(lot_days):
+            moment = start + timedelta(days=offset)
+            lote_id = moment.strftime("%Y%m%d%H%M%S") + f"{lot:04d}"
+            supplier = rng.choice(SUPPLIERS)
+            freight = rng.choice([0, 0, 15000, 30000, 50000])
+            items = rng.sample(products, k=min(len(products), rng.randint(3, 12)))
+            for index, product in enumerate(items):
+                quantity = rng.randint(5, 60)
+                subtotal = quantity * product[4]
+                shipping = freight if index == 0 else 0.0
+                purchases.append((purchase_id, user_id, subtotal + shipping, 0.0, shipping, _timestamp(moment),
+                                  f"F-{lot + 1:05d}", supplier, lote_id, freight))
+                purchase_details.append((purchase_id, product[0], quantity, product[4], product[4], subtotal))
+                purchase_id += 1
+        cursor.executemany('''
+            INSERT INTO purchases (id, user_id, total, iva, shipping, date, invoice_number,
+                                   supplier, lote_id, shipping_total)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', purchases)
+        cursor.executemany('''
+            INSERT INTO purchase_details (purchase_id, product_id, quantity, unit_cost, unit_price, subtotal)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', purchase_details)
+        inserted['purchases'] = len(purchases)
+        inserted['purchase_details'] = len(purchase_details)
+
+        # Gastos: fijos al inicio de cada mes más gastos variables
+        expenses = []
+        for month in range(0, DAYS, 30):
+            moment = _timestamp(start + timedelta(days=month, hours=9))
+            for description, category, amount in MONTHLY_EXPENSES:
+                expenses.append((description, amount * max(1.0, scale ** 0.5), category, moment, user_id, moment))
+        categories = list(EXPENSE_CATEGORIES)
+        for _ in range(counts['expenses']):
+            category = rng.choice(categories)
+            low, high = EXPENSE_CATEGORIES[category]
+            moment = _timestamp(start + timedelta(days=rng.uniform(0, DAYS)))
+            expenses.append((f"{category} (sintético)", round(rng.uniform(low, high), -2), category,
+                             moment, user_id, moment))
+        cursor.executemany('''
+            INSERT INTO expenses (description, amount, category, date, user_id, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', expenses)
+        inserted['expenses'] = len(expenses)
+
+        # Pérdidas: más frecuentes en los productos que más se mueven
+        losses = []
+        for product in rng.choices(products, weights=product_weights, k=counts['losses']):
+            quantity = rng.randint(1, 5)
+            moment = _timestamp(start + timedelta(days=rng.uniform(0, DAYS)))
+            loss_type = rng.choices(LOSS_TYPES, weights=[50, 30, 10, 10])[0]
+            losses.append((product[0], quantity, product[4], quantity * product[4], moment,
+                           f"{loss_type} (sintético)", loss_type, user_id or 1, moment))
+        cursor.executemany('''
+            INSERT INTO losses (product_id, quantity, unit_cost, total_cost, loss_date, reason,
+                                loss_type, created_by, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', losses)
+        inserted['losses'] = len(losses)
+
+    # Deudas y estados de las ventas fiadas según los abonos generados
+    reconcile_clients(client_ids)
+    return inserted
+
+
+def create_database(db_path, scale=1.0, seed=42):
+    """
+    Crea db_path (no debe existir), la llena con generate() y deja el pool
+    apuntando a la base anterior. Retorna {tabla: filas insertadas}.
+    """
+    if os.path.exists(db_path):
+        raise FileExistsError(f"{db_path} ya existe; el generador solo llena bases nuevas")
+
+    previous_db = connection_manager.db_path
+    connection_manager.close_all(db_path)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            init_database()
+        return generate(scale, seed)
+    finally:
+        connection_manager.close_all(previous_db)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera una base de datos sintética para pruebas de volumen")
+    parser.add_argument('db_path', help="Ruta de la base a crear (no debe existir)")
+    parser.add_argument('--scale', type=float, default=1.0, help="Multiplicador del volumen base (1 = un año)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    if os.path.abspath(args.db_path) == os.path.abspath(get_db_path()):
+        print("No se puede generar sobre la base de datos de la aplicación")
+        return 1
+
+    start = time.perf_counter()
+    inserted = create_database(args.db_path, args.scale, args.seed)
+    elapsed = time.perf_counter() - start
+    for table, count in inserted.items():
+        print(f"{table:<22} {count:>10,}")
+    print(f"Generada en {elapsed:.1f}s: {args.db_path} ({os.path.getsize(args.db_path) / 1024 / 1024:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
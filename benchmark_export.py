@@ -0,0 +1,134 @@
+"""
+Benchmark de exportación a Excel.
+
+Crea bases de datos temporales con distinta cantidad de ventas y mide el
+tiempo, el número de consultas y el pico de memoria de
+ExcelExporter.export_cash_flow y ExcelExporter.export_inventory_flow,
+en modo normal (pandas) y en modo streaming.
+
+Uso:
+    python benchmark_export.py [n_ventas ...]
+"""
+
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from config.database import connection_manager, init_database, get_connection, TIMESTAMP_FORMAT
+from utils.paths import get_db_path
+from utils.query_profiler import profiler
+
+DEFAULT_SIZES = [100, 1000, 5000]
+PRODUCTS      = 200
+CLIENTS       = 50
+LINES_PER_SALE = 3
+
+
+def seed(n_sales, seed_value=42):
+    """Llena la base de datos actual con datos sintéticos"""
+    rng = random.Random(seed_value)
+    start = datetime.now() - timedelta(days=365)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.executemany(
+        "INSERT INTO products (name, price, stock, cost_price) VALUES (?, ?, ?, ?)",
+        [(f"Producto {i}", 1000 + i, 100, 600 + i) for i in range(PRODUCTS)]
+    )
+    cursor.executemany(
+        "INSERT INTO clients (name, total_debt) VALUES (?, 0)",
+        [(f"Cliente {i}",) for i in range(CLIENTS)]
+    )
+
+    for i in range(n_sales):
+        created_at = (start + timedelta(minutes=105 * i)).strftime(TIMESTAMP_FORMAT)
+        client_id = rng.randint(1, CLIENTS) if rng.random() < 0.3 else None
+        lines = [(rng.randint(1, PRODUCTS), rng.randint(1, 5), 1000.0) for _ in range(LINES_PER_SALE)]
+        total = sum(qty * price for _, qty, price in lines)
+        status = 'pending' if client_id else 'paid'
+        cursor.execute(
+            "INSERT INTO sales (client_id, total, payment_method, status, paid_amount, remaining_debt, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (client_id, total, 'credit' if client_id else 'cash', status,
+             0 if client_id else total, total if client_id else 0, created_at)
+        )
+        sale_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO sale_details (sale_id, product_id, quantity, unit_price, sale_price, subtotal) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(sale_id, product_id, qty, price, price, qty * price) for product_id, qty, price in lines]
+        )
+
+    for i in range(max(1, n_sales // 20)):
+        date = (start + timedelta(days=i % 365)).strftime(TIMESTAMP_FORMAT)
+        cursor.execute(
+            "INSERT INTO purchases (user_id, total, iva, shipping, date, invoice_number, supplier) "
+            "VALUES (1, ?, 0, 0, ?, ?, 'Proveedor')",
+            (50000, date, f"F-{i}")
+        )
+        purchase_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO purchase_details (purchase_id, product_id, quantity, unit_cost, unit_price, subtotal) "
+            "VALUES (?, ?, 10, 500, 500, 5000)",
+            [(purchase_id, rng.randint(1, PRODUCTS)) for _ in range(10)]
+        )
+
+    conn.commit()
+    conn.close()
+
+
+def measure(func):
+    """Ejecuta func y retorna (segundos, consultas, pico de memoria en MB)"""
+    profiler.reset()
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    tracemalloc.stop()
+    queries = sum(s['calls'] for s in profiler.get_stats())
+    return elapsed, queries, peak
+
+
+def main(sizes):
+    from utils.excel_exporter import ExcelExporter
+
+    original_db = get_db_path()
+    original_cwd = os.getcwd()
+    profiler.enable(slow_query_ms=float('inf'), report_on_exit=False)
+
+    print(f"{'Ventas':>8} {'Detalles':>9} {'Modo':>10} {'Libro diario':>13} {'Consultas':>10} {'Memoria':>9} "
+          f"{'Inventario':>11} {'Consultas':>10} {'Memoria':>9}")
+    try:
+        for n_sales in sizes:
+            with tempfile.TemporaryDirectory() as tmp:
+                connection_manager.close_all(os.path.join(tmp, "bench.db"))
+                with contextlib.redirect_stdout(io.StringIO()):
+                    init_database()
+                seed(n_sales)
+                os.chdir(tmp)
+
+                for mode, streaming in (("normal", False), ("streaming", True)):
+                    cash_s, cash_q, cash_mb = measure(
+                        lambda: ExcelExporter.export_cash_flow("libro_diario.xlsx", streaming=streaming))
+                    inv_s, inv_q, inv_mb = measure(
+                        lambda: ExcelExporter.export_inventory_flow("libro_inventario.xlsx", streaming=streaming))
+                    print(f"{n_sales:>8} {n_sales * LINES_PER_SALE:>9} {mode:>10} {cash_s:>12.2f}s {cash_q:>10} "
+                          f"{cash_mb:>7.1f}MB {inv_s:>10.2f}s {inv_q:>10} {inv_mb:>7.1f}MB")
+
+                os.chdir(original_cwd)
+                connection_manager.close_all()
+    finally:
+        os.chdir(original_cwd)
+        profiler.disable()
+        connection_manager.close_all(original_db)
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
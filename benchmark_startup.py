@@ -0,0 +1,148 @@
+"""
+Benchmark de arranque.
+
+Cada medición corre en un proceso nuevo de Python, como al abrir la
+aplicación:
+
+- Importación: tiempo de los módulos que carga main.py (python -X
+  importtime), con los más lentos primero.
+- Primera ventana: importar main, init_database con la base al día, crear
+  Tk y mostrar la ventana principal sobre una base temporal con n ventas
+  sintéticas. Requiere pantalla; sin ella se omite.
+- Módulos pesados: pandas, numpy y openpyxl no deben cargarse al iniciar
+  ni al importar las ventanas (se importan al exportar o importar Excel).
+  Si alguno aparece el script termina con código 1.
+
+Uso:
+    python benchmark_startup.py [n_ventas]
+"""
+
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmark_export import seed
+from config.database import connection_manager, init_database
+from utils.paths import get_base_path, get_db_path
+
+DEFAULT_SALES = 5000
+TOP_IMPORTS   = 15
+
+HEAVY_MODULES = ('pandas', 'numpy', 'openpyxl')
+VIEW_MODULES = [
+    'views.main_window', 'views.login_window', 'views.sales_window', 'views.clients_window',
+    'views.inventory_window', 'views.purchases_window', 'views.reports_window',
+    'views.cash_register_window', 'views.expenses_window', 'views.losses_window',
+    'views.users_window', 'views.sale_detail_window',
+]
+
+FIRST_WINDOW_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import main
+from config.database import connection_manager
+connection_manager.close_all(sys.argv[1])
+imported = time.perf_counter()
+main.init_database()
+initialized = time.perf_counter()
+import tkinter as tk
+try:
+    root = tk.Tk()
+except tk.TclError as e:
+    print(json.dumps({"error": str(e)}))
+    sys.exit(0)
+root.withdraw()
+main.show_first_window(root)
+root.update()
+shown = time.perf_counter()
+root.destroy()
+print(json.dumps({"import": imported - start, "init_database": initialized - imported,
+                  "window": shown - initialized, "total": shown - start}))
+'''
+
+HEAVY_SCRIPT = '''
+import importlib, json, sys
+for name in sys.argv[2:]:
+    importlib.import_module(name)
+print(json.dumps(sorted({m.split(".")[0] for m in sys.modules} & set(sys.argv[1].split(",")))))
+'''
+
+
+def _run(args):
+    """Ejecuta python con args en la carpeta de la aplicación"""
+    return subprocess.run([sys.executable] + args, cwd=get_base_path(),
+                          capture_output=True, text=True, check=True)
+
+
+def import_times(module='main'):
+    """[(módulo, propio_ms, acumulado_ms)] de importar module, más lentos primero"""
+    result = _run(['-X', 'importtime', '-c', f'import {module}'])
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        times.append((name.strip(), int(own) / 1000, int(cumulative) / 1000))
+    return sorted(times, key=lambda item: item[2], reverse=True)
+
+
+def heavy_modules_loaded(modules):
+    """Módulos pesados presentes en sys.modules después de importar modules"""
+    result = _run(['-c', HEAVY_SCRIPT, ','.join(HEAVY_MODULES)] + list(modules))
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def time_to_first_window(db_path):
+    """Segundos por etapa hasta mostrar la primera ventana, o {'error': ...}"""
+    result = _run(['-c', FIRST_WINDOW_SCRIPT, db_path])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(n_sales):
+    original_db = get_db_path()
+    failed = False
+
+    times = import_times('main')
+    total = next((cumulative for name, _, cumulative in times if name == 'main'), 0.0)
+    print(f"Importación de main: {total:.1f} ms")
+    print(f"{'Módulo':<45} {'Propio':>10} {'Acumulado':>11}")
+    for name, own, cumulative in times[:TOP_IMPORTS]:
+        print(f"{name:<45} {own:>8.1f}ms {cumulative:>9.1f}ms")
+
+    for label, modules in (("al iniciar", ['main']), ("con las ventanas", ['main'] + VIEW_MODULES)):
+        loaded = heavy_modules_loaded(modules)
+        if loaded:
+            failed = True
+            print(f"\n✗ Módulos pesados cargados {label}: {', '.join(loaded)}")
+        else:
+            print(f"\n✓ Ningún módulo pesado cargado {label}")
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "startup.db")
+            connection_manager.close_all(db_path)
+            with contextlib.redirect_stdout(io.StringIO()):
+                init_database()
+            seed(n_sales)
+            connection_manager.close_all()
+
+            stages = time_to_first_window(db_path)
+            if 'error' in stages:
+                print(f"\nPrimera ventana: omitido ({stages['error']})")
+            else:
+                print(f"\nPrimera ventana con {n_sales:,} ventas: {stages['total'] * 1000:.0f} ms "
+                      f"(importación {stages['import'] * 1000:.0f} ms, "
+                      f"init_database {stages['init_database'] * 1000:.0f} ms, "
+                      f"ventana {stages['window'] * 1000:.0f} ms)")
+    finally:
+        connection_manager.close_all(original_db)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SALES))
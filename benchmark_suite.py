@@ -0,0 +1,348 @@
+"""
+Benchmark de la capa de datos a distintas escalas.
+
+Para cada factor de escala crea una base temporal con benchmark_data
+(scale=1 equivale a un año de la tienda) y mide, sin caché de consultas,
+las operaciones principales de modelos y reportes: ventas filtradas,
+historial de caja, resumen financiero, reparto de pagos, conciliación,
+exportaciones a Excel y el costo por escritura de los contadores de
+cambios (table_versions y table_writes, con y sin sus triggers). Cada operación se repite varias veces y se guarda
+el mínimo, la mediana, el máximo y el número de consultas SQL.
+
+Los resultados se escriben en JSON (ver benchmark_results.json) para
+compararlos entre versiones. Una operación que falla (por ejemplo, una
+exportación sin pandas instalado) queda registrada con su error.
+
+Línea base: --save-baseline guarda los resultados en
+benchmark_baseline.json (versionado con el código). --compare repite el
+benchmark con las escalas, repeticiones y semilla de la línea base e
+imprime la diferencia por operación. Falla (código 1) si alguna operación
+hace más consultas, si su mediana supera la de la línea base en más de la
+tolerancia (y en más de min_regression_ms, para ignorar el ruido de las
+operaciones muy rápidas) o si deja de funcionar. Con --queries-only solo
+se comparan las consultas, que no dependen de la máquina;
+tests/test_benchmark_baseline.py corre esa comparación siempre y la de
+latencia con BENCHMARK_LATENCY=1.
+
+Uso:
+    python benchmark_suite.py [--scales 1 10 100] [--repeat 5] [--output archivo.json]
+    python benchmark_suite.py --save-baseline [--scales 1] [--tolerance 1.0]
+    python benchmark_suite.py --compare [--tolerance 0.5] [--queries-only]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from benchmark_data import create_database, scaled_counts
+from config.database import connection_manager, get_connection
+from models.query_cache import query_cache
+from utils.paths import get_db_path
+from utils.query_profiler import profiler
+
+DEFAULT_SCALES = [1, 10]
+DEFAULT_REPEAT = 5
+DEFAULT_OUTPUT = "benchmark_results.json"
+SEED = 42
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+DEFAULT_TOLERANCE = 1.0           # Mediana hasta 2x la de la línea base
+DEFAULT_MIN_REGRESSION_MS = 10.0  # Diferencias menores se consideran ruido
+WRITE_ROWS = 500                  # Gastos por medición de escrituras
+
+
+def _operations():
+    """[(nombre, función)] a medir sobre la base actual"""
+    from models.sale import Sale
+    from models.cash_register import CashRegister
+    from models.financial_report import get_financial_summary
+    from models.payment_allocation import allocate_payment, plan_allocation
+    from models.reconciliation import reconcile_clients
+    from utils.excel_exporter import ExcelExporter
+
+    today = date.today()
+    month_ago = (today - timedelta(days=30)).isoformat()
+
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, total_debt FROM clients ORDER BY total_debt DESC, id LIMIT 1")
+        client_id, debt = cursor.fetchone()
+    finally:
+        conn.close()
+
+    return [
+        ("Sale.get_filtered_sales (30 días)", lambda: Sale.get_filtered_sales(month_ago, today.isoformat())),
+        ("Sale.get_filtered_sales (pendientes)", lambda: Sale.get_filtered_sales(status='pending')),
+        ("Sale.get_filtered_sales (todas)", lambda: Sale.get_filtered_sales()),
+        ("CashRegister.get_history (365 días)", lambda: CashRegister.get_history(365)),
+        ("get_financial_summary", get_financial_summary),
+        ("plan_allocation", lambda: plan_allocation(client_id, debt)),
+        ("allocate_payment", lambda: allocate_payment(client_id, 1000.0, "Abono benchmark")),
+        ("reconcile_clients", reconcile_clients),
+        ("ExcelExporter.export_cash_flow", lambda: ExcelExporter.export_cash_flow("libro_diario.xlsx")),
+        ("ExcelExporter.export_inventory_flow",
+         lambda: ExcelExporter.export_inventory_flow("libro_inventario.xlsx")),
+        (f"Escrituras de {WRITE_ROWS} gastos (con contadores)", lambda: write_expenses(WRITE_ROWS)),
+        (f"Escrituras de {WRITE_ROWS} gastos (sin contadores)",
+         lambda: write_expenses(WRITE_ROWS, counters=False)),
+    ]
+
+
+def write_expenses(count, counters=True):
+    """
+    Inserta, actualiza y borra count gastos, de a uno, en una transacción
+    que al final se deshace (la base queda igual). Con counters=False se
+    borran antes, dentro de la misma transacción, los triggers de
+    table_versions y table_writes de expenses: la diferencia entre ambas
+    mediciones es lo que cuestan los contadores de cambios.
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        if not counters:
+            for action in ('insert', 'update', 'delete'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS main.trg_version_expenses_{action}')
+                cursor.execute(f'DROP TRIGGER IF EXISTS temp.trg_local_expenses_{action}')
+        ids = []
+        for i in range(count):
+            cursor.execute("INSERT INTO expenses (description, amount, category, date) VALUES (?, ?, ?, ?)",
+                           ("Gasto benchmark", float(i), "Benchmark", "2025-01-01 10:00:00"))
+            ids.append(cursor.lastrowid)
+        for expense_id in ids:
+            cursor.execute("UPDATE expenses SET amount = amount + 1 WHERE id = ?", (expense_id,))
+        for expense_id in ids:
+            cursor.execute("DELETE FROM expenses WHERE id = ?", (expense_id,))
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def measure(func, repeat):
+    """Tiempos de repeat ejecuciones de func: {'min', 'median', 'max', 'queries'} o {'error'}"""
+    times = []
+    queries = 0
+    for _ in range(repeat):
+        profiler.reset()
+        start = time.perf_counter()
+        try:
+            func()
+        except Exception as e:
+            return {'error': str(e)}
+        times.append(time.perf_counter() - start)
+        queries = sum(s['calls'] for s in profiler.get_stats())
+    return {
+        'min': min(times),
+        'median': statistics.median(times),
+        'max': max(times),
+        'queries': queries,
+    }
+
+
+def run_scale(scale, repeat, seed=SEED):
+    """Genera la base para scale, mide las operaciones y retorna su resultado"""
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "benchmark.db")
+        start = time.perf_counter()
+        inserted = create_database(db_path, scale, seed)
+        generate_seconds = time.perf_counter() - start
+
+        connection_manager.close_all(db_path)
+        os.chdir(tmp)
+        try:
+            operations = {}
+            for name, func in _operations():
+                operations[name] = measure(func, repeat)
+                _print_operation(name, operations[name])
+        finally:
+            os.chdir(original_cwd)
+            connection_manager.close_all()
+
+        return {
+            'scale': scale,
+            'rows': inserted,
+            'generate_seconds': generate_seconds,
+            'db_size_mb': os.path.getsize(db_path) / (1024 * 1024),
+            'operations': operations,
+        }
+
+
+def _print_operation(name, result):
+    if 'error' in result:
+        print(f"  {name:<42} error: {result['error']}")
+    else:
+        print(f"  {name:<42} {result['median'] * 1000:>10.1f} ms {result['queries']:>6} consultas")
+
+
+def run(scales, repeat=DEFAULT_REPEAT, seed=SEED):
+    """Ejecuta el benchmark en cada escala y retorna el documento de resultados"""
+    original_db = get_db_path()
+    cache_enabled = query_cache.enabled
+    query_cache.enabled = False
+    profiler.enable(slow_query_ms=float('inf'), report_on_exit=False)
+    results = []
+    try:
+        for scale in scales:
+            print(f"Escala {scale:g} ({scaled_counts(scale)['sales']:,} ventas)")
+            results.append(run_scale(scale, repeat, seed))
+    finally:
+        profiler.disable()
+        query_cache.enabled = cache_enabled
+        connection_manager.close_all(original_db)
+
+    return {
+        'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'seed': seed,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+# ── Línea base ───────────────────────────────────────────────────────────────
+def save_baseline(document, path=BASELINE_PATH, tolerance=DEFAULT_TOLERANCE,
+                  min_regression_ms=DEFAULT_MIN_REGRESSION_MS):
+    """Guarda document como línea base junto con la tolerancia a usar al comparar"""
+    baseline = dict(document, tolerance=tolerance, min_regression_ms=min_regression_ms)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+def load_baseline(path=BASELINE_PATH):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(baseline, document, tolerance=None, min_regression_ms=None, check_latency=True):
+    """
+    Compara document con baseline operación por operación. Retorna
+    (filas, fallas): una fila por (escala, operación) con las medianas, las
+    consultas y el estado, y la lista de descripciones de las fallas. Con
+    check_latency=False las medianas se muestran pero no generan fallas.
+    """
+    if tolerance is None:
+        tolerance = baseline.get('tolerance', DEFAULT_TOLERANCE)
+    if min_regression_ms is None:
+        min_regression_ms = baseline.get('min_regression_ms', DEFAULT_MIN_REGRESSION_MS)
+
+    current = {result['scale']: result for result in document['results']}
+    rows, failures = [], []
+    for base in baseline['results']:
+        result = current.get(base['scale'])
+        if result is None:
+            failures.append(f"Escala {base['scale']:g}: no se midió")
+            continue
+        names = list(base['operations']) + [name for name in result['operations'] if name not in base['operations']]
+        for name in names:
+            before = base['operations'].get(name)
+            after = result['operations'].get(name)
+            row = {'scale': base['scale'], 'operation': name, 'before': before, 'after': after}
+            row['status'] = _status(before, after, tolerance, min_regression_ms, check_latency)
+            rows.append(row)
+            if row['status'] not in ('ok', 'nueva', 'sin línea base'):
+                failures.append(f"Escala {base['scale']:g}, {name}: {row['status']}")
+    return rows, failures
+
+
+def _status(before, after, tolerance, min_regression_ms, check_latency=True):
+    if before is None:
+        return 'nueva'
+    if after is None:
+        return 'no se midió'
+    if 'error' in before:
+        return 'sin línea base'
+    if 'error' in after:
+        return 'error'
+    if after['queries'] > before['queries']:
+        return 'más consultas'
+    delta_ms = (after['median'] - before['median']) * 1000
+    if check_latency and after['median'] > before['median'] * (1 + tolerance) and delta_ms > min_regression_ms:
+        return 'más lenta'
+    return 'ok'
+
+
+def print_comparison(rows):
+    """Tabla con la diferencia por operación"""
+    print(f"{'Escala':>7}  {'Operación':<42} {'Base':>10} {'Actual':>10} {'Cambio':>8} "
+          f"{'Consultas':>11}  Estado")
+    for row in rows:
+        before, after = row['before'] or {}, row['after'] or {}
+        before_ms = f"{before['median'] * 1000:.1f}ms" if 'median' in before else '-'
+        after_ms = f"{after['median'] * 1000:.1f}ms" if 'median' in after else '-'
+        change = '-'
+        if before.get('median') and 'median' in after:
+            change = f"{(after['median'] / before['median'] - 1) * 100:+.0f}%"
+        queries = f"{before.get('queries', '-')}→{after.get('queries', '-')}"
+        mark = '✓' if row['status'] in ('ok', 'nueva', 'sin línea base') else '✗'
+        print(f"{row['scale']:>7g}  {row['operation']:<42} {before_ms:>10} {after_ms:>10} {change:>8} "
+              f"{queries:>11}  {mark} {row['status']}")
+
+
+def check_baseline(path=BASELINE_PATH, tolerance=None, min_regression_ms=None, check_latency=True):
+    """
+    Repite el benchmark con la configuración de la línea base y la compara.
+    Sin check_latency cada operación corre una sola vez: basta para contar
+    sus consultas.
+    """
+    baseline = load_baseline(path)
+    document = run([result['scale'] for result in baseline['results']],
+                   baseline['repeat'] if check_latency else 1, baseline['seed'])
+    return compare(baseline, document, tolerance, min_regression_ms, check_latency)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de la capa de datos a distintas escalas")
+    parser.add_argument('--scales', type=float, nargs='+', default=DEFAULT_SCALES)
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--save-baseline', action='store_true', help="Guarda los resultados como línea base")
+    mode.add_argument('--compare', action='store_true', help="Compara con la línea base guardada")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=None,
+                        help="Aumento permitido de la mediana (0.5 = +50%%)")
+    parser.add_argument('--min-regression-ms', type=float, default=None)
+    parser.add_argument('--queries-only', action='store_true',
+                        help="Al comparar, solo falla si aumentan las consultas")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        rows, failures = check_baseline(args.baseline, args.tolerance, args.min_regression_ms,
+                                        check_latency=not args.queries_only)
+        print()
+        print_comparison(rows)
+        if failures:
+            print(f"\n✗ {len(failures)} regresiones respecto a {args.baseline}")
+            return 1
+        print(f"\n✓ Sin regresiones respecto a {args.baseline}")
+        return 0
+
+    document = run(args.scales, args.repeat, args.seed)
+    if args.save_baseline:
+        save_baseline(document, args.baseline,
+                      DEFAULT_TOLERANCE if args.tolerance is None else args.tolerance,
+                      DEFAULT_MIN_REGRESSION_MS if args.min_regression_ms is None else args.min_regression_ms)
+        print(f"Línea base guardada en {args.baseline}")
+        return 0
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
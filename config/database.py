@@ -1,381 +1,753 @@
-import sqlite3
 import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 from utils.paths import get_db_path
+from utils.query_profiler import profiler, ProfilingCursor
 
 
-def get_connection():
-    """Obtiene conexión a la base de datos con configuraciones mejoradas"""
-    if not os.path.exists('data'):
-        os.makedirs('data')
-    
-    conn = sqlite3.connect(get_db_path(), timeout=30.0)  # Timeout de 30 segundos
-    conn.row_factory = sqlite3.Row
-    
-    # Configuraciones adicionales para mejorar rendimiento
-    conn.execute('PRAGMA journal_mode=WAL')  # Write-Ahead Logging
-    conn.execute('PRAGMA synchronous=NORMAL')
-    conn.execute('PRAGMA temp_store=MEMORY')
-    conn.execute('PRAGMA mmap_size=268435456')  # 256MB
-    
-    return conn
+class PooledConnection:
+    """
+    Préstamo de una conexión persistente del pool.
+    Se usa igual que una conexión sqlite3 normal; close() no cierra la
+    conexión real, solo la devuelve al pool del hilo actual.
 
-def migrate_sales_table():
-    """Migra la tabla de ventas sin perder datos - VERSIÓN SEGURA"""
-    conn = None
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Verificar estructura actual de la tabla sales
-        cursor.execute("PRAGMA table_info(sales)")
-        columns = {column[1]: column for column in cursor.fetchall()}
-        
-        # Lista de columnas que debe tener la tabla sales
-        required_columns = {
-            'id': 'INTEGER PRIMARY KEY AUTOINCREMENT',
-            'client_id': 'INTEGER',
-            'total': 'REAL NOT NULL',
-            'payment_type': 'TEXT NULL',
-            'payment_method': 'TEXT NULL',
-            'paid_amount': 'REAL DEFAULT 0.0',
-            'remaining_debt': 'REAL DEFAULT 0.0',
-            'notes': 'TEXT',
-            'user_id': 'INTEGER',
-            'created_at': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP',
-            'status': 'TEXT DEFAULT "paid"'
-        }
-        
-        # Agregar columnas faltantes una por una (SEGURO)
-        for column_name, column_def in required_columns.items():
-            if column_name not in columns:
-                try:
-                    if column_name == 'id':
-                        continue  # No se puede agregar PRIMARY KEY con ALTER
-                    
-                    cursor.execute(f'ALTER TABLE sales ADD COLUMN {column_name} {column_def}')
-                    print(f"Columna {column_name} agregada a sales")
-                except sqlite3.OperationalError as e:
-                    print(f"Columna {column_name} ya existe o error: {e}")
-        
-        # Migrar datos de payment_type a payment_method si es necesario
-        if 'payment_type' in columns and 'payment_method' in columns:
-            cursor.execute('UPDATE sales SET payment_method = payment_type WHERE payment_method IS NULL OR payment_method = ""')
-        
-        # Asegurar que todas las ventas tengan un status válido
-        cursor.execute('UPDATE sales SET status = "paid" WHERE status IS NULL OR status = ""')
-        
-        conn.commit()
-        print("Tabla sales migrada correctamente sin pérdida de datos")
-        
-    except Exception as e:
-        print(f"Error al migrar tabla sales: {e}")
-        if conn:
-            conn.rollback()
-    finally:
-        if conn:
-            conn.close()
-            
+    Un préstamo tomado dentro de un bloque connection() del mismo hilo es
+    anidado y trabaja sobre un SAVEPOINT propio: commit() solo confirma su
+    parte dentro de la transacción del bloque exterior (que decide al
+    final), rollback() deshace solo lo hecho desde ese SAVEPOINT y close()
+    conserva lo hecho para el bloque exterior.
+    """
 
-def init_database():
-    """Inicializa la base de datos con las tablas necesarias - VERSIÓN CORREGIDA"""
-    conn = None
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Tabla usuarios
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                role TEXT NOT NULL DEFAULT 'employee',
-                name TEXT,
-                position TEXT
-            )
-        ''')
+    __slots__ = ('_manager', '_conn', '_closed', '_savepoint')
 
-        # Verificar si hay usuarios, si no, crear el admin por defecto
-        cursor.execute("SELECT COUNT(*) FROM users")
-        if cursor.fetchone()[0] == 0:
-            try:
-                from utils.security import hash_password
-                admin_password = hash_password("admin123")
-            except ImportError:
-                admin_password = "admin123"  # Fallback si no existe la función hash
-            
-            cursor.execute(
-                "INSERT INTO users (username, password, role, name, position) VALUES (?, ?, ?, ?, ?)",
-                ("admin", admin_password, "admin", "Administrador", "Gerente")
-            )
-            print("Usuario administrador creado con éxito")
-        
-        # Tabla productos  
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                price REAL NOT NULL,
-                stock INTEGER DEFAULT 0,
-                cost_price REAL DEFAULT 0.0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Tabla clientes
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS clients (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                phone TEXT,
-                address TEXT,
-                credit_limit REAL DEFAULT 0.0,
-                total_debt REAL DEFAULT 0.0,
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Tabla para historial de transacciones de clientes
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS client_transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                client_id INTEGER NOT NULL,
-                transaction_type TEXT NOT NULL,
-                amount REAL NOT NULL,
-                description TEXT NOT NULL,
-                sale_id INTEGER NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (client_id) REFERENCES clients (id),
-                FOREIGN KEY (sale_id) REFERENCES sales (id)
-            )
-        ''')
-        
-        # Tabla de ventas
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sales (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                client_id INTEGER,
-                total REAL NOT NULL,
-                payment_type TEXT NULL,
-                payment_method TEXT NULL,
-                paid_amount REAL DEFAULT 0.0,
-                remaining_debt REAL DEFAULT 0.0,
-                adjustment REAL DEFAULT 0.0,
-                adjustment_reason TEXT,
-                notes TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                user_id INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'paid',
-                FOREIGN KEY (client_id) REFERENCES clients (id),
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Tabla de detalles de ventas
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sale_details (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                sale_id INTEGER NOT NULL,
-                product_id INTEGER NOT NULL,
-                quantity REAL NOT NULL,
-                unit_price REAL NOT NULL,
-                sale_price REAL NOT NULL,
-                subtotal REAL NOT NULL,
-                cost_price REAL DEFAULT 0,
-                FOREIGN KEY (sale_id) REFERENCES sales (id),
-                FOREIGN KEY (product_id) REFERENCES products (id)
-            )
-        ''')
-        
-        # Tabla de compras
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS purchases (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                total REAL NOT NULL,
-                iva REAL DEFAULT 0.0,
-                shipping REAL DEFAULT 0.0,
-                date TEXT DEFAULT CURRENT_TIMESTAMP,
-                invoice_number TEXT,
-                supplier TEXT,
-                freight TEXT,
-                tax TEXT,
-                subtotal TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Tabla de detalles de compras
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS purchase_details (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                purchase_id INTEGER NOT NULL,
-                product_id INTEGER NOT NULL,
-                quantity INTEGER NOT NULL,
-                unit_cost REAL NULL,
-                unit_price REAL NOT NULL,
-                subtotal REAL NOT NULL,
-                FOREIGN KEY (purchase_id) REFERENCES purchases (id),
-                FOREIGN KEY (product_id) REFERENCES products (id)
-            )
-        ''')
-        
-        # Tabla de gastos operativos
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS expenses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                description TEXT NOT NULL,
-                amount REAL NOT NULL,
-                category TEXT,
-                date TEXT DEFAULT CURRENT_TIMESTAMP,
-                user_id INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
+    def __init__(self, manager, conn, savepoint=None):
+        self._manager = manager
+        self._conn = conn
+        self._closed = False
+        self._savepoint = savepoint
+        if savepoint is not None:
+            if not conn.in_transaction:
+                # Sin BEGIN, el SAVEPOINT abriría la transacción y su RELEASE
+                # confirmaría en disco antes que el bloque exterior
+                conn.execute('BEGIN')
+            conn.execute(f'SAVEPOINT {savepoint}')
 
-        # Tabla de pérdidas/mermas
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS losses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id INTEGER NOT NULL,
-                quantity REAL NOT NULL,
-                unit_cost REAL NOT NULL,
-                total_cost REAL NOT NULL,
-                loss_date TIMESTAMP NOT NULL,
-                reason TEXT NOT NULL,
-                loss_type TEXT NOT NULL,
-                notes TEXT,
-                created_by INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (product_id) REFERENCES products(id),
-                FOREIGN KEY (created_by) REFERENCES users(id)
-            )
-        ''')
-        
-        # Agregar columnas faltantes de forma segura
-        safe_add_columns = [
-            ('clients', 'phone', 'TEXT'),
-            ('clients', 'address', 'TEXT'),
-            ('clients', 'credit_limit', 'REAL DEFAULT 0.0'),
-            ('clients', 'notes', 'TEXT'),
-            ('sales', 'notes', 'TEXT'),
-            ('sale_details', 'cost_price', 'REAL DEFAULT 0'),
-            ('sale_details', 'sale_price', 'REAL'),
-            ('purchases', 'date', 'TEXT DEFAULT CURRENT_TIMESTAMP'),
-            ('expenses', 'date', 'TEXT DEFAULT CURRENT_TIMESTAMP'),
-            ('purchases', 'freight', 'TEXT'),
-            ('purchases', 'tax', 'TEXT'),
-            ('purchases', 'subtotal', 'TEXT'),
-            ('purchases', 'lote_id', 'TEXT'),
-            ('purchases', 'shipping_total', 'REAL DEFAULT 0.0'),
-        ]
-        
-        for table, column, definition in safe_add_columns:
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args):
+        cursor = self._conn.cursor(*args)
+        if profiler.enabled:
+            return ProfilingCursor(cursor, profiler)
+        return cursor
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def commit(self):
+        """Confirma la transacción, o solo el SAVEPOINT si el préstamo es anidado"""
+        if self._savepoint is None:
+            self._conn.commit()
+        elif self._release_savepoint():
+            self._conn.execute(f'SAVEPOINT {self._savepoint}')
+
+    def rollback(self):
+        """Deshace la transacción, o solo lo hecho desde el SAVEPOINT si es anidado"""
+        if self._savepoint is None:
+            self._conn.rollback()
+        else:
             try:
-                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
-                print(f"Columna {column} agregada a {table}")
+                self._conn.execute(f'ROLLBACK TO {self._savepoint}')
             except sqlite3.OperationalError:
-                pass  # La columna ya existe
-        add_adjustment_column_to_sales()
-        # Migrar datos de unit_price a sale_price en sale_details si es necesario
+                pass  # El bloque exterior ya lo liberó o deshizo
+
+    def _release_savepoint(self):
         try:
-            cursor.execute('UPDATE sale_details SET sale_price = unit_price WHERE sale_price IS NULL')
+            self._conn.execute(f'RELEASE {self._savepoint}')
+            return True
         except sqlite3.OperationalError:
+            return False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Igual que sqlite3.Connection: commit o rollback, sin cerrar
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def close(self):
+        """Devuelve la conexión al pool (idempotente)"""
+        if not self._closed:
+            self._closed = True
+            if self._savepoint is not None:
+                self._release_savepoint()
+            self._manager.release(self._conn)
+
+    def __del__(self):
+        # Préstamos que nunca llamaron close() (ej: get_connection().cursor())
+        try:
+            self.close()
+        except Exception:
             pass
-        conn.commit()
-        print("Base de datos inicializada correctamente")
-        
-        # Cerrar conexión antes de llamar a migrate_sales_table
-        migrate_client_transactions_table() 
 
-    except Exception as e:
-        print(f"Error al inicializar base de datos: {e}")
-        if conn:
-            conn.rollback()
-    finally:
-        if conn:
+
+class ConnectionManager:
+    """
+    Mantiene una conexión SQLite de larga duración por hilo.
+    Los PRAGMAs se aplican una sola vez al abrirla y cada get_connection()
+    posterior en el mismo hilo la reutiliza. Cuando se devuelve el último
+    préstamo activo con una transacción sin confirmar, se hace rollback
+    (mismo comportamiento que cerrar una conexión sin commit).
+
+    Como todos los préstamos de un hilo comparten la conexión, dentro de un
+    bloque connection() la transacción es del bloque más exterior: los
+    préstamos y bloques anidados usan SAVEPOINTs (ver PooledConnection) y
+    su commit() o rollback() nunca confirma ni deshace el trabajo de fuera.
+    """
+
+    PRAGMAS = (
+        'PRAGMA journal_mode=WAL',       # Write-Ahead Logging
+        'PRAGMA synchronous=NORMAL',
+        'PRAGMA temp_store=MEMORY',
+        'PRAGMA mmap_size=268435456',    # 256MB
+    )
+
+    def __init__(self, db_path=None):
+        self._db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}  # thread ident -> conexión
+        self._generation = 0
+        self._stats = {'opened': 0, 'reused': 0, 'closed': 0}
+
+    @property
+    def db_path(self):
+        if self._db_path is None:
+            self._db_path = get_db_path()
+        return self._db_path
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, timeout=30.0,  # Timeout de 30 segundos
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        install_local_write_counters(conn)
+        return conn
+
+    def _prune_dead_threads(self):
+        """Cierra conexiones de hilos que ya terminaron (llamar con el lock tomado)"""
+        alive = {thread.ident for thread in threading.enumerate()}
+        for ident in [i for i in self._connections if i not in alive]:
             try:
-                conn.close()
-            except sqlite3.ProgrammingError:
-                pass  # Ya estaba cerrada
+                self._connections.pop(ident).close()
+                self._stats['closed'] += 1
+            except sqlite3.Error:
+                pass
 
+    def acquire(self):
+        """Presta la conexión del hilo actual, abriéndola si hace falta"""
+        local = self._local
+        savepoint = None
+        conn = getattr(local, 'conn', None)
+        if conn is None or local.generation != self._generation:
+            conn = self._open()
+            local.conn = conn
+            local.depth = 0
+            local.generation = self._generation
+            with self._lock:
+                self._prune_dead_threads()
+                self._connections[threading.get_ident()] = conn
+                self._stats['opened'] += 1
+        else:
+            with self._lock:
+                self._stats['reused'] += 1
+            if getattr(local, 'blocks', 0) > 0:
+                local.savepoints = getattr(local, 'savepoints', 0) + 1
+                savepoint = f'loan_{local.savepoints}'
+        loan = PooledConnection(self, conn, savepoint)
+        local.depth += 1
+        return loan
 
-def migrate_client_transactions_table():
-    """Agrega la columna sale_id a client_transactions si no existe"""
-    conn = None
+    def release(self, conn):
+        """Devuelve un préstamo; al soltar el último descarta lo no confirmado"""
+        local = self._local
+        if getattr(local, 'conn', None) is not conn:
+            return  # Conexión de otro hilo o de una generación anterior
+        local.depth = max(0, local.depth - 1)
+        if local.depth == 0 and conn.in_transaction:
+            conn.rollback()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager con commit automático al salir sin errores
+        y rollback si se produce una excepción. Anidado dentro de otro
+        bloque del mismo hilo trabaja sobre un SAVEPOINT: el error deshace
+        solo lo suyo y el commit final queda en manos del bloque exterior.
+        """
+        conn = self.acquire()
+        local = self._local
+        local.blocks = getattr(local, 'blocks', 0) + 1
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            local.blocks = max(0, local.blocks - 1)
+            conn.close()
+
+    def close_all(self, db_path=None):
+        """Cierra todas las conexiones del pool (al salir o al cambiar de BD)"""
+        with self._lock:
+            for conn in self._connections.values():
+                try:
+                    conn.close()
+                    self._stats['closed'] += 1
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+            self._generation += 1
+            if db_path is not None:
+                self._db_path = db_path
+
+    def get_stats(self):
+        """Contadores de aperturas/reutilizaciones del pool"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['active'] = len(self._connections)
+        return stats
+
+
+connection_manager = ConnectionManager()
+
+
+def get_connection():
+    """Obtiene la conexión persistente del hilo actual (ver ConnectionManager)"""
+    return connection_manager.acquire()
+
+
+def db_connection():
+    """Context manager: `with db_connection() as conn:` hace commit/rollback automático"""
+    return connection_manager.connection()
+
+
+def close_all_connections():
+    """Cierra las conexiones del pool (al salir) y borra los contadores de escritura propios"""
+    forget_local_writes()
+    connection_manager.close_all()
+
+def init_database():
+    """
+    Prepara la base de datos: aplica las migraciones pendientes del esquema
+    (ver config/migrations.py), crea el administrador por defecto si no
+    hay usuarios y descarta los contadores de escritura que dejaron otros
+    procesos (prune_table_writes). Con la base al día no modifica nada más.
+    """
+    from config.migrations import run_migrations
     try:
-        conn = get_connection()
+        if run_migrations():
+            print("Base de datos inicializada correctamente")
+        ensure_default_admin()
+        prune_table_writes()
+    except Exception as e:
+        print(f"Error al inicializar base de datos: {e}")
+
+
+def ensure_default_admin():
+    """Crea el usuario admin por defecto si la tabla users está vacía"""
+    with db_connection() as conn:
         cursor = conn.cursor()
-        
-        # Verificar si la columna sale_id ya existe
-        cursor.execute("PRAGMA table_info(client_transactions)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'sale_id' not in columns:
+        cursor.execute("SELECT 1 FROM users LIMIT 1")
+        if cursor.fetchone() is not None:
+            return False
+        try:
+            from utils.security import hash_password
+            admin_password = hash_password("admin123")
+        except ImportError:
+            admin_password = "admin123"  # Fallback si no existe la función hash
+        
+        cursor.execute(
+            "INSERT INTO users (username, password, role, name, position) VALUES (?, ?, ?, ?, ?)",
+            ("admin", admin_password, "admin", "Administrador", "Gerente")
+        )
+        print("Usuario administrador creado con éxito")
+        return True
+
+
+# Índices secundarios. Subir INDEX_VERSION al agregar, cambiar o retirar uno
+# (los retirados se listan en OBSOLETE_INDEXES para borrarlos).
+INDEX_VERSION = 4
+
+SCHEMA_INDEXES = [
+    # Ventas: historial por cliente, listados por fecha y caja del día
+    ('idx_sales_client_created', 'sales (client_id, created_at)', None),
+    ('idx_sales_created', 'sales (created_at)', None),
+    ('idx_sales_pending_client', 'sales (client_id, created_at, total, paid_amount)', "status = 'pending'"),
+    ('idx_sales_cash_paid_created', 'sales (created_at, total)', "payment_method = 'cash' AND status = 'paid'"),
+    # Detalles de ventas
+    ('idx_sale_details_sale', 'sale_details (sale_id)', None),
+    ('idx_sale_details_product', 'sale_details (product_id)', None),
+    # Historial de clientes y dinero recibido por fecha (abonos y crédito a favor)
+    ('idx_client_tx_client_created', 'client_transactions (client_id, created_at)', None),
+    ('idx_client_tx_cash_created', 'client_transactions (created_at, amount)',
+     "transaction_type IN ('credit', 'credit_balance')"),
+    ('idx_client_tx_sale', 'client_transactions (sale_id)', None),
+    # Reparto de pagos por venta y por movimiento
+    ('idx_payment_alloc_sale', 'payment_allocations (sale_id)', None),
+    ('idx_payment_alloc_tx', 'payment_allocations (transaction_id)', None),
+    # Compras
+    ('idx_purchases_date', 'purchases (date)', None),
+    ('idx_purchases_lote', 'purchases (lote_id)', None),
+    ('idx_purchase_details_purchase', 'purchase_details (purchase_id)', None),
+    ('idx_purchase_details_product', 'purchase_details (product_id)', None),
+    # Gastos y pérdidas
+    ('idx_expenses_date', 'expenses (date)', None),
+    ('idx_expenses_category_date', 'expenses (category, date)', None),
+    ('idx_losses_date', 'losses (loss_date)', None),
+    ('idx_losses_product', 'losses (product_id)', None),
+    ('idx_losses_type_date', 'losses (loss_type, loss_date)', None),
+]
+
+OBSOLETE_INDEXES = ['idx_client_tx_credit_created']
+
+# Consultas calientes y el índice que deben usar (ver verify_index_usage)
+INDEX_PLAN_CHECKS = [
+    ("Ventas pendientes por cliente",
+     "SELECT id, created_at, total, paid_amount FROM sales WHERE client_id = ? AND status = 'pending' ORDER BY created_at ASC",
+     (1,), 'idx_sales_pending_client'),
+    ("Ventas de un cliente",
+     "SELECT id, total FROM sales WHERE client_id = ?",
+     (1,), 'idx_sales_client_created'),
+    ("Detalles de una venta",
+     "SELECT * FROM sale_details WHERE sale_id = ?",
+     (1,), 'idx_sale_details_sale'),
+    ("Ventas de un producto",
+     "SELECT SUM(quantity) FROM sale_details WHERE product_id = ?",
+     (1,), 'idx_sale_details_product'),
+    ("Historial de un cliente",
+     "SELECT * FROM client_transactions WHERE client_id = ? ORDER BY created_at DESC",
+     (1,), 'idx_client_tx_client_created'),
+    ("Ventas de contado por fecha",
+     "SELECT SUM(total) FROM sales WHERE created_at >= ? AND created_at < ? AND payment_method = 'cash' AND status = 'paid'",
+     ('2025-01-01', '2025-01-02'), 'idx_sales_cash_paid_created'),
+    ("Abonos por fecha",
+     "SELECT SUM(amount) FROM client_transactions WHERE transaction_type IN ('credit', 'credit_balance') AND created_at >= ? AND created_at < ?",
+     ('2025-01-01', '2025-01-02'), 'idx_client_tx_cash_created'),
+    ("Detalles de una compra",
+     "SELECT * FROM purchase_details WHERE purchase_id = ?",
+     (1,), 'idx_purchase_details_purchase'),
+    ("Compras de un producto",
+     "SELECT SUM(quantity) FROM purchase_details WHERE product_id = ?",
+     (1,), 'idx_purchase_details_product'),
+    ("Gastos por categoría",
+     "SELECT * FROM expenses WHERE category = ? ORDER BY date DESC, id DESC LIMIT 100",
+     ('Servicios',), 'idx_expenses_category_date'),
+    ("Pérdidas por tipo",
+     "SELECT * FROM losses WHERE loss_type = ? ORDER BY loss_date DESC, id DESC LIMIT 100",
+     ('damage',), 'idx_losses_type_date'),
+]
+
+
+def _get_meta(cursor, key):
+    cursor.execute("CREATE TABLE IF NOT EXISTS schema_meta (key TEXT PRIMARY KEY, value TEXT)")
+    cursor.execute("SELECT value FROM schema_meta WHERE key = ?", (key,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _set_meta(cursor, key, value):
+    cursor.execute('''
+        INSERT INTO schema_meta (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+    ''', (key, str(value)))
+
+
+def ensure_indexes(force=False):
+    """
+    Crea los índices secundarios de SCHEMA_INDEXES de forma idempotente.
+    Si la versión registrada coincide y todos existen, no hace nada.
+    Retorna la lista de índices creados.
+    """
+    created = []
+    try:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+            existing = {row[0] for row in cursor.fetchall()}
+            expected = {name for name, _, _ in SCHEMA_INDEXES}
+
+            current_version = _get_meta(cursor, 'index_version')
+            if not force and current_version == str(INDEX_VERSION) and expected <= existing:
+                return created
+
+            for name in OBSOLETE_INDEXES:
+                cursor.execute(f'DROP INDEX IF EXISTS {name}')
+
+            for name, target, where in SCHEMA_INDEXES:
+                if name in existing:
+                    if not force and current_version == str(INDEX_VERSION):
+                        continue
+                    # Versión nueva: recrear por si cambió la definición
+                    cursor.execute(f'DROP INDEX IF EXISTS {name}')
+                sql = f'CREATE INDEX IF NOT EXISTS {name} ON {target}'
+                if where:
+                    sql += f' WHERE {where}'
+                cursor.execute(sql)
+                created.append(name)
+
+            _set_meta(cursor, 'index_version', INDEX_VERSION)
+            if created:
+                cursor.execute('ANALYZE')
+                print(f"Índices creados/actualizados: {len(created)}")
+    except Exception as e:
+        print(f"Error al crear índices: {e}")
+    return created
+
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Columnas de fecha que se guardan como texto 'YYYY-MM-DD HH:MM:SS'
+TIMESTAMP_COLUMNS = [
+    ('sales', 'created_at'),
+    ('client_transactions', 'created_at'),
+    ('purchases', 'date'),
+    ('expenses', 'date'),
+    ('expenses', 'created_at'),
+    ('losses', 'loss_date'),
+    ('losses', 'created_at'),
+]
+
+TIMESTAMPS_VERSION = 1
+
+
+def day_range(start_date, end_date=None):
+    """
+    Convierte un rango de días (inclusive) en límites semiabiertos
+    [inicio, fin) para comparar directamente contra columnas de fecha
+    normalizadas, sin envolverlas en DATE() (así se usan los índices).
+    Acepta 'YYYY-MM-DD', date o datetime. Retorna ('YYYY-MM-DD', 'YYYY-MM-DD').
+    """
+    def to_date(value):
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        return datetime.strptime(str(value).strip()[:10], '%Y-%m-%d').date()
+
+    start = to_date(start_date)
+    end = to_date(end_date) if end_date else start
+    return start.isoformat(), (end + timedelta(days=1)).isoformat()
+
+
+def normalize_timestamps(force=False):
+    """
+    Migración: reescribe las fechas en formato mixto (con 'T', microsegundos,
+    solo fecha...) al formato TIMESTAMP_FORMAT, para que las comparaciones
+    de texto por rango sean cronológicas. Los valores que SQLite no reconoce
+    como fecha se dejan intactos.
+    """
+    try:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            if not force and _get_meta(cursor, 'timestamps_version') == str(TIMESTAMPS_VERSION):
+                return 0
+
+            updated = 0
+            for table, column in TIMESTAMP_COLUMNS:
+                try:
+                    cursor.execute(f'''
+                        UPDATE {table}
+                        SET {column} = strftime('{TIMESTAMP_FORMAT}', {column})
+                        WHERE typeof({column}) = 'text'
+                          AND strftime('{TIMESTAMP_FORMAT}', {column}) IS NOT NULL
+                          AND {column} != strftime('{TIMESTAMP_FORMAT}', {column})
+                    ''')
+                    updated += cursor.rowcount
+                except sqlite3.OperationalError:
+                    pass  # Tabla o columna inexistente en BD antiguas
+
+            _set_meta(cursor, 'timestamps_version', TIMESTAMPS_VERSION)
+            if updated:
+                print(f"Fechas normalizadas: {updated}")
+            return updated
+    except Exception as e:
+        print(f"Error al normalizar fechas: {e}")
+        return 0
+
+
+# Resumen diario de caja (daily_cash_summary). Lo mantienen triggers sobre
+# sales y client_transactions dentro de la misma transacción que escribe la
+# venta o el abono, sin importar desde qué ventana se haga. Los abonos
+# incluyen el excedente de un pago que quedó como crédito a favor
+# ('credit_balance'): también es efectivo que entró a la caja.
+CASH_SUMMARY_VERSION = 2
+
+_CASH_SALE = "{row}.payment_method = 'cash' AND {row}.status = 'paid' AND {row}.created_at IS NOT NULL"
+_CASH_CREDIT = "{row}.transaction_type IN ('credit', 'credit_balance') AND {row}.created_at IS NOT NULL"
+
+
+def _cash_summary_upsert(amount_column, count_column, amount, sign, row, condition):
+    return f'''
+            INSERT INTO daily_cash_summary (fecha, {amount_column}, {count_column})
+            SELECT substr({row}.created_at, 1, 10), {sign}{amount}, {sign}1
+            WHERE {condition.format(row=row)}
+            ON CONFLICT(fecha) DO UPDATE SET
+                {amount_column} = {amount_column} + excluded.{amount_column},
+                {count_column} = {count_column} + excluded.{count_column};'''
+
+
+def _cash_summary_triggers():
+    sale_add = _cash_summary_upsert('total_contado', 'num_ventas', 'NEW.total', '', 'NEW', _CASH_SALE)
+    sale_sub = _cash_summary_upsert('total_contado', 'num_ventas', 'OLD.total', '-', 'OLD', _CASH_SALE)
+    credit_add = _cash_summary_upsert('total_abonos', 'num_abonos', 'ABS(NEW.amount)', '', 'NEW', _CASH_CREDIT)
+    credit_sub = _cash_summary_upsert('total_abonos', 'num_abonos', 'ABS(OLD.amount)', '-', 'OLD', _CASH_CREDIT)
+    return {
+        'trg_cash_sales_insert': f'AFTER INSERT ON sales BEGIN {sale_add} END',
+        'trg_cash_sales_delete': f'AFTER DELETE ON sales BEGIN {sale_sub} END',
+        'trg_cash_sales_update': (
+            'AFTER UPDATE OF total, payment_method, status, created_at ON sales '
+            f'BEGIN {sale_sub} {sale_add} END'
+        ),
+        'trg_cash_credits_insert': f'AFTER INSERT ON client_transactions BEGIN {credit_add} END',
+        'trg_cash_credits_delete': f'AFTER DELETE ON client_transactions BEGIN {credit_sub} END',
+        'trg_cash_credits_update': (
+            'AFTER UPDATE OF amount, transaction_type, created_at ON client_transactions '
+            f'BEGIN {credit_sub} {credit_add} END'
+        ),
+    }
+
+
+def rebuild_daily_cash_summary(cursor):
+    """Recalcula daily_cash_summary desde cero a partir de ventas y abonos"""
+    cursor.execute('DELETE FROM daily_cash_summary')
+    cursor.execute('''
+        INSERT INTO daily_cash_summary (fecha, total_contado, num_ventas, total_abonos, num_abonos)
+        SELECT fecha, SUM(total_contado), SUM(num_ventas), SUM(total_abonos), SUM(num_abonos)
+        FROM (
+            SELECT substr(created_at, 1, 10) AS fecha, total AS total_contado, 1 AS num_ventas,
+                   0 AS total_abonos, 0 AS num_abonos
+            FROM sales
+            WHERE payment_method = 'cash' AND status = 'paid' AND created_at IS NOT NULL
+            UNION ALL
+            SELECT substr(created_at, 1, 10), 0, 0, ABS(amount), 1
+            FROM client_transactions
+            WHERE transaction_type IN ('credit', 'credit_balance') AND created_at IS NOT NULL
+        )
+        GROUP BY fecha
+    ''')
+    return cursor.rowcount
+
+
+def ensure_daily_cash_summary(force=False):
+    """Crea la tabla y los triggers del resumen diario y la llena la primera vez"""
+    try:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            if not force and _get_meta(cursor, 'cash_summary_version') == str(CASH_SUMMARY_VERSION):
+                return False
+
             cursor.execute('''
-                ALTER TABLE client_transactions 
-                ADD COLUMN sale_id INTEGER NULL
+                CREATE TABLE IF NOT EXISTS daily_cash_summary (
+                    fecha TEXT PRIMARY KEY,
+                    total_contado REAL NOT NULL DEFAULT 0,
+                    num_ventas INTEGER NOT NULL DEFAULT 0,
+                    total_abonos REAL NOT NULL DEFAULT 0,
+                    num_abonos INTEGER NOT NULL DEFAULT 0
+                )
             ''')
-            print("Columna sale_id agregada a client_transactions")
-            
-            # Agregar la foreign key constraint si no existe
+            for name, body in _cash_summary_triggers().items():
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+                cursor.execute(f'CREATE TRIGGER {name} {body}')
+
+            days = rebuild_daily_cash_summary(cursor)
+            _set_meta(cursor, 'cash_summary_version', CASH_SUMMARY_VERSION)
+            print(f"Resumen diario de caja reconstruido: {days} días")
+            return True
+    except Exception as e:
+        print(f"Error al crear resumen diario de caja: {e}")
+        return False
+
+
+# Contador de escrituras por tabla, mantenido por triggers. Lo usan el
+# vigilante de cambios externos (utils/db_watcher.py) para saber qué tablas
+# cambió otro proceso y la caché de consultas (models/query_cache.py) para
+# invalidarse por tabla. Subir TABLE_VERSIONS_VERSION al cambiar la lista.
+#
+# table_writes cuenta, por proceso (writer = pid), las escrituras que hizo
+# el propio proceso: lo incrementan triggers TEMP que solo existen en las
+# conexiones del pool (install_local_write_counters). Como corren en la
+# misma transacción que la escritura, un rollback también los descarta.
+TABLE_VERSIONS_VERSION = 4
+
+LOCAL_WRITER = os.getpid()
+
+WATCHED_TABLES = [
+    'products', 'sales', 'sale_details', 'clients', 'client_transactions',
+    'purchases', 'purchase_details', 'expenses', 'losses', 'users',
+    'daily_cash_summary', 'payment_allocations',
+]
+
+
+def ensure_table_versions(force=False):
+    """Crea la tabla table_versions y los triggers que la incrementan"""
+    try:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            if not force and _get_meta(cursor, 'table_versions_version') == str(TABLE_VERSIONS_VERSION):
+                return False
+
             cursor.execute('''
-                PRAGMA foreign_key_list(client_transactions)
+                CREATE TABLE IF NOT EXISTS table_versions (
+                    name TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL DEFAULT 0
+                )
             ''')
-            fks = cursor.fetchall()
-            sale_id_fk_exists = any(fk[3] == 'sales' for fk in fks)
-            
-            if not sale_id_fk_exists:
-                # SQLite no permite agregar FK constraints con ALTER TABLE,
-                # así que necesitamos recrear la tabla
-                print("Recreando tabla client_transactions con FK constraint...")
-                
-                # 1. Crear tabla temporal
-                cursor.execute('''
-                    CREATE TABLE temp_client_transactions AS
-                    SELECT * FROM client_transactions
-                ''')
-                
-                # 2. Eliminar tabla original
-                cursor.execute('DROP TABLE client_transactions')
-                
-                # 3. Crear nueva tabla con la estructura correcta
-                cursor.execute('''
-                    CREATE TABLE client_transactions (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        client_id INTEGER NOT NULL,
-                        transaction_type TEXT NOT NULL,
-                        amount REAL NOT NULL,
-                        description TEXT NOT NULL,
-                        sale_id INTEGER NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (client_id) REFERENCES clients (id),
-                        FOREIGN KEY (sale_id) REFERENCES sales (id)
-                    )
-                ''')
-                
-                # 4. Copiar datos de vuelta
-                cursor.execute('''
-                    INSERT INTO client_transactions
-                    SELECT * FROM temp_client_transactions
-                ''')
-                
-                # 5. Eliminar tabla temporal
-                cursor.execute('DROP TABLE temp_client_transactions')
-                
-        conn.commit()
-        print("Migración de client_transactions completada")
-        
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS table_writes (
+                    writer INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    version INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (writer, name)
+                )
+            ''')
+            for table in WATCHED_TABLES:
+                cursor.execute('INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 0)', (table,))
+                for action in ('INSERT', 'UPDATE', 'DELETE'):
+                    name = f'trg_version_{table}_{action.lower()}'
+                    cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+                    cursor.execute(f'''
+                        CREATE TRIGGER {name} AFTER {action} ON {table}
+                        BEGIN
+                            UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+                        END
+                    ''')
+            _set_meta(cursor, 'table_versions_version', TABLE_VERSIONS_VERSION)
+            # Las demás conexiones del pool los instalan al abrirse
+            install_local_write_counters(conn)
+            return True
     except Exception as e:
-        print(f"Error al migrar client_transactions: {e}")
-        if conn:
-            conn.rollback()
+        print(f"Error al crear contadores de tablas: {e}")
+        return False
+
+
+def install_local_write_counters(conn):
+    """
+    Crea en conn los triggers TEMP que cuentan en table_writes las
+    escrituras de este proceso. No hace nada si la base todavía no tiene
+    table_writes (se llama de nuevo al crearla).
+    """
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'table_writes'").fetchone() is None:
+        return False
+    for table in WATCHED_TABLES:
+        for action in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''
+                CREATE TEMP TRIGGER IF NOT EXISTS trg_local_{table}_{action.lower()} AFTER {action} ON main.{table}
+                BEGIN
+                    INSERT INTO table_writes (writer, name, version) VALUES ({LOCAL_WRITER}, '{table}', 1)
+                    ON CONFLICT(writer, name) DO UPDATE SET version = version + 1;
+                END
+            ''')
+    return True
+
+
+def prune_table_writes():
+    """
+    Borra de table_writes las filas de otros procesos (writer != LOCAL_WRITER)
+    para que la tabla no crezca con un pid nuevo en cada arranque. Las deja
+    una instancia que se cerró sin close_all_connections(); si otra instancia
+    sigue abierta, su vigilante anuncia una vez las tablas que ella escribió.
+    Retorna el número de filas borradas.
+    """
+    try:
+        with db_connection() as conn:
+            return conn.execute('DELETE FROM table_writes WHERE writer != ?', (LOCAL_WRITER,)).rowcount
+    except sqlite3.OperationalError:
+        return 0  # Base sin table_writes
+
+
+def forget_local_writes():
+    """Borra los contadores de escritura de este proceso (al cerrar la aplicación)"""
+    try:
+        with db_connection() as conn:
+            return conn.execute('DELETE FROM table_writes WHERE writer = ?', (LOCAL_WRITER,)).rowcount
+    except sqlite3.OperationalError:
+        return 0
+
+
+def get_table_versions(cursor):
+    """{tabla: versión} según table_versions (vacío si la tabla no existe)"""
+    try:
+        cursor.execute('SELECT name, version FROM table_versions')
+    except sqlite3.OperationalError:
+        return {}
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+
+def get_external_table_versions(cursor):
+    """
+    {tabla: versión sin las escrituras de este proceso}: solo cambia cuando
+    escribe otro proceso. Una sola consulta, así versiones y escrituras
+    propias salen de la misma lectura.
+    """
+    try:
+        cursor.execute('''
+            SELECT v.name, v.version - COALESCE(w.version, 0)
+            FROM table_versions v
+            LEFT JOIN table_writes w ON w.writer = ? AND w.name = v.name
+        ''', (LOCAL_WRITER,))
+    except sqlite3.OperationalError:
+        return {}
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+
+def get_index_report():
+    """Estado de cada índice esperado: [(nombre, tabla, existe)]"""
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+        existing = {row[0] for row in cursor.fetchall()}
+        return [(name, target.split(' ')[0], name in existing)
+                for name, target, _ in SCHEMA_INDEXES]
     finally:
-        if conn:
-            conn.close()
+        conn.close()
+
+
+def explain_query_plan(sql, params=()):
+    """Retorna las líneas de EXPLAIN QUERY PLAN de una consulta"""
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[3] for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def verify_index_usage():
+    """
+    Comprueba con EXPLAIN QUERY PLAN que las consultas de INDEX_PLAN_CHECKS
+    usan su índice. Retorna [(descripción, índice, ok, plan)].
+    """
+    results = []
+    for description, sql, params, index_name in INDEX_PLAN_CHECKS:
+        plan = explain_query_plan(sql, params)
+        ok = any(index_name in line for line in plan)
+        results.append((description, index_name, ok, plan))
+    return results
+
 
 def update_client_debt_on_payment(client_id, payment_amount, sale_id):
     """Actualiza la deuda del cliente cuando se realiza un pago"""
@@ -515,295 +887,32 @@ def migrate_datetime_precision():
             conn.close()
 
 def fix_all_client_debts():
-    """Función para ejecutar una vez y arreglar todo"""
+    """
+    Recalcula la deuda de todos los clientes desde client_transactions y
+    ajusta el saldo y estado de sus ventas pendientes (ver
+    models/reconciliation.py).
+    """
+    from models.reconciliation import reconcile_clients
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        print("🔄 Iniciando corrección completa...")
-        
-        # 1. Recalcular todas las deudas basándose en transacciones
-        cursor.execute("SELECT id FROM clients")
-        client_ids = [row[0] for row in cursor.fetchall()]
-        
-        for client_id in client_ids:
-            # Calcular deuda real
-            cursor.execute("""
-                SELECT 
-                    COALESCE(SUM(CASE WHEN transaction_type = 'debit' THEN amount ELSE 0 END), 0) as debits,
-                    COALESCE(SUM(CASE WHEN transaction_type = 'credit' THEN amount ELSE 0 END), 0) as credits
-                FROM client_transactions 
-                WHERE client_id = ?
-            """, (client_id,))
-            
-            result = cursor.fetchone()
-            debits = float(result[0])
-            credits = float(result[1])
-            real_debt = max(0, debits - credits)
-            
-            # Actualizar cliente
-            cursor.execute("""
-                UPDATE clients 
-                SET total_debt = ?, updated_at = datetime('now', 'localtime')
-                WHERE id = ?
-            """, (real_debt, client_id))
-        
-        # 2. Sincronizar estados de ventas
-        # Marcar como pagadas las ventas de clientes sin deuda
-        cursor.execute('''
-            UPDATE sales 
-            SET status = 'paid', 
-                paid_amount = total, 
-                remaining_debt = 0,
-                updated_at = datetime('now', 'localtime')
-            WHERE client_id IN (
-                SELECT id FROM clients WHERE total_debt = 0
-            ) AND status = 'pending'
-        ''')
-        
-        updated_sales = cursor.rowcount
-        
-        # 3. Para clientes con deuda, ajustar estados de ventas
-        cursor.execute('''
-            SELECT c.id, c.total_debt
-            FROM clients c
-            WHERE c.total_debt > 0
-        ''')
-        
-        clients_with_debt = cursor.fetchall()
-        
-        for client in clients_with_debt:
-            client_id = client['id']
-            current_debt = client['total_debt']
-            
-            # Obtener ventas pendientes (más antiguas primero)
-            cursor.execute('''
-                SELECT id, total
-                FROM sales 
-                WHERE client_id = ? AND status = 'pending'
-                ORDER BY created_at ASC
-            ''', (client_id,))
-            
-            pending_sales = cursor.fetchall()
-            
-            # Distribuir la deuda en las ventas
-            remaining_debt = current_debt
-            for sale in pending_sales:
-                if remaining_debt <= 0:
-                    # Esta venta está pagada
-                    cursor.execute('''
-                        UPDATE sales 
-                        SET status = 'paid', paid_amount = total, remaining_debt = 0
-                        WHERE id = ?
-                    ''', (sale['id'],))
-                elif remaining_debt >= sale['total']:
-                    # Esta venta sigue pendiente completa
-                    remaining_debt -= sale['total']
-                    cursor.execute('''
-                        UPDATE sales 
-                        SET paid_amount = 0, remaining_debt = ?
-                        WHERE id = ?
-                    ''', (sale['total'], sale['id']))
-                else:
-                    # Esta venta está parcialmente pagada
-                    paid_amount = sale['total'] - remaining_debt
-                    cursor.execute('''
-                        UPDATE sales 
-                        SET paid_amount = ?, remaining_debt = ?
-                        WHERE id = ?
-                    ''', (paid_amount, remaining_debt, sale['id']))
-                    remaining_debt = 0
-        
-        conn.commit()
-        conn.close()
-        
-        print(f"✅ Corrección completa terminada. {updated_sales} ventas actualizadas")
+        result = reconcile_clients()
+        print(f"✅ Corrección completa terminada. {len(result['debt_changes'])} deudas y "
+              f"{len(result['sale_changes'])} ventas actualizadas")
         return True
-        
     except Exception as e:
         print(f"❌ Error en corrección: {e}")
-        if conn:
-            conn.rollback()
-            conn.close()
         return False
     
 def sync_all_client_sales_status():
-    """Sincroniza el estado de todas las ventas basándose en la deuda real de los clientes"""
-    conn = None
+    """Sincroniza el estado de todas las ventas pendientes con la deuda registrada de cada cliente"""
+    from models.reconciliation import reconcile_clients
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        print("🔄 Iniciando sincronización completa de estados de ventas...")
-        print("=" * 60)
-        
-        # Detectar columna de estado
-        cursor.execute("PRAGMA table_info(sales)")
-        table_info = cursor.fetchall()
-        column_names = [column[1] for column in table_info]
-        
-        if 'payment_status' in column_names:
-            status_column = 'payment_status'
-        elif 'status' in column_names:
-            status_column = 'status'
-        else:
-            print("❌ ERROR: No se encontró columna de estado en sales")
-            return False
-        
-        print(f"📊 Usando columna de estado: '{status_column}'")
-        
-        # Obtener todos los clientes con sus deudas reales
-        cursor.execute("""
-            SELECT 
-                c.id,
-                c.name,
-                c.total_debt,
-                COALESCE(SUM(
-                    CASE 
-                        WHEN ct.transaction_type = 'debit' THEN ct.amount
-                        WHEN ct.transaction_type = 'credit' THEN -ct.amount
-                        ELSE 0
-                    END
-                ), 0) as calculated_debt
-            FROM clients c
-            LEFT JOIN client_transactions ct ON c.id = ct.client_id
-            GROUP BY c.id, c.name, c.total_debt
-        """)
-        
-        clients_data = cursor.fetchall()
-        total_clients_processed = 0
-        total_sales_updated = 0
-        
-        for client in clients_data:
-            client_id = client['id']
-            client_name = client['name']
-            registered_debt = float(client['total_debt'])
-            calculated_debt = float(client['calculated_debt'])
-            
-            print(f"\n👤 Cliente: {client_name} (ID: {client_id})")
-            print(f"   💳 Deuda registrada: ${registered_debt:,.2f}")
-            print(f"   🧮 Deuda calculada: ${calculated_debt:,.2f}")
-            
-            # Usar la deuda registrada como referencia (ya que pay_debt() la actualiza)
-            current_debt = registered_debt
-            
-            # Obtener todas las ventas de este cliente ordenadas cronológicamente
-            query = f'''
-                SELECT id, total, {status_column}, created_at, notes
-                FROM sales 
-                WHERE client_id = ?
-                ORDER BY datetime(created_at) ASC
-            '''
-            cursor.execute(query, (client_id,))
-            client_sales = cursor.fetchall()
-            
-            if not client_sales:
-                print(f"   ℹ️ Sin ventas registradas")
-                continue
-            
-            print(f"   📋 Ventas encontradas: {len(client_sales)}")
-            
-            # Procesar las ventas según la deuda actual
-            remaining_debt = current_debt
-            sales_updated_for_client = 0
-            
-            for sale in client_sales:
-                sale_id = sale['id']
-                sale_total = float(sale['total'])
-                current_status = sale[status_column]
-                sale_date = sale['created_at'][:19]
-                sale_notes = sale['notes'] or ""
-                
-                if current_debt <= 0:
-                    # Cliente sin deuda - todas las ventas deben estar pagadas
-                    if current_status != 'paid':
-                        update_query = f'''
-                            UPDATE sales 
-                            SET {status_column} = 'paid',
-                                notes = ?,
-                                updated_at = datetime('now', 'localtime')
-                            WHERE id = ?
-                        '''
-                        updated_notes = f"{sale_notes} [Auto-pagada por sincronización]".strip()
-                        cursor.execute(update_query, (updated_notes, sale_id))
-                        sales_updated_for_client += 1
-                        print(f"      ✅ Venta #{sale_id} marcada como PAGADA (cliente sin deuda)")
-                
-                elif remaining_debt >= sale_total:
-                    # Esta venta específica sigue pendiente
-                    remaining_debt -= sale_total
-                    if current_status != 'pending':
-                        update_query = f'''
-                            UPDATE sales 
-                            SET {status_column} = 'pending',
-                                updated_at = datetime('now', 'localtime')
-                            WHERE id = ?
-                        '''
-                        cursor.execute(update_query, (sale_id,))
-                        sales_updated_for_client += 1
-                        print(f"      ⚠️ Venta #{sale_id} marcada como PENDIENTE (${sale_total:,.2f})")
-                
-                else:
-                    # Esta venta está parcialmente pagada o completamente pagada
-                    if remaining_debt > 0:
-                        # Pago parcial - actualizar el monto pendiente
-                        paid_amount = sale_total - remaining_debt
-                        update_query = f'''
-                            UPDATE sales 
-                            SET total = ?,
-                                {status_column} = 'pending',
-                                notes = ?,
-                                updated_at = datetime('now', 'localtime')
-                            WHERE id = ?
-                        '''
-                        updated_notes = f"{sale_notes} [Abono parcial ${paid_amount:,.2f} - Saldo: ${remaining_debt:,.2f}]".strip()
-                        cursor.execute(update_query, (remaining_debt, updated_notes, sale_id))
-                        sales_updated_for_client += 1
-                        print(f"      💳 Venta #{sale_id} ABONO PARCIAL: Pagado ${paid_amount:,.2f}, Saldo ${remaining_debt:,.2f}")
-                        remaining_debt = 0
-                    else:
-                        # Completamente pagada
-                        if current_status != 'paid':
-                            update_query = f'''
-                                UPDATE sales 
-                                SET {status_column} = 'paid',
-                                    notes = ?,
-                                    updated_at = datetime('now', 'localtime')
-                                WHERE id = ?
-                            '''
-                            updated_notes = f"{sale_notes} [Pagada por sincronización]".strip()
-                            cursor.execute(update_query, (updated_notes, sale_id))
-                            sales_updated_for_client += 1
-                            print(f"      ✅ Venta #{sale_id} marcada como PAGADA")
-            
-            total_sales_updated += sales_updated_for_client
-            total_clients_processed += 1
-            
-            if sales_updated_for_client > 0:
-                print(f"   📊 Ventas actualizadas: {sales_updated_for_client}")
-            else:
-                print(f"   ✅ Ventas ya estaban sincronizadas")
-        
-        # Confirmar cambios
-        conn.commit()
-        
-        print(f"\n🎯 SINCRONIZACIÓN COMPLETADA")
-        print("=" * 40)
-        print(f"👥 Clientes procesados: {total_clients_processed}")
-        print(f"📋 Ventas actualizadas: {total_sales_updated}")
-        print(f"✅ Todas las ventas están ahora sincronizadas con las deudas reales")
-        
+        result = reconcile_clients(recompute_debts=False)
+        print(f"✅ Ventas sincronizadas: {len(result['sale_changes'])} actualizadas "
+              f"({result['clients']} clientes revisados)")
         return True
-        
     except Exception as e:
-        error_msg = f"Error en sincronización: {e}"
-        print(f"❌ {error_msg}")
-        if conn:
-            conn.rollback()
+        print(f"❌ Error en sincronización: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 def migrate_transaction_times():
     """Corrige las horas incorrectas en transacciones existentes"""
@@ -856,325 +965,20 @@ def fix_client_sales_relationship():
         print(f"❌ Error en corrección completa: {e}")
         return False
     
-def add_adjustment_column_to_sales():
-    """Agrega columna de ajuste a la tabla sales"""
-    conn = None
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Verificar si la columna ya existe
-        cursor.execute("PRAGMA table_info(sales)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'adjustment' not in columns:
-            cursor.execute('''
-                ALTER TABLE sales 
-                ADD COLUMN adjustment REAL DEFAULT 0.0
-            ''')
-            print("✅ Columna 'adjustment' agregada a la tabla sales")
-        
-        if 'adjustment_reason' not in columns:
-            cursor.execute('''
-                ALTER TABLE sales 
-                ADD COLUMN adjustment_reason TEXT
-            ''')
-            print("✅ Columna 'adjustment_reason' agregada a la tabla sales")
-        
-        conn.commit()
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error al agregar columna de ajuste: {e}")
-        if conn:
-            conn.rollback()
-        return False
-    finally:
-        if conn:
-            conn.close()
-
-def sync_client_sales_status_on_payment(client_id):
-    """
-    Sincroniza automáticamente el estado de las ventas cuando se hace un pago
-    Esta función se debe llamar después de cada pago registrado
-    """
-    conn = None
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        print(f"🔄 Sincronizando estados de ventas para cliente {client_id}")
-        
-        # PASO 1: Obtener la deuda actual del cliente
-        cursor.execute("SELECT total_debt FROM clients WHERE id = ?", (client_id,))
-        client_result = cursor.fetchone()
-        
-        if not client_result:
-            print(f"❌ Cliente {client_id} no encontrado")
-            return False
-        
-        client_debt = float(client_result[0])
-        print(f"💳 Deuda actual del cliente: ${client_debt:,.2f}")
-        
-        # PASO 2: Detectar columna de estado en la tabla sales
-        cursor.execute("PRAGMA table_info(sales)")
-        table_info = cursor.fetchall()
-        column_names = [column[1] for column in table_info]
-        
-        if 'payment_status' in column_names:
-            status_column = 'payment_status'
-        elif 'status' in column_names:
-            status_column = 'status'
-        else:
-            print("❌ ERROR: No se encontró columna de estado en sales")
-            return False
-        
-        print(f"📊 Usando columna de estado: '{status_column}'")
-        
-        # PASO 3: Si la deuda es 0, marcar TODAS las ventas como pagadas
-        if client_debt <= 0:
-            update_query = f'''
-                UPDATE sales 
-                SET {status_column} = 'paid',
-                    updated_at = datetime('now', 'localtime')
-                WHERE client_id = ? AND {status_column} = 'pending'
-            '''
-            cursor.execute(update_query, (client_id,))
-            updated_sales = cursor.rowcount
-            
-            print(f"✅ Cliente sin deuda: {updated_sales} ventas marcadas como PAGADAS")
-            
-        else:
-            # PASO 4: Si hay deuda, aplicar lógica de pagos cronológicos
-            print("📋 Cliente con deuda pendiente, aplicando lógica cronológica...")
-            
-            # Obtener todas las ventas ordenadas cronológicamente
-            query = f'''
-                SELECT id, total, created_at, {status_column}
-                FROM sales 
-                WHERE client_id = ?
-                ORDER BY datetime(created_at) ASC
-            '''
-            cursor.execute(query, (client_id,))
-            all_sales = cursor.fetchall()
-            
-            # Calcular cuánto se ha pagado basándose en la deuda restante
-            total_sales = sum(float(sale[1]) for sale in all_sales)
-            total_paid = total_sales - client_debt
-            
-            print(f"💰 Total en ventas: ${total_sales:,.2f}")
-            print(f"💳 Total pagado: ${total_paid:,.2f}")
-            print(f"📊 Deuda restante: ${client_debt:,.2f}")
-            
-            # Aplicar pagos cronológicamente
-            remaining_payment = total_paid
-            sales_updated = 0
-            
-            for sale in all_sales:
-                sale_id = sale[0]
-                sale_total = float(sale[1])
-                current_status = sale[3]
-                
-                if remaining_payment >= sale_total:
-                    # Esta venta debe estar pagada
-                    if current_status != 'paid':
-                        update_query = f'''
-                            UPDATE sales 
-                            SET {status_column} = 'paid',
-                                updated_at = datetime('now', 'localtime')
-                            WHERE id = ?
-                        '''
-                        cursor.execute(update_query, (sale_id,))
-                        sales_updated += 1
-                        print(f"   ✅ Venta #{sale_id} marcada como PAGADA")
-                    
-                    remaining_payment -= sale_total
-                    
-                else:
-                    # Esta venta debe estar pendiente
-                    if current_status == 'paid':
-                        update_query = f'''
-                            UPDATE sales 
-                            SET {status_column} = 'pending',
-                                updated_at = datetime('now', 'localtime')
-                            WHERE id = ?
-                        '''
-                        cursor.execute(update_query, (sale_id,))
-                        sales_updated += 1
-                        print(f"   ⚠️ Venta #{sale_id} marcada como PENDIENTE")
-                    
-                    # Solo procesar hasta donde alcance el pago
-                    if remaining_payment <= 0:
-                        break
-            
-            print(f"📊 Total de ventas actualizadas: {sales_updated}")
-        
-        # PASO 5: Confirmar cambios
-        conn.commit()
-        print("✅ Sincronización completada exitosamente")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error en sincronización: {e}")
-        if conn:
-            conn.rollback()
-        return False
-    finally:
-        if conn:
-            conn.close()
-
-
 def fix_all_client_sales_statuses():
     """
-    Función de mantenimiento: Corrige todos los estados de ventas para todos los clientes
-    Ejecutar esta función una sola vez para arreglar datos históricos
+    Función de mantenimiento: corrige los estados de ventas de todos los
+    clientes según su deuda registrada
     """
-    conn = None
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        print("🔧 INICIANDO CORRECCIÓN MASIVA DE ESTADOS DE VENTAS")
-        print("=" * 60)
-        
-        # Obtener todos los clientes
-        cursor.execute("SELECT id, name, total_debt FROM clients")
-        all_clients = cursor.fetchall()
-        
-        total_clients = len(all_clients)
-        clients_processed = 0
-        total_sales_updated = 0
-        
-        print(f"👥 Clientes a procesar: {total_clients}")
-        print()
-        
-        for client in all_clients:
-            client_id = client[0]
-            client_name = client[1]
-            client_debt = float(client[2])
-            
-            print(f"👤 Procesando: {client_name} (Deuda: ${client_debt:,.2f})")
-            
-            # Llamar a la función de sincronización para cada cliente
-            if sync_client_sales_status_on_payment(client_id):
-                clients_processed += 1
-                print(f"   ✅ Procesado correctamente")
-            else:
-                print(f"   ❌ Error al procesar")
-            
-            print()
-        
-        print("🎯 CORRECCIÓN MASIVA COMPLETADA")
-        print("=" * 40)
-        print(f"✅ Clientes procesados: {clients_processed}/{total_clients}")
-        print("📊 Todos los estados de ventas han sido sincronizados")
-        
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error en corrección masiva: {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
+    return sync_all_client_sales_status()
 
 
 def sync_client_sales_status_on_payment(client_id):
-    """
-    Sincroniza automáticamente el estado de las ventas cuando se hace un pago - VERSIÓN CORREGIDA
-    """
-    conn = None
+    """Ajusta saldo y estado de las ventas pendientes del cliente a su deuda registrada"""
+    from models.reconciliation import reconcile_clients
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Obtener la deuda actual del cliente
-        cursor.execute("SELECT total_debt FROM clients WHERE id = ?", (client_id,))
-        client_result = cursor.fetchone()
-        
-        if not client_result:
-            return False
-        
-        client_debt = float(client_result[0])
-        
-        # Detectar columna de estado
-        cursor.execute("PRAGMA table_info(sales)")
-        table_info = cursor.fetchall()
-        column_names = [column[1] for column in table_info]
-        
-        if 'payment_status' in column_names:
-            status_column = 'payment_status'
-        elif 'status' in column_names:
-            status_column = 'status'
-        else:
-            return False
-        
-        # Si la deuda es 0, marcar todas las ventas como pagadas
-        if client_debt <= 0:
-            # *** CORRECCIÓN: Sin updated_at ***
-            update_query = f'''
-                UPDATE sales 
-                SET {status_column} = 'paid'
-                WHERE client_id = ? AND {status_column} = 'pending'
-            '''
-            cursor.execute(update_query, (client_id,))
-            
-        else:
-            # Aplicar lógica cronológica de pagos
-            query = f'''
-                SELECT id, total, created_at, {status_column}
-                FROM sales 
-                WHERE client_id = ?
-                ORDER BY datetime(created_at) ASC
-            '''
-            cursor.execute(query, (client_id,))
-            all_sales = cursor.fetchall()
-            
-            # Calcular cuánto se ha pagado
-            total_sales = sum(float(sale[1]) for sale in all_sales)
-            total_paid = total_sales - client_debt
-            
-            # Aplicar pagos cronológicamente
-            remaining_payment = total_paid
-            
-            for sale in all_sales:
-                sale_id = sale[0]
-                sale_total = float(sale[1])
-                current_status = sale[3]
-                
-                if remaining_payment >= sale_total:
-                    # Esta venta debe estar pagada
-                    if current_status != 'paid':
-                        # *** CORRECCIÓN: Sin updated_at ***
-                        update_query = f'''
-                            UPDATE sales 
-                            SET {status_column} = 'paid'
-                            WHERE id = ?
-                        '''
-                        cursor.execute(update_query, (sale_id,))
-                    
-                    remaining_payment -= sale_total
-                    
-                else:
-                    # Esta venta debe estar pendiente
-                    if current_status == 'paid':
-                        # *** CORRECCIÓN: Sin updated_at ***
-                        update_query = f'''
-                            UPDATE sales 
-                            SET {status_column} = 'pending'
-                            WHERE id = ?
-                        '''
-                        cursor.execute(update_query, (sale_id,))
-                    
-                    break
-        
-        conn.commit()
+        reconcile_clients([client_id], recompute_debts=False)
         return True
-        
     except Exception as e:
-        if conn:
-            conn.rollback()
+        print(f"❌ Error en sincronización: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
\ No newline at end of file
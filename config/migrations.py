@@ -0,0 +1,393 @@
+"""
+Migraciones del esquema, numeradas y registradas en PRAGMA user_version.
+
+Cada paso de MIGRATIONS se aplica una sola vez, en orden y dentro de su
+propia transacción junto con el nuevo user_version, así que un paso que
+falla no deja nada a medias y se reintenta en el próximo arranque. Con la
+base al día el arranque solo lee user_version y schema_meta (sin CREATE,
+ALTER ni UPDATE sobre tablas completas).
+
+Los objetos derivados (índices, resumen de caja, contadores de tablas,
+formato de fechas) conservan su propia versión en schema_meta y solo se
+regeneran cuando esa versión cambia (ver DERIVED_OBJECTS).
+
+Para cambiar el esquema se agrega un paso al final de MIGRATIONS; nunca se
+modifica ni se reordena uno existente. Los pasos deben ser idempotentes,
+porque una base anterior a este registro (user_version 0) los ejecuta todos.
+"""
+
+import sqlite3
+from datetime import datetime
+
+from config.database import (
+    connection_manager, ensure_indexes, normalize_timestamps, ensure_daily_cash_summary,
+    ensure_table_versions, INDEX_VERSION, TIMESTAMPS_VERSION, CASH_SUMMARY_VERSION,
+    TABLE_VERSIONS_VERSION, TIMESTAMP_FORMAT,
+)
+
+
+# ── Pasos ────────────────────────────────────────────────────────────────────
+def _create_tables(cursor):
+    # Tabla usuarios
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL DEFAULT 'employee',
+            name TEXT,
+            position TEXT
+        )
+    ''')
+
+    # Tabla productos
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            price REAL NOT NULL,
+            stock INTEGER DEFAULT 0,
+            cost_price REAL DEFAULT 0.0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Tabla clientes
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS clients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            phone TEXT,
+            address TEXT,
+            credit_limit REAL DEFAULT 0.0,
+            total_debt REAL DEFAULT 0.0,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Tabla para historial de transacciones de clientes
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS client_transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_id INTEGER NOT NULL,
+            transaction_type TEXT NOT NULL,
+            amount REAL NOT NULL,
+            description TEXT NOT NULL,
+            sale_id INTEGER NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (client_id) REFERENCES clients (id),
+            FOREIGN KEY (sale_id) REFERENCES sales (id)
+        )
+    ''')
+
+    # Reparto de cada pago entre las ventas que cubre (models/payment_allocation.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS payment_allocations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_id INTEGER,
+            client_id INTEGER NOT NULL,
+            sale_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (transaction_id) REFERENCES client_transactions (id),
+            FOREIGN KEY (client_id) REFERENCES clients (id),
+            FOREIGN KEY (sale_id) REFERENCES sales (id)
+        )
+    ''')
+
+    # Tabla de ventas
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_id INTEGER,
+            total REAL NOT NULL,
+            payment_type TEXT NULL,
+            payment_method TEXT NULL,
+            paid_amount REAL DEFAULT 0.0,
+            remaining_debt REAL DEFAULT 0.0,
+            adjustment REAL DEFAULT 0.0,
+            adjustment_reason TEXT,
+            notes TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'paid',
+            FOREIGN KEY (client_id) REFERENCES clients (id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Tabla de detalles de ventas
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sale_details (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sale_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity REAL NOT NULL,
+            unit_price REAL NOT NULL,
+            sale_price REAL NOT NULL,
+            subtotal REAL NOT NULL,
+            cost_price REAL DEFAULT 0,
+            FOREIGN KEY (sale_id) REFERENCES sales (id),
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+    ''')
+
+    # Tabla de compras
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS purchases (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            total REAL NOT NULL,
+            iva REAL DEFAULT 0.0,
+            shipping REAL DEFAULT 0.0,
+            date TEXT DEFAULT CURRENT_TIMESTAMP,
+            invoice_number TEXT,
+            supplier TEXT,
+            freight TEXT,
+            tax TEXT,
+            subtotal TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Tabla de detalles de compras
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS purchase_details (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            purchase_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            unit_cost REAL NULL,
+            unit_price REAL NOT NULL,
+            subtotal REAL NOT NULL,
+            FOREIGN KEY (purchase_id) REFERENCES purchases (id),
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+    ''')
+
+    # Tabla de gastos operativos
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS expenses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            description TEXT NOT NULL,
+            amount REAL NOT NULL,
+            category TEXT,
+            date TEXT DEFAULT CURRENT_TIMESTAMP,
+            user_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Tabla de pérdidas/mermas
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS losses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            quantity REAL NOT NULL,
+            unit_cost REAL NOT NULL,
+            total_cost REAL NOT NULL,
+            loss_date TIMESTAMP NOT NULL,
+            reason TEXT NOT NULL,
+            loss_type TEXT NOT NULL,
+            notes TEXT,
+            created_by INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (product_id) REFERENCES products(id),
+            FOREIGN KEY (created_by) REFERENCES users(id)
+        )
+    ''')
+
+
+# Columnas que faltan en bases creadas por versiones anteriores (antes en
+# init_database, update_database.py, migrate.py, migrate_sales_table,
+# add_adjustment_column_to_sales y migrate_client_transactions_table).
+# ALTER TABLE no acepta defaults no constantes como CURRENT_TIMESTAMP.
+LEGACY_COLUMNS = [
+    ('clients', 'phone', 'TEXT'),
+    ('clients', 'address', 'TEXT'),
+    ('clients', 'credit_limit', 'REAL DEFAULT 0.0'),
+    ('clients', 'notes', 'TEXT'),
+    ('client_transactions', 'sale_id', 'INTEGER NULL REFERENCES sales (id)'),
+    ('sales', 'payment_type', 'TEXT NULL'),
+    ('sales', 'payment_method', 'TEXT NULL'),
+    ('sales', 'paid_amount', 'REAL DEFAULT 0.0'),
+    ('sales', 'remaining_debt', 'REAL DEFAULT 0.0'),
+    ('sales', 'notes', 'TEXT'),
+    ('sales', 'user_id', 'INTEGER'),
+    ('sales', 'status', "TEXT DEFAULT 'paid'"),
+    ('sales', 'adjustment', 'REAL DEFAULT 0.0'),
+    ('sales', 'adjustment_reason', 'TEXT'),
+    ('sale_details', 'cost_price', 'REAL DEFAULT 0'),
+    ('sale_details', 'sale_price', 'REAL'),
+    ('purchases', 'date', 'TEXT'),
+    ('purchases', 'freight', 'TEXT'),
+    ('purchases', 'tax', 'TEXT'),
+    ('purchases', 'subtotal', 'TEXT'),
+    ('purchases', 'lote_id', 'TEXT'),
+    ('purchases', 'shipping_total', 'REAL DEFAULT 0.0'),
+    ('expenses', 'date', 'TEXT'),
+]
+
+
+def _add_legacy_columns(cursor):
+    columns = {}
+    for table, column, definition in LEGACY_COLUMNS:
+        if table not in columns:
+            cursor.execute(f'PRAGMA table_info({table})')
+            columns[table] = {row[1] for row in cursor.fetchall()}
+        if column not in columns[table]:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+            columns[table].add(column)
+            print(f"Columna {column} agregada a {table}")
+
+
+def _backfill_legacy_values(cursor):
+    cursor.execute('UPDATE sale_details SET sale_price = unit_price WHERE sale_price IS NULL')
+    cursor.execute('''
+        UPDATE sales SET payment_method = payment_type
+        WHERE (payment_method IS NULL OR payment_method = '') AND payment_type IS NOT NULL
+    ''')
+    cursor.execute("UPDATE sales SET status = 'paid' WHERE status IS NULL OR status = ''")
+
+
+# Compras registradas con menos de LOTE_WINDOW_SECONDS entre sí forman un lote
+LOTE_WINDOW_SECONDS = 10
+
+
+def _assign_purchase_lotes(cursor):
+    """
+    Compras históricas sin lote_id (antes migrate.py): las agrupa en lotes por
+    cercanía en el tiempo, deja el flete total en el primer ítem del lote y
+    llena shipping_total en todos.
+    """
+    cursor.execute('SELECT id, shipping, date FROM purchases WHERE lote_id IS NULL ORDER BY date, id')
+    lotes, previous = [], None
+    for row in cursor.fetchall():
+        try:
+            moment = datetime.strptime(str(row['date'])[:19].replace('T', ' '), TIMESTAMP_FORMAT)
+        except ValueError:
+            continue  # Fecha ilegible: la compra queda sin lote
+        if previous is None or (moment - previous).total_seconds() > LOTE_WINDOW_SECONDS:
+            lotes.append([])
+        lotes[-1].append((row['id'], row['shipping'] or 0.0, moment))
+        previous = moment
+
+    updates = []
+    for lote in lotes:
+        lote_id = lote[0][2].strftime('%Y%m%d%H%M%S')
+        freight_total = lote[0][1] * len(lote)
+        updates.extend((lote_id, freight_total, freight_total if index == 0 else 0.0, purchase_id)
+                       for index, (purchase_id, _, _) in enumerate(lote))
+    cursor.executemany('UPDATE purchases SET lote_id = ?, shipping_total = ?, shipping = ? WHERE id = ?',
+                       updates)
+
+
+def _drop_products_name_nocase(cursor):
+    """
+    Las importaciones de Excel creaban un índice único sin distinción de
+    mayúsculas sobre products.name, pero las búsquedas de productos
+    comparan el nombre exacto: una compra con "coca cola" fallaba si ya
+    existía "Coca Cola". La importación ya no lo necesita.
+    """
+    cursor.execute('DROP INDEX IF EXISTS idx_products_name_nocase')
+
+
+def _backfill_null_dates(cursor):
+    """
+    La columna date que agregó LEGACY_COLUMNS no tiene default, así que
+    gastos y compras anteriores pueden tenerla en NULL y quedarían fuera de
+    las páginas siguientes de los listados (las claves de KeysetQuery no
+    admiten NULL). Los gastos toman created_at; lo que no tiene de dónde
+    tomar la fecha queda en '' (se ordena antes que cualquier fecha).
+    """
+    cursor.execute("UPDATE expenses SET date = COALESCE(created_at, '') WHERE date IS NULL")
+    cursor.execute("UPDATE purchases SET date = '' WHERE date IS NULL")
+
+
+# (versión, descripción, función(cursor)). Solo se agregan pasos al final.
+MIGRATIONS = [
+    (1, "Tablas base", _create_tables),
+    (2, "Columnas agregadas en versiones anteriores", _add_legacy_columns),
+    (3, "Valores de las columnas agregadas", _backfill_legacy_values),
+    (4, "Lotes de compras históricas", _assign_purchase_lotes),
+    (5, "Sin índice de nombres de productos sin mayúsculas", _drop_products_name_nocase),
+    (6, "Fechas de gastos y compras sin valor", _backfill_null_dates),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Objetos derivados: (clave en schema_meta, versión esperada, función que los crea)
+DERIVED_OBJECTS = [
+    ('timestamps_version', TIMESTAMPS_VERSION, normalize_timestamps),
+    ('index_version', INDEX_VERSION, ensure_indexes),
+    ('cash_summary_version', CASH_SUMMARY_VERSION, ensure_daily_cash_summary),
+    ('table_versions_version', TABLE_VERSIONS_VERSION, ensure_table_versions),
+]
+
+
+# ── Ejecución ────────────────────────────────────────────────────────────────
+def get_schema_version(cursor):
+    cursor.execute('PRAGMA user_version')
+    return cursor.fetchone()[0]
+
+
+def pending_migrations(version):
+    return [migration for migration in MIGRATIONS if migration[0] > version]
+
+
+def run_migrations():
+    """
+    Aplica los pasos pendientes y regenera los objetos derivados cuya
+    versión cambió. Retorna la lista de pasos y objetos aplicados (vacía si
+    la base ya estaba al día). Se detiene en el primer paso que falla.
+    """
+    applied = []
+    conn = connection_manager.acquire()
+    try:
+        cursor = conn.cursor()
+        if get_schema_version(cursor) < SCHEMA_VERSION:
+            applied.extend(_apply_pending(conn))
+        stale = _stale_derived_objects(cursor)
+    finally:
+        conn.close()
+
+    for key, _, ensure in stale:
+        ensure()
+        applied.append(key)
+    return applied
+
+
+def _apply_pending(conn):
+    applied = []
+    cursor = conn.cursor()
+    while True:
+        # BEGIN IMMEDIATE: otra instancia que arranque a la vez espera y,
+        # al releer user_version, no repite el paso
+        cursor.execute('BEGIN IMMEDIATE')
+        pending = pending_migrations(get_schema_version(cursor))
+        if not pending:
+            conn.rollback()
+            return applied
+        version, description, migrate = pending[0]
+        try:
+            migrate(cursor)
+            cursor.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"Error en la migración {version} ({description}): {e}")
+            return applied
+        print(f"Migración {version} aplicada: {description}")
+        applied.append(version)
+
+
+def _stale_derived_objects(cursor):
+    try:
+        cursor.execute('SELECT key, value FROM schema_meta')
+        current = {row[0]: row[1] for row in cursor.fetchall()}
+    except sqlite3.OperationalError:
+        current = {}  # Base nueva: schema_meta aún no existe
+    return [item for item in DERIVED_OBJECTS if current.get(item[0]) != str(item[1])]
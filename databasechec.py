@@ -25,6 +25,19 @@ def check_database():
     print(f"\nTotal de detalles de venta: {total_details}")
     
     conn.close()
+    
+    check_indexes()
+
+def check_indexes():
+    from config.database import get_index_report, verify_index_usage
+    
+    print("\n=== ÍNDICES ===\n")
+    for name, table, exists in get_index_report():
+        print(f"{'✓' if exists else '✗'} {name} ({table})")
+    
+    print("\n=== PLANES DE CONSULTA ===\n")
+    for description, index_name, ok, plan in verify_index_usage():
+        print(f"{'✓' if ok else '✗'} {description}: {'; '.join(plan)}")
 
 if __name__ == "__main__":
     check_database()
\ No newline at end of file
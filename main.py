@@ -17,8 +17,48 @@ data_dir = os.path.join(base_path, "data")
 if not os.path.exists(data_dir):
     os.makedirs(data_dir)
 
-from config.database import init_database
+# Solo lo necesario para la primera ventana; cada ventana importa sus
+# módulos (pandas, openpyxl, modelos) al abrirse por primera vez.
+from config.database import init_database, close_all_connections
 from models.user import User
+from utils.background import task_executor
+from utils.db_watcher import db_watcher
+
+
+def show_first_window(root):
+    """Muestra la ventana principal (o el login) y la retorna"""
+    # Contar usuarios registrados
+    users = User.get_all()
+
+    if len(users) == 1:
+        # Un solo usuario: entrar directo sin login
+        user = users[0]
+        print(f"✓ Acceso automático: {user.username} ({user.role})")
+        root.deiconify()
+        from views.main_window import MainWindow
+        return MainWindow(root, user)
+
+    # Más de un usuario: mostrar login normal
+    from views.login_window import LoginWindow
+    return LoginWindow(root)
+
+
+def warm_caches():
+    """Precarga el catálogo de productos y la lista de clientes"""
+    from models.product_catalog import product_catalog
+    from models.client import Client
+    product_catalog.ensure_current()
+    Client.get_all()
+
+
+def start_background_services(root):
+    """Vigilante de cambios, precarga de cachés y backups automáticos, después de mostrar la ventana"""
+    from utils.backup import backup_service
+    db_watcher.start(root)
+    backup_service.start(root)
+    task_executor.submit(root, warm_caches,
+                         on_error=lambda e: print(f"No se pudieron precargar los datos: {e}"))
+
 
 def main():
     try:
@@ -28,22 +68,15 @@ def main():
         root.withdraw()
         root.protocol("WM_DELETE_WINDOW", root.quit)
 
-        # Contar usuarios registrados
-        users = User.get_all()
-
-        if len(users) == 1:
-            # Un solo usuario: entrar directo sin login
-            user = users[0]
-            print(f"✓ Acceso automático: {user.username} ({user.role})")
-            root.deiconify()
-            from views.main_window import MainWindow
-            MainWindow(root, user)
-        else:
-            # Más de un usuario: mostrar login normal
-            from views.login_window import LoginWindow
-            LoginWindow(root)
+        show_first_window(root)
+        root.after_idle(start_background_services, root)
 
         root.mainloop()
+        from utils.backup import backup_service
+        backup_service.stop()
+        db_watcher.stop()
+        task_executor.shutdown()
+        close_all_connections()
 
     except Exception as e:
         import traceback
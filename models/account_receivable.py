@@ -1,5 +1,5 @@
 from config.database import get_connection
-from datetime import datetime
+from models.payment_allocation import allocate_payment
 
 class AccountReceivable:
     def __init__(self, id=None, client_id=None, client_name=None, 
@@ -67,34 +67,8 @@ class AccountReceivable:
     
     @staticmethod
     def add_payment(client_id, amount, description="Pago"):
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        try:
-            # Agregar transacción de pago (crédito)
-            cursor.execute('''
-                INSERT INTO client_transactions (client_id, transaction_type, amount, description, created_at)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (client_id, 'credit', amount, description, 
-                  datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
-            
-            # Actualizar deuda del cliente
-            cursor.execute('''
-                UPDATE clients SET total_debt = total_debt - ? WHERE id = ?
-            ''', (amount, client_id))
-            
-            # Asegurar que la deuda no sea negativa
-            cursor.execute('''
-                UPDATE clients SET total_debt = 0 WHERE id = ? AND total_debt < 0
-            ''', (client_id,))
-            
-            conn.commit()
-            
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+        """Registra un pago y lo reparte entre las ventas pendientes (ver models/payment_allocation.py)"""
+        return allocate_payment(client_id, amount, description)
     
     @staticmethod
     def get_client_transactions(client_id):
@@ -1,4 +1,7 @@
-from config.database import get_connection
+from datetime import date, timedelta
+
+from config.database import get_connection, db_connection, day_range, rebuild_daily_cash_summary
+from models.query_cache import cached_query
 
 
 class CashRegister:
@@ -13,17 +16,18 @@ class CashRegister:
         conn = get_connection()
         cursor = conn.cursor()
         movements = []
+        day_start, day_end = day_range(date_str)
 
         try:
             # 1. Ventas al contado
             cursor.execute("""
                 SELECT s.id, s.total, s.created_at
                 FROM sales s
-                WHERE DATE(s.created_at) = ?
+                WHERE s.created_at >= ? AND s.created_at < ?
                   AND s.payment_method = 'cash'
                   AND s.status = 'paid'
                 ORDER BY s.created_at ASC
-            """, (date_str,))
+            """, (day_start, day_end))
 
             for row in cursor.fetchall():
                 movements.append({
@@ -34,20 +38,22 @@ class CashRegister:
                 })
 
             # 2. Abonos de clientes fiados (credit con amount negativo → ABS)
+            #    y excedentes de pago que quedaron como crédito a favor
             cursor.execute("""
-                SELECT ct.id, ct.amount, ct.description, ct.created_at,
+                SELECT ct.id, ct.transaction_type, ct.amount, ct.description, ct.created_at,
                        c.name as client_name
                 FROM client_transactions ct
                 LEFT JOIN clients c ON ct.client_id = c.id
-                WHERE DATE(ct.created_at) = ?
-                  AND ct.transaction_type = 'credit'
+                WHERE ct.created_at >= ? AND ct.created_at < ?
+                  AND ct.transaction_type IN ('credit', 'credit_balance')
                 ORDER BY ct.created_at ASC
-            """, (date_str,))
+            """, (day_start, day_end))
 
             for row in cursor.fetchall():
                 monto = abs(row['amount'])
                 movements.append({
-                    'tipo': 'Abono cliente',
+                    'tipo': ('Crédito a favor' if row['transaction_type'] == 'credit_balance'
+                             else 'Abono cliente'),
                     'descripcion': f"{row['client_name']} — {row['description']}",
                     'monto': monto,
                     'hora': row['created_at'],
@@ -70,6 +76,7 @@ class CashRegister:
         return sum(m['monto'] for m in movements)
 
     @staticmethod
+    @cached_query('daily_cash_summary')
     def get_daily_summary(date_str):
         """Retorna resumen del día: total_contado, total_abonos, total_general."""
         conn = get_connection()
@@ -77,21 +84,13 @@ class CashRegister:
 
         try:
             cursor.execute("""
-                SELECT COALESCE(SUM(total), 0)
-                FROM sales
-                WHERE DATE(created_at) = ?
-                  AND payment_method = 'cash'
-                  AND status = 'paid'
+                SELECT total_contado, total_abonos
+                FROM daily_cash_summary
+                WHERE fecha = ?
             """, (date_str,))
-            total_contado = cursor.fetchone()[0]
-
-            cursor.execute("""
-                SELECT COALESCE(SUM(ABS(amount)), 0)
-                FROM client_transactions
-                WHERE DATE(created_at) = ?
-                  AND transaction_type = 'credit'
-            """, (date_str,))
-            total_abonos = cursor.fetchone()[0]
+            row = cursor.fetchone()
+            total_contado = row['total_contado'] if row else 0.0
+            total_abonos = row['total_abonos'] if row else 0.0
 
             return {
                 'fecha': date_str,
@@ -116,46 +115,27 @@ class CashRegister:
         """
         Retorna resumen de los últimos N días que tuvieron movimientos.
         Cada entrada: {fecha, total_contado, total_abonos, total_general}
+        Lee el resumen precalculado en daily_cash_summary.
         """
         conn = get_connection()
         cursor = conn.cursor()
+        since = (date.today() - timedelta(days=days)).isoformat()
 
         try:
-            # Fechas con ventas al contado
-            cursor.execute("""
-                SELECT DATE(created_at) as fecha,
-                       COALESCE(SUM(total), 0) as total_contado
-                FROM sales
-                WHERE payment_method = 'cash'
-                  AND status = 'paid'
-                  AND DATE(created_at) >= DATE('now', ?)
-                GROUP BY DATE(created_at)
-            """, (f'-{days} days',))
-            contado_by_date = {row['fecha']: row['total_contado'] for row in cursor.fetchall()}
-
-            # Fechas con abonos
             cursor.execute("""
-                SELECT DATE(created_at) as fecha,
-                       COALESCE(SUM(ABS(amount)), 0) as total_abonos
-                FROM client_transactions
-                WHERE transaction_type = 'credit'
-                  AND DATE(created_at) >= DATE('now', ?)
-                GROUP BY DATE(created_at)
-            """, (f'-{days} days',))
-            abonos_by_date = {row['fecha']: row['total_abonos'] for row in cursor.fetchall()}
-
-            # Unir todas las fechas
-            all_dates = sorted(
-                set(contado_by_date.keys()) | set(abonos_by_date.keys()),
-                reverse=True
-            )
+                SELECT fecha, total_contado, total_abonos
+                FROM daily_cash_summary
+                WHERE fecha >= ?
+                  AND (num_ventas > 0 OR num_abonos > 0)
+                ORDER BY fecha DESC
+            """, (since,))
 
             history = []
-            for fecha in all_dates:
-                tc = contado_by_date.get(fecha, 0.0)
-                ta = abonos_by_date.get(fecha, 0.0)
+            for row in cursor.fetchall():
+                tc = row['total_contado']
+                ta = row['total_abonos']
                 history.append({
-                    'fecha': fecha,
+                    'fecha': row['fecha'],
                     'total_contado': tc,
                     'total_abonos': ta,
                     'total_general': tc + ta,
@@ -167,4 +147,14 @@ class CashRegister:
             print(f"Error en CashRegister.get_history: {e}")
             return []
         finally:
-            conn.close()
\ No newline at end of file
+            conn.close()
+
+    @staticmethod
+    def rebuild_summary():
+        """Reconstruye daily_cash_summary desde las ventas y abonos. Retorna días."""
+        try:
+            with db_connection() as conn:
+                return rebuild_daily_cash_summary(conn.cursor())
+        except Exception as e:
+            print(f"Error en CashRegister.rebuild_summary: {e}")
+            return 0
@@ -1,5 +1,6 @@
 from config.database import get_connection
-from config.database import sync_client_sales_status_on_payment
+from models.payment_allocation import allocate_payment
+from models.query_cache import cached_query
 
 class Client:
     def __init__(self, id=None, name=None, phone=None, address=None, 
@@ -13,6 +14,19 @@ class Client:
         self.notes = notes
     
     @staticmethod
+    def _from_row(row):
+        return Client(
+            id=row['id'],
+            name=row['name'],
+            phone=row['phone'] if row['phone'] else None,
+            address=row['address'] if row['address'] else None,
+            credit_limit=row['credit_limit'] if row['credit_limit'] else 0.0,
+            total_debt=row['total_debt'],
+            notes=row['notes'] if row['notes'] else None
+        )
+    
+    @staticmethod
+    @cached_query('clients')
     def get_all():
         """Obtiene todos los clientes"""
         conn = get_connection()
@@ -24,18 +38,7 @@ class Client:
             ORDER BY name
         ''')
         
-        clients = []
-        for row in cursor.fetchall():
-            client = Client(
-                id=row['id'],
-                name=row['name'],
-                phone=row['phone'] if row['phone'] else None,
-                address=row['address'] if row['address'] else None,
-                credit_limit=row['credit_limit'] if row['credit_limit'] else 0.0,
-                total_debt=row['total_debt'],
-                notes=row['notes'] if row['notes'] else None
-            )
-            clients.append(client)
+        clients = [Client._from_row(row) for row in cursor.fetchall()]
         
         conn.close()
         return clients
@@ -56,17 +59,29 @@ class Client:
         conn.close()
         
         if row:
-            return Client(
-                id=row['id'], 
-                name=row['name'],
-                phone=row['phone'] if row['phone'] else None,
-                address=row['address'] if row['address'] else None,
-                credit_limit=row['credit_limit'] if row['credit_limit'] else 0.0,
-                total_debt=row['total_debt'],
-                notes=row['notes'] if row['notes'] else None
-            )
+            return Client._from_row(row)
         return None
     
+    @staticmethod
+    def get_by_ids(client_ids):
+        """Obtiene los clientes de una lista de IDs (los inexistentes se omiten)"""
+        client_ids = list(dict.fromkeys(client_ids))
+        if not client_ids:
+            return []
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        placeholders = ','.join('?' * len(client_ids))
+        cursor.execute(f'''
+            SELECT id, name, phone, address, credit_limit, total_debt, notes
+            FROM clients 
+            WHERE id IN ({placeholders})
+        ''', client_ids)
+        
+        clients = [Client._from_row(row) for row in cursor.fetchall()]
+        conn.close()
+        return clients
+    
     def save(self):
         """Guarda un nuevo cliente"""
         conn = get_connection()
@@ -147,47 +162,22 @@ class Client:
 
     def pay_debt(self, amount, description=""):
         """
-        Reduce la deuda y registra el pago en el historial.
-        NOTA: Este método NO debe usarse directamente para pagos complejos.
-        Usar process_complete_payment() en CreditManagementWindow para pagos que afectan ventas.
+        Registra un pago: reduce la deuda, lo reparte entre las ventas
+        pendientes (las más antiguas primero) y deja el exceso como crédito
+        a favor. Ver models/payment_allocation.py.
         """
         if amount <= 0:
             raise ValueError("El monto debe ser positivo")
         
-        conn = get_connection()
-        cursor = conn.cursor()
-        
         try:
-            # Reducir deuda (no puede quedar negativa)
-            cursor.execute('''
-                UPDATE clients 
-                SET total_debt = MAX(0, total_debt - ?)
-                WHERE id = ?
-            ''', (amount, self.id))
-            
-            # Registrar transacción de pago (CORREGIDO: usar amount positivo para créditos)
-            cursor.execute('''
-                INSERT INTO client_transactions (
-                    client_id, transaction_type, amount, description, created_at
-                ) VALUES (?, 'credit', ?, ?, datetime('now', 'localtime'))
-            ''', (self.id, amount, description))  # amount positivo para créditos
-            
-            conn.commit()
-            
-            # Actualizar objeto
-            self.total_debt = max(0, self.total_debt - amount)
-            
-            # Sincronizar estados de ventas después del pago
-            sync_client_sales_status_on_payment(self.id)
-            
-            return True
-            
+            result = allocate_payment(self.id, amount, description)
         except Exception as e:
-            conn.rollback()
             print(f"Error al pagar deuda: {e}")
             return False
-        finally:
-            conn.close()
+        
+        # Actualizar objeto
+        self.total_debt = max(0, self.total_debt - result['debt_reduced'])
+        return True
 
     def register_sale_transaction(self, sale_id, amount, description):
         """Registra una transacción de venta a crédito correctamente"""
@@ -250,18 +240,7 @@ class Client:
             ORDER BY name
         ''', (f'%{query}%', f'%{query}%'))
         
-        clients = []
-        for row in cursor.fetchall():
-            client = Client(
-                id=row['id'], 
-                name=row['name'],
-                phone=row['phone'] if row['phone'] else None,
-                address=row['address'] if row['address'] else None,
-                credit_limit=row['credit_limit'] if row['credit_limit'] else 0.0,
-                total_debt=row['total_debt'],
-                notes=row['notes'] if row['notes'] else None
-            )
-            clients.append(client)
+        clients = [Client._from_row(row) for row in cursor.fetchall()]
         
         conn.close()
         return clients
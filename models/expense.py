@@ -1,14 +1,17 @@
-from config.database import get_connection
-from datetime import datetime
+from config.database import get_connection, TIMESTAMP_FORMAT
+from models.pagination import KeysetQuery, Conditions, Page, PAGE_SIZE
+from datetime import date, datetime, time
+import sqlite3
 
 class Expense:
     def __init__(self, id=None, description=None, amount=None, 
-                 date=None, user_id=None):
+                 date=None, user_id=None, category=None):
         self.id = id
         self.description = description
         self.amount = amount
         self.date = date if date else datetime.now()
         self.user_id = user_id
+        self.category = category
     
     @classmethod
     def get_total_expenses(cls):
@@ -29,19 +32,70 @@ class Expense:
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM expenses ORDER BY date DESC')
-        expenses = []
-        
-        for row in cursor.fetchall():
-            expense = Expense(
-                row['id'], row['description'], row['amount'],
-                datetime.fromisoformat(row['date']) if row['date'] else None,
-                row['user_id']
-            )
-            expenses.append(expense)
+        expenses = [Expense._from_row(row) for row in cursor.fetchall()]
         
         conn.close()
         return expenses
     
+    @staticmethod
+    def _from_row(row):
+        return Expense(
+            row['id'], row['description'], row['amount'],
+            datetime.fromisoformat(row['date']) if row['date'] else None,
+            row['user_id'], row['category']
+        )
+    
+    @staticmethod
+    def get_by_id(expense_id):
+        """Obtiene un gasto por ID"""
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('SELECT * FROM expenses WHERE id = ?', (expense_id,))
+            row = cursor.fetchone()
+            return Expense._from_row(row) if row else None
+        except Exception as e:
+            print(f"Error al obtener gasto por ID: {e}")
+            return None
+        finally:
+            conn.close()
+    
+    # Órdenes disponibles para list_query/query: (expresión, alias, descendente)
+    SORTS = {
+        'newest': [('date', 'date', True), ('id', 'id', True)],
+        'oldest': [('date', 'date', False), ('id', 'id', False)],
+    }
+    
+    @staticmethod
+    def list_query(start_date=None, end_date=None, category=None, user_id=None,
+                   search=None, sort='newest'):
+        """
+        KeysetQuery de gastos con los filtros en SQL. Las fechas son días
+        inclusive; search busca dentro de la descripción.
+        """
+        conditions = Conditions()
+        conditions.date_range('date', start_date, end_date)
+        conditions.equals('category', category)
+        conditions.equals('user_id', user_id)
+        conditions.contains('description', search)
+        return KeysetQuery(
+            columns='*',
+            from_clause='expenses',
+            key=Expense.SORTS[sort],
+            where=conditions.where,
+            params=conditions.params,
+        )
+    
+    @staticmethod
+    def query(limit=PAGE_SIZE, after=None, sort='newest', **filters):
+        """Página de gastos filtrados; after es el next_token anterior"""
+        try:
+            return Expense.list_query(sort=sort, **filters).page(limit, after, Expense._from_row, sort)
+        except sqlite3.Error as e:
+            print(f"Error al consultar gastos: {e}")
+            return Page([])
+    
     @classmethod
     def get_total_purchases(cls):
         """Retorna el total de todas las compras"""
@@ -56,24 +110,34 @@ class Expense:
             print(f"Error al obtener total de compras: {e}")
             return 0
     
+    @staticmethod
+    def _date_text(value):
+        """Fecha en TIMESTAMP_FORMAT; acepta datetime, date o texto ISO ('2024-03-01 10:00:00')"""
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value.strip())
+        elif isinstance(value, date) and not isinstance(value, datetime):
+            value = datetime.combine(value, time())
+        return value.strftime(TIMESTAMP_FORMAT)
+    
     def save(self):
         """Guarda el gasto en la base de datos"""
         conn = get_connection()
         cursor = conn.cursor()
         
         try:
+            expense_date = Expense._date_text(self.date)
             if self.id is None:
                 cursor.execute('''
-                    INSERT INTO expenses (description, amount, date, user_id) 
-                    VALUES (?, ?, ?, ?)
-                ''', (self.description, self.amount, self.date.isoformat(), self.user_id))
+                    INSERT INTO expenses (description, amount, date, user_id, category) 
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (self.description, self.amount, expense_date, self.user_id, self.category))
                 self.id = cursor.lastrowid
             else:
                 cursor.execute('''
-                    UPDATE expenses SET description = ?, amount = ?, date = ?, user_id = ? 
+                    UPDATE expenses SET description = ?, amount = ?, date = ?, user_id = ?, category = ? 
                     WHERE id = ?
-                ''', (self.description, self.amount, self.date.isoformat(), 
-                      self.user_id, self.id))
+                ''', (self.description, self.amount, expense_date, 
+                      self.user_id, self.category, self.id))
             
             conn.commit()
             return True
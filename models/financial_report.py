@@ -0,0 +1,138 @@
+from config.database import get_connection
+
+
+class FinancialSummary:
+    """Resultado del resumen financiero (todos los montos en float)"""
+
+    FIELDS = (
+        'total_sales', 'paid_sales', 'credit_sales', 'current_debt',
+        'total_purchases', 'total_freight', 'total_iva',
+        'total_expenses', 'total_losses', 'inventory_sold', 'client_credit',
+    )
+
+    def __init__(self, total_sales=0.0, paid_sales=0.0, credit_sales=0.0, current_debt=0.0,
+                 total_purchases=0.0, total_freight=0.0, total_iva=0.0,
+                 total_expenses=0.0, total_losses=0.0, inventory_sold=0.0, client_credit=0.0):
+        self.total_sales = float(total_sales)
+        self.paid_sales = float(paid_sales)          # Dinero realmente recibido
+        self.credit_sales = float(credit_sales)      # Dinero pendiente de cobro
+        self.current_debt = float(current_debt)      # Suma de clients.total_debt
+        self.total_purchases = float(total_purchases)
+        self.total_freight = float(total_freight)
+        self.total_iva = float(total_iva)
+        self.total_expenses = float(total_expenses)
+        self.total_losses = float(total_losses)
+        self.inventory_sold = float(inventory_sold)  # Costo de lo vendido (cost_price)
+        self.client_credit = float(client_credit)    # Pagos por encima de la deuda (crédito a favor)
+
+    @property
+    def cash_in_hand(self):
+        """Efectivo = ventas pagadas + crédito a favor recibido - compras - gastos"""
+        return self.paid_sales + self.client_credit - self.total_purchases - self.total_expenses
+
+    @property
+    def current_inventory_value(self):
+        """Inventario actual = compras - vendido - pérdidas - flete - IVA (no negativo)"""
+        value = (self.total_purchases - self.inventory_sold - self.total_losses
+                 - self.total_freight - self.total_iva)
+        return max(0, value)
+
+    def as_dict(self):
+        """Diccionario con las claves que usan las vistas de reportes"""
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def calculations(self):
+        """Valores derivados en el formato de ReportsWindow._perform_calculations"""
+        return {
+            'cash_in_hand': self.cash_in_hand,
+            'current_inventory_value': self.current_inventory_value,
+        }
+
+    def __repr__(self):
+        return (f"FinancialSummary(total_sales={self.total_sales:.2f}, paid_sales={self.paid_sales:.2f}, "
+                f"credit_sales={self.credit_sales:.2f}, total_purchases={self.total_purchases:.2f})")
+
+
+# Ventas, deuda de clientes, costo de lo vendido y crédito a favor recibido
+# en una sola lectura
+_SALES_SQL = '''
+    SELECT
+        COALESCE(SUM(s.total), 0) as total_sales,
+        COALESCE(SUM(COALESCE(s.paid_amount, 0)), 0) as paid_sales,
+        COALESCE(SUM(COALESCE(s.remaining_debt, s.total)), 0) as credit_sales,
+        (SELECT COALESCE(SUM(total_debt), 0) FROM clients) as current_debt,
+        (SELECT COALESCE(SUM(sd.quantity * p.cost_price), 0)
+         FROM sale_details sd
+         JOIN products p ON sd.product_id = p.id) as inventory_sold,
+        (SELECT COALESCE(SUM(amount), 0) FROM client_transactions
+         WHERE transaction_type = 'credit_balance') as client_credit
+    FROM sales s
+'''
+
+# Compras (con flete e IVA), gastos y pérdidas
+_COSTS_SQL = '''
+    SELECT
+        COALESCE(SUM(pu.total), 0) as total_purchases,
+        COALESCE(SUM(CASE WHEN pu.shipping IS NOT NULL AND pu.shipping != '' AND pu.shipping != '0'
+                     THEN CAST(pu.shipping AS REAL) ELSE 0 END), 0) as total_freight,
+        COALESCE(SUM(CASE WHEN pu.iva IS NOT NULL AND pu.iva != '' AND pu.iva != '0'
+                     THEN CAST(pu.iva AS REAL) ELSE 0 END), 0) as total_iva,
+        (SELECT COALESCE(SUM(amount), 0) FROM expenses) as total_expenses,
+        (SELECT COALESCE(SUM(total_cost), 0) FROM losses) as total_losses
+    FROM purchases pu
+'''
+
+
+def get_financial_summary():
+    """
+    Calcula el resumen financiero completo con dos consultas agregadas
+    dentro de una misma transacción de lectura, de modo que todos los
+    totales corresponden a la misma foto de la base de datos.
+    Retorna un FinancialSummary (en ceros si ocurre un error).
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    own_transaction = not conn.in_transaction
+    try:
+        if own_transaction:
+            cursor.execute("BEGIN")
+
+        cursor.execute(_SALES_SQL)
+        sales = cursor.fetchone()
+        cursor.execute(_COSTS_SQL)
+        costs = cursor.fetchone()
+
+        total_sales = float(sales['total_sales'])
+        paid_sales = float(sales['paid_sales'])
+        credit_sales = float(sales['credit_sales'])
+        current_debt = float(sales['current_debt'])
+
+        # Verificación de consistencia: si pagado + pendiente no cuadra con
+        # el total, se usa la deuda de los clientes como respaldo
+        if abs(paid_sales + credit_sales - total_sales) > 0.01:
+            print(f"⚠️ Inconsistencia en ventas: total ${total_sales:,.2f}, "
+                  f"pagado + pendiente ${paid_sales + credit_sales:,.2f}; usando deuda de clientes")
+            paid_sales = total_sales - current_debt
+            credit_sales = current_debt
+
+        return FinancialSummary(
+            total_sales=total_sales,
+            paid_sales=paid_sales,
+            credit_sales=credit_sales,
+            current_debt=current_debt,
+            total_purchases=costs['total_purchases'],
+            total_freight=costs['total_freight'],
+            total_iva=costs['total_iva'],
+            total_expenses=costs['total_expenses'],
+            total_losses=costs['total_losses'],
+            inventory_sold=sales['inventory_sold'],
+            client_credit=sales['client_credit'],
+        )
+
+    except Exception as e:
+        print(f"Error al calcular resumen financiero: {e}")
+        return FinancialSummary()
+    finally:
+        if own_transaction and conn.in_transaction:
+            conn.rollback()
+        conn.close()
@@ -1,5 +1,9 @@
-from config.database import get_connection
+from config.database import get_connection, day_range, TIMESTAMP_FORMAT
+from models.pagination import KeysetQuery, Conditions, Page, PAGE_SIZE
+from models.query_cache import cached_query
+from utils.events import event_bus, LOSS_RECORDED, STOCK_CHANGED
 from datetime import datetime
+import sqlite3
 
 class Loss:
     def __init__(self, id=None, product_id=None, quantity=None, unit_cost=None, 
@@ -22,6 +26,10 @@ class Loss:
         conn = get_connection()
         cursor = conn.cursor()
         
+        loss_date = self.loss_date
+        if isinstance(loss_date, datetime):
+            loss_date = loss_date.strftime(TIMESTAMP_FORMAT)
+        
         try:
             # Iniciar transacción
             conn.execute("BEGIN TRANSACTION")
@@ -33,7 +41,7 @@ class Loss:
                                       loss_date, reason, loss_type, notes, created_by)
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ''', (self.product_id, self.quantity, self.unit_cost, self.total_cost,
-                      self.loss_date, self.reason, self.loss_type, self.notes, self.created_by))
+                      loss_date, self.reason, self.loss_type, self.notes, self.created_by))
                 self.id = cursor.lastrowid
             else:
                 cursor.execute('''
@@ -42,7 +50,7 @@ class Loss:
                         loss_date=?, reason=?, loss_type=?, notes=?, created_by=?
                     WHERE id=?
                 ''', (self.product_id, self.quantity, self.unit_cost, self.total_cost,
-                      self.loss_date, self.reason, self.loss_type, self.notes, 
+                      loss_date, self.reason, self.loss_type, self.notes, 
                       self.created_by, self.id))
             
             # Actualizar el inventario (reducir stock)
@@ -54,6 +62,7 @@ class Loss:
             
             # Confirmar transacción
             conn.commit()
+            event_bus.publish(LOSS_RECORDED, losses=[self.id], products=[self.product_id])
             return True
             
         except Exception as e:
@@ -81,11 +90,11 @@ class Loss:
         
         if start_date:
             query += " AND l.loss_date >= ?"
-            params.append(start_date)
+            params.append(day_range(start_date)[0])
         
         if end_date:
-            query += " AND l.loss_date <= ?"
-            params.append(end_date)
+            query += " AND l.loss_date < ?"
+            params.append(day_range(end_date)[1])
         
         if product_id:
             query += " AND l.product_id = ?"
@@ -101,27 +110,60 @@ class Loss:
         losses_data = cursor.fetchall()
         conn.close()
         
-        losses = []
-        for loss_data in losses_data:
-            loss = Loss(
-                id=loss_data['id'],
-                product_id=loss_data['product_id'],
-                quantity=loss_data['quantity'],
-                unit_cost=loss_data['unit_cost'],
-                total_cost=loss_data['total_cost'],
-                loss_date=loss_data['loss_date'],
-                reason=loss_data['reason'],
-                loss_type=loss_data['loss_type'],
-                notes=loss_data['notes'],
-                created_by=loss_data['created_by'],
-                created_at=loss_data['created_at']
-            )
-            # Agregar datos adicionales
-            loss.product_name = loss_data['product_name']
-            loss.user_name = loss_data['user_name']
-            losses.append(loss)
-        
-        return losses
+        return [Loss._from_row(loss_data) for loss_data in losses_data]
+    
+    @staticmethod
+    def _from_row(loss_data):
+        """Crea una pérdida desde una fila de losses (+ product_name, user_name)"""
+        loss = Loss(
+            id=loss_data['id'],
+            product_id=loss_data['product_id'],
+            quantity=loss_data['quantity'],
+            unit_cost=loss_data['unit_cost'],
+            total_cost=loss_data['total_cost'],
+            loss_date=loss_data['loss_date'],
+            reason=loss_data['reason'],
+            loss_type=loss_data['loss_type'],
+            notes=loss_data['notes'],
+            created_by=loss_data['created_by'],
+            created_at=loss_data['created_at']
+        )
+        # Agregar datos adicionales
+        loss.product_name = loss_data['product_name']
+        loss.user_name = loss_data['user_name']
+        return loss
+    
+    # Órdenes disponibles para list_query/query: (expresión, alias, descendente)
+    SORTS = {
+        'newest': [('l.loss_date', 'loss_date', True), ('l.id', 'id', True)],
+        'oldest': [('l.loss_date', 'loss_date', False), ('l.id', 'id', False)],
+    }
+    
+    @staticmethod
+    def list_query(start_date=None, end_date=None, product_id=None, loss_type=None, sort='newest'):
+        """KeysetQuery de pérdidas con los filtros en SQL (fechas: días inclusive)"""
+        conditions = Conditions()
+        conditions.date_range('l.loss_date', start_date, end_date)
+        conditions.equals('l.product_id', product_id)
+        conditions.equals('l.loss_type', loss_type)
+        return KeysetQuery(
+            columns='l.*, p.name as product_name, u.name as user_name',
+            from_clause='losses l '
+                        'JOIN products p ON l.product_id = p.id '
+                        'JOIN users u ON l.created_by = u.id',
+            key=Loss.SORTS[sort],
+            where=conditions.where,
+            params=conditions.params,
+        )
+    
+    @staticmethod
+    def query(limit=PAGE_SIZE, after=None, sort='newest', **filters):
+        """Página de pérdidas filtradas; after es el next_token anterior"""
+        try:
+            return Loss.list_query(sort=sort, **filters).page(limit, after, Loss._from_row, sort)
+        except sqlite3.Error as e:
+            print(f"Error al consultar pérdidas: {e}")
+            return Page([])
     
     @staticmethod
     def get_by_id(loss_id):
@@ -154,26 +196,7 @@ class Loss:
                 print(f"No se encontró pérdida con ID: {loss_id}")
                 return None
                 
-            # Crear instancia de Loss con todos los atributos básicos
-            loss = Loss(
-                id=loss_data['id'],
-                product_id=loss_data['product_id'],
-                quantity=loss_data['quantity'],
-                unit_cost=loss_data['unit_cost'],
-                total_cost=loss_data['total_cost'],
-                loss_date=loss_data['loss_date'],
-                reason=loss_data['reason'],
-                loss_type=loss_data['loss_type'],
-                notes=loss_data['notes'],
-                created_by=loss_data['created_by'],
-                created_at=loss_data['created_at']
-            )
-            
-            # Agregar atributos adicionales
-            loss.product_name = loss_data['product_name']
-            loss.user_name = loss_data['user_name']
-            
-            return loss
+            return Loss._from_row(loss_data)
             
         except Exception as e:
             print(f"Error al obtener pérdida: {e}")
@@ -252,6 +275,7 @@ class Loss:
             
             # Confirmar transacción
             conn.commit()
+            event_bus.publish(STOCK_CHANGED, products=[product_id])
             print(f"Pérdida {self.id} eliminada correctamente")
             return True
             
@@ -265,6 +289,7 @@ class Loss:
             conn.close()
     
     @staticmethod
+    @cached_query('losses')
     def get_summary_by_type(start_date=None, end_date=None):
         """Obtiene un resumen de pérdidas por tipo"""
         conn = get_connection()
@@ -279,11 +304,11 @@ class Loss:
         
         if start_date:
             query += " AND loss_date >= ?"
-            params.append(start_date)
+            params.append(day_range(start_date)[0])
         
         if end_date:
-            query += " AND loss_date <= ?"
-            params.append(end_date)
+            query += " AND loss_date < ?"
+            params.append(day_range(end_date)[1])
         
         query += " GROUP BY loss_type ORDER BY total DESC"
         
@@ -0,0 +1,223 @@
+"""
+Paginación por clave ("keyset") para listados y exportaciones.
+
+En lugar de LIMIT/OFFSET, cada página pide las filas que siguen a la última
+clave vista (WHERE clave < ? ORDER BY clave LIMIT n), así SQLite recorre el
+índice desde ese punto y el costo de una página no crece con su posición.
+Los modelos (Sale, Purchase, Expense, Loss) arman sus consultas con
+KeysetQuery y Conditions; query() devuelve un Page con un token de
+continuación opaco para pedir la página siguiente.
+"""
+
+import base64
+import json
+
+from config.database import get_connection, day_range
+
+PAGE_SIZE = 100
+
+
+class Page:
+    """Elementos de una página y token para pedir la siguiente (None si es la última)"""
+
+    def __init__(self, items, next_token=None):
+        self.items = items
+        self.next_token = next_token
+
+    @property
+    def has_more(self):
+        return self.next_token is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __repr__(self):
+        return f"Page({len(self.items)} elementos, has_more={self.has_more})"
+
+
+def encode_token(sort, key):
+    """Token de continuación: orden + clave de la última fila entregada"""
+    data = json.dumps([sort, list(key)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+
+def decode_token(token, sort):
+    """Clave guardada en el token; ValueError si está dañado o es de otro orden"""
+    try:
+        token_sort, key = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except Exception:
+        raise ValueError("Token de continuación inválido")
+    if token_sort != sort:
+        raise ValueError(f"El token de continuación corresponde al orden '{token_sort}', no a '{sort}'")
+    return tuple(key)
+
+
+class Conditions:
+    """Acumula condiciones WHERE con sus parámetros; los filtros vacíos se ignoran"""
+
+    def __init__(self):
+        self.clauses = []
+        self.params = []
+
+    def add(self, clause, *params):
+        self.clauses.append(clause)
+        self.params.extend(params)
+
+    def equals(self, column, value):
+        if value not in (None, ''):
+            self.add(f"{column} = ?", value)
+
+    def date_range(self, column, start_date=None, end_date=None):
+        """Días inclusive, comparando el texto de la columna (usa el índice)"""
+        if start_date:
+            self.add(f"{column} >= ?", day_range(start_date)[0])
+        if end_date:
+            self.add(f"{column} < ?", day_range(end_date)[1])
+
+    def contains(self, column, text):
+        if text:
+            escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            self.add(f"{column} LIKE ? ESCAPE '\\'", f"%{escaped}%")
+
+    @property
+    def where(self):
+        return ' AND '.join(self.clauses) or None
+
+
+class KeysetQuery:
+    """
+    Consulta paginada por clave.
+
+    columns: lista SELECT (debe incluir los alias de la clave).
+    from_clause: tablas y JOINs.
+    key: lista de (expresión, alias, descendente) que define el orden; la
+         última debe ser única (normalmente el id). Las expresiones de la
+         clave no deben ser NULL, porque las filas con NULL no se
+         pueden comparar y quedarían fuera de las páginas siguientes.
+    where / params: filtro opcional.
+    id_aliases: alias que forman el identificador de cada fila (iid en
+         las listas virtuales; por defecto, el último de la clave).
+    """
+
+    def __init__(self, columns, from_clause, key, where=None, params=(), id_aliases=None):
+        self.columns = columns
+        self.from_clause = from_clause
+        self.key = [(expr, alias, bool(desc)) for expr, alias, desc in key]
+        self.where = where
+        self.params = tuple(params)
+        self.id_aliases = tuple(id_aliases or (self.key[-1][1],))
+
+    # ── Claves ───────────────────────────────────────────────────────────────
+    def key_of(self, row):
+        return tuple(row[alias] for _, alias, _ in self.key)
+
+    def row_id(self, row):
+        """Identificador estable de la fila"""
+        return ':'.join(str(row[alias]) for alias in self.id_aliases)
+
+    def _order_by(self):
+        return ', '.join(f"{expr} {'DESC' if desc else 'ASC'}" for expr, _, desc in self.key)
+
+    def _after_clause(self, after):
+        """
+        Condición "viene después de la clave after" respetando la dirección
+        de cada columna. La primera columna se acota también por separado
+        (<= o >=) para que SQLite recorra el índice como un rango.
+        """
+        def strictly_after(index):
+            expr, _, desc = self.key[index]
+            op = '<' if desc else '>'
+            if index == len(self.key) - 1:
+                return f"{expr} {op} ?", [after[index]]
+            rest_sql, rest_params = strictly_after(index + 1)
+            return (f"({expr} {op} ? OR ({expr} = ? AND {rest_sql}))",
+                    [after[index], after[index]] + rest_params)
+
+        first_expr, _, first_desc = self.key[0]
+        sql, params = strictly_after(0)
+        bound = f"{first_expr} {'<=' if first_desc else '>='} ?"
+        return f"{bound} AND {sql}", [after[0]] + params
+
+    def _where(self, after=None):
+        clauses, params = [], []
+        if self.where:
+            clauses.append(f"({self.where})")
+            params.extend(self.params)
+        if after is not None:
+            sql, after_params = self._after_clause(after)
+            clauses.append(sql)
+            params.extend(after_params)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    # ── Consultas ────────────────────────────────────────────────────────────
+    def count(self):
+        where, params = self._where()
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT COUNT(*) FROM {self.from_clause}{where}", params)
+            return cursor.fetchone()[0]
+        finally:
+            conn.close()
+
+    def aggregate(self, expressions):
+        """Una fila con expresiones agregadas (SUM, COUNT...) sobre el mismo filtro"""
+        where, params = self._where()
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {expressions} FROM {self.from_clause}{where}", params)
+            return cursor.fetchone()
+        finally:
+            conn.close()
+
+    def page(self, limit=PAGE_SIZE, after=None, build=None, sort=''):
+        """
+        Página de hasta limit elementos que siguen al token after.
+        build convierte cada fila (p. ej. en un objeto del modelo); sort es
+        el nombre del orden, que queda dentro del token para que no se
+        mezcle con otra consulta.
+        """
+        rows = self.fetch(decode_token(after, sort) if after else None, limit + 1)
+        next_token = encode_token(sort, self.key_of(rows[limit - 1])) if len(rows) > limit else None
+        rows = rows[:limit]
+        return Page([build(row) for row in rows] if build else rows, next_token)
+
+    def fetch(self, after=None, limit=PAGE_SIZE):
+        """Hasta limit filas que siguen a la clave after (o desde el inicio)"""
+        where, params = self._where(after)
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT {self.columns} FROM {self.from_clause}{where} "
+                f"ORDER BY {self._order_by()} LIMIT ?",
+                params + [limit]
+            )
+            return cursor.fetchall()
+        finally:
+            conn.close()
+
+    def key_at(self, position):
+        """
+        Clave de la fila en la posición indicada. Solo lee las columnas de
+        la clave (normalmente desde el índice), se usa para saltar a una
+        posición lejana sin haber leído las páginas anteriores.
+        """
+        where, params = self._where()
+        key_columns = ', '.join(f"{expr} AS {alias}" for expr, alias, _ in self.key)
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT {key_columns} FROM {self.from_clause}{where} "
+                f"ORDER BY {self._order_by()} LIMIT 1 OFFSET ?",
+                params + [position]
+            )
+            row = cursor.fetchone()
+            return self.key_of(row) if row else None
+        finally:
+            conn.close()
@@ -0,0 +1,158 @@
+"""
+Asignación de pagos de clientes a sus ventas pendientes (FIFO).
+
+Un pago se reparte entre las ventas pendientes del cliente de la más
+antigua a la más nueva. El reparto sale de una sola consulta con una suma
+acumulada (SUM() OVER) sobre los saldos pendientes, y todas las
+actualizaciones se aplican con executemany en una sola transacción: saldo
+de cada venta (paid_amount / remaining_debt / status), deuda del cliente,
+movimientos en client_transactions y una fila por venta en
+payment_allocations. Lo que excede la deuda queda como crédito a favor.
+
+Todos los caminos de pago (CreditManagementWindow, Client.pay_debt,
+AccountReceivable.add_payment) usan allocate_payment().
+"""
+
+from datetime import datetime
+
+from config.database import db_connection, get_connection, TIMESTAMP_FORMAT
+from utils.events import event_bus, PAYMENT_REGISTERED
+
+# Diferencia por debajo de la cual un saldo se considera cero
+EPSILON = 0.005
+
+PLAN_SQL = '''
+    WITH pending AS (
+        SELECT id, created_at, total, COALESCE(paid_amount, 0) AS paid,
+               total - COALESCE(paid_amount, 0) AS balance
+        FROM sales
+        WHERE client_id = :client_id AND status = 'pending'
+          AND total - COALESCE(paid_amount, 0) > :epsilon
+    ),
+    ordered AS (
+        SELECT *, SUM(balance) OVER (ORDER BY created_at, id ROWS UNBOUNDED PRECEDING) - balance AS before
+        FROM pending
+    )
+    SELECT id, created_at, total, paid, balance, MIN(balance, :amount - before) AS applied
+    FROM ordered
+    WHERE before < :amount - :epsilon
+    ORDER BY created_at, id
+'''
+
+
+def _plan(cursor, client_id, amount):
+    """Reparto FIFO de amount: lista de dicts, uno por venta afectada"""
+    if amount <= EPSILON:
+        return []
+    cursor.execute(PLAN_SQL, {'client_id': client_id, 'amount': amount, 'epsilon': EPSILON})
+    allocations = []
+    for row in cursor.fetchall():
+        remaining = row['balance'] - row['applied']
+        allocations.append({
+            'sale_id': row['id'],
+            'date': row['created_at'],
+            'total': row['total'],
+            'balance': row['balance'],
+            'amount': row['applied'],
+            'paid_amount': row['paid'] + row['applied'],
+            'remaining': 0.0 if remaining <= EPSILON else remaining,
+            'status': 'paid' if remaining <= EPSILON else 'pending',
+        })
+    return allocations
+
+
+def _debt_split(cursor, client_id, amount):
+    """(deuda actual, parte del pago que reduce la deuda, exceso a crédito a favor)"""
+    cursor.execute('SELECT total_debt FROM clients WHERE id = ?', (client_id,))
+    row = cursor.fetchone()
+    if row is None:
+        raise ValueError("Cliente no encontrado")
+    current_debt = max(0.0, float(row['total_debt'] or 0))
+    debt_reduced = min(amount, current_debt)
+    return current_debt, debt_reduced, amount - debt_reduced
+
+
+def plan_allocation(client_id, amount):
+    """
+    Cómo se repartiría un pago sin aplicarlo: (asignaciones, sobrante). Igual
+    que allocate_payment, solo se reparte hasta la deuda del cliente; el
+    sobrante es lo que la excede y quedaría como crédito a favor.
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        _, debt_reduced, excess_credit = _debt_split(cursor, client_id, amount)
+        allocations = _plan(cursor, client_id, debt_reduced)
+    finally:
+        conn.close()
+    return allocations, excess_credit if excess_credit > EPSILON else 0.0
+
+
+def allocate_payment(client_id, amount, description="Pago"):
+    """
+    Registra un pago del cliente y lo reparte FIFO entre sus ventas
+    pendientes. Reduce la deuda hasta cero; el exceso queda como crédito a
+    favor. Retorna un dict con transaction_id, debt_reduced, excess_credit,
+    sales_paid_complete, sales_paid_partial y allocations. Lanza la
+    excepción original (sin guardar nada) si algo falla.
+    """
+    if amount <= 0:
+        raise ValueError("El monto debe ser positivo")
+
+    created_at = datetime.now().strftime(TIMESTAMP_FORMAT)
+
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        current_debt, debt_reduced, excess_credit = _debt_split(cursor, client_id, amount)
+        allocations = _plan(cursor, client_id, debt_reduced)
+
+        transaction_id = None
+        if debt_reduced > 0:
+            cursor.execute('''
+                UPDATE clients SET total_debt = MAX(0, total_debt - ?) WHERE id = ?
+            ''', (debt_reduced, client_id))
+            cursor.execute('''
+                INSERT INTO client_transactions (client_id, transaction_type, amount, description, created_at)
+                VALUES (?, 'credit', ?, ?, ?)
+            ''', (client_id, debt_reduced, description, created_at))
+            transaction_id = cursor.lastrowid
+
+        if excess_credit > EPSILON:
+            cursor.execute('''
+                INSERT INTO client_transactions (client_id, transaction_type, amount, description, created_at)
+                VALUES (?, 'credit_balance', ?, ?, ?)
+            ''', (client_id, excess_credit,
+                  f"Crédito a favor por exceso en pago de ${excess_credit:,.2f}", created_at))
+
+        cursor.executemany('''
+            UPDATE sales SET paid_amount = ?, remaining_debt = ?, status = ? WHERE id = ?
+        ''', [(item['paid_amount'], item['remaining'], item['status'], item['sale_id'])
+              for item in allocations])
+        cursor.executemany('''
+            INSERT INTO payment_allocations (transaction_id, client_id, sale_id, amount, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(transaction_id, client_id, item['sale_id'], item['amount'], created_at)
+              for item in allocations])
+
+        sale_ids = [item['sale_id'] for item in allocations]
+
+        # Deuda saldada: ninguna venta del cliente puede quedar pendiente
+        if debt_reduced > 0 and current_debt - debt_reduced <= EPSILON:
+            cursor.execute("SELECT id FROM sales WHERE client_id = ? AND status = 'pending'", (client_id,))
+            sale_ids.extend(row[0] for row in cursor.fetchall())
+            cursor.execute('''
+                UPDATE sales SET status = 'paid', paid_amount = total, remaining_debt = 0
+                WHERE client_id = ? AND status = 'pending'
+            ''', (client_id,))
+
+    event_bus.publish(PAYMENT_REGISTERED, clients=[client_id], sales=sale_ids)
+    return {
+        'success': True,
+        'transaction_id': transaction_id,
+        'debt_reduced': debt_reduced,
+        'excess_credit': excess_credit if excess_credit > EPSILON else 0.0,
+        'sales_paid_complete': sum(1 for item in allocations if item['status'] == 'paid'),
+        'sales_paid_partial': sum(1 for item in allocations if item['status'] == 'pending'),
+        'allocations': allocations,
+    }
+
@@ -1,6 +1,15 @@
 from config.database import get_connection
 import sqlite3  # Agregar esta línea
 
+from models.query_cache import cached_query
+from utils.events import event_bus, STOCK_CHANGED
+
+
+def _products_changed(*product_ids):
+    """Avisa que cambiaron productos; el catálogo compartido se invalida al recibirlo"""
+    event_bus.publish(STOCK_CHANGED, products=product_ids)
+
+
 class Product:
     def __init__(self, id=None, name=None, price=None, stock=None, cost_price=None, created_at=None):
         self.id = id
@@ -11,6 +20,7 @@ class Product:
         self.created_at = created_at
     
     @staticmethod
+    @cached_query('products')
     def get_all():
         """Obtiene todos los productos de la base de datos"""
         conn = get_connection()
@@ -82,6 +92,7 @@ class Product:
                 ''', (self.name, self.price, self.stock, self.id))
             
             conn.commit()
+            _products_changed(self.id)
             return True
         except sqlite3.IntegrityError:
             return False
@@ -96,6 +107,7 @@ class Product:
         cursor.execute('DELETE FROM products WHERE id = ?', (self.id,))
         conn.commit()
         conn.close()
+        _products_changed(self.id)
     
     def update_stock(self, quantity_change):
         """Actualiza el stock del producto"""
@@ -106,4 +118,5 @@ class Product:
         cursor.execute('UPDATE products SET stock = ? WHERE id = ?', 
                       (self.stock, self.id))
         conn.commit()
-        conn.close()
\ No newline at end of file
+        conn.close()
+        _products_changed(self.id)
\ No newline at end of file
@@ -0,0 +1,213 @@
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from config.database import get_connection, get_table_versions
+from models.product import Product
+from utils.events import event_bus, PRODUCT_TOPICS
+
+
+def normalize_text(text):
+    """Minúsculas y sin tildes: 'Azúcar Morena' -> 'azucar morena'"""
+    if not text:
+        return ""
+    text = str(text)
+    if not text.isascii():
+        decomposed = unicodedata.normalize('NFKD', text)
+        text = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(text.casefold().split())
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ProductCatalog:
+    """
+    Catálogo de productos en memoria compartido por las ventanas.
+
+    Se carga una sola vez desde la base de datos y se recarga cuando algún
+    evento del bus lo invalida (ventas, compras, pérdidas, cambios de
+    productos) o al llamar refresh().
+    Mantiene índices por id, por nombre exacto, por nombre normalizado
+    (sin tildes ni mayúsculas), una lista ordenada para búsquedas por
+    prefijo y un índice de trigramas para búsquedas por contenido.
+    """
+
+    # Orden de relevancia de una coincidencia
+    RANK_EXACT = 0
+    RANK_PREFIX = 1
+    RANK_WORD_PREFIX = 2
+    RANK_CONTAINS = 3
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._version = None     # Versión de la tabla products al cargar
+        self.products = []       # Ordenados por nombre (como Product.get_all)
+        self.by_id = {}
+        self.by_name = {}        # Nombre exacto -> producto
+        self._by_key = {}        # Nombre normalizado -> producto
+        self._keys = {}          # id -> nombre normalizado
+        self._sorted_keys = []   # [(nombre normalizado, id)] para prefijos
+        self._trigrams = {}      # trigrama -> set(ids)
+        self._chars = {}         # carácter -> set(ids), para búsquedas de 1-2 letras
+
+    # ── Carga ────────────────────────────────────────────────────────────────
+    def refresh(self):
+        """Recarga el catálogo desde la base de datos"""
+        version = self._products_version()
+        products = Product.get_all()
+        self._build(products, version)
+        return self.products
+
+    def ensure_current(self):
+        """
+        Recarga el catálogo solo si la tabla products cambió desde la última
+        carga (lo indica table_versions); retorna los productos. Permite
+        abrir ventanas con el catálogo ya precargado al iniciar.
+        """
+        if not self._loaded or self._version is None or self._products_version() != self._version:
+            return self.refresh()
+        return self.products
+
+    @staticmethod
+    def _products_version():
+        conn = get_connection()
+        try:
+            return get_table_versions(conn.cursor()).get('products')
+        finally:
+            conn.close()
+
+    def invalidate(self):
+        """Marca el catálogo como desactualizado; se recarga en el próximo uso"""
+        self._loaded = False
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            self.refresh()
+
+    def _build(self, products, version=None):
+        by_id, by_name, by_key, keys = {}, {}, {}, {}
+        trigrams, chars = defaultdict(set), defaultdict(set)
+        for product in products:
+            key = normalize_text(product.name)
+            by_id[product.id] = product
+            by_name.setdefault(product.name, product)
+            by_key.setdefault(key, product)
+            keys[product.id] = key
+            for gram in _trigrams(key):
+                trigrams[gram].add(product.id)
+            for ch in set(key):
+                chars[ch].add(product.id)
+
+        with self._lock:
+            self.products = products
+            self.by_id = by_id
+            self.by_name = by_name
+            self._by_key = by_key
+            self._keys = keys
+            self._sorted_keys = sorted((key, pid) for pid, key in keys.items())
+            self._trigrams = dict(trigrams)
+            self._chars = dict(chars)
+            self._version = version
+            self._loaded = True
+
+    # ── Consultas ────────────────────────────────────────────────────────────
+    def get(self, name):
+        """Producto con el nombre exacto, o None"""
+        self.ensure_loaded()
+        return self.by_name.get((name or "").strip())
+
+    def get_by_id(self, product_id):
+        self.ensure_loaded()
+        return self.by_id.get(product_id)
+
+    def find(self, name):
+        """Producto cuyo nombre coincide sin importar mayúsculas ni tildes, o None"""
+        self.ensure_loaded()
+        return self._by_key.get(normalize_text(name))
+
+    def names(self, in_stock=False):
+        """Nombres de todos los productos (opcionalmente solo con stock)"""
+        self.ensure_loaded()
+        return [p.name for p in self.products if not in_stock or (p.stock or 0) > 0]
+
+    def starting_with(self, text, in_stock=False):
+        """Productos cuyo nombre normalizado empieza por text, en orden alfabético"""
+        self.ensure_loaded()
+        prefix = normalize_text(text)
+        with self._lock:
+            sorted_keys = self._sorted_keys
+            by_id = self.by_id
+        result = []
+        index = bisect_left(sorted_keys, (prefix,))
+        while index < len(sorted_keys) and sorted_keys[index][0].startswith(prefix):
+            product = by_id[sorted_keys[index][1]]
+            if not in_stock or (product.stock or 0) > 0:
+                result.append(product)
+            index += 1
+        return result
+
+    def search(self, text, limit=None, in_stock=False):
+        """
+        Productos que contienen text (sin importar mayúsculas ni tildes),
+        ordenados por relevancia: exacto, prefijo, inicio de palabra y
+        contenido; a igual relevancia, por nombre.
+        """
+        self.ensure_loaded()
+        query = normalize_text(text)
+        if not query:
+            products = [p for p in self.products if not in_stock or (p.stock or 0) > 0]
+            return products[:limit] if limit else products
+
+        with self._lock:
+            keys = self._keys
+            by_id = self.by_id
+            candidates = self._candidates(query)
+
+        ranked = []
+        for pid in candidates:
+            key = keys[pid]
+            position = key.find(query)
+            if position < 0:
+                continue
+            product = by_id[pid]
+            if in_stock and (product.stock or 0) <= 0:
+                continue
+            if key == query:
+                rank = self.RANK_EXACT
+            elif position == 0:
+                rank = self.RANK_PREFIX
+            elif key[position - 1] == ' ':
+                rank = self.RANK_WORD_PREFIX
+            else:
+                rank = self.RANK_CONTAINS
+            ranked.append((rank, key, product))
+
+        ranked.sort(key=lambda item: (item[0], item[1]))
+        products = [product for _, _, product in ranked]
+        return products[:limit] if limit else products
+
+    def _candidates(self, query):
+        """Ids que pueden contener query según el índice (se verifican después)"""
+        if len(query) >= 3:
+            grams = _trigrams(query)
+            index = self._trigrams
+        else:
+            grams = set(query)
+            index = self._chars
+
+        sets = []
+        for gram in grams:
+            ids = index.get(gram)
+            if not ids:
+                return set()
+            sets.append(ids)
+        sets.sort(key=len)
+        return set.intersection(*sets)
+
+
+product_catalog = ProductCatalog()
+event_bus.subscribe(PRODUCT_TOPICS, lambda event: product_catalog.invalidate())
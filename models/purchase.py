@@ -1,5 +1,7 @@
-from config.database import get_connection
+from config.database import get_connection, TIMESTAMP_FORMAT
+from models.pagination import KeysetQuery, Conditions, Page, PAGE_SIZE
 from datetime import datetime
+import sqlite3
 
 class Purchase:
     def __init__(self, id=None, user_id=None, total=None, 
@@ -13,6 +15,19 @@ class Purchase:
         self.invoice_number = invoice_number
         self.supplier = supplier
     
+    @staticmethod
+    def _from_row(row):
+        return Purchase(
+            id=row['id'],
+            user_id=row['user_id'],
+            total=row['total'],
+            iva=row['iva'],
+            shipping=row['shipping'],
+            date=row['date'],
+            invoice_number=row['invoice_number'],
+            supplier=row['supplier']
+        )
+    
     @staticmethod
     def get_all():
         """Obtiene todas las compras"""
@@ -20,24 +35,59 @@ class Purchase:
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM purchases ORDER BY date DESC')
-        purchases = []
-        
-        for row in cursor.fetchall():
-            purchase = Purchase(
-                id=row['id'],
-                user_id=row['user_id'],
-                total=row['total'],
-                iva=row['iva'],
-                shipping=row['shipping'],
-                date=row['date'],
-                invoice_number=row['invoice_number'],
-                supplier=row['supplier']
-            )
-            purchases.append(purchase)
+        purchases = [Purchase._from_row(row) for row in cursor.fetchall()]
         
         conn.close()
         return purchases
     
+    # Órdenes disponibles para list_query/query: (expresión, alias, descendente)
+    SORTS = {
+        'newest': [('date', 'date', True), ('id', 'id', True)],
+        'oldest': [('date', 'date', False), ('id', 'id', False)],
+    }
+    
+    @staticmethod
+    def list_query(start_date=None, end_date=None, supplier=None, invoice_number=None,
+                   user_id=None, sort='newest'):
+        """KeysetQuery de compras con los filtros en SQL (fechas: días inclusive)"""
+        conditions = Conditions()
+        conditions.date_range('date', start_date, end_date)
+        conditions.equals('supplier', supplier)
+        conditions.equals('invoice_number', invoice_number)
+        conditions.equals('user_id', user_id)
+        return KeysetQuery(
+            columns='*',
+            from_clause='purchases',
+            key=Purchase.SORTS[sort],
+            where=conditions.where,
+            params=conditions.params,
+        )
+    
+    @staticmethod
+    def query(limit=PAGE_SIZE, after=None, sort='newest', **filters):
+        """Página de compras filtradas; after es el next_token anterior"""
+        try:
+            return Purchase.list_query(sort=sort, **filters).page(limit, after, Purchase._from_row, sort)
+        except sqlite3.Error as e:
+            print(f"Error al consultar compras: {e}")
+            return Page([])
+    
+    @staticmethod
+    def get_by_id(purchase_id):
+        """Obtiene una compra por ID"""
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('SELECT * FROM purchases WHERE id = ?', (purchase_id,))
+            row = cursor.fetchone()
+            return Purchase._from_row(row) if row else None
+        except Exception as e:
+            print(f"Error al obtener compra por ID: {e}")
+            return None
+        finally:
+            conn.close()
+    
     def save(self):
         """Guarda la compra en la base de datos"""
         conn = get_connection()
@@ -50,7 +100,8 @@ class Purchase:
                                          date, invoice_number, supplier) 
                     VALUES (?, ?, ?, ?, ?, ?, ?)
                 ''', (self.user_id, self.total, self.iva, 
-                      self.shipping, self.date, self.invoice_number,
+                      self.shipping, self.date or datetime.now().strftime(TIMESTAMP_FORMAT),
+                      self.invoice_number,
                       self.supplier if self.supplier else "Sin proveedor"))
                 self.id = cursor.lastrowid
             else:
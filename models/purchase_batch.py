@@ -0,0 +1,116 @@
+"""
+Guardado de un lote de compras (una factura con varios productos) en una
+sola transacción.
+
+Todo el lote se escribe en un solo commit: productos nuevos, una fila de
+purchases por ítem, sus purchase_details, el costo de cada producto y los
+incrementos de stock. Si algo falla no queda nada a medio aplicar.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+
+from config.database import db_connection, TIMESTAMP_FORMAT
+from utils.events import event_bus, PURCHASE_BATCH_SAVED
+
+# Margen con el que se crea el precio de venta de un producto nuevo
+NEW_PRODUCT_MARKUP = 1.3
+# Máximo de parámetros por consulta IN (...)
+CHUNK_SIZE = 500
+
+
+def save_purchase_batch(items, user_id, freight_total=0.0, tax_total=0.0,
+                        invoice_number='', supplier="Sin proveedor"):
+    """
+    Guarda el lote y retorna {'lote_id', 'purchase_ids', 'product_ids',
+    'created_products'}. items: dicts con product_name, quantity,
+    unit_price y subtotal. El flete total se registra en el primer ítem;
+    el IVA se reparte en partes iguales. Lanza la excepción original (y no
+    guarda nada) si falla cualquier paso.
+    """
+    if not items:
+        raise ValueError("No hay artículos en el lote")
+
+    tax_per_item = tax_total / len(items)
+    lote_id = datetime.now().strftime("%Y%m%d%H%M%S")
+    date = datetime.now().strftime(TIMESTAMP_FORMAT)
+    names = [item['product_name'] for item in items]
+
+    with db_connection() as conn:
+        cursor = conn.cursor()
+
+        # 1. Productos: ids de los existentes y alta de los nuevos
+        product_ids = _product_ids(cursor, names)
+        missing = {}
+        for item in items:
+            if item['product_name'] not in product_ids:
+                missing.setdefault(item['product_name'], item['unit_price'] * NEW_PRODUCT_MARKUP)
+        if missing:
+            cursor.executemany(
+                'INSERT INTO products (name, price, stock) VALUES (?, ?, 0)',
+                list(missing.items())
+            )
+            product_ids.update(_product_ids(cursor, list(missing)))
+
+        # 2. Una compra por ítem (el flete total solo en el primero)
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM purchases')
+        last_id = cursor.fetchone()[0]
+        cursor.executemany('''
+            INSERT INTO purchases (user_id, total, iva, shipping, date, invoice_number,
+                                   supplier, lote_id, shipping_total)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (user_id,
+             item['subtotal'] + (freight_total if index == 0 else 0.0) + tax_per_item,
+             tax_per_item,
+             freight_total if index == 0 else 0.0,
+             date, invoice_number, supplier or "Sin proveedor", lote_id, freight_total)
+            for index, item in enumerate(items)
+        ])
+        cursor.execute('SELECT id FROM purchases WHERE id > ? AND lote_id = ? ORDER BY id',
+                       (last_id, lote_id))
+        purchase_ids = [row[0] for row in cursor.fetchall()]
+        if len(purchase_ids) != len(items):
+            raise RuntimeError("No se pudieron registrar todas las compras del lote")
+
+        # 3. Detalles, costos y stock
+        cursor.executemany('''
+            INSERT INTO purchase_details (purchase_id, product_id, quantity, unit_cost, unit_price, subtotal)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [
+            (purchase_id, product_ids[item['product_name']], item['quantity'],
+             item['unit_price'], item['unit_price'], item['subtotal'])
+            for purchase_id, item in zip(purchase_ids, items)
+        ])
+
+        # Si un producto aparece varias veces, queda el costo del último ítem
+        costs = {product_ids[item['product_name']]: item['unit_price'] for item in items}
+        cursor.executemany('UPDATE products SET cost_price = ? WHERE id = ?',
+                           [(cost, product_id) for product_id, cost in costs.items()])
+
+        stock = defaultdict(int)
+        for item in items:
+            stock[product_ids[item['product_name']]] += item['quantity']
+        cursor.executemany('UPDATE products SET stock = stock + ? WHERE id = ?',
+                           [(quantity, product_id) for product_id, quantity in stock.items()])
+
+    batch_product_ids = list(dict.fromkeys(product_ids[name] for name in names))
+    event_bus.publish(PURCHASE_BATCH_SAVED, purchases=purchase_ids, products=batch_product_ids)
+    return {
+        'lote_id': lote_id,
+        'purchase_ids': purchase_ids,
+        'product_ids': batch_product_ids,
+        'created_products': list(missing),
+    }
+
+
+def _product_ids(cursor, names):
+    """{nombre: id} de los productos con esos nombres"""
+    ids = {}
+    unique = list(dict.fromkeys(names))
+    for start in range(0, len(unique), CHUNK_SIZE):
+        chunk = unique[start:start + CHUNK_SIZE]
+        placeholders = ','.join('?' * len(chunk))
+        cursor.execute(f'SELECT id, name FROM products WHERE name IN ({placeholders})', chunk)
+        ids.update({row['name']: row['id'] for row in cursor.fetchall()})
+    return ids
@@ -0,0 +1,150 @@
+"""
+Caché de resultados de lecturas de los modelos.
+
+Varias ventanas llaman a los mismos métodos de lectura (Product.get_all,
+Client.get_all, Sale.get_filtered_sales...) con los mismos argumentos. Con
+@cached_query('tabla', ...) el resultado se guarda en memoria con la clave
+(método, argumentos) junto con la versión de cada tabla que lee. Las
+versiones son los contadores de table_versions, que los triggers suben en
+cada escritura (también las hechas con SQL directo desde las vistas o por
+otro proceso), así que una entrada sirve mientras sus tablas no cambien.
+Validar una entrada cuesta una sola consulta a table_versions.
+
+    @staticmethod
+    @cached_query('products')
+    def get_all():
+        ...
+
+Los aciertos devuelven copias (de la lista y de cada objeto), así que
+modificar lo recibido no altera la caché.
+"""
+
+import copy
+import functools
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from config.database import connection_manager, get_connection, get_table_versions
+
+# ── Configuración ────────────────────────────────────────────────────────────
+MAX_ENTRIES = 256
+
+
+class QueryCache:
+    """Caché LRU de resultados etiquetados con las versiones de sus tablas"""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.enabled = True
+        self._entries = OrderedDict()   # clave -> (versiones, resultado)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'bypassed': 0}
+
+    def get_or_load(self, key, tables, load):
+        """Resultado en caché para key si sus tablas no cambiaron; si no, load()"""
+        if not self.enabled:
+            return load()
+
+        versions, in_transaction = self._current_versions(tables)
+        if versions is None:
+            with self._lock:
+                self._stats['bypassed'] += 1
+            return load()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return _copy_result(entry[1])
+            if entry is not None:
+                del self._entries[key]
+                self._stats['stale'] += 1
+            self._stats['misses'] += 1
+
+        result = load()
+        # Con una escritura sin confirmar las versiones leídas podrían
+        # revertirse; el resultado no se guarda
+        if result is not None and not in_transaction:
+            with self._lock:
+                self._entries[key] = (versions, result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._stats['evictions'] += 1
+            return _copy_result(result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def get_stats(self):
+        """Aciertos, fallos, entradas obsoletas, desalojos y tasa de aciertos"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    @staticmethod
+    def _current_versions(tables):
+        """(versiones de las tablas, hay transacción abierta) o (None, _) si no hay contadores"""
+        conn = get_connection()
+        try:
+            versions = get_table_versions(conn.cursor())
+            in_transaction = conn.in_transaction
+        finally:
+            conn.close()
+        if not all(table in versions for table in tables):
+            return None, False
+        return tuple(versions[table] for table in tables), in_transaction
+
+
+# Filas inmutables que se pueden compartir sin copiar
+_IMMUTABLE = (sqlite3.Row, tuple, str, int, float, type(None))
+
+
+def _copy_item(item):
+    if isinstance(item, _IMMUTABLE):
+        return item
+    if hasattr(item, '__dict__') and not isinstance(item, type):
+        # Copia superficial de un objeto del modelo, más rápida que copy.copy
+        clone = object.__new__(item.__class__)
+        clone.__dict__.update(item.__dict__)
+        return clone
+    return copy.copy(item)
+
+
+def _copy_result(result):
+    if isinstance(result, list):
+        return [_copy_item(item) for item in result]
+    if isinstance(result, _IMMUTABLE):
+        return result
+    return copy.deepcopy(result)
+
+
+query_cache = QueryCache()
+
+
+def cached_query(*tables):
+    """Decorador: cachea el método según sus argumentos y las tablas que lee"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (connection_manager.db_path, func.__qualname__, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                return func(*args, **kwargs)   # Argumentos no hasheables: sin caché
+            return query_cache.get_or_load(key, tables, lambda: func(*args, **kwargs))
+        wrapper.uncached = func
+        return wrapper
+    return decorator
@@ -0,0 +1,132 @@
+"""
+Conciliación de deudas de clientes y estados de sus ventas.
+
+Recalcula en pocas sentencias y una sola transacción, para todos los
+clientes o para un conjunto de ids:
+
+1. total_debt de cada cliente: débitos menos abonos de client_transactions
+   (nunca negativa), o la deuda registrada si recompute_debts=False.
+2. paid_amount / remaining_debt / status de cada venta pendiente: la deuda
+   del cliente se asigna a sus ventas pendientes más recientes (los pagos
+   cubren primero las más antiguas, igual que models/payment_allocation.py)
+   con una suma acumulada (SUM() OVER) por cliente. Las ventas que la
+   deuda ya no alcanza quedan pagadas.
+
+Solo se escriben las filas que cambian, y se informa cuáles fueron.
+"""
+
+from config.database import db_connection
+from models.payment_allocation import EPSILON
+from utils.events import event_bus, PAYMENT_REGISTERED
+
+DEBTS_SQL = '''
+    INSERT INTO temp.reconcile_debts (client_id, old_debt, debt)
+    SELECT c.id, COALESCE(c.total_debt, 0),
+           {debt}
+    FROM clients c
+    LEFT JOIN (
+        SELECT client_id,
+               SUM(CASE WHEN transaction_type = 'debit' THEN amount
+                        WHEN transaction_type = 'credit' THEN -amount
+                        ELSE 0 END) AS balance
+        FROM client_transactions
+        GROUP BY client_id
+    ) t ON t.client_id = c.id
+    {scope}
+'''
+
+SALES_SQL = '''
+    INSERT INTO temp.reconcile_sales (id, client_id, old_status, paid_amount, remaining_debt, status)
+    SELECT id, client_id, status, total - outstanding, outstanding,
+           CASE WHEN outstanding > :epsilon THEN 'pending' ELSE 'paid' END
+    FROM (
+        SELECT s.id, s.client_id, s.status, s.total,
+               MAX(0, MIN(s.total, d.debt - (SUM(s.total) OVER (
+                   PARTITION BY s.client_id ORDER BY s.created_at DESC, s.id DESC
+                   ROWS UNBOUNDED PRECEDING) - s.total))) AS outstanding
+        FROM sales s
+        JOIN temp.reconcile_debts d ON d.client_id = s.client_id
+        WHERE s.status = 'pending'
+    ) AS balances
+'''
+
+
+def reconcile_clients(client_ids=None, recompute_debts=True):
+    """
+    Concilia deudas y ventas de los clientes indicados (todos si es None).
+    Retorna {'clients': revisados, 'debt_changes': [...], 'sale_changes': [...]},
+    donde cada cambio es un dict con el id y los valores anterior y nuevo.
+    Lanza la excepción original (sin guardar nada) si algo falla.
+    """
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        _create_work_tables(cursor)
+        try:
+            scope = ''
+            if client_ids is not None:
+                cursor.executemany('INSERT OR IGNORE INTO temp.reconcile_scope (client_id) VALUES (?)',
+                                   [(client_id,) for client_id in client_ids])
+                scope = 'WHERE c.id IN (SELECT client_id FROM temp.reconcile_scope)'
+            debt = 'MAX(0, COALESCE(t.balance, 0))' if recompute_debts else 'MAX(0, COALESCE(c.total_debt, 0))'
+            cursor.execute(DEBTS_SQL.format(debt=debt, scope=scope))
+            cursor.execute('SELECT COUNT(*) FROM temp.reconcile_debts')
+            checked = cursor.fetchone()[0]
+
+            # 1. Deudas
+            cursor.execute('''
+                SELECT client_id, old_debt, debt FROM temp.reconcile_debts
+                WHERE ABS(debt - old_debt) > ?
+            ''', (EPSILON,))
+            debt_changes = [{'client_id': row[0], 'old_debt': row[1], 'debt': row[2]}
+                            for row in cursor.fetchall()]
+            cursor.executemany('UPDATE clients SET total_debt = ? WHERE id = ?',
+                               [(change['debt'], change['client_id']) for change in debt_changes])
+
+            # 2. Ventas pendientes
+            cursor.execute(SALES_SQL, {'epsilon': EPSILON})
+            cursor.execute('''
+                SELECT r.id, r.client_id, r.old_status, r.status, r.paid_amount, r.remaining_debt
+                FROM temp.reconcile_sales r
+                JOIN sales s ON s.id = r.id
+                WHERE r.status != s.status
+                   OR ABS(r.paid_amount - COALESCE(s.paid_amount, 0)) > :epsilon
+                   OR ABS(r.remaining_debt - COALESCE(s.remaining_debt, 0)) > :epsilon
+            ''', {'epsilon': EPSILON})
+            sale_changes = [{'sale_id': row[0], 'client_id': row[1], 'old_status': row[2],
+                             'status': row[3], 'paid_amount': row[4], 'remaining_debt': row[5]}
+                            for row in cursor.fetchall()]
+            cursor.executemany('''
+                UPDATE sales SET status = ?, paid_amount = ?, remaining_debt = ? WHERE id = ?
+            ''', [(change['status'], change['paid_amount'], change['remaining_debt'], change['sale_id'])
+                  for change in sale_changes])
+        finally:
+            _drop_work_tables(cursor)
+
+    if debt_changes or sale_changes:
+        event_bus.publish(
+            PAYMENT_REGISTERED,
+            clients={change['client_id'] for change in debt_changes + sale_changes},
+            sales=[change['sale_id'] for change in sale_changes],
+        )
+    return {'clients': checked, 'debt_changes': debt_changes, 'sale_changes': sale_changes}
+
+
+def _create_work_tables(cursor):
+    _drop_work_tables(cursor)
+    cursor.execute('CREATE TEMP TABLE reconcile_scope (client_id INTEGER PRIMARY KEY)')
+    cursor.execute('''
+        CREATE TEMP TABLE reconcile_debts (
+            client_id INTEGER PRIMARY KEY, old_debt REAL, debt REAL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TEMP TABLE reconcile_sales (
+            id INTEGER PRIMARY KEY, client_id INTEGER, old_status TEXT,
+            paid_amount REAL, remaining_debt REAL, status TEXT
+        )
+    ''')
+
+
+def _drop_work_tables(cursor):
+    for table in ('reconcile_scope', 'reconcile_debts', 'reconcile_sales'):
+        cursor.execute(f'DROP TABLE IF EXISTS temp.{table}')
@@ -1,5 +1,9 @@
-from config.database import get_connection
+from config.database import get_connection, day_range
+from models.pagination import KeysetQuery, Conditions, Page, PAGE_SIZE
+from models.query_cache import cached_query
+from utils.events import event_bus, SALE_SAVED, PAYMENT_REGISTERED
 from datetime import datetime
+import sqlite3
 
 # Importaciones condicionales para evitar errores
 try:
@@ -92,6 +96,8 @@ class Sale:
                 ''', (self.total, self.client_id))
 
             conn.commit()
+            event_bus.publish(SALE_SAVED, sales=[self.id], clients=[self.client_id],
+                              products=[item.get('product_id') for item in self.items])
             return True
         except Exception as e:
             conn.rollback()
@@ -146,6 +152,7 @@ class Sale:
             ))
 
             conn.commit()
+            event_bus.publish(PAYMENT_REGISTERED, sales=[self.id], clients=[self.client_id])
             return True
         except Exception as e:
             conn.rollback()
@@ -177,6 +184,72 @@ class Sale:
         except (KeyError, IndexError, TypeError):
             return default
     
+    @staticmethod
+    def _from_row(row):
+        """Crea una venta desde una fila de sales (+ client_name)"""
+        # Usar acceso seguro a Row
+        status = Sale._safe_get(row, 'status', 'paid')
+        if not status:
+            status = 'pending' if row['client_id'] else 'paid'
+        
+        # Método de pago
+        payment_method = (Sale._safe_get(row, 'payment_method') or 
+                        Sale._safe_get(row, 'payment_type') or 'cash')
+        
+        return Sale(
+            id=row['id'],
+            client_id=row['client_id'],
+            client_name=Sale._safe_get(row, 'client_name'),
+            total=row['total'],
+            payment_method=payment_method,
+            notes=Sale._safe_get(row, 'notes'),
+            created_at=row['created_at'],
+            user_id=Sale._safe_get(row, 'user_id'),
+            status=status,
+            paid_amount=Sale._safe_get(row, 'paid_amount', 0),
+            remaining_debt=Sale._safe_get(row, 'remaining_debt', 0),
+            adjustment=Sale._safe_get(row, 'adjustment', 0.0),
+            adjustment_reason=Sale._safe_get(row, 'adjustment_reason')
+        )
+    
+    # Órdenes disponibles para list_query/query: (expresión, alias, descendente)
+    SORTS = {
+        'newest': [('s.created_at', 'created_at', True), ('s.id', 'id', True)],
+        'oldest': [('s.created_at', 'created_at', False), ('s.id', 'id', False)],
+    }
+    
+    @staticmethod
+    def list_query(start_date=None, end_date=None, client_id=None, status=None,
+                   payment_method=None, sort='newest'):
+        """
+        KeysetQuery de ventas (s.* + client_name) con los filtros en SQL.
+        Las fechas son días inclusive ('YYYY-MM-DD', date o datetime).
+        """
+        conditions = Conditions()
+        conditions.date_range('s.created_at', start_date, end_date)
+        conditions.equals('s.client_id', client_id)
+        conditions.equals('s.status', status)
+        conditions.equals('s.payment_method', payment_method)
+        return KeysetQuery(
+            columns='s.*, c.name as client_name',
+            from_clause='sales s LEFT JOIN clients c ON s.client_id = c.id',
+            key=Sale.SORTS[sort],
+            where=conditions.where,
+            params=conditions.params,
+        )
+    
+    @staticmethod
+    def query(limit=PAGE_SIZE, after=None, sort='newest', **filters):
+        """
+        Página de ventas filtradas (ver list_query). after es el
+        next_token de la página anterior. Retorna un Page de Sale.
+        """
+        try:
+            return Sale.list_query(sort=sort, **filters).page(limit, after, Sale._from_row, sort)
+        except sqlite3.Error as e:
+            print(f"Error al consultar ventas: {e}")
+            return Page([])
+    
     @staticmethod
     def get_all():
         """Obtiene todas las ventas con información completa - CORREGIDO"""
@@ -191,33 +264,7 @@ class Sale:
                 ORDER BY s.created_at DESC
             ''')
             
-            sales = []
-            for row in cursor.fetchall():
-                # Usar acceso seguro a Row
-                status = Sale._safe_get(row, 'status', 'paid')
-                if not status:
-                    status = 'pending' if row['client_id'] else 'paid'
-                
-                # Método de pago
-                payment_method = (Sale._safe_get(row, 'payment_method') or 
-                                Sale._safe_get(row, 'payment_type') or 'cash')
-                
-                sale = Sale(
-                    id=row['id'],
-                    client_id=row['client_id'],
-                    client_name=Sale._safe_get(row, 'client_name'),
-                    total=row['total'],
-                    payment_method=payment_method,
-                    notes=Sale._safe_get(row, 'notes'),
-                    created_at=row['created_at'],
-                    user_id=Sale._safe_get(row, 'user_id'),
-                    status=status,
-                    paid_amount=Sale._safe_get(row, 'paid_amount', 0),
-                    remaining_debt=Sale._safe_get(row, 'remaining_debt', 0),
-                    adjustment=Sale._safe_get(row, 'adjustment', 0.0),
-                    adjustment_reason=Sale._safe_get(row, 'adjustment_reason')
-                )
-                sales.append(sale)
+            sales = [Sale._from_row(row) for row in cursor.fetchall()]
             
             return sales
             
@@ -245,28 +292,7 @@ class Sale:
             
             row = cursor.fetchone()
             if row:
-                status = Sale._safe_get(row, 'status', 'paid')
-                if not status:
-                    status = 'pending' if row['client_id'] else 'paid'
-                
-                payment_method = (Sale._safe_get(row, 'payment_method') or 
-                                Sale._safe_get(row, 'payment_type') or 'cash')
-                
-                return Sale(
-                    id=row['id'],
-                    client_id=row['client_id'],
-                    client_name=Sale._safe_get(row, 'client_name'),
-                    total=row['total'],
-                    payment_method=payment_method,
-                    notes=Sale._safe_get(row, 'notes'),
-                    created_at=row['created_at'],
-                    user_id=Sale._safe_get(row, 'user_id'),
-                    status=status,
-                    paid_amount=Sale._safe_get(row, 'paid_amount', 0),
-                    remaining_debt=Sale._safe_get(row, 'remaining_debt', 0),
-                    adjustment=Sale._safe_get(row, 'adjustment', 0.0),
-                    adjustment_reason=Sale._safe_get(row, 'adjustment_reason')
-                )
+                return Sale._from_row(row)
             return None
         except Exception as e:
             print(f"Error al obtener venta por ID: {e}")
@@ -295,13 +321,14 @@ class Sale:
         cursor = conn.cursor()
         
         try:
+            range_start, range_end = day_range(start_date, end_date)
             cursor.execute('''
                 SELECT s.*, c.name as client_name
                 FROM sales s
                 LEFT JOIN clients c ON s.client_id = c.id
-                WHERE DATE(s.created_at) BETWEEN ? AND ?
+                WHERE s.created_at >= ? AND s.created_at < ?
                 ORDER BY s.created_at DESC
-            ''', (start_date, end_date))
+            ''', (range_start, range_end))
             
             sales = []
             for row in cursor.fetchall():
@@ -367,6 +394,7 @@ class Sale:
             conn.close()
     
     @staticmethod
+    @cached_query('sales', 'clients')
     def get_filtered_sales(start_date=None, end_date=None, client_id=None, status=None, payment_method=None):
         """Obtiene ventas filtradas por múltiples criterios - CORREGIDO"""
         conn = get_connection()
@@ -382,12 +410,12 @@ class Sale:
             params = []
             
             if start_date:
-                query += ' AND DATE(s.created_at) >= ?'
-                params.append(start_date)
+                query += ' AND s.created_at >= ?'
+                params.append(day_range(start_date)[0])
             
             if end_date:
-                query += ' AND DATE(s.created_at) <= ?'
-                params.append(end_date)
+                query += ' AND s.created_at < ?'
+                params.append(day_range(end_date)[1])
             
             if client_id:
                 query += ' AND s.client_id = ?'
@@ -0,0 +1,62 @@
+"""
+Fixtures compartidas de los tests.
+
+db apunta la aplicación (connection_manager) a una base nueva en una
+carpeta temporal, con init_database aplicado, y al terminar la devuelve a
+la base de siempre.
+"""
+
+import pytest
+
+from config.database import connection_manager, init_database
+from utils.paths import get_db_path
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Ruta de una BD temporal inicializada; el pool de conexiones apunta a ella"""
+    ruta = str(tmp_path / 'tienda.db')
+    connection_manager.close_all(ruta)
+    try:
+        init_database()
+        yield ruta
+    finally:
+        connection_manager.close_all(get_db_path())
+
+
+@pytest.fixture
+def crear_cliente(db):
+    """
+    crear_cliente(conn, nombre, totales, deuda=None, pagado=None): cliente
+    con una venta pendiente por cada total (de la más antigua a la más
+    nueva, un día de diferencia). deuda: total_debt (por defecto, la suma de
+    los saldos). Retorna (id del cliente, ids de las ventas).
+    """
+    def crear(conn, nombre, totales, deuda=None, pagado=None):
+        pagado = pagado or [0.0] * len(totales)
+        saldo = sum(total - abono for total, abono in zip(totales, pagado))
+        cursor = conn.execute('INSERT INTO clients (name, total_debt) VALUES (?, ?)',
+                              (nombre, saldo if deuda is None else deuda))
+        client_id = cursor.lastrowid
+        ventas = []
+        for dia, (total, abono) in enumerate(zip(totales, pagado), start=1):
+            cursor = conn.execute('''
+                INSERT INTO sales (client_id, total, paid_amount, remaining_debt, status, created_at)
+                VALUES (?, ?, ?, ?, 'pending', ?)
+            ''', (client_id, total, abono, total - abono, f'2024-03-{dia:02d} 10:00:00'))
+            ventas.append(cursor.lastrowid)
+        return client_id, ventas
+    return crear
+
+
+@pytest.fixture
+def estado_ventas(db):
+    """estado_ventas(conn, ids) -> {id: (paid_amount, remaining_debt, status)}"""
+    def estado(conn, ids):
+        placeholders = ','.join('?' * len(ids))
+        rows = conn.execute(f'''
+            SELECT id, paid_amount, remaining_debt, status FROM sales WHERE id IN ({placeholders})
+        ''', ids).fetchall()
+        return {row['id']: (round(row['paid_amount'], 2), round(row['remaining_debt'], 2), row['status'])
+                for row in rows}
+    return estado
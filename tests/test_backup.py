@@ -0,0 +1,31 @@
+"""Copias de seguridad en línea (utils/backup.py)"""
+
+import sqlite3
+
+from utils import backup
+
+
+def test_copia_termina_con_escrituras_constantes(tmp_path, monkeypatch):
+    """Una escritura confirmada en cada paso: tras MAX_REINICIOS reinicios copia en un solo paso"""
+    origen, destino = tmp_path / "origen.db", tmp_path / "destino.db"
+    escritor = sqlite3.connect(origen)
+    escritor.execute("PRAGMA journal_mode=WAL")
+    escritor.execute("CREATE TABLE datos (valor TEXT)")
+    escritor.executemany("INSERT INTO datos VALUES (?)", [("x" * 500,)] * 2000)
+    escritor.commit()
+
+    mensajes = []
+
+    def progreso(fraccion, mensaje):
+        mensajes.append(mensaje)
+        escritor.execute("INSERT INTO datos VALUES ('nuevo')")
+        escritor.commit()
+
+    monkeypatch.setattr(backup, 'PAGINAS_POR_PASO', 50)
+    try:
+        backup.exportar_db_segura(origen, destino, progreso)
+    finally:
+        escritor.close()
+
+    assert any("un solo paso" in mensaje for mensaje in mensajes)
+    assert backup.verificar_integridad(destino, completa=True)
@@ -0,0 +1,32 @@
+"""
+Capa de datos contra la línea base guardada (benchmark_baseline.json).
+
+El número de consultas de cada operación es determinista y se compara
+siempre. La latencia depende de la máquina: solo se compara con
+BENCHMARK_LATENCY=1 (BENCHMARK_TOLERANCE ajusta su tolerancia).
+"""
+
+import os
+
+import pytest
+
+import benchmark_suite
+
+LATENCIA = os.environ.get('BENCHMARK_LATENCY', '').strip().lower() in ('1', 'true', 'yes', 'si', 'sí')
+
+
+def _regresiones(latencia):
+    tolerance = os.environ.get('BENCHMARK_TOLERANCE')
+    rows, fallas = benchmark_suite.check_baseline(
+        tolerance=float(tolerance) if tolerance else None, check_latency=latencia)
+    benchmark_suite.print_comparison(rows)
+    return fallas
+
+
+def test_consultas_sin_regresiones():
+    assert _regresiones(latencia=False) == []
+
+
+@pytest.mark.skipif(not LATENCIA, reason="Comparación de latencia desactivada (BENCHMARK_LATENCY=1 para activarla)")
+def test_latencia_sin_regresiones():
+    assert _regresiones(latencia=True) == []
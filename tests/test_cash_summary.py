@@ -0,0 +1,63 @@
+"""Resumen diario de caja mantenido por triggers (config/database.py)"""
+
+from config.database import db_connection, rebuild_daily_cash_summary
+
+
+def _resumen(conn):
+    """Filas de daily_cash_summary sin los días que los triggers dejaron en cero"""
+    rows = conn.execute('''
+        SELECT fecha, total_contado, num_ventas, total_abonos, num_abonos
+        FROM daily_cash_summary ORDER BY fecha
+    ''').fetchall()
+    return [(row[0], round(row[1], 2), row[2], round(row[3], 2), row[4])
+            for row in rows if any(row[1:])]
+
+
+def _igual_a_recalcular(conn):
+    """El resumen de los triggers coincide con rebuild_daily_cash_summary"""
+    por_triggers = _resumen(conn)
+    rebuild_daily_cash_summary(conn.cursor())
+    return por_triggers == _resumen(conn)
+
+
+def _venta(conn, total, fecha, metodo='cash', estado='paid'):
+    return conn.execute('''
+        INSERT INTO sales (total, payment_method, status, paid_amount, created_at) VALUES (?, ?, ?, ?, ?)
+    ''', (total, metodo, estado, total if estado == 'paid' else 0, fecha)).lastrowid
+
+
+def _movimiento(conn, cliente, tipo, monto, fecha):
+    return conn.execute('''
+        INSERT INTO client_transactions (client_id, transaction_type, amount, description, created_at)
+        VALUES (?, ?, ?, 'prueba', ?)
+    ''', (cliente, tipo, monto, fecha)).lastrowid
+
+
+def test_triggers_igual_a_recalcular(db):
+    with db_connection() as conn:
+        cliente = conn.execute("INSERT INTO clients (name) VALUES ('Caja')").lastrowid
+
+        # Altas: contado, fiado (no cuenta), abonos y crédito a favor
+        v1 = _venta(conn, 100.0, '2024-03-01 09:00:00')
+        v2 = _venta(conn, 50.0, '2024-03-01 18:30:00')
+        _venta(conn, 70.0, '2024-03-01 12:00:00', metodo='credit', estado='pending')
+        a1 = _movimiento(conn, cliente, 'credit', -30.0, '2024-03-01 11:00:00')
+        a2 = _movimiento(conn, cliente, 'credit', 20.0, '2024-03-02 10:00:00')
+        _movimiento(conn, cliente, 'credit_balance', 15.0, '2024-03-02 10:00:00')
+        _movimiento(conn, cliente, 'debit', 70.0, '2024-03-01 12:00:00')
+        assert _igual_a_recalcular(conn)
+        assert _resumen(conn) == [('2024-03-01', 150.0, 2, 30.0, 1), ('2024-03-02', 0.0, 0, 35.0, 2)]
+
+        # Cambios de monto, de fecha y de tipo
+        conn.execute('UPDATE sales SET total = 120 WHERE id = ?', (v1,))
+        conn.execute("UPDATE sales SET created_at = '2024-03-03 08:00:00' WHERE id = ?", (v2,))
+        conn.execute("UPDATE sales SET status = 'pending' WHERE id = ?", (v1,))
+        conn.execute('UPDATE client_transactions SET amount = -45 WHERE id = ?', (a1,))
+        conn.execute("UPDATE client_transactions SET created_at = '2024-03-03 09:00:00' WHERE id = ?", (a2,))
+        assert _igual_a_recalcular(conn)
+
+        # Bajas
+        conn.execute('DELETE FROM sales WHERE id IN (?, ?)', (v1, v2))
+        conn.execute('DELETE FROM client_transactions WHERE id = ?', (a1,))
+        assert _igual_a_recalcular(conn)
+        assert _resumen(conn) == [('2024-03-02', 0.0, 0, 15.0, 1), ('2024-03-03', 0.0, 0, 20.0, 1)]
@@ -0,0 +1,119 @@
+"""Pool de conexiones por hilo (config/database.py, ConnectionManager)"""
+
+import sqlite3
+
+import pytest
+
+from config.database import connection_manager, db_connection, get_connection
+
+
+def _gastos(ruta):
+    """Descripciones guardadas en disco, leídas con una conexión aparte del pool"""
+    conn = sqlite3.connect(ruta)
+    try:
+        return sorted(row[0] for row in conn.execute('SELECT description FROM expenses'))
+    finally:
+        conn.close()
+
+
+def _gasto(conn, descripcion):
+    conn.execute('INSERT INTO expenses (description, amount, date) VALUES (?, 1, ?)',
+                 (descripcion, '2024-03-01 10:00:00'))
+
+
+def test_reutiliza_la_conexion_del_hilo(db):
+    antes = connection_manager.get_stats()
+    primera = get_connection()
+    segunda = get_connection()
+    try:
+        assert primera._conn is segunda._conn
+        assert connection_manager._local.depth == 2
+    finally:
+        segunda.close()
+        primera.close()
+    assert connection_manager._local.depth == 0
+    assert connection_manager.get_stats()['reused'] == antes['reused'] + 2
+    assert connection_manager.get_stats()['opened'] == antes['opened']
+
+
+def test_close_es_idempotente(db):
+    conn = get_connection()
+    conn.close()
+    conn.close()
+    assert connection_manager._local.depth == 0
+
+
+def test_soltar_el_ultimo_prestamo_descarta_lo_no_confirmado(db):
+    conn = get_connection()
+    _gasto(conn, 'sin commit')
+    conn.close()
+    assert _gastos(db) == []
+
+
+def test_bloque_confirma_al_salir_sin_errores(db):
+    with db_connection() as conn:
+        _gasto(conn, 'luz')
+    assert _gastos(db) == ['luz']
+
+
+def test_bloque_deshace_si_hay_excepcion(db):
+    with pytest.raises(ValueError):
+        with db_connection() as conn:
+            _gasto(conn, 'luz')
+            raise ValueError('falla')
+    assert _gastos(db) == []
+    assert connection_manager._local.depth == 0
+
+
+def test_bloque_anidado_con_error_solo_deshace_lo_suyo(db):
+    with db_connection() as conn:
+        _gasto(conn, 'exterior')
+        with pytest.raises(ValueError):
+            with db_connection() as interno:
+                _gasto(interno, 'interior')
+                raise ValueError('falla')
+        assert _gastos(db) == []  # Nada confirmado antes que el bloque exterior
+    assert _gastos(db) == ['exterior']
+
+
+def test_commit_y_rollback_de_un_prestamo_anidado_no_tocan_el_bloque_exterior(db):
+    with pytest.raises(ValueError):
+        with db_connection() as conn:
+            _gasto(conn, 'exterior')
+            interno = get_connection()
+            _gasto(interno, 'interior')
+            interno.commit()
+            _gasto(interno, 'descartado')
+            interno.rollback()
+            interno.close()
+            assert _gastos(db) == []
+            raise ValueError('falla')
+    assert _gastos(db) == []
+
+    with db_connection() as conn:
+        interno = get_connection()
+        _gasto(interno, 'interior')
+        interno.commit()
+        interno.close()
+    assert _gastos(db) == ['interior']
+
+
+def test_close_all_cambia_de_base(db, tmp_path):
+    otra = str(tmp_path / 'otra.db')
+    conn = get_connection()
+    vieja = conn._conn
+    conn.close()
+
+    connection_manager.close_all(otra)
+    assert connection_manager.db_path == otra
+    assert connection_manager.get_stats()['active'] == 0
+    with db_connection() as conn:
+        assert conn._conn is not vieja
+        conn.execute('CREATE TABLE prueba (id INTEGER)')
+    with pytest.raises(sqlite3.ProgrammingError):
+        vieja.execute('SELECT 1')
+    externa = sqlite3.connect(otra)
+    try:
+        assert externa.execute("SELECT name FROM sqlite_master WHERE name = 'prueba'").fetchone()
+    finally:
+        externa.close()
@@ -0,0 +1,90 @@
+"""Vigilante de cambios externos (utils/db_watcher.py)"""
+
+import sqlite3
+
+import pytest
+
+from config.database import LOCAL_WRITER, db_connection, forget_local_writes, prune_table_writes
+from utils.db_watcher import DatabaseWatcher
+from utils.events import EventBus, PAYMENT_REGISTERED
+
+
+class _RaizSinPantalla:
+    """Sustituto de la ventana principal: no programa sondeos, el test llama a check()"""
+
+    def after(self, ms, func):
+        return None
+
+    def after_cancel(self, job):
+        pass
+
+
+@pytest.fixture
+def bus():
+    return EventBus()
+
+
+@pytest.fixture
+def vigilante(db, bus):
+    vigilante = DatabaseWatcher(db_path=db, bus=bus)
+    assert vigilante.start(_RaizSinPantalla())
+    yield vigilante
+    vigilante.stop()
+
+
+@pytest.fixture
+def externa(db):
+    """Conexión sin los triggers TEMP del pool: sus escrituras cuentan como de otro proceso"""
+    conn = sqlite3.connect(db)
+    yield conn
+    conn.close()
+
+
+def test_escritura_propia_no_se_anuncia(vigilante):
+    with db_connection() as conn:
+        conn.execute("INSERT INTO products (name, price, stock) VALUES ('Local', 1, 1)")
+    assert vigilante.check() == set()
+
+
+def test_escritura_externa_se_anuncia(vigilante, externa):
+    externa.execute("INSERT INTO products (name, price, stock) VALUES ('Externa', 1, 1)")
+    externa.commit()
+    assert vigilante.check() == {'products'}
+
+
+def test_escrituras_propia_y_externa_en_la_misma_tabla(vigilante, externa):
+    with db_connection() as conn:
+        conn.execute("INSERT INTO products (name, price, stock) VALUES ('Local', 1, 1)")
+    externa.execute("INSERT INTO products (name, price, stock) VALUES ('Externa', 1, 1)")
+    externa.commit()
+    with db_connection() as conn:
+        conn.execute("UPDATE products SET stock = 6 WHERE name = 'Local'")
+    assert vigilante.check() == {'products'}
+
+
+def test_rollback_y_anuncio_sin_escritura_no_ocultan_cambios(vigilante, externa, bus):
+    with pytest.raises(RuntimeError):
+        with db_connection() as conn:
+            conn.execute("UPDATE products SET stock = 0")
+            raise RuntimeError("rollback")
+    bus.publish(PAYMENT_REGISTERED, clients=[1])  # Anuncio propio sin escritura
+    externa.execute("INSERT INTO clients (name) VALUES ('Externo')")
+    externa.commit()
+    assert vigilante.check() == {'clients'}
+
+
+def test_limpieza_de_contadores_de_escritura(db):
+    """Al arrancar se descartan los de otros procesos; al salir, los propios"""
+    with db_connection() as conn:
+        conn.execute("INSERT INTO products (name, price, stock) VALUES ('Local', 1, 1)")
+        conn.execute("INSERT INTO table_writes (writer, name, version) VALUES (-1, 'products', 7)")
+
+    def escritores():
+        with db_connection() as conn:
+            return {row[0] for row in conn.execute('SELECT writer FROM table_writes')}
+
+    assert escritores() == {LOCAL_WRITER, -1}
+    assert prune_table_writes() == 1
+    assert escritores() == {LOCAL_WRITER}
+    forget_local_writes()
+    assert escritores() == set()
@@ -0,0 +1,36 @@
+"""Guardado de gastos (models/expense.py)"""
+
+from datetime import date, datetime
+
+from models.expense import Expense
+
+
+def test_guarda_categoria_y_filtra_por_ella(db):
+    luz = Expense(description='Luz', amount=30.0, date=datetime(2024, 3, 1, 9, 30), category='Servicios')
+    renta = Expense(description='Renta', amount=200.0, date=date(2024, 3, 2), category='Local')
+    assert luz.save() and renta.save()
+
+    assert [gasto.id for gasto in Expense.query(category='Servicios')] == [luz.id]
+    assert Expense.get_by_id(renta.id).category == 'Local'
+
+    renta.category = 'Servicios'
+    assert renta.save()
+    assert [gasto.id for gasto in Expense.query(category='Servicios')] == [renta.id, luz.id]
+    assert Expense.get_by_id(renta.id).date == datetime(2024, 3, 2)
+
+
+def test_fecha_como_texto(db):
+    gasto = Expense(description='Agua', amount=12.0, date='2024-03-05T08:15:00', category='Servicios')
+    assert gasto.save()
+    assert Expense.get_by_id(gasto.id).date == datetime(2024, 3, 5, 8, 15)
+
+    gasto.date = '2024-03-06'
+    assert gasto.save()
+    assert [g.id for g in Expense.query(start_date='2024-03-06', end_date='2024-03-06')] == [gasto.id]
+
+
+def test_fecha_invalida_no_guarda(db):
+    gasto = Expense(description='Agua', amount=12.0, date='ayer')
+    assert not gasto.save()
+    assert gasto.id is None
+    assert list(Expense.query()) == []
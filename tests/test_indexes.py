@@ -0,0 +1,9 @@
+"""Índices secundarios: las consultas calientes los usan (EXPLAIN QUERY PLAN)"""
+
+from config.database import verify_index_usage
+
+
+def test_consultas_calientes_usan_sus_indices(db):
+    sin_indice = [f"{description}: no usa {index_name} ({'; '.join(plan)})"
+                  for description, index_name, ok, plan in verify_index_usage() if not ok]
+    assert sin_indice == []
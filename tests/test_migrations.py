@@ -0,0 +1,119 @@
+"""Registro de migraciones (config/migrations.py)"""
+
+import sqlite3
+
+import pytest
+
+from config import migrations
+from config.database import connection_manager, db_connection, get_table_versions
+from utils.paths import get_db_path
+
+# Esquema de una base creada por una versión anterior al registro de migraciones
+ESQUEMA_ANTERIOR = '''
+    CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL,
+                        password TEXT NOT NULL, role TEXT NOT NULL DEFAULT 'employee');
+    CREATE TABLE products (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL,
+                           price REAL NOT NULL, stock INTEGER DEFAULT 0, cost_price REAL DEFAULT 0.0);
+    CREATE TABLE clients (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL,
+                          total_debt REAL DEFAULT 0.0, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+    CREATE TABLE client_transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, client_id INTEGER NOT NULL,
+                                      transaction_type TEXT NOT NULL, amount REAL NOT NULL,
+                                      description TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+    CREATE TABLE sales (id INTEGER PRIMARY KEY AUTOINCREMENT, client_id INTEGER, total REAL NOT NULL,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+    CREATE TABLE sale_details (id INTEGER PRIMARY KEY AUTOINCREMENT, sale_id INTEGER NOT NULL,
+                               product_id INTEGER NOT NULL, quantity REAL NOT NULL,
+                               unit_price REAL NOT NULL, subtotal REAL NOT NULL);
+    CREATE TABLE purchases (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, total REAL NOT NULL,
+                            iva REAL DEFAULT 0.0, shipping REAL DEFAULT 0.0, date TEXT,
+                            invoice_number TEXT, supplier TEXT);
+    CREATE TABLE expenses (id INTEGER PRIMARY KEY AUTOINCREMENT, description TEXT NOT NULL,
+                           amount REAL NOT NULL, category TEXT, user_id INTEGER,
+                           created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+
+    INSERT INTO products (name, price) VALUES ('Pan', 3);
+    INSERT INTO sales (id, total, created_at) VALUES (1, 6, '2024-01-01 09:00:00');
+    INSERT INTO sale_details (sale_id, product_id, quantity, unit_price, subtotal) VALUES (1, 1, 2, 3, 6);
+    INSERT INTO expenses (description, amount, created_at) VALUES ('Luz', 50, '2024-01-02 08:00:00');
+    -- Flete registrado por ítem: tres compras de una misma factura y una suelta
+    INSERT INTO purchases (total, shipping, date) VALUES (100, 15, '2024-01-01 10:00:00');
+    INSERT INTO purchases (total, shipping, date) VALUES (100, 15, '2024-01-01 10:00:05');
+    INSERT INTO purchases (total, shipping, date) VALUES (100, 15, '2024-01-01 10:00:08');
+    INSERT INTO purchases (total, shipping, date) VALUES (100, 20, '2024-01-01 12:00:00');
+'''
+
+
+@pytest.fixture
+def base_anterior(tmp_path):
+    """Base con ESQUEMA_ANTERIOR y user_version 0; el pool de conexiones apunta a ella"""
+    ruta = str(tmp_path / 'anterior.db')
+    conn = sqlite3.connect(ruta)
+    conn.executescript(ESQUEMA_ANTERIOR)
+    conn.close()
+    connection_manager.close_all(ruta)
+    try:
+        yield ruta
+    finally:
+        connection_manager.close_all(get_db_path())
+
+
+def _version():
+    with db_connection() as conn:
+        return migrations.get_schema_version(conn.cursor())
+
+
+def test_migra_una_base_anterior(base_anterior):
+    aplicados = migrations.run_migrations()
+    assert [paso for paso in aplicados if isinstance(paso, int)] == [version for version, _, _ in migrations.MIGRATIONS]
+    assert _version() == migrations.SCHEMA_VERSION
+    with db_connection() as conn:
+        columnas = {row[1] for row in conn.execute('PRAGMA table_info(sales)')}
+        assert [column for table, column, _ in migrations.LEGACY_COLUMNS
+                if table == 'sales' and column not in columnas] == []
+        assert conn.execute('SELECT status FROM sales').fetchone()[0] == 'paid'
+        assert conn.execute('SELECT sale_price FROM sale_details').fetchone()[0] == 3.0
+        assert conn.execute('SELECT date FROM expenses').fetchone()[0] == '2024-01-02 08:00:00'
+        # Flete total del lote en la primera compra y shipping_total en todas
+        assert [tuple(row) for row in conn.execute(
+            'SELECT lote_id, shipping, shipping_total FROM purchases ORDER BY id')] == [
+            ('20240101100000', 45.0, 45.0), ('20240101100000', 0.0, 45.0),
+            ('20240101100000', 0.0, 45.0), ('20240101120000', 20.0, 20.0),
+        ]
+
+
+def test_segunda_ejecucion_no_hace_nada(base_anterior):
+    migrations.run_migrations()
+    with db_connection() as conn:
+        versiones = get_table_versions(conn.cursor())
+    assert migrations.run_migrations() == []
+    with db_connection() as conn:
+        assert get_table_versions(conn.cursor()) == versiones
+
+
+def test_paso_fallido_se_revierte_y_se_reanuda(db, monkeypatch):
+    base = migrations.SCHEMA_VERSION
+
+    def crear(tabla):
+        return lambda cursor: cursor.execute(f'CREATE TABLE {tabla} (id INTEGER)')
+
+    def falla(cursor):
+        cursor.execute('CREATE TABLE prueba_b (id INTEGER)')
+        raise RuntimeError("falla de prueba")
+
+    monkeypatch.setattr(migrations, 'MIGRATIONS', migrations.MIGRATIONS + [
+        (base + 1, "Prueba A", crear('prueba_a')),
+        (base + 2, "Prueba B", falla),
+        (base + 3, "Prueba C", crear('prueba_c')),
+    ])
+    monkeypatch.setattr(migrations, 'SCHEMA_VERSION', base + 3)
+
+    assert migrations.run_migrations() == [base + 1]
+    assert _version() == base + 1
+    with db_connection() as conn:
+        tablas = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert tablas & {'prueba_a', 'prueba_b', 'prueba_c'} == {'prueba_a'}
+
+    migrations.MIGRATIONS[-2] = (base + 2, "Prueba B", crear('prueba_b'))
+    assert migrations.run_migrations() == [base + 2, base + 3]
+    assert _version() == base + 3
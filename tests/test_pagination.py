@@ -0,0 +1,38 @@
+"""Paginación por clave (models/pagination.py) sobre los modelos"""
+
+import pytest
+
+from config.database import db_connection
+from config.migrations import run_migrations
+from models.expense import Expense
+from models.purchase import Purchase
+
+
+def _recorrer(modelo, orden, limite=2):
+    """Ids de todas las páginas, siguiendo next_token"""
+    vistos, token = [], None
+    while True:
+        pagina = modelo.query(limit=limite, after=token, sort=orden)
+        vistos.extend(item.id for item in pagina)
+        token = pagina.next_token
+        if token is None:
+            return vistos
+
+
+@pytest.fixture
+def fechas_nulas(db):
+    """Gastos y compras de versiones anteriores con date NULL, migrados"""
+    with db_connection() as conn:
+        for i in range(5):
+            fecha = f'2024-01-0{i + 1} 10:00:00' if i % 2 else None
+            conn.execute('INSERT INTO expenses (description, amount, date, created_at) VALUES (?, 1, ?, ?)',
+                         (f'Gasto {i}', fecha, None if i == 0 else '2023-12-31 09:00:00'))
+            conn.execute('INSERT INTO purchases (total, date) VALUES (1, ?)', (fecha,))
+        conn.execute('PRAGMA user_version = 5')
+    run_migrations()
+
+
+@pytest.mark.parametrize('modelo', [Expense, Purchase])
+@pytest.mark.parametrize('orden', ['newest', 'oldest'])
+def test_paginas_incluyen_filas_con_fecha_nula(fechas_nulas, modelo, orden):
+    assert sorted(_recorrer(modelo, orden)) == [1, 2, 3, 4, 5]
@@ -0,0 +1,86 @@
+"""Reparto FIFO de pagos de clientes (models/payment_allocation.py)"""
+
+from datetime import date
+
+from config.database import db_connection
+from models.cash_register import CashRegister
+from models.financial_report import get_financial_summary
+from models.payment_allocation import allocate_payment, plan_allocation
+
+
+def _deuda(conn, client_id):
+    return conn.execute('SELECT total_debt FROM clients WHERE id = ?', (client_id,)).fetchone()[0]
+
+
+def _repartos(conn, transaction_id):
+    rows = conn.execute('''
+        SELECT sale_id, amount FROM payment_allocations WHERE transaction_id = ? ORDER BY sale_id
+    ''', (transaction_id,)).fetchall()
+    return [(row['sale_id'], round(row['amount'], 2)) for row in rows]
+
+
+def test_abono_parcial_en_varias_ventas(crear_cliente, estado_ventas):
+    with db_connection() as conn:
+        cliente, (v1, v2, v3) = crear_cliente(conn, "Parcial", [100.0, 50.0, 30.0])
+
+    plan, exceso = plan_allocation(cliente, 120.0)
+    assert [(item['sale_id'], item['amount']) for item in plan] == [(v1, 100.0), (v2, 20.0)]
+    assert exceso == 0.0
+
+    resultado = allocate_payment(cliente, 120.0)
+    assert resultado['allocations'] == plan
+    with db_connection() as conn:
+        assert estado_ventas(conn, [v1, v2, v3]) == {
+            v1: (100.0, 0.0, 'paid'), v2: (20.0, 30.0, 'pending'), v3: (0.0, 30.0, 'pending')}
+        assert _deuda(conn, cliente) == 60.0
+        assert _repartos(conn, resultado['transaction_id']) == [(v1, 100.0), (v2, 20.0)]
+
+
+def test_pago_exacto(crear_cliente, estado_ventas):
+    with db_connection() as conn:
+        cliente, (v1, v2) = crear_cliente(conn, "Exacto", [100.0, 50.0], pagado=[0.0, 20.0])
+
+    resultado = allocate_payment(cliente, 130.0)
+    assert resultado['excess_credit'] == 0.0
+    with db_connection() as conn:
+        assert estado_ventas(conn, [v1, v2]) == {v1: (100.0, 0.0, 'paid'), v2: (50.0, 0.0, 'paid')}
+        assert _deuda(conn, cliente) == 0.0
+        assert _repartos(conn, resultado['transaction_id']) == [(v1, 100.0), (v2, 30.0)]
+
+
+def test_pago_mayor_que_la_deuda(crear_cliente):
+    with db_connection() as conn:
+        cliente, (v1,) = crear_cliente(conn, "Exceso", [40.0])
+
+    assert plan_allocation(cliente, 100.0)[1] == 60.0
+    resultado = allocate_payment(cliente, 100.0)
+    assert resultado['excess_credit'] == 60.0
+    with db_connection() as conn:
+        assert _deuda(conn, cliente) == 0.0
+        assert _repartos(conn, resultado['transaction_id']) == [(v1, 40.0)]
+
+
+def test_pago_mayor_que_la_deuda_entra_completo_a_caja(crear_cliente):
+    """El excedente queda como crédito a favor, pero el efectivo recibido es el pago entero"""
+    with db_connection() as conn:
+        cliente, _ = crear_cliente(conn, "Caja", [40.0])
+
+    allocate_payment(cliente, 100.0)
+    hoy = date.today().isoformat()
+    resumen = CashRegister.get_daily_summary(hoy)
+    assert resumen['total_abonos'] == 100.0
+    assert [dia['total_abonos'] for dia in CashRegister.get_history() if dia['fecha'] == hoy] == [100.0]
+    assert sorted((m['tipo'], m['monto']) for m in CashRegister.get_movements_by_date(hoy)) == [
+        ('Abono cliente', 40.0), ('Crédito a favor', 60.0)]
+    assert get_financial_summary().client_credit == 60.0
+
+
+def test_plan_limitado_a_la_deuda(crear_cliente):
+    """Deuda menor que las ventas pendientes: el plan coincide con lo que se registra"""
+    with db_connection() as conn:
+        cliente, (v1, _) = crear_cliente(conn, "Tope", [50.0, 50.0], deuda=30.0)
+
+    plan, exceso = plan_allocation(cliente, 80.0)
+    assert ([(item['sale_id'], item['amount']) for item in plan], exceso) == ([(v1, 30.0)], 50.0)
+    resultado = allocate_payment(cliente, 80.0)
+    assert (resultado['allocations'], resultado['excess_credit']) == (plan, exceso)
@@ -0,0 +1,50 @@
+"""Búsquedas del catálogo de productos en memoria (models/product_catalog.py)"""
+
+import pytest
+
+from config.database import db_connection
+from models.product_catalog import ProductCatalog
+
+
+@pytest.fixture
+def catalogo(db):
+    with db_connection() as conn:
+        conn.executemany('INSERT INTO products (name, price, stock) VALUES (?, 1, ?)', [
+            ('Pan', 5), ('Pan dulce', 0), ('Harina para pan', 2), ('Empanada', 3),
+            ('Azúcar Morena', 4), ('Café', 1),
+        ])
+    catalogo = ProductCatalog()
+    catalogo.refresh()
+    return catalogo
+
+
+def _nombres(productos):
+    return [producto.name for producto in productos]
+
+
+def test_ignora_tildes_y_mayusculas(catalogo):
+    assert catalogo.find('  AZUCAR   morena ').name == 'Azúcar Morena'
+    assert catalogo.find('cafe').name == 'Café'
+    assert catalogo.find('caf') is None
+    assert _nombres(catalogo.search('AZÚCAR')) == ['Azúcar Morena']
+    assert _nombres(catalogo.starting_with('CAFÉ')) == ['Café']
+
+
+def test_orden_por_relevancia(catalogo):
+    # Exacto, prefijo, inicio de palabra y contenido
+    assert _nombres(catalogo.search('pan')) == ['Pan', 'Pan dulce', 'Harina para pan', 'Empanada']
+    assert _nombres(catalogo.search('pan', limit=2)) == ['Pan', 'Pan dulce']
+
+
+def test_solo_con_stock(catalogo):
+    assert _nombres(catalogo.search('pan', in_stock=True)) == ['Pan', 'Harina para pan', 'Empanada']
+    assert _nombres(catalogo.starting_with('pan')) == ['Pan', 'Pan dulce']
+    assert _nombres(catalogo.starting_with('pan', in_stock=True)) == ['Pan']
+
+
+def test_consultas_de_una_y_dos_letras(catalogo):
+    # Usan el índice por carácter y luego se verifica la subcadena
+    assert _nombres(catalogo.search('z')) == ['Azúcar Morena']
+    assert _nombres(catalogo.search('pa')) == ['Pan', 'Pan dulce', 'Harina para pan', 'Empanada']
+    assert _nombres(catalogo.search('é')) == ['Empanada', 'Azúcar Morena', 'Café', 'Pan dulce']
+    assert catalogo.search('np') == []
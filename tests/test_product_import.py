@@ -0,0 +1,33 @@
+"""Importación de productos desde Excel (utils/product_import.py)"""
+
+from config.database import db_connection
+from config.migrations import run_migrations
+from models.purchase_batch import save_purchase_batch
+from utils.product_import import import_products, validate_row
+
+
+def test_nombre_repetido_con_otras_mayusculas_actualiza(db):
+    import_products([validate_row("Coca Cola", 10.0, 5)])
+    assert import_products([validate_row("COCA COLA", 12.0, 7)]) == {'inserted': 0, 'updated': 1, 'total': 1}
+    with db_connection() as conn:
+        assert [tuple(row) for row in conn.execute('SELECT name, price, stock FROM products')] == [
+            ("Coca Cola", 12.0, 7)]
+
+
+def test_importacion_no_rompe_compras(db):
+    """Después de importar "Coca Cola", una compra con "coca cola" y "Pan" se guarda"""
+    import_products([validate_row("Coca Cola", 10.0, 5)])
+    save_purchase_batch([
+        {'product_name': "coca cola", 'quantity': 2, 'unit_price': 8.0, 'subtotal': 16.0},
+        {'product_name': "Pan", 'quantity': 1, 'unit_price': 3.0, 'subtotal': 3.0},
+    ], user_id=1)
+
+
+def test_migracion_elimina_el_indice_sin_mayusculas(db):
+    """Bases en las que una importación anterior ya creó el índice"""
+    with db_connection() as conn:
+        conn.execute('CREATE UNIQUE INDEX idx_products_name_nocase ON products (name COLLATE NOCASE)')
+        conn.execute('PRAGMA user_version = 4')
+    run_migrations()
+    with db_connection() as conn:
+        assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_products_name_nocase'").fetchone() is None
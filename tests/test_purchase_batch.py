@@ -0,0 +1,53 @@
+"""Guardado de un lote de compras en una transacción (models/purchase_batch.py)"""
+
+import sqlite3
+
+import pytest
+
+from config.database import db_connection
+from models.purchase_batch import save_purchase_batch
+
+
+@pytest.fixture
+def arroz(db):
+    with db_connection() as conn:
+        return conn.execute(
+            "INSERT INTO products (name, price, stock, cost_price) VALUES ('Arroz', 3, 10, 2)").lastrowid
+
+
+def _estado(conn):
+    """Conteos de compras y detalles, y (nombre, stock, costo) de cada producto"""
+    return (
+        conn.execute('SELECT COUNT(*) FROM purchases').fetchone()[0],
+        conn.execute('SELECT COUNT(*) FROM purchase_details').fetchone()[0],
+        [tuple(row) for row in conn.execute('SELECT name, stock, cost_price FROM products ORDER BY name')],
+    )
+
+
+def _item(nombre, cantidad, precio):
+    return {'product_name': nombre, 'quantity': cantidad, 'unit_price': precio,
+            'subtotal': (cantidad or 0) * precio}
+
+
+def test_lote_completo(arroz):
+    resultado = save_purchase_batch([_item('Arroz', 5, 2.2), _item('Frijol', 4, 1.5)],
+                                    user_id=None, freight_total=3.0, tax_total=2.0)
+    assert resultado['created_products'] == ['Frijol']
+    with db_connection() as conn:
+        assert _estado(conn) == (2, 2, [('Arroz', 15, 2.2), ('Frijol', 4, 1.5)])
+        totales = [round(row[0], 2) for row in conn.execute('SELECT total FROM purchases ORDER BY id')]
+    assert totales == [11.0 + 3.0 + 1.0, 6.0 + 1.0]
+
+
+def test_falla_a_mitad_del_lote_no_guarda_nada(arroz):
+    with db_connection() as conn:
+        antes = _estado(conn)
+
+    # El tercer ítem no tiene cantidad: falla al insertar los detalles,
+    # después de dar de alta 'Frijol' y de escribir las compras
+    with pytest.raises(sqlite3.IntegrityError):
+        save_purchase_batch([_item('Arroz', 5, 2.2), _item('Frijol', 4, 1.5), _item('Arroz', None, 9.0)],
+                            user_id=None)
+
+    with db_connection() as conn:
+        assert _estado(conn) == antes == (0, 0, [('Arroz', 10, 2.0)])
@@ -0,0 +1,116 @@
+"""Caché de lecturas de los modelos (models/query_cache.py)"""
+
+import pytest
+
+from config.database import db_connection
+from models.product import Product
+from models.product_catalog import ProductCatalog
+from models.query_cache import QueryCache, cached_query, query_cache
+
+
+@pytest.fixture
+def cache(db):
+    """query_cache vacía y con estadísticas en cero sobre la BD temporal"""
+    enabled = query_cache.enabled
+    query_cache.enabled = True
+    query_cache.clear()
+    query_cache.reset_stats()
+    yield query_cache
+    query_cache.clear()
+    query_cache.enabled = enabled
+
+
+@pytest.fixture
+def productos(cache):
+    with db_connection() as conn:
+        conn.executemany('INSERT INTO products (name, price, stock) VALUES (?, ?, ?)',
+                         [('Arroz', 2.5, 10), ('Café', 8.0, 3)])
+
+
+def _lector(cargas):
+    """Lectura cacheada de nombres de productos que anota cada carga real"""
+    @cached_query('products')
+    def nombres():
+        cargas.append(1)
+        with db_connection() as conn:
+            return [row[0] for row in conn.execute('SELECT name FROM products ORDER BY name')]
+    return nombres
+
+
+def test_acierto_y_fallo_tras_escritura(productos, cache):
+    cargas = []
+    nombres = _lector(cargas)
+    assert nombres() == ['Arroz', 'Café']
+    assert nombres() == ['Arroz', 'Café']
+    assert len(cargas) == 1
+
+    with db_connection() as conn:
+        conn.execute("INSERT INTO products (name, price, stock) VALUES ('Sal', 1, 1)")
+    assert nombres() == ['Arroz', 'Café', 'Sal']
+    assert len(cargas) == 2
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['stale']) == (1, 2, 1)
+
+
+def test_no_guarda_lo_leido_dentro_de_una_transaccion(productos, cache):
+    cargas = []
+    nombres = _lector(cargas)
+    with pytest.raises(RuntimeError):
+        with db_connection() as conn:
+            conn.execute("INSERT INTO products (name, price, stock) VALUES ('Fantasma', 1, 1)")
+            assert 'Fantasma' in nombres()
+            raise RuntimeError('rollback')
+    assert cache.get_stats()['entries'] == 0
+    assert nombres() == ['Arroz', 'Café']
+    assert len(cargas) == 2
+
+
+def test_limite_lru():
+    cache = QueryCache(max_entries=2)
+    cache._current_versions = lambda tables: ((1,), False)
+    cargas = []
+
+    def cargar(clave):
+        return cache.get_or_load(clave, ('products',), lambda: cargas.append(clave) or [clave])
+
+    cargar('a')
+    cargar('b')
+    cargar('a')      # 'a' pasa a ser la más reciente
+    cargar('c')      # Desaloja 'b'
+    assert cargas == ['a', 'b', 'c']
+    cargar('a')
+    cargar('b')
+    assert cargas == ['a', 'b', 'c', 'b']
+    stats = cache.get_stats()
+    assert (stats['entries'], stats['evictions']) == (2, 2)
+
+
+def test_modificar_lo_devuelto_no_altera_la_cache(productos, cache):
+    primera = Product.get_all()          # Fallo: se guarda y se devuelve una copia
+    primera[0].stock = -99
+    primera.append('basura')
+
+    segunda = Product.get_all()          # Acierto
+    assert [(p.name, p.stock) for p in segunda] == [('Arroz', 10), ('Café', 3)]
+    segunda[1].price = 0
+
+    # El catálogo comparte los objetos que recibe (sales_window los modifica)
+    catalogo = ProductCatalog()
+    catalogo.refresh()
+    catalogo.find('cafe').stock -= 1
+
+    assert [(p.name, p.price, p.stock) for p in Product.get_all()] == [('Arroz', 2.5, 10), ('Café', 8.0, 3)]
+    assert cache.get_stats()['hits'] == 3
+
+
+def test_estadisticas(productos, cache):
+    nombres = _lector([])
+    for _ in range(4):
+        nombres()
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (3, 1, 1)
+    assert stats['hit_rate'] == 0.75
+
+    cache.reset_stats()
+    assert cache.get_stats()['hit_rate'] == 0.0
+    assert cache.get_stats()['entries'] == 1
@@ -0,0 +1,83 @@
+"""Conciliación de deudas y ventas de clientes (models/reconciliation.py)"""
+
+import pytest
+
+from config.database import db_connection
+from models.reconciliation import reconcile_clients
+
+
+def _movimientos(conn, client_id, debitos, abonos):
+    conn.executemany('''
+        INSERT INTO client_transactions (client_id, transaction_type, amount, description)
+        VALUES (?, ?, ?, 'Prueba')
+    ''', [(client_id, 'debit', monto) for monto in debitos] + [(client_id, 'credit', monto) for monto in abonos])
+
+
+def _deudas(conn, ids):
+    return {client_id: conn.execute('SELECT total_debt FROM clients WHERE id = ?', (client_id,)).fetchone()[0]
+            for client_id in ids}
+
+
+@pytest.fixture
+def clientes(crear_cliente):
+    """
+    a: deuda real 60 (registrada 180); b: deuda real 0 (registrada 40);
+    c: deuda 200 con solo 50 en ventas pendientes; d: deuda registrada 25,
+    los movimientos dicen 100. Retorna {nombre: (id, ids de ventas)}.
+    """
+    with db_connection() as conn:
+        a = crear_cliente(conn, "A", [100.0, 50.0, 30.0])
+        _movimientos(conn, a[0], [100.0, 50.0, 30.0], [120.0])
+        b = crear_cliente(conn, "B", [40.0])
+        _movimientos(conn, b[0], [40.0], [40.0])
+        c = crear_cliente(conn, "C", [20.0, 30.0], deuda=200.0)
+        _movimientos(conn, c[0], [200.0], [])
+        d = crear_cliente(conn, "D", [50.0, 10.0], deuda=25.0)
+        _movimientos(conn, d[0], [100.0], [])
+    return {'a': a, 'b': b, 'c': c, 'd': d}
+
+
+def test_acotada_a_un_cliente(clientes, estado_ventas):
+    a, (a1, a2, a3) = clientes['a']
+    b, (b1,) = clientes['b']
+
+    resultado = reconcile_clients([a])
+    assert resultado['clients'] == 1
+    assert resultado['debt_changes'] == [{'client_id': a, 'old_debt': 180.0, 'debt': 60.0}]
+    with db_connection() as conn:
+        # La deuda queda en las ventas más recientes
+        assert estado_ventas(conn, [a1, a2, a3]) == {
+            a1: (100.0, 0.0, 'paid'), a2: (20.0, 30.0, 'pending'), a3: (0.0, 30.0, 'pending')}
+        assert _deudas(conn, [b]) == {b: 40.0}
+        assert estado_ventas(conn, [b1]) == {b1: (0.0, 40.0, 'pending')}
+
+
+def test_sin_recalcular_deudas(clientes, estado_ventas):
+    d, (d1, d2) = clientes['d']
+
+    resultado = reconcile_clients([d], recompute_debts=False)
+    assert resultado['debt_changes'] == []
+    with db_connection() as conn:
+        assert _deudas(conn, [d]) == {d: 25.0}
+        assert estado_ventas(conn, [d1, d2]) == {d1: (35.0, 15.0, 'pending'), d2: (0.0, 10.0, 'pending')}
+
+
+def test_completa(clientes, estado_ventas):
+    a, _ = clientes['a']
+    b, (b1,) = clientes['b']
+    c, (c1, c2) = clientes['c']
+    d, (d1, d2) = clientes['d']
+
+    resultado = reconcile_clients()
+    assert resultado['clients'] == 4
+    assert sorted(change['client_id'] for change in resultado['debt_changes']) == [a, b, d]
+    with db_connection() as conn:
+        assert _deudas(conn, [a, b, c, d]) == {a: 60.0, b: 0.0, c: 200.0, d: 100.0}
+        assert estado_ventas(conn, [b1]) == {b1: (40.0, 0.0, 'paid')}
+        # Deuda mayor que las ventas pendientes: quedan completas sin pagar
+        assert estado_ventas(conn, [c1, c2]) == {c1: (0.0, 20.0, 'pending'), c2: (0.0, 30.0, 'pending')}
+        assert estado_ventas(conn, [d1, d2]) == {d1: (0.0, 50.0, 'pending'), d2: (0.0, 10.0, 'pending')}
+
+    # Una segunda ejecución no cambia nada
+    resultado = reconcile_clients()
+    assert (resultado['debt_changes'], resultado['sale_changes']) == ([], [])
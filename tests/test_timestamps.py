@@ -0,0 +1,55 @@
+"""Rangos de días semiabiertos y normalización de fechas (config/database.py)"""
+
+from datetime import date, datetime
+
+from config.database import day_range, db_connection, normalize_timestamps
+from models.sale import Sale
+
+
+def test_day_range_acepta_texto_date_y_datetime():
+    assert day_range('2024-03-01') == ('2024-03-01', '2024-03-02')
+    assert day_range(' 2024-03-01 18:45:00 ') == ('2024-03-01', '2024-03-02')
+    assert day_range(date(2024, 2, 28), datetime(2024, 2, 29, 23, 59)) == ('2024-02-28', '2024-03-01')
+    assert day_range('2024-12-31') == ('2024-12-31', '2025-01-01')
+
+
+def test_limites_del_dia(db):
+    with db_connection() as conn:
+        ultima = conn.execute(
+            "INSERT INTO sales (total, created_at) VALUES (1, '2024-03-01 23:59:59.999')").lastrowid
+        siguiente = conn.execute(
+            "INSERT INTO sales (total, created_at) VALUES (2, '2024-03-02 00:00:00')").lastrowid
+
+    def ids(inicio, fin):
+        return [venta.id for venta in Sale.get_filtered_sales(inicio, fin)]
+
+    assert ids('2024-03-01', '2024-03-01') == [ultima]
+    assert ids('2024-03-02', '2024-03-02') == [siguiente]
+    assert sorted(ids('2024-03-01', '2024-03-02')) == [ultima, siguiente]
+
+    inicio, fin = day_range('2024-03-01')
+    with db_connection() as conn:
+        filas = conn.execute('SELECT id FROM sales WHERE created_at >= ? AND created_at < ?',
+                             (inicio, fin)).fetchall()
+    assert [fila[0] for fila in filas] == [ultima]
+
+
+def test_normalize_timestamps_reescribe_formatos_antiguos(db):
+    antiguas = {
+        '2024-03-01T10:15:30': '2024-03-01 10:15:30',
+        '2024-03-01 10:15:30.123456': '2024-03-01 10:15:30',
+        '2024-03-01T23:59:59.999': '2024-03-01 23:59:59',
+        '2024-03-02': '2024-03-02 00:00:00',
+        '2024-03-02 08:00:00': '2024-03-02 08:00:00',   # Ya normalizada
+        'ayer': 'ayer',                                 # No es fecha: se deja
+    }
+    with db_connection() as conn:
+        ids = {conn.execute('INSERT INTO sales (total, created_at) VALUES (1, ?)', (valor,)).lastrowid: valor
+               for valor in antiguas}
+
+    assert normalize_timestamps() == 0          # La migración ya corrió al crear la base
+    assert normalize_timestamps(force=True) == 4
+
+    with db_connection() as conn:
+        filas = conn.execute('SELECT id, created_at FROM sales').fetchall()
+    assert {fila[0]: fila[1] for fila in filas} == {id_: antiguas[valor] for id_, valor in ids.items()}
@@ -1,9 +1,12 @@
-import pandas as pd
 import tkinter as tk
 from tkinter import ttk, messagebox
 from tkinter import filedialog
-import os
-from config.database import get_connection
+from utils.background import task_executor
+from utils.events import event_bus, STOCK_CHANGED
+from utils.product_import import parse_file, import_products
+
+# Filas que se muestran en la vista previa (primero las que tienen errores)
+PREVIEW_ROWS = 500
 
 class ExcelImportWindow:
     def __init__(self, parent, inventory_window):
@@ -20,6 +23,7 @@ class ExcelImportWindow:
         
         self.center_window()
         self.setup_ui()
+        self.window.bind("<Destroy>", self._on_destroy, add="+")
     
     def center_window(self):
         """Centra la ventana en la pantalla"""
@@ -118,6 +122,34 @@ class ExcelImportWindow:
         self.stats_label = ttk.Label(buttons_frame, text="Seleccione un archivo para comenzar", 
                                     font=("Arial", 10))
         self.stats_label.pack(side=tk.LEFT, pady=(10, 0))
+        
+        # Progreso de lectura/importación (se muestra solo mientras trabaja)
+        self.progress_bar = ttk.Progressbar(buttons_frame, length=200)
+    
+    def _on_destroy(self, event):
+        """Descarta la lectura o importación pendiente al cerrar"""
+        if event.widget is self.window:
+            task_executor.cancel_owner(self)
+    
+    def _set_busy(self, busy, message=""):
+        """Muestra el progreso y bloquea los botones mientras hay una tarea"""
+        if busy:
+            self.import_button.config(state="disabled")
+            self.progress_bar.config(mode='determinate', value=0)
+            self.progress_bar.pack(side=tk.LEFT, padx=(10, 0), pady=(10, 0))
+        else:
+            self.progress_bar.stop()
+            self.progress_bar.pack_forget()
+        self.stats_label.config(text=message)
+    
+    def _on_progress(self, value, message):
+        if value is None:
+            if self.progress_bar.cget('mode') != 'indeterminate':
+                self.progress_bar.config(mode='indeterminate')
+                self.progress_bar.start(15)
+        else:
+            self.progress_bar.config(mode='determinate', value=value * 100)
+        self.stats_label.config(text=message)
     
     def select_file(self):
         """Selecciona el archivo Excel"""
@@ -134,76 +166,46 @@ class ExcelImportWindow:
             self.load_excel_data(file_path)
     
     def load_excel_data(self, file_path):
-        """Carga y valida los datos del Excel"""
-        try:
-            # Leer archivo Excel
-            df = pd.read_excel(file_path)
-            
-            # Validar columnas requeridas
-            required_columns = ['Nombre', 'Precio', 'Stock']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            
-            if missing_columns:
-                messagebox.showerror("Error", 
-                                   f"Faltan las siguientes columnas: {', '.join(missing_columns)}")
-                return
-            
-            # Limpiar y validar datos
-            df = df[required_columns].copy()  # Solo columnas necesarias
-            df = df.dropna()  # Eliminar filas vacías
-            
-            # Validar datos
-            valid_data = []
-            for index, row in df.iterrows():
-                nombre = str(row['Nombre']).strip()
-                precio = row['Precio']
-                stock = row['Stock']
-                estado = "✅ Válido"
-                
-                # Validaciones
-                if not nombre or nombre.lower() == 'nan':
-                    estado = "❌ Nombre vacío"
-                elif not isinstance(precio, (int, float)) or precio < 0:
-                    estado = "❌ Precio inválido"
-                elif not isinstance(stock, (int, float)) or stock < 0 or stock != int(stock):
-                    estado = "❌ Stock inválido"
-                
-                valid_data.append({
-                    'nombre': nombre,
-                    'precio': float(precio) if isinstance(precio, (int, float)) else 0,
-                    'stock': int(stock) if isinstance(stock, (int, float)) else 0,
-                    'estado': estado,
-                    'valido': estado == "✅ Válido"
-                })
-            
-            self.excel_data = valid_data
-            self.populate_preview()
-            
-            # Estadísticas
-            total = len(valid_data)
-            validos = sum(1 for item in valid_data if item['valido'])
-            invalidos = total - validos
-            
-            stats_text = f"Total: {total} | Válidos: {validos} | Con errores: {invalidos}"
-            self.stats_label.config(text=stats_text)
-            
-            # Habilitar botón de importar si hay datos válidos
-            if validos > 0:
-                self.import_button.config(state="normal")
-            else:
-                self.import_button.config(state="disabled")
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al leer archivo Excel: {e}")
+        """Lee y valida el Excel en segundo plano (fila por fila, sin pandas)"""
+        self.excel_data = None
+        self._set_busy(True, "Leyendo archivo...")
+        
+        def on_error(error):
+            self._set_busy(False, "Seleccione un archivo para comenzar")
+            messagebox.showerror("Error", f"Error al leer archivo Excel: {error}", parent=self.window)
+        
+        task_executor.submit(self.window, parse_file, file_path, owner=self,
+                             on_success=self._on_file_loaded, on_error=on_error,
+                             on_progress=self._on_progress)
+    
+    def _on_file_loaded(self, items):
+        self.excel_data = items
+        self.populate_preview()
+        
+        # Estadísticas
+        total = len(items)
+        validos = sum(1 for item in items if item['valido'])
+        invalidos = total - validos
+        
+        stats_text = f"Total: {total:,} | Válidos: {validos:,} | Con errores: {invalidos:,}"
+        if total > PREVIEW_ROWS:
+            stats_text += f" (vista previa: {PREVIEW_ROWS} filas)"
+        self._set_busy(False, stats_text)
+        
+        # Habilitar botón de importar si hay datos válidos
+        if validos > 0:
+            self.import_button.config(state="normal")
+        else:
+            self.import_button.config(state="disabled")
     
     def populate_preview(self):
-        """Llena la vista previa con los datos"""
+        """Llena la vista previa (primero las filas con errores, hasta PREVIEW_ROWS)"""
         # Limpiar tabla
-        for item in self.preview_tree.get_children():
-            self.preview_tree.delete(item)
+        self.preview_tree.delete(*self.preview_tree.get_children())
         
-        # Agregar datos
-        for item in self.excel_data:
+        errors = [item for item in self.excel_data if not item['valido']]
+        valid = [item for item in self.excel_data if item['valido']]
+        for item in (errors + valid)[:PREVIEW_ROWS]:
             precio_formatted = f"${item['precio']:,.2f}"
             
             tags = []
@@ -219,80 +221,47 @@ class ExcelImportWindow:
         self.preview_tree.tag_configure("error", background="#f8d7da")
     
     def import_products(self):
-        """Importa los productos válidos"""
+        """Importa los productos válidos en una sola transacción, en segundo plano"""
         if not self.excel_data:
             return
         
-        valid_items = [item for item in self.excel_data if item['valido']]
+        valid_count = sum(1 for item in self.excel_data if item['valido'])
         
-        if not valid_items:
+        if not valid_count:
             messagebox.showwarning("Sin datos válidos", "No hay productos válidos para importar")
             return
         
         result = messagebox.askyesno("Confirmar Importación", 
-                                   f"¿Desea importar {len(valid_items)} productos válidos?\n\n"
+                                   f"¿Desea importar {valid_count:,} productos válidos?\n\n"
                                    f"Los productos existentes con el mismo nombre serán actualizados.")
         
         if not result:
             return
         
-        try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            imported = 0
-            updated = 0
-            errors = []
-            
-            for item in valid_items:
-                try:
-                    # Verificar si el producto existe
-                    cursor.execute("SELECT id FROM products WHERE LOWER(name) = LOWER(?)", 
-                                 (item['nombre'],))
-                    existing = cursor.fetchone()
-                    
-                    if existing:
-                        # Actualizar producto existente
-                        cursor.execute('''
-                            UPDATE products 
-                            SET price = ?, stock = ? 
-                            WHERE id = ?
-                        ''', (item['precio'], item['stock'], existing['id']))
-                        updated += 1
-                    else:
-                        # Insertar nuevo producto
-                        cursor.execute('''
-                            INSERT INTO products (name, price, stock) 
-                            VALUES (?, ?, ?)
-                        ''', (item['nombre'], item['precio'], item['stock']))
-                        imported += 1
-                        
-                except Exception as e:
-                    errors.append(f"Error con '{item['nombre']}': {e}")
-            
-            conn.commit()
-            conn.close()
-            
-            # Mostrar resultados
-            result_text = f"Importación completada:\n"
-            result_text += f"• Productos nuevos: {imported}\n"
-            result_text += f"• Productos actualizados: {updated}\n"
-            
-            if errors:
-                result_text += f"• Errores: {len(errors)}\n\nErrores:\n" + "\n".join(errors[:5])
-                if len(errors) > 5:
-                    result_text += f"\n... y {len(errors)-5} errores más"
-            
-            messagebox.showinfo("Importación Completada", result_text)
-            
-            # Actualizar inventario
-            self.inventory_window.refresh_products()
-            
-            # Cerrar ventana
-            self.window.destroy()
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Error durante la importación: {e}")
+        self._set_busy(True, "Importando...")
+        
+        def on_error(error):
+            self._set_busy(False, "La importación falló; no se guardó ningún producto")
+            self.import_button.config(state="normal")
+            messagebox.showerror("Error", f"Error durante la importación: {error}", parent=self.window)
+        
+        task_executor.submit(self.window, import_products, self.excel_data, owner=self,
+                             on_success=self._on_imported, on_error=on_error,
+                             on_progress=self._on_progress)
+    
+    def _on_imported(self, counts):
+        # El inventario y las demás ventanas se actualizan con el evento
+        event_bus.publish(STOCK_CHANGED)
+        
+        # Mostrar resultados
+        result_text = f"Importación completada:\n"
+        result_text += f"• Productos nuevos: {counts['inserted']:,}\n"
+        result_text += f"• Productos actualizados: {counts['updated']:,}\n"
+        
+        messagebox.showinfo("Importación Completada", result_text, parent=self.window)
+        
+        # Cerrar ventana
+        self.window.destroy()
     
     def cancel(self):
         """Cancela la importación"""
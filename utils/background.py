@@ -0,0 +1,183 @@
+"""
+Ejecución de tareas en segundo plano para las ventanas Tk.
+
+Tk no es seguro entre hilos: los widgets solo pueden tocarse desde el hilo
+del mainloop. Las tareas (consultas, cálculos) corren en un pool de hilos y
+sus resultados se dejan en una cola; un ciclo root.after() en el hilo de Tk
+vacía la cola y llama a los callbacks on_success / on_error / on_progress.
+
+Cada tarea pertenece a un "dueño" (normalmente la ventana que la pidió);
+cancel_owner() descarta todas sus tareas pendientes, por ejemplo al cerrar
+la ventana, para que ningún callback toque widgets ya destruidos.
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ── Configuración ────────────────────────────────────────────────────────────
+MAX_WORKERS = 3
+POLL_MS     = 50
+
+
+class BackgroundTask:
+    """Referencia a una tarea enviada al ejecutor"""
+
+    def __init__(self, executor, owner, on_success=None, on_error=None, on_progress=None):
+        self._executor = executor
+        self.owner = owner
+        self.on_success = on_success
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.future = None
+        self.cancelled = False
+        self.done = False
+
+    def cancel(self):
+        """Cancela la tarea; si ya está corriendo, su resultado se descarta"""
+        if not self.cancelled and not self.done:
+            self.cancelled = True
+            if self.future is not None:
+                self.future.cancel()
+            self._executor._finish(self)
+
+    def report_progress(self, value, message=None):
+        """Llamado desde el hilo de trabajo; el callback corre en el hilo de Tk"""
+        if not self.cancelled and self.on_progress is not None:
+            self._executor._results.put((self, 'progress', (value, message)))
+
+
+class TaskExecutor:
+    """Pool de hilos con cola de resultados atendida por root.after()"""
+
+    def __init__(self, max_workers=MAX_WORKERS, poll_ms=POLL_MS):
+        self.max_workers = max_workers
+        self.poll_ms = poll_ms
+        self._pool = None
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._tasks = set()
+        self._root = None
+        self._polling = False
+        self._listeners = []
+
+    # ── Envío y cancelación ──────────────────────────────────────────────────
+    def submit(self, widget, func, *args, owner=None, on_success=None, on_error=None,
+               on_progress=None, **kwargs):
+        """
+        Ejecuta func(*args, **kwargs) en segundo plano.
+        widget: cualquier widget Tk (se usa para programar el sondeo de la cola).
+        owner: dueño de la tarea para cancel_owner (por defecto, widget).
+        Si se pasa on_progress, func recibe además progress=task.report_progress.
+        """
+        task = BackgroundTask(self, owner if owner is not None else widget,
+                              on_success, on_error, on_progress)
+        if on_progress is not None:
+            kwargs['progress'] = task.report_progress
+
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix="tienda-bg")
+            self._tasks.add(task)
+            self._root = widget.nametowidget('.')
+            task.future = self._pool.submit(self._run, task, func, args, kwargs)
+
+        self._notify(task.owner)
+        self._ensure_polling()
+        return task
+
+    def cancel_owner(self, owner):
+        """Cancela todas las tareas del dueño indicado"""
+        with self._lock:
+            tasks = [task for task in self._tasks if task.owner is owner]
+        for task in tasks:
+            task.cancel()
+
+    def pending(self, owner=None):
+        """Número de tareas sin terminar (de un dueño o de todos)"""
+        with self._lock:
+            return sum(1 for task in self._tasks if owner is None or task.owner is owner)
+
+    def add_listener(self, callback):
+        """callback(owner, pending) se llama en el hilo de Tk cuando cambia el número de tareas"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def shutdown(self, wait=False):
+        """Detiene el pool; las tareas sin iniciar se cancelan"""
+        with self._lock:
+            tasks = list(self._tasks)
+            pool, self._pool = self._pool, None
+        for task in tasks:
+            task.cancel()
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+    # ── Internos ─────────────────────────────────────────────────────────────
+    def _run(self, task, func, args, kwargs):
+        if task.cancelled:
+            return
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self._results.put((task, 'error', e))
+        else:
+            self._results.put((task, 'success', result))
+
+    def _finish(self, task):
+        with self._lock:
+            if task not in self._tasks:
+                return
+            self._tasks.discard(task)
+        task.done = True
+        self._notify(task.owner)
+
+    def _notify(self, owner):
+        pending = self.pending(owner)
+        for callback in list(self._listeners):
+            try:
+                callback(owner, pending)
+            except Exception as e:
+                print(f"Error en listener de tareas: {e}")
+
+    def _ensure_polling(self):
+        if not self._polling and self._root is not None:
+            self._polling = True
+            self._root.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        while True:
+            try:
+                task, kind, payload = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if task.cancelled:
+                continue
+            if kind == 'progress':
+                callback, args = task.on_progress, payload
+            else:
+                self._finish(task)
+                callback = task.on_success if kind == 'success' else task.on_error
+                args = (payload,)
+                if callback is None and kind == 'error':
+                    print(f"Error en tarea en segundo plano: {payload}")
+            if callback is not None:
+                try:
+                    callback(*args)
+                except Exception as e:
+                    print(f"Error en callback de tarea: {e}")
+
+        if self.pending() or not self._results.empty():
+            try:
+                self._root.after(self.poll_ms, self._poll)
+                return
+            except Exception:
+                pass  # La ventana principal ya no existe
+        self._polling = False
+
+
+task_executor = TaskExecutor()
@@ -1,41 +1,130 @@
+"""
+Backup de la base de datos y sincronización con Google Drive.
+
+backup_y_sync_drive() copia la base en línea con la API de backup de
+SQLite, por pasos de PAGINAS_POR_PASO páginas con una pausa entre pasos,
+así las ventas y abonos se siguen confirmando mientras se copia. Verifica
+la copia con quick_check (integrity_check completo cada
+VERIFICACION_COMPLETA_DIAS días) y la sube a Drive por bloques. Acepta
+progress(valor, mensaje) como las tareas de task_executor.
+
+backup_service la ejecuta en segundo plano (nunca en el hilo de Tk), una
+a la vez, y programa backups automáticos mientras la aplicación está
+abierta.
+"""
+
 import sqlite3
 import time
 import shutil
 import logging
 import os
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 from pathlib import Path
 
+from utils.background import task_executor
 from utils.paths import get_db_path
 
 # ── Configuración ────────────────────────────────────────────────────────────
 ORIGEN_DB   = Path(get_db_path())
-BACKUP_DIR  = Path(r"G:\Mi unidad\Emprendimiento\backups_db")
-SYNC_DIR    = Path(r"G:\Mi unidad\Emprendimiento\db_actual")
+DRIVE_DIR   = Path(r"G:\Mi unidad\Emprendimiento")
+BACKUP_DIR  = DRIVE_DIR / "backups_db"
+SYNC_DIR    = DRIVE_DIR / "db_actual"
 SYNC_DB     = SYNC_DIR / "tienda.db"
 
 MAX_BACKUPS     = 30
 MAX_REINTENTOS  = 6
 ESPERA_BASE     = 3
 
+PAGINAS_POR_PASO  = 256     # Páginas por paso de backup (1 MB con páginas de 4 KB)
+PAUSA_ENTRE_PASOS = 0.01    # Segundos entre pasos; los escritores confirman en la pausa
+MAX_REINICIOS     = 3       # Reinicios tolerados antes de copiar todo en un solo paso
+VERIFICACION_COMPLETA_DIAS = 7
+BLOQUE_COPIA      = 1024 * 1024
+
+BACKUP_AUTOMATICO_HORAS = 6
+REVISION_AUTOMATICA_MS  = 10 * 60 * 1000   # Cada cuánto se revisa si toca backup
+PRIMERA_REVISION_MS     = 60 * 1000        # Primera revisión, después del arranque
+
+ULTIMO_BACKUP        = BACKUP_DIR / "ultimo_backup.txt"
+ULTIMA_VERIFICACION  = BACKUP_DIR / "ultima_verificacion_completa.txt"
+FORMATO_FECHA        = "%Y-%m-%d_%H-%M-%S"
+
 # ── Logging ──────────────────────────────────────────────────────────────────
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s  %(levelname)-8s  %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-    handlers=[
-        logging.FileHandler(BACKUP_DIR.parent / "backup.log", encoding="utf-8"),
-        logging.StreamHandler(),
-    ],
-)
+# Se configura al hacer el primer backup, no al importar: el archivo de log
+# vive en la carpeta de Drive y solo se crea si esa carpeta existe.
 log = logging.getLogger(__name__)
+_log_lock = threading.Lock()
+
+
+def _configurar_log():
+    with _log_lock:
+        if log.handlers:
+            return
+        formato = logging.Formatter("%(asctime)s  %(levelname)-8s  %(message)s",
+                                    datefmt="%Y-%m-%d %H:%M:%S")
+        handlers = [logging.StreamHandler()]
+        if DRIVE_DIR.is_dir():
+            handlers.append(logging.FileHandler(DRIVE_DIR / "backup.log", encoding="utf-8"))
+        for handler in handlers:
+            handler.setFormatter(formato)
+            log.addHandler(handler)
+        log.setLevel(logging.INFO)
+        log.propagate = False
 
 
 # ── Helpers ──────────────────────────────────────────────────────────────────
-def exportar_db_segura(origen: Path, destino: Path) -> None:
-    """Copia la BD usando la API nativa de SQLite (sin bloqueos)."""
-    with sqlite3.connect(origen) as src, sqlite3.connect(destino) as dst:
-        src.backup(dst)
+def _etapa(progress, inicio, fin):
+    """progress para una etapa que ocupa el tramo [inicio, fin] del total"""
+    if progress is None:
+        return None
+    return lambda valor, mensaje: progress(inicio + (fin - inicio) * valor, mensaje)
+
+
+class _DemasiadosReinicios(Exception):
+    """La copia por pasos se reinició más de MAX_REINICIOS veces"""
+
+
+def exportar_db_segura(origen: Path, destino: Path, progress=None) -> None:
+    """
+    Copia la BD en línea con la API de backup de SQLite, por pasos: entre
+    paso y paso la base queda libre para otras conexiones. Si otra conexión
+    escribe durante la copia, SQLite la reinicia para que quede consistente.
+    Después de MAX_REINICIOS reinicios copia todo en un solo paso (con WAL
+    los escritores siguen confirmando mientras tanto), así una base con
+    escrituras constantes también termina su backup.
+    """
+    reinicios = 0
+    anterior = None
+
+    def avance(status, restantes, total):
+        nonlocal reinicios, anterior
+        if anterior is not None and restantes > anterior:
+            reinicios += 1
+            if reinicios > MAX_REINICIOS:
+                raise _DemasiadosReinicios()
+        anterior = restantes
+        if progress is not None and total:
+            progress((total - restantes) / total,
+                     f"Copiando base de datos… {total - restantes:,} de {total:,} páginas")
+
+    src = sqlite3.connect(origen, timeout=30)
+    dst = sqlite3.connect(destino)
+    try:
+        try:
+            src.backup(dst, pages=PAGINAS_POR_PASO, progress=avance, sleep=PAUSA_ENTRE_PASOS)
+        except _DemasiadosReinicios:
+            log.info("La copia se reinició %d veces; se copia en un solo paso", reinicios)
+            if progress is not None:
+                progress(0.0, f"Escrituras constantes ({reinicios} reinicios): copiando en un solo paso…")
+            src.backup(dst, pages=-1)
+            if progress is not None:
+                progress(1.0, "Base de datos copiada en un solo paso")
+    finally:
+        dst.close()
+        src.close()
+    if 0 < reinicios <= MAX_REINICIOS:
+        log.info("La copia se reinició %d veces por escrituras concurrentes", reinicios)
 
 
 def limpiar_backups_antiguos(directorio: Path, max_backups: int) -> None:
@@ -45,15 +134,49 @@ def limpiar_backups_antiguos(directorio: Path, max_backups: int) -> None:
         log.info("Backup antiguo eliminado: %s", archivo.name)
 
 
-def verificar_integridad(ruta_db: Path) -> bool:
+def verificar_integridad(ruta_db: Path, completa: bool = True) -> bool:
+    """integrity_check si completa; si no, quick_check (omite índices, mucho más rápido)"""
+    pragma = "integrity_check" if completa else "quick_check"
     try:
-        with sqlite3.connect(ruta_db) as conn:
-            return conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        conn = sqlite3.connect(ruta_db)
+        try:
+            return conn.execute(f"PRAGMA {pragma}").fetchone()[0] == "ok"
+        finally:
+            conn.close()
     except sqlite3.Error as e:
         log.error("Error de integridad en %s: %s", ruta_db, e)
         return False
 
 
+def _leer_fecha(archivo: Path):
+    try:
+        return datetime.strptime(archivo.read_text(encoding="utf-8").strip(), FORMATO_FECHA)
+    except (OSError, ValueError):
+        return None
+
+
+def toca_verificacion_completa() -> bool:
+    """True si la última verificación completa tiene VERIFICACION_COMPLETA_DIAS o más"""
+    ultima = _leer_fecha(ULTIMA_VERIFICACION)
+    return ultima is None or datetime.now() - ultima >= timedelta(days=VERIFICACION_COMPLETA_DIAS)
+
+
+def copiar_archivo(origen: Path, destino: Path, progress=None) -> None:
+    """Copia por bloques (como shutil.copy2) informando el avance"""
+    total = origen.stat().st_size
+    copiado = 0
+    with open(origen, "rb") as src, open(destino, "wb") as dst:
+        while True:
+            bloque = src.read(BLOQUE_COPIA)
+            if not bloque:
+                break
+            dst.write(bloque)
+            copiado += len(bloque)
+            if progress is not None and total:
+                progress(copiado / total, f"Subiendo a Drive… {copiado / 1048576:.1f} de {total / 1048576:.1f} MB")
+    shutil.copystat(origen, destino)
+
+
 def esperar_archivo_libre(ruta: Path, max_intentos: int = MAX_REINTENTOS, espera_base: int = ESPERA_BASE) -> None:
     """Espera hasta que el archivo no esté bloqueado por otro proceso."""
     espera = espera_base
@@ -73,7 +196,7 @@ def esperar_archivo_libre(ruta: Path, max_intentos: int = MAX_REINTENTOS, espera
             espera = min(espera * 2, 30)  # máximo 30s de espera
 
 
-def sync_seguro(origen: Path, destino: Path) -> None:
+def sync_seguro(origen: Path, destino: Path, progress=None) -> None:
     """
     Sincroniza origen → destino de forma segura en 3 pasos:
       1. Espera a que origen esté libre (antivirus, etc.)
@@ -88,7 +211,7 @@ def sync_seguro(origen: Path, destino: Path) -> None:
 
     # Paso 2: copiar directo a Drive con nombre temporal
     log.info("Copiando a Drive…")
-    shutil.copy2(origen, destino_temp)
+    copiar_archivo(origen, destino_temp, progress)
 
     # Paso 3: reemplazar con reintentos
     espera = ESPERA_BASE
@@ -106,25 +229,36 @@ def sync_seguro(origen: Path, destino: Path) -> None:
 
 
 # ── Función principal ─────────────────────────────────────────────────────────
-def backup_y_sync_drive() -> dict:
+def backup_y_sync_drive(progress=None) -> dict:
+    """
+    Backup verificado en BACKUP_DIR y copia en SYNC_DB. Retorna {'backup',
+    'sync', 'fecha', 'verificacion'}. Pensada para correr en segundo plano
+    (ver backup_service); progress(valor, mensaje) recibe el avance 0-1.
+    """
+    _configurar_log()
     BACKUP_DIR.mkdir(parents=True, exist_ok=True)
     SYNC_DIR.mkdir(parents=True, exist_ok=True)
 
     if not ORIGEN_DB.exists():
         raise FileNotFoundError(f"BD origen no encontrada: {ORIGEN_DB}")
 
-    fecha       = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    fecha       = datetime.now().strftime(FORMATO_FECHA)
     ruta_backup = BACKUP_DIR / f"tienda_backup_{fecha}.db"
 
     # ── 1. Backup ────────────────────────────────────────────────────────────
     log.info("Iniciando backup → %s", ruta_backup.name)
-    exportar_db_segura(ORIGEN_DB, ruta_backup)
+    exportar_db_segura(ORIGEN_DB, ruta_backup, _etapa(progress, 0.0, 0.6))
 
-    if not verificar_integridad(ruta_backup):
+    completa = toca_verificacion_completa()
+    if progress is not None:
+        progress(0.6, "Verificación completa de integridad…" if completa else "Verificación rápida…")
+    if not verificar_integridad(ruta_backup, completa):
         ruta_backup.unlink(missing_ok=True)
         raise RuntimeError("El backup no pasó la verificación de integridad.")
+    if completa:
+        ULTIMA_VERIFICACION.write_text(fecha, encoding="utf-8")
 
-    (BACKUP_DIR / "ultimo_backup.txt").write_text(fecha, encoding="utf-8")
+    ULTIMO_BACKUP.write_text(fecha, encoding="utf-8")
     limpiar_backups_antiguos(BACKUP_DIR, MAX_BACKUPS)
     log.info("Backup completado ✓")
 
@@ -133,10 +267,79 @@ def backup_y_sync_drive() -> dict:
 
     # Reutilizamos el backup ya verificado como fuente, así no leemos
     # la BD de producción dos veces
-    sync_seguro(ruta_backup, SYNC_DB)
+    sync_seguro(ruta_backup, SYNC_DB, _etapa(progress, 0.8, 1.0))
 
     log.info("Sync completado ✓")
-    return {"backup": str(ruta_backup), "sync": str(SYNC_DB), "fecha": fecha}
+    return {"backup": str(ruta_backup), "sync": str(SYNC_DB), "fecha": fecha,
+            "verificacion": "completa" if completa else "rápida"}
+
+
+# ── Servicio en segundo plano ─────────────────────────────────────────────────
+class BackupService:
+    """
+    Ejecuta backup_y_sync_drive con task_executor, uno a la vez. start()
+    revisa cada REVISION_AUTOMATICA_MS si pasaron BACKUP_AUTOMATICO_HORAS
+    desde el último backup y, si es así, hace uno automático. Los backups
+    automáticos solo se activan si la carpeta de Drive está disponible.
+    """
+
+    def __init__(self, intervalo_horas=BACKUP_AUTOMATICO_HORAS):
+        self.intervalo = timedelta(hours=intervalo_horas)
+        self._task = None
+        self._root = None
+        self._after_id = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done
+
+    def run(self, widget, on_progress=None, on_success=None, on_error=None):
+        """Inicia un backup en segundo plano; retorna la tarea o None si ya hay uno en curso"""
+        if self.running:
+            return None
+        self._task = task_executor.submit(widget, backup_y_sync_drive, owner=self,
+                                          on_success=on_success, on_error=on_error,
+                                          on_progress=on_progress)
+        return self._task
+
+    def start(self, root):
+        """Programa los backups automáticos; root es la ventana principal de Tk"""
+        self.stop()
+        if not DRIVE_DIR.is_dir():
+            print(f"Backups automáticos desactivados: no se encontró {DRIVE_DIR}")
+            return False
+        self._root = root
+        self._after_id = root.after(PRIMERA_REVISION_MS, self._check)
+        return True
+
+    def stop(self):
+        """Detiene la programación; un backup en curso termina en su hilo"""
+        if self._after_id is not None and self._root is not None:
+            try:
+                self._root.after_cancel(self._after_id)
+            except Exception:
+                pass
+        self._after_id = None
+        self._root = None
+
+    def is_due(self):
+        ultimo = _leer_fecha(ULTIMO_BACKUP)
+        return ultimo is None or datetime.now() - ultimo >= self.intervalo
+
+    def _check(self):
+        if self._root is None:
+            return
+        if not self.running and self.is_due():
+            self.run(self._root,
+                     on_success=lambda info: log.info("Backup automático completado: %s", info["backup"]),
+                     on_error=lambda e: log.error("Error en backup automático: %s", e))
+        try:
+            self._after_id = self._root.after(REVISION_AUTOMATICA_MS, self._check)
+        except Exception:
+            self._after_id = None  # La ventana principal ya no existe
+
+
+backup_service = BackupService()
 
 
 # ── Entry point ───────────────────────────────────────────────────────────────
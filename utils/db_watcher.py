@@ -0,0 +1,146 @@
+"""
+Detección de cambios hechos por otros procesos en la base de datos.
+
+Otra instancia de la aplicación, correo.py, migrate.py o el respaldo pueden
+escribir en data/tienda.db mientras las ventanas están abiertas. Este
+vigilante sondea cada POLL_MS, en el hilo de Tk, con una conexión propia
+y persistente:
+
+1. Compara tamaño y fecha de modificación del archivo y de su WAL; si no
+   cambiaron no ejecuta ninguna consulta.
+2. Si cambiaron, lee PRAGMA data_version, que solo cambia cuando otra
+   conexión confirmó una escritura.
+3. Si cambió, lee table_versions (contadores por tabla mantenidos por
+   triggers, ver config.database.ensure_table_versions) menos las
+   escrituras de este mismo proceso (table_writes), y publica en el bus
+   de eventos TABLES_CHANGED con las tablas modificadas, más el tema de
+   escritura equivalente de cada tabla (TABLE_TOPICS) sin ids, para que las
+   ventanas y cachés suscritas se actualicen como si el cambio fuera local.
+
+Las escrituras propias ya las anunciaron sus eventos, con ids; como se
+descuentan fila por fila, una escritura externa en la misma tabla y en el
+mismo intervalo se sigue anunciando.
+"""
+
+import os
+import sqlite3
+
+from config.database import get_external_table_versions
+from utils.events import event_bus, TABLES_CHANGED, TABLE_TOPICS
+from utils.paths import get_db_path
+
+# ── Configuración ────────────────────────────────────────────────────────────
+POLL_MS = 400
+
+
+class DatabaseWatcher:
+    """Sondeo de PRAGMA data_version con root.after()"""
+
+    def __init__(self, db_path=None, poll_ms=POLL_MS, bus=event_bus):
+        self._db_path = db_path
+        self.poll_ms = poll_ms
+        self.bus = bus
+        self._conn = None
+        self._root = None
+        self._job = None
+        self._signature = None
+        self._data_version = None
+        self._versions = {}
+        self.stats = {'polls': 0, 'queries': 0, 'external_changes': 0}
+
+    @property
+    def db_path(self):
+        return self._db_path or get_db_path()
+
+    # ── Ciclo de vida ────────────────────────────────────────────────────────
+    def start(self, root):
+        """Empieza a sondear; root es la ventana principal de Tk"""
+        self.stop()
+        try:
+            self._conn = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False)
+            self._data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            self._versions = get_external_table_versions(self._conn.cursor())
+        except sqlite3.Error as e:
+            print(f"No se pudo iniciar el vigilante de la base de datos: {e}")
+            self._close()
+            return False
+        self._signature = self._file_signature()
+        self._root = root
+        self._schedule()
+        return True
+
+    def stop(self):
+        if self._job is not None and self._root is not None:
+            try:
+                self._root.after_cancel(self._job)
+            except Exception:
+                pass  # La ventana principal ya no existe
+        self._job = None
+        self._root = None
+        self._close()
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+            self._conn = None
+
+    # ── Sondeo ───────────────────────────────────────────────────────────────
+    def _schedule(self):
+        try:
+            self._job = self._root.after(self.poll_ms, self._poll)
+        except Exception:
+            self._job = None  # La ventana principal ya no existe
+
+    def _poll(self):
+        self._job = None
+        if self._conn is None:
+            return
+        try:
+            self.check()
+        except Exception as e:
+            print(f"Error al revisar cambios externos: {e}")
+        self._schedule()
+
+    def check(self):
+        """Revisa una vez; retorna el conjunto de tablas cambiadas por otros procesos"""
+        self.stats['polls'] += 1
+        signature = self._file_signature()
+        if signature == self._signature:
+            return set()
+        self._signature = signature
+
+        self.stats['queries'] += 1
+        data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version == self._data_version:
+            return set()
+        self._data_version = data_version
+
+        versions = get_external_table_versions(self._conn.cursor())
+        changed = {table for table, version in versions.items()
+                   if self._versions.get(table) != version}
+        self._versions = versions
+        if changed:
+            self.stats['external_changes'] += 1
+            self._publish(changed)
+        return changed
+
+    def _publish(self, tables):
+        self.bus.publish(TABLES_CHANGED, tables=sorted(tables))
+        for topic in sorted({TABLE_TOPICS[table] for table in tables if table in TABLE_TOPICS}):
+            self.bus.publish(topic)
+
+    def _file_signature(self):
+        signature = []
+        for path in (self.db_path, self.db_path + '-wal'):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+
+db_watcher = DatabaseWatcher()
@@ -0,0 +1,224 @@
+"""
+Bus de eventos en el proceso para mantener sincronizadas las ventanas.
+
+Los caminos de escritura (guardar o eliminar una venta, registrar un pago,
+cambiar stock, guardar un lote de compras, registrar una pérdida) publican
+un evento con los ids de las entidades afectadas. Cada ventana se suscribe
+solo a los temas que muestra; subscribe_window() junta los eventos que
+llegan seguidos y llama al callback una sola vez con root.after(), de modo
+que una ráfaga de cambios (p. ej. un lote de 50 compras) produce una sola
+recarga por ventana y las ventanas que no muestran esos datos no consultan
+nada.
+
+    from utils.events import event_bus, SALE_SAVED
+    event_bus.publish(SALE_SAVED, sales=[sale_id], clients=[client_id])
+
+    subscribe_window(self.window, (SALE_SAVED, PAYMENT_REGISTERED),
+                     lambda changes: self.refresh_clients(changes.ids('clients')))
+"""
+
+import threading
+from collections import defaultdict
+
+# ── Temas ────────────────────────────────────────────────────────────────────
+SALE_SAVED           = 'sale_saved'
+SALE_DELETED         = 'sale_deleted'
+PAYMENT_REGISTERED   = 'payment_registered'
+STOCK_CHANGED        = 'stock_changed'         # Stock u otros datos de productos
+PURCHASE_BATCH_SAVED = 'purchase_batch_saved'
+LOSS_RECORDED        = 'loss_recorded'
+TABLES_CHANGED       = 'tables_changed'        # Cambios de otro proceso: tables=[...]
+
+# Temas que cambian el stock o los datos de los productos
+PRODUCT_TOPICS = frozenset({STOCK_CHANGED, SALE_SAVED, SALE_DELETED, PURCHASE_BATCH_SAVED, LOSS_RECORDED})
+
+# Tema con el que se anuncia el cambio externo de cada tabla (sin ids)
+TABLE_TOPICS = {
+    'sales':               SALE_SAVED,
+    'sale_details':        SALE_SAVED,
+    'clients':             PAYMENT_REGISTERED,
+    'client_transactions': PAYMENT_REGISTERED,
+    'payment_allocations': PAYMENT_REGISTERED,
+    'products':            STOCK_CHANGED,
+    'purchases':           PURCHASE_BATCH_SAVED,
+    'purchase_details':    PURCHASE_BATCH_SAVED,
+    'losses':              LOSS_RECORDED,
+}
+
+# Entidades cuyos ids puede llevar un evento; si un evento omite una, se
+# entiende que pudo cambiar cualquier fila de esa entidad
+ENTITIES = ('sales', 'clients', 'products', 'purchases', 'losses')
+
+# ── Configuración ────────────────────────────────────────────────────────────
+COALESCE_MS = 100   # Espera para juntar eventos antes de refrescar una ventana
+
+
+class Event:
+    """Un cambio publicado: tema e ids por entidad (sales, clients, products...)"""
+
+    def __init__(self, topic, **ids):
+        self.topic = topic
+        self.ids = {entity: frozenset(_as_ids(values)) for entity, values in ids.items()}
+
+    def __repr__(self):
+        ids = ", ".join(f"{entity}={sorted(values)}" for entity, values in self.ids.items())
+        return f"Event({self.topic}{', ' + ids if ids else ''})"
+
+
+class Changes:
+    """Eventos acumulados entre dos refrescos de una ventana"""
+
+    def __init__(self):
+        self.topics = set()
+        self.events = []
+        self._ids = defaultdict(set)
+        self._unknown = set()   # Entidades que algún evento no detalló
+
+    def add(self, event):
+        self.topics.add(event.topic)
+        self.events.append(event)
+        for entity, values in event.ids.items():
+            self._ids[entity].update(values)
+        self._unknown.update(entity for entity in ENTITIES if entity not in event.ids)
+
+    def ids(self, entity):
+        """
+        Ids de la entidad mencionados por los eventos, o None si algún evento
+        no los indicó (hay que suponer que cambió cualquiera).
+        """
+        if entity in self._unknown:
+            return None
+        return set(self._ids.get(entity, ()))
+
+    def __contains__(self, topic):
+        return topic in self.topics
+
+    def __bool__(self):
+        return bool(self.events)
+
+    def __repr__(self):
+        return f"Changes({self.events!r})"
+
+
+class EventBus:
+    """Publicación/suscripción por tema; los callbacks se llaman en el hilo que publica"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(list)
+        self.published = defaultdict(int)   # tema -> eventos publicados
+
+    def subscribe(self, topics, callback):
+        """callback(event) para cada evento de los temas indicados"""
+        with self._lock:
+            for topic in _as_topics(topics):
+                self._subscribers[topic].append(callback)
+
+    def unsubscribe(self, topics, callback):
+        with self._lock:
+            for topic in _as_topics(topics):
+                if callback in self._subscribers[topic]:
+                    self._subscribers[topic].remove(callback)
+
+    def publish(self, topic, **ids):
+        """Publica un evento; un error en un suscriptor no afecta a los demás"""
+        event = Event(topic, **ids)
+        with self._lock:
+            self.published[topic] += 1
+            callbacks = list(self._subscribers[topic])
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Error en suscriptor de {topic}: {e}")
+        return event
+
+    def subscribers(self, topic):
+        with self._lock:
+            return len(self._subscribers[topic])
+
+
+class WindowSubscription:
+    """
+    Suscripción de una ventana Tk. Los eventos se acumulan en un Changes y
+    callback(changes) se llama una sola vez, COALESCE_MS después del primero,
+    en el hilo de Tk. Se cancela sola cuando se destruye el widget.
+    """
+
+    def __init__(self, widget, topics, callback, bus, delay_ms=COALESCE_MS):
+        self.widget = widget
+        self.topics = _as_topics(topics)
+        self.callback = callback
+        self.bus = bus
+        self.delay_ms = delay_ms
+        self._lock = threading.Lock()
+        self._pending = Changes()
+        self._job = None
+        self.active = True
+
+        bus.subscribe(self.topics, self._on_event)
+        widget.bind('<Destroy>', self._on_destroy, add='+')
+
+    def cancel(self):
+        self.active = False
+        self.bus.unsubscribe(self.topics, self._on_event)
+        with self._lock:
+            job, self._job = self._job, None
+            self._pending = Changes()
+        if job is not None:
+            try:
+                self.widget.after_cancel(job)
+            except Exception:
+                pass  # El widget ya no existe
+
+    def _on_event(self, event):
+        with self._lock:
+            if not self.active:
+                return
+            self._pending.add(event)
+            if self._job is not None:
+                return
+            try:
+                self._job = self.widget.after(self.delay_ms, self._flush)
+            except Exception:
+                self.active = False   # El widget ya no existe
+        if not self.active:
+            self.bus.unsubscribe(self.topics, self._on_event)
+
+    def _flush(self):
+        with self._lock:
+            changes, self._pending = self._pending, Changes()
+            self._job = None
+        if not self.active or not changes:
+            return
+        try:
+            if not self.widget.winfo_exists():
+                return
+            self.callback(changes)
+        except Exception as e:
+            print(f"Error al refrescar ventana por eventos: {e}")
+
+    def _on_destroy(self, event):
+        # <Destroy> también llega por los widgets hijos
+        if event.widget is self.widget:
+            self.cancel()
+
+
+def _as_topics(topics):
+    return (topics,) if isinstance(topics, str) else tuple(topics)
+
+
+def _as_ids(values):
+    if values is None:
+        return ()
+    if isinstance(values, (list, tuple, set, frozenset)):
+        return (value for value in values if value is not None)
+    return (values,)
+
+
+event_bus = EventBus()
+
+
+def subscribe_window(widget, topics, callback, delay_ms=COALESCE_MS):
+    """Suscribe una ventana al bus global; ver WindowSubscription"""
+    return WindowSubscription(widget, topics, callback, event_bus, delay_ms)
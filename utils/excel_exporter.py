@@ -1,14 +1,354 @@
-import pandas as pd
 from datetime import datetime
+from itertools import groupby
+import heapq
 import os
-from models.sale import Sale
-from models.purchase import Purchase
-from models.expense import Expense
-from models.product import Product
-from models.client import Client
-from models.loss import Loss
+from models.financial_report import get_financial_summary
 from config.database import get_connection
 
+# pandas y openpyxl se importan al exportar, no al cargar el módulo: son
+# lentos de importar y la ventana de reportes no debe esperarlos al abrir.
+
+# Filas leídas por lote al recorrer los resultados (fetchmany)
+BATCH_SIZE = 500
+
+# Con más detalles (venta + compra) que esto, los libros se escriben en modo streaming
+STREAMING_THRESHOLD = 20000
+
+CASH_FLOW_COLUMNS = ['Fecha', 'Tipo', 'Concepto', 'Cantidad', 'Monto', 'Saldo Running']
+INVENTORY_COLUMNS = ['Fecha', 'Tipo', 'Movimiento', 'Producto', 'Cantidad', 'Costo Unitario',
+                     'Costo Total', 'Referencia', 'Notas']
+INVENTORY_SUMMARY_COLUMNS = ['Producto', 'Stock Actual', 'Costo Unitario', 'Valor Inventario',
+                             'Total Comprado', 'Total Vendido', 'Total Perdido']
+
+# Estado efectivo de la venta, con el mismo criterio que Sale.get_all
+_SALE_STATUS_SQL = '''
+    CASE
+        WHEN s.status IS NULL THEN 'paid'
+        WHEN s.status = '' THEN CASE WHEN COALESCE(s.client_id, 0) != 0 THEN 'pending' ELSE 'paid' END
+        ELSE s.status
+    END
+'''
+
+# Una fila por detalle de venta (o una sola fila con detalle NULL si la venta no tiene detalles)
+_SALE_LINES_SQL = f'''
+    SELECT s.id as sale_id, s.client_id, s.total, s.created_at,
+           {_SALE_STATUS_SQL} as status,
+           c.name as client_name,
+           sd.id as detail_id, sd.quantity, sd.unit_price, sd.subtotal, sd.cost_price,
+           p.name as product_name
+    FROM sales s
+    LEFT JOIN clients c ON c.id = s.client_id
+    LEFT JOIN sale_details sd ON sd.sale_id = s.id
+    LEFT JOIN products p ON p.id = sd.product_id
+'''
+
+# Una fila por detalle de compra (o una sola fila con detalle NULL si la compra no tiene detalles)
+_PURCHASE_LINES_SQL = '''
+    SELECT pu.id as purchase_id, pu.total, pu.iva, pu.shipping, pu.date,
+           pu.invoice_number,
+           pd.id as detail_id, pd.quantity, pd.unit_price, pd.subtotal,
+           p.name as product_name
+    FROM purchases pu
+    LEFT JOIN purchase_details pd ON pd.purchase_id = pu.id
+    LEFT JOIN products p ON p.id = pd.product_id
+'''
+
+_LOSSES_SQL = '''
+    SELECT l.*, p.name as product_name, u.name as user_name
+    FROM losses l
+    JOIN products p ON l.product_id = p.id
+    JOIN users u ON l.created_by = u.id
+'''
+
+_INVENTORY_SUMMARY_SQL = '''
+    SELECT 
+        p.name as producto,
+        p.stock as stock_actual,
+        p.cost_price as costo_actual,
+        (p.stock * p.cost_price) as valor_inventario,
+        COALESCE(compras.total_comprado, 0) as total_comprado,
+        COALESCE(ventas.total_vendido, 0) as total_vendido,
+        COALESCE(perdidas.total_perdido, 0) as total_perdido
+    FROM products p
+    LEFT JOIN (
+        SELECT pd.product_id, SUM(pd.quantity) as total_comprado
+        FROM purchase_details pd
+        GROUP BY pd.product_id
+    ) compras ON p.id = compras.product_id
+    LEFT JOIN (
+        SELECT sd.product_id, SUM(sd.quantity) as total_vendido
+        FROM sale_details sd
+        JOIN sales s ON sd.sale_id = s.id
+        WHERE s.status IN ('paid', 'pending')
+        GROUP BY sd.product_id
+    ) ventas ON p.id = ventas.product_id
+    LEFT JOIN (
+        SELECT l.product_id, SUM(l.quantity) as total_perdido
+        FROM losses l
+        GROUP BY l.product_id
+    ) perdidas ON p.id = perdidas.product_id
+    WHERE p.stock > 0 OR compras.total_comprado > 0 OR ventas.total_vendido > 0 OR perdidas.total_perdido > 0
+    ORDER BY valor_inventario DESC
+'''
+
+
+def _iter_rows(sql, params=(), batch_size=BATCH_SIZE):
+    """Recorre el resultado de una consulta por lotes, sin cargarlo entero en memoria"""
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
+def _iter_grouped(sql, key, params=()):
+    """
+    Agrupa filas consecutivas de cabecera + detalle por la columna key.
+    Entrega (primera_fila, detalles), donde detalles excluye las filas sin
+    detalle o cuyo producto ya no existe (igual que el JOIN con products
+    de las consultas por venta/compra).
+    """
+    for _, rows in groupby(_iter_rows(sql, params), key=lambda row: row[key]):
+        rows = list(rows)
+        details = [row for row in rows if row['detail_id'] is not None and row['product_name'] is not None]
+        yield rows[0], details
+
+
+def _parse_date(value):
+    """Convierte la fecha guardada en datetime (None si está vacía, datetime.min si no se reconoce)"""
+    if isinstance(value, datetime) or not value:
+        return value or None
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.min
+
+
+def _export_path(filename):
+    """Ruta dentro de la carpeta de exportación (la crea si no existe)"""
+    export_dir = "exports"
+    if not os.path.exists(export_dir):
+        os.makedirs(export_dir)
+    return os.path.join(export_dir, filename)
+
+
+def _movement_date(movement):
+    """Clave de orden de un movimiento (las fechas vacías van primero)"""
+    return movement['Fecha'] or datetime.min
+
+
+def _format_date(movement):
+    """Formatea la fecha de un movimiento para mostrar"""
+    movement['Fecha'] = movement['Fecha'].strftime("%Y-%m-%d %H:%M:%S") if movement['Fecha'] else "N/A"
+    return movement
+
+
+def _needs_streaming():
+    """Decide si el historial es lo bastante grande para exportar en modo streaming"""
+    conn = get_connection()
+    try:
+        row = conn.execute('''
+            SELECT (SELECT COUNT(*) FROM sale_details) + (SELECT COUNT(*) FROM purchase_details)
+        ''').fetchone()
+        return (row[0] or 0) > STREAMING_THRESHOLD
+    finally:
+        conn.close()
+
+
+def _write_sheet(workbook, title, columns, rows):
+    """Escribe filas (diccionarios) en una hoja de un libro write-only, una por una"""
+    sheet = workbook.create_sheet(title)
+    sheet.append(columns)
+    for row in rows:
+        sheet.append([row.get(column) for column in columns])
+
+
+# ── Movimientos del libro diario (cada generador entrega en orden de fecha) ──
+def _iter_sale_income():
+    """Ventas pagadas como ingresos"""
+    sql = (_SALE_LINES_SQL + f" WHERE {_SALE_STATUS_SQL} = 'paid'"
+           " ORDER BY s.created_at, s.id DESC, sd.id")
+    for sale, details in _iter_grouped(sql, 'sale_id'):
+        fecha = _parse_date(sale['created_at'])
+        if details:
+            for detail in details:
+                yield {
+                    'Fecha': fecha,
+                    'Tipo': 'Ingreso',
+                    'Concepto': f"Venta - {detail['product_name']}",
+                    'Cantidad': detail['quantity'],
+                    'Monto': detail['subtotal'],
+                    'Saldo Running': 0
+                }
+        else:
+            # Si no hay detalles, usar la información general de la venta
+            yield {
+                'Fecha': fecha,
+                'Tipo': 'Ingreso',
+                'Concepto': f"Venta #{sale['sale_id']}",
+                'Cantidad': 1,
+                'Monto': sale['total'],
+                'Saldo Running': 0
+            }
+
+
+def _iter_purchase_outflows():
+    """Compras como egresos"""
+    sql = _PURCHASE_LINES_SQL + " ORDER BY pu.date, pu.id DESC, pd.id"
+    for purchase, details in _iter_grouped(sql, 'purchase_id'):
+        fecha = _parse_date(purchase['date'])
+        if details:
+            for detail in details:
+                yield {
+                    'Fecha': fecha,
+                    'Tipo': 'Egreso',
+                    'Concepto': f"Compra - {detail['product_name']}",
+                    'Cantidad': detail['quantity'],
+                    'Monto': -detail['subtotal'],
+                    'Saldo Running': 0
+                }
+        else:
+            # Si no hay detalles, usar la información general de la compra
+            yield {
+                'Fecha': fecha,
+                'Tipo': 'Egreso',
+                'Concepto': f"Compra #{purchase['purchase_id']}",
+                'Cantidad': 1,
+                'Monto': -purchase['total'],
+                'Saldo Running': 0
+            }
+
+
+def _iter_expense_outflows():
+    """Gastos operativos como egresos"""
+    for expense in _iter_rows('SELECT date, description, amount FROM expenses ORDER BY date, id DESC'):
+        yield {
+            'Fecha': _parse_date(expense['date']),
+            'Tipo': 'Egreso',
+            'Concepto': f"Gasto Operativo - {expense['description']}",
+            'Cantidad': 1,
+            'Monto': -expense['amount'],
+            'Saldo Running': 0
+        }
+
+
+def _iter_loss_outflows():
+    """Pérdidas como egresos"""
+    for loss in _iter_rows(_LOSSES_SQL + " ORDER BY l.loss_date, l.id DESC"):
+        yield {
+            'Fecha': _parse_date(loss['loss_date']),
+            'Tipo': 'Egreso',
+            'Concepto': f"Pérdida - {loss['product_name']} ({loss['loss_type']})",
+            'Cantidad': loss['quantity'],
+            'Monto': -loss['total_cost'],  # Negativo porque es una pérdida
+            'Saldo Running': 0
+        }
+
+
+def _cash_flow_summary_rows():
+    """Filas de la hoja Resumen del libro diario"""
+    try:
+        # Mismos totales que el resumen de ReportsWindow
+        summary = get_financial_summary()
+        rows = [
+            ('Total Ventas', summary.paid_sales),
+            ('Total Compras', summary.total_purchases),
+            ('Total Gastos Operativos', summary.total_expenses),
+            ('Total Pérdidas', summary.total_losses),
+            ('Efectivo en Posesión', summary.cash_in_hand),
+        ]
+    except Exception as e:
+        print(f"Error al crear resumen: {e}")
+        rows = [(f'No se pudo generar resumen: {e}', None)]
+    for concepto, monto in rows:
+        yield {'Concepto': concepto, 'Monto': monto}
+
+
+# ── Movimientos de inventario ────────────────────────────────────────────────
+def _iter_purchase_entries():
+    """Compras como entradas de inventario (solo las que tienen detalles)"""
+    sql = _PURCHASE_LINES_SQL + " ORDER BY pu.date, pu.id DESC, pd.id"
+    for purchase, details in _iter_grouped(sql, 'purchase_id'):
+        fecha = _parse_date(purchase['date'])
+        for detail in details:
+            yield {
+                'Fecha': fecha,
+                'Tipo': 'Entrada',
+                'Movimiento': 'Compra',
+                'Producto': detail['product_name'],
+                'Cantidad': detail['quantity'],
+                'Costo Unitario': detail['unit_price'],
+                'Costo Total': detail['subtotal'],
+                'Referencia': f"Compra #{purchase['purchase_id']}",
+                'Notas': f"Factura: {purchase['invoice_number'] or 'N/A'}"
+            }
+
+
+def _iter_sale_exits():
+    """Ventas como salidas de inventario (al costo registrado en el detalle)"""
+    sql = _SALE_LINES_SQL + " ORDER BY s.created_at, s.id DESC, sd.id"
+    for sale, details in _iter_grouped(sql, 'sale_id'):
+        fecha = _parse_date(sale['created_at'])
+        for detail in details:
+            cost_price = detail['cost_price'] or 0
+            yield {
+                'Fecha': fecha,
+                'Tipo': 'Salida',
+                'Movimiento': 'Venta',
+                'Producto': detail['product_name'],
+                'Cantidad': -detail['quantity'],  # Negativo porque es salida
+                'Costo Unitario': cost_price,
+                'Costo Total': -(detail['quantity'] * cost_price),  # Negativo
+                'Referencia': f"Venta #{sale['sale_id']}",
+                'Notas': f"Precio venta: ${detail['unit_price']:.2f}"
+            }
+
+
+def _iter_loss_exits():
+    """Pérdidas como salidas de inventario"""
+    for loss in _iter_rows(_LOSSES_SQL + " ORDER BY l.loss_date, l.id DESC"):
+        yield {
+            'Fecha': _parse_date(loss['loss_date']),
+            'Tipo': 'Salida',
+            'Movimiento': 'Pérdida',
+            'Producto': loss['product_name'],
+            'Cantidad': -loss['quantity'],  # Negativo porque es salida
+            'Costo Unitario': loss['unit_cost'],
+            'Costo Total': -loss['total_cost'],  # Negativo
+            'Referencia': f"Pérdida #{loss['id']}",
+            'Notas': f"{loss['loss_type']}: {loss['reason']}"
+        }
+
+
+def _inventory_summary_rows():
+    """Filas de la hoja Resumen por Producto"""
+    try:
+        for row in _iter_rows(_INVENTORY_SUMMARY_SQL):
+            yield {
+                'Producto': row['producto'],
+                'Stock Actual': row['stock_actual'],
+                'Costo Unitario': row['costo_actual'],
+                'Valor Inventario': row['valor_inventario'],
+                'Total Comprado': row['total_comprado'],
+                'Total Vendido': row['total_vendido'],
+                'Total Perdido': row['total_perdido']
+            }
+    except Exception as e:
+        print(f"Error al crear resumen de inventario: {e}")
+        yield {'Producto': f'No se pudo generar resumen: {e}'}
+
+
 class ExcelExporter:
     @staticmethod
     def export_sales(filename=None):
@@ -18,65 +358,43 @@ class ExcelExporter:
             filename = f"ventas_{timestamp}.xlsx"
         
         try:
-            # Obtener datos
-            sales = Sale.get_all()
-            products = {p.id: p.name for p in Product.get_all()}
-            clients = {c.id: c.name for c in Client.get_all()}
-            
-            # Preparar datos para el DataFrame
+            import pandas as pd
+            # Ventas con sus detalles y cliente en una sola consulta
             data = []
-            for sale in sales:
-                # Obtener detalles de la venta
-                conn = get_connection()
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT sd.*, p.name as product_name 
-                    FROM sale_details sd
-                    JOIN products p ON sd.product_id = p.id
-                    WHERE sd.sale_id = ?
-                ''', (sale.id,))
-                
-                details = cursor.fetchall()
-                conn.close()
-                
-                client_name = clients.get(sale.client_id, "N/A") if sale.client_id else "Venta de Contado"
+            sql = _SALE_LINES_SQL + " ORDER BY s.created_at DESC, s.id DESC, sd.id"
+            for sale, details in _iter_grouped(sql, 'sale_id'):
+                client_name = (sale['client_name'] or "N/A") if sale['client_id'] else "Venta de Contado"
+                status = 'Pagado' if sale['status'] == 'paid' else 'Pendiente'
+                fecha = sale['created_at'] if sale['created_at'] else "N/A"
                 
                 if details:
                     for detail in details:
-                        product_name = detail['product_name']
-                        
                         data.append({
-                            'ID': sale.id,
-                            'Producto': product_name,
+                            'ID': sale['sale_id'],
+                            'Producto': detail['product_name'],
                             'Cliente': client_name,
                             'Cantidad': detail['quantity'],
                             'Precio Unitario': detail['unit_price'],
-                            'Total': sale.total,
-                            'Estado': 'Pagado' if sale.status == 'paid' else 'Pendiente',
-                            'Fecha': sale.created_at if sale.created_at else "N/A"
+                            'Total': sale['total'],
+                            'Estado': status,
+                            'Fecha': fecha
                         })
                 else:
                     # Si no hay detalles, mostrar solo la información básica de la venta
                     data.append({
-                        'ID': sale.id,
+                        'ID': sale['sale_id'],
                         'Producto': "N/A",
                         'Cliente': client_name,
                         'Cantidad': "N/A",
                         'Precio Unitario': "N/A",
-                        'Total': sale.total,
-                        'Estado': 'Pagado' if sale.status == 'paid' else 'Pendiente',
-                        'Fecha': sale.created_at if sale.created_at else "N/A"
+                        'Total': sale['total'],
+                        'Estado': status,
+                        'Fecha': fecha
                     })
             
             # Crear DataFrame y exportar
             df = pd.DataFrame(data)
-            
-            # Crear directorio de exportación si no existe
-            export_dir = "exports"
-            if not os.path.exists(export_dir):
-                os.makedirs(export_dir)
-            
-            filepath = os.path.join(export_dir, filename)
+            filepath = _export_path(filename)
             df.to_excel(filepath, index=False)
             
             return filepath
@@ -92,64 +410,41 @@ class ExcelExporter:
             filename = f"compras_{timestamp}.xlsx"
         
         try:
-            # Obtener datos
-            purchases = Purchase.get_all()
-            products = {p.id: p.name for p in Product.get_all()}
-            
-            # Preparar datos para el DataFrame
+            import pandas as pd
+            # Compras con sus detalles en una sola consulta
             data = []
-            for purchase in purchases:
-                # Obtener detalles de la compra
-                conn = get_connection()
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT pd.*, p.name as product_name 
-                    FROM purchase_details pd
-                    JOIN products p ON pd.product_id = p.id
-                    WHERE pd.purchase_id = ?
-                ''', (purchase.id,))
-                
-                details = cursor.fetchall()
-                conn.close()
+            sql = _PURCHASE_LINES_SQL + " ORDER BY pu.date DESC, pu.id DESC, pd.id"
+            for purchase, details in _iter_grouped(sql, 'purchase_id'):
+                common = {
+                    'Flete': purchase['shipping'],
+                    'IVA': purchase['iva'],
+                    'Total': purchase['total'],
+                    'No. Factura': purchase['invoice_number'] or "N/A",
+                    'Fecha': purchase['date'] if purchase['date'] else "N/A"
+                }
                 
                 if details:
                     for detail in details:
-                        product_name = detail['product_name']
-                        
                         data.append({
-                            'ID': purchase.id,
-                            'Producto': product_name,
+                            'ID': purchase['purchase_id'],
+                            'Producto': detail['product_name'],
                             'Cantidad': detail['quantity'],
                             'Precio Unitario': detail['unit_price'],
-                            'Flete': purchase.shipping,
-                            'IVA': purchase.iva,
-                            'Total': purchase.total,
-                            'No. Factura': purchase.invoice_number or "N/A",
-                            'Fecha': purchase.date if purchase.date else "N/A"
+                            **common
                         })
                 else:
                     # Si no hay detalles, mostrar solo la información básica de la compra
                     data.append({
-                        'ID': purchase.id,
+                        'ID': purchase['purchase_id'],
                         'Producto': "N/A",
                         'Cantidad': "N/A",
                         'Precio Unitario': "N/A",
-                        'Flete': purchase.shipping,
-                        'IVA': purchase.iva,
-                        'Total': purchase.total,
-                        'No. Factura': purchase.invoice_number or "N/A",
-                        'Fecha': purchase.date if purchase.date else "N/A"
+                        **common
                     })
             
             # Crear DataFrame y exportar
             df = pd.DataFrame(data)
-            
-            # Crear directorio de exportación si no existe
-            export_dir = "exports"
-            if not os.path.exists(export_dir):
-                os.makedirs(export_dir)
-            
-            filepath = os.path.join(export_dir, filename)
+            filepath = _export_path(filename)
             df.to_excel(filepath, index=False)
             
             return filepath
@@ -165,21 +460,10 @@ class ExcelExporter:
             filename = f"perdidas_{timestamp}.xlsx"
         
         try:
-            # Obtener datos
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT l.*, p.name as product_name, u.name as user_name
-                FROM losses l
-                JOIN products p ON l.product_id = p.id
-                JOIN users u ON l.created_by = u.id
-            ''')
-            losses_data = cursor.fetchall()
-            conn.close()
-            
+            import pandas as pd
             # Preparar datos para el DataFrame
             data = []
-            for loss_data in losses_data:
+            for loss_data in _iter_rows(_LOSSES_SQL + " ORDER BY l.loss_date DESC"):
                 data.append({
                     'ID': loss_data['id'],
                     'Fecha': loss_data['loss_date'],
@@ -195,13 +479,7 @@ class ExcelExporter:
             
             # Crear DataFrame y exportar
             df = pd.DataFrame(data)
-            
-            # Crear directorio de exportación si no existe
-            export_dir = "exports"
-            if not os.path.exists(export_dir):
-                os.makedirs(export_dir)
-            
-            filepath = os.path.join(export_dir, filename)
+            filepath = _export_path(filename)
             df.to_excel(filepath, index=False)
             
             return filepath
@@ -210,318 +488,105 @@ class ExcelExporter:
             raise Exception(f"Error al exportar pérdidas: {str(e)}")
 
     @staticmethod
-    def export_cash_flow(filename=None):
-        """Exporta el libro diario de ingresos y egresos"""
+    def iter_cash_flow_movements():
+        """
+        Recorre el libro diario (ventas pagadas, compras, gastos y pérdidas)
+        en orden de fecha, calculando el saldo corriente sobre la marcha.
+        """
+        running_balance = 0
+        for movement in heapq.merge(_iter_sale_income(), _iter_purchase_outflows(),
+                                    _iter_expense_outflows(), _iter_loss_outflows(),
+                                    key=_movement_date):
+            running_balance += movement['Monto']
+            movement['Saldo Running'] = running_balance
+            yield _format_date(movement)
+
+    @staticmethod
+    def get_cash_flow_movements():
+        """Movimientos del libro diario ordenados por fecha, con el saldo corriente"""
+        return list(ExcelExporter.iter_cash_flow_movements())
+
+    @staticmethod
+    def export_cash_flow(filename=None, streaming=None):
+        """
+        Exporta el libro diario de ingresos y egresos.
+        streaming=True escribe fila por fila con memoria constante; por
+        defecto se activa solo cuando el historial es grande.
+        """
         if filename is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"libro_diario_{timestamp}.xlsx"
         
         try:
-            # Obtener todos los movimientos
-            movements = []
-            
-            # Obtener datos de referencia
-            products = {p.id: p.name for p in Product.get_all()}
-            
-            # Agregar ventas como ingresos
-            sales = Sale.get_all()
-            for sale in sales:
-                if sale.status == 'paid':  # Solo ventas realmente pagadas
-                    # Obtener detalles de la venta
-                    conn = get_connection()
-                    cursor = conn.cursor()
-                    cursor.execute('''
-                        SELECT sd.*, p.name as product_name 
-                        FROM sale_details sd
-                        JOIN products p ON sd.product_id = p.id
-                        WHERE sd.sale_id = ?
-                    ''', (sale.id,))
-                    
-                    details = cursor.fetchall()
-                    conn.close()
-                    
-                    if details:
-                        for detail in details:
-                            product_name = detail['product_name']
-                            movements.append({
-                                'Fecha': sale.created_at,
-                                'Tipo': 'Ingreso',
-                                'Concepto': f"Venta - {product_name}",
-                                'Cantidad': detail['quantity'],
-                                'Monto': detail['subtotal'],
-                                'Saldo Running': 0
-                            })
-                    else:
-                        # Si no hay detalles, usar la información general de la venta
-                        movements.append({
-                            'Fecha': sale.created_at,
-                            'Tipo': 'Ingreso',
-                            'Concepto': f"Venta #{sale.id}",
-                            'Cantidad': 1,
-                            'Monto': sale.total,
-                            'Saldo Running': 0
-                        })
-            
-            # Agregar compras como egresos
-            purchases = Purchase.get_all()
-            for purchase in purchases:
-                # Obtener detalles de la compra
-                conn = get_connection()
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT pd.*, p.name as product_name 
-                    FROM purchase_details pd
-                    JOIN products p ON pd.product_id = p.id
-                    WHERE pd.purchase_id = ?
-                ''', (purchase.id,))
-                
-                details = cursor.fetchall()
-                conn.close()
-                
-                if details:
-                    for detail in details:
-                        product_name = detail['product_name']
-                        movements.append({
-                            'Fecha': purchase.date,
-                            'Tipo': 'Egreso',
-                            'Concepto': f"Compra - {product_name}",
-                            'Cantidad': detail['quantity'],
-                            'Monto': -detail['subtotal'],
-                            'Saldo Running': 0
-                        })
-                else:
-                    # Si no hay detalles, usar la información general de la compra
-                    movements.append({
-                        'Fecha': purchase.date,
-                        'Tipo': 'Egreso',
-                        'Concepto': f"Compra #{purchase.id}",
-                        'Cantidad': 1,
-                        'Monto': -purchase.total,
-                        'Saldo Running': 0
-                    })
-            
-            # Agregar gastos operativos como egresos
-            expenses = Expense.get_all()
-            for expense in expenses:
-                movements.append({
-                    'Fecha': expense.date,
-                    'Tipo': 'Egreso',
-                    'Concepto': f"Gasto Operativo - {expense.description}",
-                    'Cantidad': 1,
-                    'Monto': -expense.amount,
-                    'Saldo Running': 0
-                })
-            
-            # Agregar pérdidas como egresos - NUEVO
-            losses = Loss.get_all()
-            for loss in losses:
-                movements.append({
-                    'Fecha': loss.loss_date,
-                    'Tipo': 'Egreso',
-                    'Concepto': f"Pérdida - {loss.product_name} ({loss.loss_type})",
-                    'Cantidad': loss.quantity,
-                    'Monto': -loss.total_cost,  # Negativo porque es una pérdida
-                    'Saldo Running': 0
-                })
-            
-            for movement in movements:
-                if movement['Fecha'] and isinstance(movement['Fecha'], str):
-                    try:
-                        # Intentar convertir la cadena a datetime
-                        movement['Fecha'] = datetime.strptime(movement['Fecha'], "%Y-%m-%d %H:%M:%S")
-                    except ValueError:
-                        # Si falla, usar una fecha mínima
-                        movement['Fecha'] = datetime.min
-
-            # Ordenar por fecha (manejar fechas None)
-            movements.sort(key=lambda x: x['Fecha'] if x['Fecha'] else datetime.min)
-
-            # Calcular saldo corriente
-            running_balance = 0
-            for movement in movements:
-                running_balance += movement['Monto']
-                movement['Saldo Running'] = running_balance
-                
-                # Formatear fecha para mostrar
-                if movement['Fecha']:
-                    if isinstance(movement['Fecha'], datetime):
-                        # Si es datetime, formatearlo
-                        movement['Fecha'] = movement['Fecha'].strftime("%Y-%m-%d %H:%M:%S")
-                else:
-                    movement['Fecha'] = "N/A"
-            
-            # Crear DataFrame
-            df = pd.DataFrame(movements)
-            
-            # Crear directorio de exportación si no existe
-            export_dir = "exports"
-            if not os.path.exists(export_dir):
-                os.makedirs(export_dir)
-            
-            filepath = os.path.join(export_dir, filename)
+            filepath = _export_path(filename)
+            if streaming is None:
+                streaming = _needs_streaming()
+            
+            if streaming:
+                from openpyxl import Workbook
+                workbook = Workbook(write_only=True)
+                _write_sheet(workbook, 'Libro Diario', CASH_FLOW_COLUMNS,
+                             ExcelExporter.iter_cash_flow_movements())
+                _write_sheet(workbook, 'Resumen', ['Concepto', 'Monto'], _cash_flow_summary_rows())
+                workbook.save(filepath)
+                return filepath
+            
+            import pandas as pd
+            df = pd.DataFrame(ExcelExporter.get_cash_flow_movements())
             
             # Crear un archivo Excel con múltiples hojas
             with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
                 # Hoja principal con movimientos
                 df.to_excel(writer, sheet_name='Libro Diario', index=False)
                 
-                # Hoja de resumen - ACTUALIZADA para incluir pérdidas
-                try:
-                    conn = get_connection()
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT SUM(total) FROM sales WHERE status = 'paid'")
-                    total_sales = cursor.fetchone()[0] or 0.0
-                    conn.close()
-                    total_purchases = Purchase.get_total_purchases()
-                    total_expenses = Expense.get_total_expenses()
-                    total_losses = Loss.get_total_losses()  # NUEVO
-                    cash_in_hand = total_sales - total_purchases - total_expenses
-                    
-                    summary_data = {
-                        'Concepto': ['Total Ventas', 'Total Compras', 'Total Gastos Operativos', 'Total Pérdidas', 'Efectivo en Posesión'],
-                        'Monto': [total_sales, total_purchases, total_expenses, total_losses, cash_in_hand]  # ACTUALIZADO
-                    }
-                    
-                    summary_df = pd.DataFrame(summary_data)
-                    summary_df.to_excel(writer, sheet_name='Resumen', index=False)
-                    
-                except Exception as e:
-                    print(f"Error al crear resumen: {e}")
-                    # Crear resumen vacío en caso de error
-                    summary_df = pd.DataFrame({'Error': [f'No se pudo generar resumen: {e}']})
-                    summary_df.to_excel(writer, sheet_name='Resumen', index=False)
+                # Hoja de resumen
+                summary_df = pd.DataFrame(list(_cash_flow_summary_rows()))
+                summary_df.to_excel(writer, sheet_name='Resumen', index=False)
             
             return filepath
             
         except Exception as e:
             raise Exception(f"Error al exportar libro diario: {str(e)}")
+    
+    @staticmethod
+    def iter_inventory_movements():
+        """Recorre los movimientos de inventario (compras, ventas al costo y pérdidas) en orden de fecha"""
+        for movement in heapq.merge(_iter_purchase_entries(), _iter_sale_exits(), _iter_loss_exits(),
+                                    key=_movement_date):
+            yield _format_date(movement)
+
+    @staticmethod
+    def get_inventory_movements():
+        """Movimientos de inventario ordenados por fecha"""
+        return list(ExcelExporter.iter_inventory_movements())
         
     @staticmethod
-    def export_inventory_flow(filename=None):
-        """Exporta el libro de movimientos de inventario (incluye pérdidas)"""
+    def export_inventory_flow(filename=None, streaming=None):
+        """
+        Exporta el libro de movimientos de inventario (incluye pérdidas).
+        streaming funciona igual que en export_cash_flow.
+        """
         if filename is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"libro_inventario_{timestamp}.xlsx"
         
         try:
-            # Obtener todos los movimientos de inventario
-            movements = []
-            
-            # Obtener datos de referencia
-            products = {p.id: p.name for p in Product.get_all()}
-            
-            # Agregar compras como entradas de inventario
-            purchases = Purchase.get_all()
-            for purchase in purchases:
-                # Obtener detalles de la compra
-                conn = get_connection()
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT pd.*, p.name as product_name 
-                    FROM purchase_details pd
-                    JOIN products p ON pd.product_id = p.id
-                    WHERE pd.purchase_id = ?
-                ''', (purchase.id,))
-                
-                details = cursor.fetchall()
-                conn.close()
-                
-                if details:
-                    for detail in details:
-                        product_name = detail['product_name']
-                        movements.append({
-                            'Fecha': purchase.date,
-                            'Tipo': 'Entrada',
-                            'Movimiento': 'Compra',
-                            'Producto': product_name,
-                            'Cantidad': detail['quantity'],
-                            'Costo Unitario': detail['unit_price'],
-                            'Costo Total': detail['subtotal'],
-                            'Referencia': f"Compra #{purchase.id}",
-                            'Notas': f"Factura: {purchase.invoice_number or 'N/A'}"
-                        })
-            
-            # Agregar ventas como salidas de inventario (al costo)
-            sales = Sale.get_all()
-            for sale in sales:
-                    # Obtener detalles de la venta con el costo del producto
-                    conn = get_connection()
-                    cursor = conn.cursor()
-                    cursor.execute('''
-                        SELECT sd.*, p.name as product_name, p.cost_price
-                        FROM sale_details sd
-                        JOIN products p ON sd.product_id = p.id
-                        WHERE sd.sale_id = ?
-                    ''', (sale.id,))
-                    
-                    details = cursor.fetchall()
-                    conn.close()
-                    
-                    if details:
-                        for detail in details:
-                            product_name = detail['product_name']
-                            cost_price = detail['cost_price'] or 0
-                            movements.append({
-                                'Fecha': sale.created_at,
-                                'Tipo': 'Salida',
-                                'Movimiento': 'Venta',
-                                'Producto': product_name,
-                                'Cantidad': -detail['quantity'],  # Negativo porque es salida
-                                'Costo Unitario': cost_price,
-                                'Costo Total': -(detail['quantity'] * cost_price),  # Negativo
-                                'Referencia': f"Venta #{sale.id}",
-                                'Notas': f"Precio venta: ${detail['unit_price']:.2f}"
-                            })
-            
-            # Agregar pérdidas como salidas de inventario - ESTA ES LA PARTE CLAVE
-            losses = Loss.get_all()
-            for loss in losses:
-                movements.append({
-                    'Fecha': loss.loss_date,
-                    'Tipo': 'Salida',
-                    'Movimiento': 'Pérdida',
-                    'Producto': loss.product_name,
-                    'Cantidad': -loss.quantity,  # Negativo porque es salida
-                    'Costo Unitario': loss.unit_cost,
-                    'Costo Total': -loss.total_cost,  # Negativo
-                    'Referencia': f"Pérdida #{loss.id}",
-                    'Notas': f"{loss.loss_type}: {loss.reason}"
-                })
-            
-            # Manejar fechas None y convertir strings a datetime si es necesario
-            for movement in movements:
-                if movement['Fecha'] and isinstance(movement['Fecha'], str):
-                    try:
-                        # Intentar convertir la cadena a datetime
-                        movement['Fecha'] = datetime.strptime(movement['Fecha'], "%Y-%m-%d %H:%M:%S")
-                    except ValueError:
-                        try:
-                            # Intentar formato solo fecha
-                            movement['Fecha'] = datetime.strptime(movement['Fecha'], "%Y-%m-%d")
-                        except ValueError:
-                            # Si falla, usar una fecha mínima
-                            movement['Fecha'] = datetime.min
-            
-            # Ordenar por fecha
-            movements.sort(key=lambda x: x['Fecha'] if x['Fecha'] else datetime.min)
-            
-            # Formatear fechas para mostrar
-            for movement in movements:
-                if movement['Fecha']:
-                    if isinstance(movement['Fecha'], datetime):
-                        movement['Fecha'] = movement['Fecha'].strftime("%Y-%m-%d %H:%M:%S")
-                else:
-                    movement['Fecha'] = "N/A"
-            
-            # Crear DataFrame
-            df = pd.DataFrame(movements)
-            
-            # Crear directorio de exportación si no existe
-            export_dir = "exports"
-            if not os.path.exists(export_dir):
-                os.makedirs(export_dir)
-            
-            filepath = os.path.join(export_dir, filename)
+            filepath = _export_path(filename)
+            if streaming is None:
+                streaming = _needs_streaming()
+            
+            if streaming:
+                from openpyxl import Workbook
+                workbook = Workbook(write_only=True)
+                _write_sheet(workbook, 'Movimientos Inventario', INVENTORY_COLUMNS,
+                             ExcelExporter.iter_inventory_movements())
+                _write_sheet(workbook, 'Resumen por Producto', INVENTORY_SUMMARY_COLUMNS,
+                             _inventory_summary_rows())
+                workbook.save(filepath)
+                return filepath
+            
+            import pandas as pd
+            df = pd.DataFrame(ExcelExporter.get_inventory_movements())
             
             # Crear un archivo Excel con múltiples hojas
             with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
@@ -529,71 +594,14 @@ class ExcelExporter:
                 df.to_excel(writer, sheet_name='Movimientos Inventario', index=False)
                 
                 # Hoja de resumen por producto
-                try:
-                    # Calcular resumen por producto
-                    conn = get_connection()
-                    cursor = conn.cursor()
-                    
-                    # Obtener resumen de inventario por producto
-                    cursor.execute('''
-                        SELECT 
-                            p.name as producto,
-                            p.stock as stock_actual,
-                            p.cost_price as costo_actual,
-                            (p.stock * p.cost_price) as valor_inventario,
-                            COALESCE(compras.total_comprado, 0) as total_comprado,
-                            COALESCE(ventas.total_vendido, 0) as total_vendido,
-                            COALESCE(perdidas.total_perdido, 0) as total_perdido
-                        FROM products p
-                        LEFT JOIN (
-                            SELECT pd.product_id, SUM(pd.quantity) as total_comprado
-                            FROM purchase_details pd
-                            GROUP BY pd.product_id
-                        ) compras ON p.id = compras.product_id
-                        LEFT JOIN (
-                            SELECT sd.product_id, SUM(sd.quantity) as total_vendido
-                            FROM sale_details sd
-                            JOIN sales s ON sd.sale_id = s.id
-                            WHERE s.status IN ('paid', 'pending')
-                            GROUP BY sd.product_id
-                        ) ventas ON p.id = ventas.product_id
-                        LEFT JOIN (
-                            SELECT l.product_id, SUM(l.quantity) as total_perdido
-                            FROM losses l
-                            GROUP BY l.product_id
-                        ) perdidas ON p.id = perdidas.product_id
-                        WHERE p.stock > 0 OR compras.total_comprado > 0 OR ventas.total_vendido > 0 OR perdidas.total_perdido > 0
-                        ORDER BY valor_inventario DESC
-                    ''')
-                    
-                    summary_data = cursor.fetchall()
-                    conn.close()
-                    
-                    if summary_data:
-                        summary_df = pd.DataFrame([
-                            {
-                                'Producto': row['producto'],
-                                'Stock Actual': row['stock_actual'],
-                                'Costo Unitario': row['costo_actual'],
-                                'Valor Inventario': row['valor_inventario'],
-                                'Total Comprado': row['total_comprado'],
-                                'Total Vendido': row['total_vendido'],
-                                'Total Perdido': row['total_perdido']
-                            }
-                            for row in summary_data
-                        ])
-                    else:
-                        summary_df = pd.DataFrame({'Mensaje': ['No hay datos de inventario disponibles']})
-                    
-                    summary_df.to_excel(writer, sheet_name='Resumen por Producto', index=False)
-                    
-                except Exception as e:
-                    print(f"Error al crear resumen de inventario: {e}")
-                    # Crear resumen vacío en caso de error
-                    error_df = pd.DataFrame({'Error': [f'No se pudo generar resumen: {e}']})
-                    error_df.to_excel(writer, sheet_name='Resumen por Producto', index=False)
+                summary_rows = list(_inventory_summary_rows())
+                if summary_rows:
+                    summary_df = pd.DataFrame(summary_rows)
+                else:
+                    summary_df = pd.DataFrame({'Mensaje': ['No hay datos de inventario disponibles']})
+                summary_df.to_excel(writer, sheet_name='Resumen por Producto', index=False)
             
             return filepath
             
         except Exception as e:
-            raise Exception(f"Error al exportar libro de inventario: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Error al exportar libro de inventario: {str(e)}")
@@ -0,0 +1,148 @@
+"""
+Importación masiva de productos desde Excel.
+
+El archivo se lee en streaming (openpyxl en modo solo lectura, fila por
+fila) y cada fila se valida al leerla. La escritura es un UPSERT por lotes:
+cada nombre se lleva al ya registrado que coincide sin distinguir
+mayúsculas y el UNIQUE de products.name permite INSERT ... ON CONFLICT DO
+UPDATE con executemany, todo en una transacción.
+Ambas etapas aceptan progress(valor, mensaje) para correr en segundo plano
+con task_executor (valor: fracción 0-1, o None si no se conoce el total).
+"""
+
+import numbers
+
+from config.database import db_connection
+
+# ── Configuración ────────────────────────────────────────────────────────────
+REQUIRED_COLUMNS = ('Nombre', 'Precio', 'Stock')
+CHUNK_SIZE       = 1000
+VALID            = "✅ Válido"
+
+UPSERT_SQL = '''
+    INSERT INTO products (name, price, stock) VALUES (?, ?, ?)
+    ON CONFLICT(name) DO UPDATE SET price = excluded.price, stock = excluded.stock
+'''
+
+
+class ImportFormatError(ValueError):
+    """El archivo no tiene las columnas requeridas"""
+
+
+# ── Lectura ──────────────────────────────────────────────────────────────────
+def iter_rows(file_path):
+    """
+    Genera (nombre, precio, stock) por cada fila de la primera hoja. El
+    primer valor generado es el total estimado de filas (o None).
+    """
+    if file_path.lower().endswith('.xls'):
+        yield from _iter_xls_rows(file_path)
+        return
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        positions = _column_positions(next(rows, None))
+        yield (sheet.max_row - 1) if sheet.max_row else None
+        for values in rows:
+            yield tuple(values[i] if i < len(values) else None for i in positions)
+    finally:
+        workbook.close()
+
+
+def _iter_xls_rows(file_path):
+    # openpyxl no lee el formato .xls antiguo
+    import pandas as pd
+    df = pd.read_excel(file_path)
+    positions = _column_positions(list(df.columns))
+    yield len(df)
+    for values in df.itertuples(index=False):
+        yield tuple(None if pd.isna(values[i]) else values[i] for i in positions)
+
+
+def _column_positions(header):
+    header = [str(value).strip() if value is not None else '' for value in (header or ())]
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ImportFormatError(f"Faltan las siguientes columnas: {', '.join(missing)}")
+    return [header.index(column) for column in REQUIRED_COLUMNS]
+
+
+def validate_row(nombre, precio, stock):
+    """Dict con los valores normalizados, el estado y si la fila es válida"""
+    nombre = str(nombre).strip() if nombre is not None else ''
+    is_number = lambda value: isinstance(value, numbers.Real) and not isinstance(value, bool)
+    estado = VALID
+
+    if not nombre or nombre.lower() == 'nan':
+        estado = "❌ Nombre vacío"
+    elif not is_number(precio) or precio < 0:
+        estado = "❌ Precio inválido"
+    elif not is_number(stock) or stock < 0 or stock != int(stock):
+        estado = "❌ Stock inválido"
+
+    return {
+        'nombre': nombre,
+        'precio': float(precio) if is_number(precio) else 0,
+        'stock': int(stock) if is_number(stock) else 0,
+        'estado': estado,
+        'valido': estado == VALID,
+    }
+
+
+def parse_file(file_path, progress=None, chunk_size=CHUNK_SIZE):
+    """
+    Lee y valida todas las filas del archivo. Las filas con alguna celda
+    vacía se omiten (como antes con dropna). Retorna la lista de filas
+    validadas.
+    """
+    rows = iter_rows(file_path)
+    total = next(rows)
+    items = []
+    for count, (nombre, precio, stock) in enumerate(rows, start=1):
+        if nombre is not None and precio is not None and stock is not None:
+            items.append(validate_row(nombre, precio, stock))
+        if progress is not None and count % chunk_size == 0:
+            progress(min(1.0, count / total) if total else None, f"Leyendo filas... {count:,}")
+    return items
+
+
+# ── Escritura ────────────────────────────────────────────────────────────────
+def import_products(items, progress=None, chunk_size=CHUNK_SIZE):
+    """
+    Inserta o actualiza (precio y stock) los productos válidos de items en
+    una sola transacción. Un nombre que coincide sin distinguir mayúsculas
+    con uno registrado actualiza ese producto; si se repite en el archivo
+    queda la última fila. Retorna {'inserted', 'updated', 'total'}.
+    Publicar STOCK_CHANGED queda a cargo de quien llama, en el hilo de Tk.
+    """
+    rows = [(item['nombre'], item['precio'], item['stock']) for item in items if item['valido']]
+    if not rows:
+        return {'inserted': 0, 'updated': 0, 'total': 0}
+
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT name FROM products ORDER BY id')
+        existing = {}
+        for row in cursor.fetchall():
+            existing.setdefault(_nocase(row[0]), row[0])
+        rows = [(existing.setdefault(_nocase(name), name), price, stock) for name, price, stock in rows]
+
+        cursor.execute('SELECT COUNT(*) FROM products')
+        before = cursor.fetchone()[0]
+        for start in range(0, len(rows), chunk_size):
+            cursor.executemany(UPSERT_SQL, rows[start:start + chunk_size])
+            if progress is not None:
+                done = min(start + chunk_size, len(rows))
+                progress(done / len(rows), f"Importando... {done:,} de {len(rows):,}")
+        cursor.execute('SELECT COUNT(*) FROM products')
+        inserted = cursor.fetchone()[0] - before
+
+    return {'inserted': inserted, 'updated': len(rows) - inserted, 'total': len(rows)}
+
+
+def _nocase(text):
+    """Minúsculas solo en ASCII, como COLLATE NOCASE"""
+    return ''.join(ch.lower() if ch.isascii() else ch for ch in text)
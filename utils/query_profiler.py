@@ -0,0 +1,315 @@
+"""
+Perfilador de consultas SQL (opcional).
+
+Se activa con la variable de entorno TIENDA_PROFILE_SQL=1 o desde el menú
+Herramientas de la ventana principal. Cuando está activo, los cursores que
+entrega get_connection() miden cada sentencia (ejecución + lectura de filas)
+y agrupan los resultados por "huella" de la consulta (SQL normalizado sin
+literales). Las consultas que superan el umbral se escriben en un log
+rotativo junto con su EXPLAIN QUERY PLAN.
+"""
+
+import atexit
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+from utils.paths import get_base_path
+
+# ── Configuración ────────────────────────────────────────────────────────────
+ENV_ENABLE       = "TIENDA_PROFILE_SQL"
+ENV_THRESHOLD_MS = "TIENDA_SLOW_QUERY_MS"
+
+SLOW_QUERY_MS    = 100.0
+MAX_SAMPLES      = 1000         # Latencias guardadas por huella (para percentiles)
+LOG_MAX_BYTES    = 1024 * 1024  # 1MB por archivo de log
+LOG_BACKUPS      = 3
+
+_RE_STRING  = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMBER  = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_SPACES  = re.compile(r"\s+")
+
+
+def fingerprint(sql: str) -> str:
+    """Normaliza una sentencia: sin literales, listas IN colapsadas y espacios simples."""
+    sql = _RE_STRING.sub("?", sql)
+    sql = _RE_NUMBER.sub("?", sql)
+    sql = _RE_IN_LIST.sub("(?+)", sql)
+    return _RE_SPACES.sub(" ", sql).strip()
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class QueryStats:
+    """Acumulado por huella de consulta"""
+
+    __slots__ = ("sql", "calls", "total_ms", "max_ms", "rows", "samples")
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.samples = deque(maxlen=MAX_SAMPLES)
+
+    def as_dict(self):
+        ordered = sorted(self.samples)
+        return {
+            "sql": self.sql,
+            "calls": self.calls,
+            "total_ms": self.total_ms,
+            "avg_ms": self.total_ms / self.calls if self.calls else 0.0,
+            "p50_ms": _percentile(ordered, 50),
+            "p95_ms": _percentile(ordered, 95),
+            "p99_ms": _percentile(ordered, 99),
+            "max_ms": self.max_ms,
+            "rows": self.rows,
+        }
+
+
+class QueryProfiler:
+    """Registro de estadísticas por huella, seguro entre hilos"""
+
+    def __init__(self):
+        self.enabled = False
+        self.slow_query_ms = SLOW_QUERY_MS
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._slow_log = None
+        self._atexit_registered = False
+
+    # ── Activación ───────────────────────────────────────────────────────────
+    def enable(self, slow_query_ms=None, report_on_exit=True):
+        if slow_query_ms is not None:
+            self.slow_query_ms = float(slow_query_ms)
+        self.enabled = True
+        if report_on_exit and not self._atexit_registered:
+            atexit.register(self._dump_on_exit)
+            self._atexit_registered = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    # ── Registro ─────────────────────────────────────────────────────────────
+    def record(self, sql, elapsed_ms, rows, conn=None, params=None):
+        key = fingerprint(sql)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = QueryStats(key)
+            stats.calls += 1
+            stats.total_ms += elapsed_ms
+            stats.rows += rows
+            stats.samples.append(elapsed_ms)
+            if elapsed_ms > stats.max_ms:
+                stats.max_ms = elapsed_ms
+
+        if elapsed_ms >= self.slow_query_ms:
+            self._log_slow_query(sql, params, elapsed_ms, rows, conn)
+
+    def _get_slow_log(self):
+        if self._slow_log is None:
+            logger = logging.getLogger("tienda.slow_queries")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            log_dir = os.path.join(get_base_path(), "data")
+            os.makedirs(log_dir, exist_ok=True)
+            handler = RotatingFileHandler(
+                os.path.join(log_dir, "slow_queries.log"),
+                maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8",
+            )
+            handler.setFormatter(logging.Formatter("%(asctime)s  %(message)s", "%Y-%m-%d %H:%M:%S"))
+            logger.addHandler(handler)
+            self._slow_log = logger
+        return self._slow_log
+
+    def _log_slow_query(self, sql, params, elapsed_ms, rows, conn):
+        plan = ""
+        keyword = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+        if conn is not None and keyword in ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT"):
+            try:
+                plan_rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params or ()).fetchall()
+                plan = "\n".join(f"    {row[3]}" for row in plan_rows)
+            except Exception as e:
+                plan = f"    (sin plan: {e})"
+        message = f"{elapsed_ms:.1f} ms, {rows} filas\n    {_RE_SPACES.sub(' ', sql).strip()}"
+        if params:
+            message += f"\n    params={tuple(params)!r}"
+        if plan:
+            message += f"\n  EXPLAIN QUERY PLAN:\n{plan}"
+        try:
+            self._get_slow_log().info(message)
+        except OSError:
+            pass
+
+    # ── Reportes ─────────────────────────────────────────────────────────────
+    def get_stats(self):
+        """Lista de estadísticas por huella, ordenada por tiempo total"""
+        with self._lock:
+            rows = [stats.as_dict() for stats in self._stats.values()]
+        return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
+
+    def report(self, limit=30):
+        """Resumen en texto de las consultas más costosas"""
+        stats = self.get_stats()
+        total_calls = sum(s["calls"] for s in stats)
+        total_ms = sum(s["total_ms"] for s in stats)
+        lines = [
+            f"Consultas: {total_calls}  |  Huellas: {len(stats)}  |  Tiempo total: {total_ms:,.1f} ms",
+            "",
+            f"{'Llamadas':>8} {'Total ms':>10} {'Prom':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'Máx':>8} {'Filas':>8}  SQL",
+        ]
+        for s in stats[:limit]:
+            sql = s["sql"] if len(s["sql"]) <= 120 else s["sql"][:117] + "..."
+            lines.append(
+                f"{s['calls']:>8} {s['total_ms']:>10.1f} {s['avg_ms']:>8.2f} {s['p50_ms']:>8.2f} "
+                f"{s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f} {s['max_ms']:>8.2f} {s['rows']:>8}  {sql}"
+            )
+        return "\n".join(lines)
+
+    def _dump_on_exit(self):
+        if not self._stats:
+            return
+        path = os.path.join(get_base_path(), "data", "query_profile.txt")
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.report(limit=200))
+            print(f"Resumen de consultas guardado en {path}")
+        except OSError as e:
+            print(f"No se pudo guardar el resumen de consultas: {e}")
+
+
+class ProfilingCursor:
+    """
+    Envuelve un cursor sqlite3 y mide cada sentencia.
+    El tiempo de lectura (fetch*) se suma a la sentencia que lo produjo;
+    la muestra se registra al ejecutar la siguiente sentencia, al agotar
+    las filas o al cerrar el cursor.
+    """
+
+    __slots__ = ("_cursor", "_profiler", "_sql", "_params", "_elapsed", "_rows")
+
+    def __init__(self, cursor, profiler):
+        self._cursor = cursor
+        self._profiler = profiler
+        self._sql = None
+        self._params = None
+        self._elapsed = 0.0
+        self._rows = 0
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _finish(self):
+        if self._sql is not None:
+            sql, self._sql = self._sql, None
+            self._profiler.record(sql, self._elapsed * 1000.0, self._rows,
+                                  self._cursor.connection, self._params)
+
+    def _start(self, sql, params):
+        self._finish()
+        self._sql = sql
+        self._params = params
+        self._elapsed = 0.0
+        self._rows = 0
+
+    def execute(self, sql, params=()):
+        self._start(sql, params)
+        start = time.perf_counter()
+        try:
+            self._cursor.execute(sql, params)
+        finally:
+            self._elapsed += time.perf_counter() - start
+        if self._cursor.description is None:
+            self._rows = max(self._cursor.rowcount, 0)
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._start(sql, None)
+        start = time.perf_counter()
+        try:
+            self._cursor.executemany(sql, seq_of_params)
+        finally:
+            self._elapsed += time.perf_counter() - start
+        self._rows = max(self._cursor.rowcount, 0)
+        self._finish()
+        return self
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._elapsed += time.perf_counter() - start
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = self._cursor.fetchmany(size if size is not None else self._cursor.arraysize)
+        self._elapsed += time.perf_counter() - start
+        self._rows += len(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._elapsed += time.perf_counter() - start
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self):
+        self._finish()
+        self._cursor.close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+profiler = QueryProfiler()
+
+
+def _threshold_from_env():
+    """Umbral de TIENDA_SLOW_QUERY_MS, o None (valor por defecto) si falta o no es un número"""
+    value = os.environ.get(ENV_THRESHOLD_MS, "").strip()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        print(f"{ENV_THRESHOLD_MS}={value!r} no es un número; se usa {SLOW_QUERY_MS} ms")
+        return None
+
+
+if os.environ.get(ENV_ENABLE, "").strip().lower() in ("1", "true", "yes", "si", "sí"):
+    profiler.enable(slow_query_ms=_threshold_from_env())
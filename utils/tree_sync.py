@@ -0,0 +1,148 @@
+"""
+Actualización incremental de un Treeview cuyas filas están identificadas
+por el id de la base de datos (iid = str(id)).
+
+En lugar de borrar todas las filas y volver a insertarlas, TreeSync compara
+lo que ya está en el árbol con los datos nuevos y solo toca los ítems que
+cambiaron: actualiza valores/tags distintos, inserta los nuevos, borra los
+que ya no están y mueve los que cambiaron de posición. Con apply() se
+actualizan solo los ids indicados (por ejemplo, el cliente de una venta
+recién guardada), manteniendo el orden con sort_key.
+"""
+
+from bisect import bisect_left, insort
+
+import tkinter as tk
+
+
+class TreeSync:
+    """
+    tree: ttk.Treeview a sincronizar.
+    render_row(row) -> (values, tags).
+    row_id(row): id de la fila en la base de datos (por defecto row['id']
+                 o row.id).
+    sort_key(row): clave de orden para insertar filas nuevas con apply();
+                   sin ella, las filas nuevas van al final.
+    """
+
+    def __init__(self, tree, render_row, row_id=None, sort_key=None):
+        self.tree = tree
+        self.render_row = render_row
+        self.row_id = row_id or _default_row_id
+        self.sort_key = sort_key
+        self._rendered = {}   # iid -> (values, tags) tal como están en el árbol
+        self._order = []      # [(sort_key, iid)] si hay sort_key
+
+    # ── Sincronización ───────────────────────────────────────────────────────
+    def load(self, rows):
+        """
+        Deja el árbol mostrando exactamente rows, en ese orden.
+        Retorna el número de ítems insertados, actualizados, borrados y movidos.
+        """
+        wanted = []
+        rendered = {}
+        order = []
+        for row in rows:
+            iid = str(self.row_id(row))
+            if iid in rendered:
+                continue
+            wanted.append(iid)
+            rendered[iid] = self._normalize(*self.render_row(row))
+            if self.sort_key is not None:
+                order.append((self.sort_key(row), iid))
+
+        stats = {'inserted': 0, 'updated': 0, 'deleted': 0, 'moved': 0}
+        stale = [iid for iid in self._rendered if iid not in rendered]
+        if stale:
+            self.tree.delete(*stale)
+            stats['deleted'] = len(stale)
+
+        current = list(self.tree.get_children(''))
+        for index, iid in enumerate(wanted):
+            values, tags = rendered[iid]
+            if iid not in self._rendered:
+                self.tree.insert('', index, iid=iid, values=values, tags=tags)
+                current.insert(index, iid)
+                stats['inserted'] += 1
+                continue
+            if self._rendered[iid] != (values, tags):
+                self.tree.item(iid, values=values, tags=tags)
+                stats['updated'] += 1
+            if index >= len(current) or current[index] != iid:
+                self.tree.move(iid, '', index)
+                current.remove(iid)
+                current.insert(index, iid)
+                stats['moved'] += 1
+
+        self._rendered = rendered
+        self._order = sorted(order)
+        return stats
+
+    def apply(self, rows, removed_ids=()):
+        """
+        Actualiza solo las filas indicadas: las que existen se modifican
+        (y se reubican si cambió su clave de orden), las nuevas se insertan
+        en su posición y las de removed_ids se borran.
+        """
+        for row_id in removed_ids:
+            self.remove(row_id)
+
+        for row in rows:
+            iid = str(self.row_id(row))
+            values, tags = self._normalize(*self.render_row(row))
+            key = self.sort_key(row) if self.sort_key is not None else None
+
+            if iid in self._rendered:
+                if self._rendered[iid] != (values, tags):
+                    self.tree.item(iid, values=values, tags=tags)
+                    self._rendered[iid] = (values, tags)
+                if key is not None and not self._has_key(iid, key):
+                    self._forget_order(iid)
+                    self.tree.move(iid, '', self._insert_order(key, iid))
+                continue
+
+            index = self._insert_order(key, iid) if key is not None else tk.END
+            self.tree.insert('', index, iid=iid, values=values, tags=tags)
+            self._rendered[iid] = (values, tags)
+
+    def remove(self, row_id):
+        iid = str(row_id)
+        if iid in self._rendered:
+            self.tree.delete(iid)
+            del self._rendered[iid]
+            self._forget_order(iid)
+
+    def clear(self):
+        self.tree.delete(*self.tree.get_children(''))
+        self._rendered = {}
+        self._order = []
+
+    def __contains__(self, row_id):
+        return str(row_id) in self._rendered
+
+    # ── Internos ─────────────────────────────────────────────────────────────
+    @staticmethod
+    def _normalize(values, tags):
+        # El Treeview devuelve tuplas; se comparan así para detectar cambios
+        return tuple(values), tuple(tags or ())
+
+    def _has_key(self, iid, key):
+        index = bisect_left(self._order, (key, iid))
+        return index < len(self._order) and self._order[index] == (key, iid)
+
+    def _forget_order(self, iid):
+        for index, (_, order_iid) in enumerate(self._order):
+            if order_iid == iid:
+                del self._order[index]
+                return
+
+    def _insert_order(self, key, iid):
+        insort(self._order, (key, iid))
+        return bisect_left(self._order, (key, iid))
+
+
+def _default_row_id(row):
+    try:
+        return row['id']
+    except (TypeError, KeyError, IndexError):
+        return row.id
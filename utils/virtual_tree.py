@@ -0,0 +1,284 @@
+"""
+Lista virtual (Treeview paginado) para tablas con mucho historial.
+
+En lugar de insertar todas las filas en el Treeview, VirtualTreeview solo
+mantiene en el widget las filas visibles. Los datos vienen de un
+KeysetQuery (models/pagination.py), que lee la base de datos por páginas
+usando paginación por clave, de modo que cada página se resuelve con un
+recorrido corto del índice sin importar cuántas filas haya antes. Al
+desplazarse se cargan las páginas de la ventana visible más un margen de
+prefetch; las páginas lejanas se descartan, así que memoria y tiempo de
+refresco se mantienen constantes.
+"""
+
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import ttk
+
+from models.pagination import PAGE_SIZE
+from utils.tree_sync import TreeSync
+
+# ── Configuración ────────────────────────────────────────────────────────────
+PREFETCH_ROWS  = 50    # Margen que se precarga antes y después de lo visible
+MAX_PAGES      = 8     # Páginas que se conservan en memoria
+HEADER_PX      = 25    # Alto aproximado de los encabezados del Treeview
+WHEEL_ROWS     = 3     # Filas por paso de la rueda del mouse
+
+
+class VirtualTreeview(ttk.Frame):
+    """
+    Treeview con barra de desplazamiento propia que muestra una ventana de
+    filas de un KeysetQuery.
+
+    render_row(row) -> (values, tags) convierte una fila de la consulta en
+    los valores del Treeview. El Treeview interno queda en self.tree, así
+    que selection(), item(), heading(), bind(), etc. se usan como siempre;
+    los iid de las filas son source.row_id(row).
+    stripe_tags: (tag_par, tag_impar) opcional para alternar colores según
+    la posición de la fila en la lista completa.
+    """
+
+    def __init__(self, parent, columns, render_row, source=None, page_size=PAGE_SIZE,
+                 prefetch=PREFETCH_ROWS, stripe_tags=None, **tree_options):
+        super().__init__(parent)
+        self.render_row = render_row
+        self.stripe_tags = stripe_tags
+        self.page_size = page_size
+        self.prefetch = prefetch
+
+        self.tree = ttk.Treeview(self, columns=columns, show='headings', **tree_options)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.source = None
+        self.total = 0
+        self.offset = 0
+        self.visible = int(tree_options.get('height', 10))
+        self._pages = OrderedDict()   # número de página -> filas
+        self._anchors = {}            # número de página -> clave de la fila anterior
+        self._shown = []              # iids actualmente en el Treeview
+        self._rows = {}               # iid -> fila, de las filas mostradas
+        self._selection = {}          # iid -> fila, también fuera de la vista
+        self._prefetch_job = None
+        self._positions = {}          # iid -> posición en la lista completa
+        self._sync = TreeSync(self.tree, self._render_row,
+                              row_id=lambda row: self.source.row_id(row))
+
+        self.tree.bind('<Configure>', self._on_configure, add='+')
+        self.tree.bind('<<TreeviewSelect>>', self._on_select, add='+')
+        self.tree.bind('<MouseWheel>', self._on_mousewheel)
+        self.tree.bind('<Button-4>', lambda e: self.scroll(-WHEEL_ROWS) or 'break')
+        self.tree.bind('<Button-5>', lambda e: self.scroll(WHEEL_ROWS) or 'break')
+        for key, step in (('<Up>', -1), ('<Down>', 1), ('<Prior>', 'page-'), ('<Next>', 'page+'),
+                          ('<Home>', 'home'), ('<End>', 'end')):
+            self.tree.bind(key, lambda e, step=step: self._on_key(step))
+
+        if source is not None:
+            self.set_source(source)
+
+    # ── Datos ────────────────────────────────────────────────────────────────
+    def set_source(self, source):
+        """Cambia la consulta (p. ej. al filtrar) y vuelve al inicio"""
+        self.source = source
+        self.offset = 0
+        self._selection = {}
+        self.refresh()
+
+    def refresh(self):
+        """
+        Relee la base de datos conservando la posición y la selección.
+        Cuesta un COUNT y las páginas visibles; en el Treeview solo se
+        modifican las filas que cambiaron.
+        """
+        self._pages.clear()
+        self._anchors = {}
+        if self.source is None:
+            self.total = 0
+        else:
+            try:
+                self.total = self.source.count()
+            except Exception as e:
+                print(f"Error al contar filas de la lista: {e}")
+                self.total = 0
+        self.offset = self._clamp(self.offset)
+        self._render()
+
+    def row(self, iid):
+        """Fila de la consulta correspondiente a un iid (visible o seleccionado)"""
+        return self._rows.get(iid) or self._selection.get(iid)
+
+    def selected_rows(self):
+        """Filas seleccionadas, incluidas las que quedaron fuera de la vista"""
+        return list(self._selection.values())
+
+    def _page(self, number):
+        if number in self._pages:
+            self._pages.move_to_end(number)
+            return self._pages[number]
+
+        if number == 0:
+            after = None
+        elif number in self._anchors:
+            after = self._anchors[number]
+        else:
+            after = self.source.key_at(number * self.page_size - 1)
+            if after is None:
+                return []
+
+        try:
+            rows = self.source.fetch(after, self.page_size)
+        except Exception as e:
+            print(f"Error al cargar página de la lista: {e}")
+            return []
+
+        if rows:
+            self._anchors[number + 1] = self.source.key_of(rows[-1])
+        self._pages[number] = rows
+        while len(self._pages) > MAX_PAGES:
+            self._pages.popitem(last=False)
+        return rows
+
+    def _slice(self, start, stop):
+        rows = []
+        for number in range(start // self.page_size, (max(start, stop - 1)) // self.page_size + 1):
+            page = self._page(number)
+            base = number * self.page_size
+            rows.extend(page[max(0, start - base):max(0, stop - base)])
+        return rows
+
+    # ── Vista ────────────────────────────────────────────────────────────────
+    def _clamp(self, offset):
+        return max(0, min(offset, self.total - self.visible))
+
+    def _render(self):
+        stop = min(self.total, self.offset + self.visible)
+        rows = self._slice(self.offset, stop) if self.source is not None and stop > self.offset else []
+
+        # Solo se tocan los ítems que cambiaron respecto de lo ya mostrado
+        self._rows = {}
+        self._shown = []
+        self._positions = {}
+        for position, row in enumerate(rows, start=self.offset):
+            iid = self.source.row_id(row)
+            if iid in self._rows:
+                continue
+            self._rows[iid] = row
+            self._shown.append(iid)
+            self._positions[iid] = position
+        self._sync.load(rows)
+
+        for iid in self._shown:
+            if iid in self._selection:
+                self._selection[iid] = self._rows[iid]
+        visible_selection = [iid for iid in self._shown if iid in self._selection]
+        if visible_selection:
+            self.tree.selection_set(visible_selection)
+
+        self._update_scrollbar()
+        self._schedule_prefetch()
+
+    def _render_row(self, row):
+        values, tags = self.render_row(row)
+        if self.stripe_tags:
+            position = self._positions.get(self.source.row_id(row), 0)
+            tags = tuple(tags) + (self.stripe_tags[position % 2],)
+        return values, tags
+
+    def _update_scrollbar(self):
+        if self.total <= 0:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.offset / self.total,
+                               min(1.0, (self.offset + self.visible) / self.total))
+
+    def _schedule_prefetch(self):
+        """Carga el margen antes/después de lo visible cuando Tk queda libre"""
+        if self._prefetch_job is not None:
+            self.after_cancel(self._prefetch_job)
+        self._prefetch_job = self.after_idle(self._prefetch_margin)
+
+    def _prefetch_margin(self):
+        self._prefetch_job = None
+        if self.source is None or self.total <= 0:
+            return
+        start = max(0, self.offset - self.prefetch)
+        stop = min(self.total, self.offset + self.visible + self.prefetch)
+        for number in range(start // self.page_size, (stop - 1) // self.page_size + 1):
+            self._page(number)
+
+    def scroll(self, rows):
+        self.scroll_to(self.offset + rows)
+
+    def scroll_to(self, offset):
+        offset = self._clamp(offset)
+        if offset != self.offset:
+            self.offset = offset
+            self._render()
+
+    def see_index(self, index):
+        """Desplaza lo mínimo para que la fila index quede visible"""
+        if index < self.offset:
+            self.scroll_to(index)
+        elif index >= self.offset + self.visible:
+            self.scroll_to(index - self.visible + 1)
+
+    # ── Eventos ──────────────────────────────────────────────────────────────
+    def _on_configure(self, event):
+        style = self.tree.cget('style') or 'Treeview'
+        try:
+            row_height = int(ttk.Style().lookup(style, 'rowheight') or 20)
+        except (ValueError, tk.TclError):
+            row_height = 20
+        visible = max(1, (event.height - HEADER_PX) // row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.offset = self._clamp(self.offset)
+            self._render()
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == 'moveto':
+            self.scroll_to(int(float(value) * self.total))
+        elif action == 'scroll':
+            step = int(value) * (self.visible if unit == 'pages' else 1)
+            self.scroll(step)
+
+    def _on_mousewheel(self, event):
+        # Windows entrega múltiplos de 120; macOS valores pequeños
+        notches = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self.scroll(-notches * WHEEL_ROWS)
+        return 'break'
+
+    def _on_select(self, event=None):
+        # Solo las filas mostradas pueden cambiar de selección; las que
+        # están fuera de la vista conservan la suya
+        current = set(self.tree.selection())
+        self._selection = {iid: row for iid, row in self._selection.items() if iid not in self._rows}
+        for iid in current:
+            if iid in self._rows:
+                self._selection[iid] = self._rows[iid]
+
+    def _on_key(self, step):
+        if self.total <= 0:
+            return 'break'
+        focus = self.tree.focus()
+        index = self.offset + self._shown.index(focus) if focus in self._shown else self.offset
+        if step == 'home':
+            index = 0
+        elif step == 'end':
+            index = self.total - 1
+        elif step == 'page-':
+            index -= self.visible
+        elif step == 'page+':
+            index += self.visible
+        else:
+            index += step
+        index = max(0, min(index, self.total - 1))
+
+        self.see_index(index)
+        position = index - self.offset
+        if 0 <= position < len(self._shown):
+            iid = self._shown[position]
+            self.tree.focus(iid)
+            self.tree.selection_set(iid)
+        return 'break'
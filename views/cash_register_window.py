@@ -1,5 +1,5 @@
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, messagebox
 from datetime import date, timedelta
 from models.cash_register import CashRegister
 from utils.formatters import format_currency
@@ -191,6 +191,9 @@ class CashRegisterWindow:
                    command=self._load_history,
                    style='Accent.TButton').pack(side=tk.LEFT)
 
+        ttk.Button(controls, text='Reconstruir resumen',
+                   command=self._rebuild_history).pack(side=tk.RIGHT)
+
         # Treeview historial
         cols = ('Fecha', 'Ventas contado', 'Abonos', 'Total en caja')
         self.hist_tree = ttk.Treeview(frame, columns=cols, show='headings')
@@ -273,6 +276,20 @@ class CashRegisterWindow:
                 format_currency(entry['total_general']),
             ), tags=(tag,))
 
+    def _rebuild_history(self):
+        """Recalcula el resumen diario desde las ventas y abonos."""
+        if not messagebox.askyesno('Reconstruir resumen',
+                                   'Se recalcularán los totales diarios desde todas '
+                                   'las ventas y abonos. ¿Continuar?',
+                                   parent=self.window):
+            return
+        days = CashRegister.rebuild_summary()
+        self._load_history()
+        self._load_day(self._selected_date)
+        messagebox.showinfo('Reconstruir resumen',
+                            f'Resumen reconstruido: {days} días.',
+                            parent=self.window)
+
     # ─────────────────────────────────────────────────────────────
     # NAVEGACIÓN DE FECHAS
     # ─────────────────────────────────────────────────────────────
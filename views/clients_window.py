@@ -1,9 +1,13 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from models.client import Client
+from models.payment_allocation import allocate_payment, plan_allocation, EPSILON
 from config.database import get_connection
 import sqlite3
-from config.database import sync_client_sales_status_on_payment
+from models.pagination import KeysetQuery
+from utils.events import subscribe_window, SALE_SAVED, SALE_DELETED, PAYMENT_REGISTERED
+from utils.tree_sync import TreeSync
+from utils.virtual_tree import VirtualTreeview
 from views.sale_detail_window import SaleDetailWindow
 
 class ClientsWindow:
@@ -12,6 +16,7 @@ class ClientsWindow:
         self.user = user
         self.main_window = main_window
         self.clients = []
+        self.stats = {}
         self.selected_client = None
 
         # Ventana
@@ -26,6 +31,16 @@ class ClientsWindow:
         self.refresh_clients()
         self.window.protocol("WM_DELETE_WINDOW", self.on_closing)
 
+        # Ventas y pagos cambian la deuda de los clientes
+        subscribe_window(self.window, (SALE_SAVED, SALE_DELETED, PAYMENT_REGISTERED),
+                         self.on_data_changed)
+
+    def on_data_changed(self, changes):
+        """Refresca solo los clientes mencionados por los eventos"""
+        client_ids = changes.ids('clients')
+        if client_ids is None or client_ids:
+            self.refresh_clients(client_ids)
+
 
     
     def manage_credit(self):
@@ -125,63 +140,104 @@ class ClientsWindow:
 
         # Configurar eventos
         self.tree.bind("<<TreeviewSelect>>", self.on_select)
+
+        # Filas del árbol identificadas por id de cliente, en orden por nombre
+        self.tree_sync = TreeSync(self.tree, self._client_row_values,
+                                  sort_key=lambda client: client.name)
     
-    def refresh_clients(self):
-        """Recarga la lista de clientes"""
+    def refresh_clients(self, client_ids=None):
+        """
+        Recarga la lista de clientes. Con client_ids solo se releen esos
+        clientes y se actualizan sus filas y las estadísticas; sin ellos
+        se recarga todo (igualmente solo se tocan las filas que cambiaron).
+        """
         try:
-            self.clients = Client.get_all()
-            self.populate_tree()
+            if client_ids is None:
+                self.clients = Client.get_all()
+                self._recount_statistics()
+                self.populate_tree(self._search_results())
+            else:
+                self._refresh_changed_clients(client_ids)
             self.update_statistics()
             
         except Exception as e:
             messagebox.showerror("Error", f"Error al cargar clientes: {e}")
-    
-    # Reemplaza el método populate_tree en la clase ClientsWindow
 
-    def populate_tree(self, clients=None):
-        """Llena el treeview con los clientes"""
-        # Limpiar árbol
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+    def _refresh_changed_clients(self, client_ids):
+        """Actualiza solo los clientes indicados (nuevos, modificados o eliminados)"""
+        client_ids = set(client_ids)
+        fresh = {client.id: client for client in Client.get_by_ids(client_ids)}
+        
+        remaining = []
+        for client in self.clients:
+            if client.id in client_ids:
+                self._add_to_statistics(client, -1)
+                if client.id in fresh:
+                    remaining.append(fresh[client.id])
+            else:
+                remaining.append(client)
+        known = {client.id for client in remaining}
+        added = [client for client_id, client in fresh.items() if client_id not in known]
+        for client in fresh.values():
+            self._add_to_statistics(client, +1)
+        self.clients = sorted(remaining + added, key=lambda client: client.name) if added else remaining
+        
+        # Con una búsqueda activa, la lista filtrada se vuelve a consultar
+        if self.search_var.get().strip():
+            self.populate_tree(self._search_results())
+        else:
+            removed = client_ids - set(fresh)
+            self.tree_sync.apply(fresh.values(), removed_ids=removed)
         
+        if self.selected_client and self.selected_client.id in client_ids:
+            self.selected_client = fresh.get(self.selected_client.id)
+
+    def _search_results(self):
+        search_term = self.search_var.get().strip()
+        return Client.search(search_term) if search_term else None
+
+    def populate_tree(self, clients=None):
+        """Llena el treeview con los clientes (solo modifica las filas que cambiaron)"""
         clients_to_show = clients if clients is not None else self.clients
-        
-        # Agregar clientes
-        for client in clients_to_show:
-            available_credit = client.available_credit()
-            
-            # CORRECCIÓN: Determinar estado más claro
-            if client.total_debt == 0:
-                status = "✅ Al día"
-                tags = ["good"]
-            elif client.total_debt >= client.credit_limit and client.credit_limit > 0:
-                status = "❌ Límite"
-                tags = ["limit"]
-            elif client.total_debt > client.credit_limit * 0.8 and client.credit_limit > 0:
-                status = "⚠️ Alerta"
-                tags = ["warning"]
-            elif client.total_debt > 0:
-                status = "⏳ Pendiente"  # Cambio aquí: en lugar de "💳 Crédito"
-                tags = ["credit"]
-            else:
-                status = "✅ Al día"
-                tags = ["good"]
-            
-            self.tree.insert("", "end", values=(
-                client.id,
-                client.name,
-                client.phone or "N/A",
-                f"${client.credit_limit:,.2f}",
-                f"${client.total_debt:,.2f}",
-                f"${available_credit:,.2f}",
-                status
-            ), tags=tags)
+        self.tree_sync.load(clients_to_show)
         
         # Configurar colores
         self.tree.tag_configure("good", background="#d4edda")
         self.tree.tag_configure("credit", background="#fff3cd")  # Amarillo para pendientes
         self.tree.tag_configure("warning", background="#fff3cd")
         self.tree.tag_configure("limit", background="#f8d7da")
+
+    def _client_row_values(self, client):
+        """Valores y tags de un cliente en la tabla"""
+        available_credit = client.available_credit()
+        
+        # CORRECCIÓN: Determinar estado más claro
+        if client.total_debt == 0:
+            status = "✅ Al día"
+            tags = ["good"]
+        elif client.total_debt >= client.credit_limit and client.credit_limit > 0:
+            status = "❌ Límite"
+            tags = ["limit"]
+        elif client.total_debt > client.credit_limit * 0.8 and client.credit_limit > 0:
+            status = "⚠️ Alerta"
+            tags = ["warning"]
+        elif client.total_debt > 0:
+            status = "⏳ Pendiente"  # Cambio aquí: en lugar de "💳 Crédito"
+            tags = ["credit"]
+        else:
+            status = "✅ Al día"
+            tags = ["good"]
+        
+        values = (
+            client.id,
+            client.name,
+            client.phone or "N/A",
+            f"${client.credit_limit:,.2f}",
+            f"${client.total_debt:,.2f}",
+            f"${available_credit:,.2f}",
+            status
+        )
+        return values, tags
     
     def on_search(self, *args):
         """Filtra clientes por búsqueda"""
@@ -211,18 +267,33 @@ class ClientsWindow:
         else:
             self.selected_client = None
     
+    def _recount_statistics(self):
+        """Recalcula los totales de las estadísticas desde self.clients"""
+        self.stats = {'clients': 0, 'debt': 0.0, 'credit_limit': 0.0, 'with_debt': 0, 'at_limit': 0}
+        for client in self.clients:
+            self._add_to_statistics(client, +1)
+
+    def _add_to_statistics(self, client, sign):
+        """Suma (sign=+1) o resta (sign=-1) el aporte de un cliente a los totales"""
+        self.stats['clients'] += sign
+        self.stats['debt'] += sign * client.total_debt
+        self.stats['credit_limit'] += sign * client.credit_limit
+        if client.total_debt > 0:
+            self.stats['with_debt'] += sign
+        if client.credit_limit > 0 and client.total_debt >= client.credit_limit:
+            self.stats['at_limit'] += sign
+
     def update_statistics(self):
         """Actualiza las estadísticas"""
         if not self.clients:
             self.stats_label.config(text="No hay clientes registrados")
             return
         
-        total_clients = len(self.clients)
-        total_debt = sum(client.total_debt for client in self.clients)
-        total_credit_limit = sum(client.credit_limit for client in self.clients)
-        clients_with_debt = sum(1 for client in self.clients if client.total_debt > 0)
-        clients_at_limit = sum(1 for client in self.clients 
-                              if client.credit_limit > 0 and client.total_debt >= client.credit_limit)
+        total_clients = self.stats['clients']
+        total_debt = self.stats['debt']
+        total_credit_limit = self.stats['credit_limit']
+        clients_with_debt = self.stats['with_debt']
+        clients_at_limit = self.stats['at_limit']
         
         stats_text = f"Clientes: {total_clients} | "
         stats_text += f"Deuda Total: ${total_debt:,.2f} | "
@@ -286,7 +357,7 @@ class ClientsWindow:
             try:
                 self.selected_client.delete()
                 messagebox.showinfo("Éxito", "Cliente eliminado correctamente")
-                self.refresh_clients()
+                self.refresh_clients([self.selected_client.id])
                 
             except Exception as e:
                 messagebox.showerror("Error", f"Error al eliminar cliente: {e}")
@@ -450,6 +521,7 @@ class ClientFormWindow:
                     notes=notes if notes else None
                 )
                 client.save()
+                changed_id = client.id
                 messagebox.showinfo("Éxito", "Cliente agregado correctamente")
                 
             else:  # mode == "edit"
@@ -461,10 +533,11 @@ class ClientFormWindow:
                 self.client.notes = notes if notes else None
                 
                 self.client.update()
+                changed_id = self.client.id
                 messagebox.showinfo("Éxito", "Cliente actualizado correctamente")
             
-            # Refresh de la ventana padre
-            self.clients_window.refresh_clients()
+            # Refresh de la ventana padre (solo el cliente guardado)
+            self.clients_window.refresh_clients([changed_id])
             
             # Cerrar ventana
             self.window.destroy()
@@ -502,13 +575,10 @@ class CreditManagementWindow:
         self.setup_ui()
 
     def refresh_and_close(self):
-        """Actualiza todas las ventanas y cierra esta ventana"""
-        # Actualizar ventana de clientes
-        self.clients_window.refresh_clients()
-        
-        # Actualizar todas las ventanas desde main_window
-        if self.main_window:
-            self.main_window.refresh_all_windows()
+        """Actualiza la ventana de clientes y cierra esta ventana"""
+        # Actualizar ventana de clientes (solo este cliente). Las demás
+        # ventanas se enteran de los pagos por el bus de eventos.
+        self.clients_window.refresh_clients([self.client.id])
         
         # Cerrar ventana actual
         self.window.destroy()
@@ -624,30 +694,6 @@ class CreditManagementWindow:
         ttk.Button(buttons_frame, text="Cerrar", 
                   command=self.close_window).pack(side=tk.RIGHT)
         
-    def handle_excess_credit(self, client_id, excess_amount):
-        """Maneja el crédito a favor cuando el pago excede la deuda"""
-        try:
-            from config.database import get_connection
-            
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # Registrar transacción de crédito a favor
-            cursor.execute('''
-                INSERT INTO client_transactions 
-                    (client_id, transaction_type, amount, description, created_at)
-                VALUES (?, ?, ?, ?, datetime('now', 'localtime'))
-            ''', (client_id, 'credit_balance', excess_amount, 
-                f'Crédito a favor por exceso en pago de ${excess_amount:,.2f}'))
-            
-            conn.commit()
-            conn.close()
-            
-            print(f"💰 Crédito a favor registrado: ${excess_amount:,.2f}")
-            
-        except Exception as e:
-            print(f"Error al registrar crédito a favor: {e}")
-
     # MÉTODO PARA CONSULTAR CRÉDITO A FAVOR
     def get_client_credit_balance(self, client_id):
         """Obtiene el saldo de crédito a favor del cliente"""
@@ -840,44 +886,19 @@ class CreditManagementWindow:
             result = messagebox.askyesno("Confirmar Pago", mensaje_confirmacion)
             
             if result:
-                # CORRECCIÓN 2: Usar el método pay_debt del cliente para casos simples
-                if deuda_actual == 0:
-                    # No hay deuda, registrar como crédito a favor
-                    self.handle_excess_credit(self.client.id, amount)
-                    success = True
-                    excess_amount = amount
-                    debt_reduced = 0
-                elif amount <= deuda_actual:
-                    # Pago normal - usar el método pay_debt que ya funciona bien
-                    success = self.client.pay_debt(amount, description)
-                    excess_amount = 0
-                    debt_reduced = amount
-                else:
-                    # Pago excede la deuda - pagar toda la deuda y registrar exceso
-                    success = self.client.pay_debt(deuda_actual, description)
-                    if success:
-                        excess_amount = amount - deuda_actual
-                        self.handle_excess_credit(self.client.id, excess_amount)
-                        debt_reduced = deuda_actual
-                    else:
-                        excess_amount = 0
-                        debt_reduced = 0
+                resultado = self.process_complete_payment(amount, description)
                 
-                if success:
-                    # CORRECCIÓN 3: Actualizar estado de ventas después del pago
-                    self.update_sales_status_after_payment(amount)
-                    
+                if resultado['success']:
                     # Limpiar campos
                     self.payment_amount_entry.delete(0, tk.END)
                     self.payment_desc_entry.delete(0, tk.END)
                     
                     # Mostrar mensaje de éxito
-                    self.show_simple_payment_success(amount, deuda_actual, debt_reduced, excess_amount)
+                    self.show_payment_success_message(amount, deuda_actual, resultado)
                     
-                    # CORRECCIÓN 4: Refrescar todas las ventanas
                     self.refresh_and_close()
                 else:
-                    messagebox.showerror("Error", "Error al procesar el pago")
+                    messagebox.showerror("Error", f"Error al procesar el pago:\n{resultado['error']}")
                     
         except Exception as e:
             messagebox.showerror("Error", f"Ocurrió un error inesperado:\n{str(e)}")
@@ -885,190 +906,16 @@ class CreditManagementWindow:
 
     def process_complete_payment(self, payment_amount, description):
         """
-        Procesa un pago completo: actualiza ventas, cliente y transacciones - VERSIÓN CORREGIDA
+        Aplica el pago a las ventas pendientes (las más antiguas primero),
+        reduce la deuda y registra el exceso como crédito a favor, todo en
+        una transacción. Ver models/payment_allocation.py.
         """
-        from config.database import get_connection
-        from datetime import datetime
-        
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            print(f"\n💰 PROCESANDO PAGO COMPLETO: ${payment_amount:,.2f}")
-            print("=" * 60)
-            
-            # PASO 1: Detectar estructura de la tabla sales
-            cursor.execute("PRAGMA table_info(sales)")
-            table_info = cursor.fetchall()
-            column_names = [column[1] for column in table_info]
-            
-            if 'payment_status' in column_names:
-                status_column = 'payment_status'
-            elif 'status' in column_names:
-                status_column = 'status'
-            else:
-                return {'success': False, 'error': 'No se encontró columna de estado en sales'}
-            
-            print(f"📊 Usando columna de estado: '{status_column}'")
-            
-            # PASO 2: Obtener ventas pendientes ordenadas cronológicamente
-            query = f'''
-                SELECT id, total, created_at, notes
-                FROM sales 
-                WHERE client_id = ? AND {status_column} = 'pending'
-                ORDER BY datetime(created_at) ASC
-            '''
-            
-            cursor.execute(query, (self.client.id,))
-            pending_sales = cursor.fetchall()
-            
-            print(f"📋 Ventas pendientes encontradas: {len(pending_sales)}")
-            
-            if not pending_sales:
-                print("ℹ️ No hay ventas pendientes")
-                if payment_amount > 0:
-                    cursor.execute('''
-                        INSERT INTO client_transactions 
-                        (client_id, transaction_type, amount, description, created_at)
-                        VALUES (?, 'credit', ?, ?, datetime('now', 'localtime'))
-                    ''', (self.client.id, payment_amount, f"{description} - Crédito a favor"))
-                    
-                    print(f"💵 Registrado como crédito a favor: ${payment_amount:,.2f}")
-                
-                conn.commit()
-                return {
-                    'success': True, 
-                    'sales_paid_complete': 0,
-                    'sales_paid_partial': 0,
-                    'excess_credit': payment_amount
-                }
-            
-            # PASO 3: Aplicar el pago a las ventas
-            remaining_payment = payment_amount
-            updated_sales = []
-            sales_paid_complete = 0
-            sales_paid_partial = 0
-            total_debt_reduced = 0
-            
-            for sale in pending_sales:
-                if remaining_payment <= 0:
-                    break
-                    
-                sale_id = sale[0]
-                sale_total = float(sale[1])
-                sale_date = sale[2]
-                sale_notes = sale[3] or ""
-                
-                print(f"\n📄 Procesando Venta #{sale_id}")
-                print(f"   💰 Debe: ${sale_total:,.2f}")
-                print(f"   💳 Pago disponible: ${remaining_payment:,.2f}")
-                
-                if remaining_payment >= sale_total:
-                    # ✅ PAGO COMPLETO - Marcar como pagada
-                    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M')
-                    updated_notes = f"{sale_notes} [PAGADA el {timestamp}]".strip()
-                    
-                    # *** CORRECCIÓN: Sin updated_at ***
-                    update_query = f'''
-                        UPDATE sales 
-                        SET {status_column} = 'paid',
-                            notes = ?
-                        WHERE id = ?
-                    '''
-                    cursor.execute(update_query, (updated_notes, sale_id))
-                    
-                    remaining_payment -= sale_total
-                    total_debt_reduced += sale_total
-                    sales_paid_complete += 1
-                    
-                    print(f"   ✅ PAGADA COMPLETAMENTE")
-                    print(f"   💰 Pago restante: ${remaining_payment:,.2f}")
-                    
-                else:
-                    # ⚠️ PAGO PARCIAL - Actualizar monto pendiente
-                    paid_amount = remaining_payment
-                    new_debt = sale_total - paid_amount
-                    
-                    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M')
-                    updated_notes = f"{sale_notes} [Abono ${paid_amount:,.2f} el {timestamp} - Saldo: ${new_debt:,.2f}]".strip()
-                    
-                    # *** CORRECCIÓN: Sin updated_at ***
-                    update_query = f'''
-                        UPDATE sales 
-                        SET total = ?,
-                            notes = ?
-                        WHERE id = ?
-                    '''
-                    cursor.execute(update_query, (new_debt, updated_notes, sale_id))
-                    
-                    total_debt_reduced += paid_amount
-                    sales_paid_partial += 1
-                    
-                    print(f"   ⚠️ PAGO PARCIAL")
-                    print(f"   💳 Abono: ${paid_amount:,.2f}")
-                    print(f"   📊 Saldo pendiente: ${new_debt:,.2f}")
-                    
-                    remaining_payment = 0  # Se agotó el pago
-            
-            # PASO 4: Actualizar deuda del cliente - SIN updated_at
-            cursor.execute('''
-                UPDATE clients 
-                SET total_debt = MAX(0, total_debt - ?)
-                WHERE id = ?
-            ''', (total_debt_reduced, self.client.id))
-            
-            print(f"\n💳 Deuda reducida en: ${total_debt_reduced:,.2f}")
-            
-            # PASO 5: Registrar transacción de pago
-            cursor.execute('''
-                INSERT INTO client_transactions 
-                (client_id, transaction_type, amount, description, created_at)
-                VALUES (?, 'credit', ?, ?, datetime('now', 'localtime'))
-            ''', (self.client.id, total_debt_reduced, description))
-            
-            # PASO 6: Manejar exceso como crédito a favor
-            excess_credit = 0
-            if remaining_payment > 0:
-                excess_credit = remaining_payment
-                cursor.execute('''
-                    INSERT INTO client_transactions 
-                    (client_id, transaction_type, amount, description, created_at)
-                    VALUES (?, 'credit_balance', ?, ?, datetime('now', 'localtime'))
-                ''', (self.client.id, excess_credit, f"Crédito a favor por exceso en pago"))
-                
-                print(f"💵 Exceso registrado como crédito: ${excess_credit:,.2f}")
-            
-            # PASO 7: Confirmar todos los cambios
-            conn.commit()
-            
-            print(f"\n🎯 RESUMEN FINAL:")
-            print("=" * 50)
-            print(f"💰 Pago procesado: ${payment_amount:,.2f}")
-            print(f"💳 Aplicado a deuda: ${total_debt_reduced:,.2f}")
-            print(f"✅ Ventas pagadas completamente: {sales_paid_complete}")
-            print(f"⚠️ Ventas con abono parcial: {sales_paid_partial}")
-            print(f"💵 Crédito a favor: ${excess_credit:,.2f}")
-            
-            return {
-                'success': True,
-                'total_updated': len(updated_sales),
-                'sales_paid_complete': sales_paid_complete,
-                'sales_paid_partial': sales_paid_partial,
-                'debt_reduced': total_debt_reduced,
-                'excess_credit': excess_credit
-            }
-            
+            return allocate_payment(self.client.id, payment_amount, description)
         except Exception as e:
             error_msg = f"Error al procesar pago completo: {e}"
             print(f"❌ {error_msg}")
-            if conn:
-                conn.rollback()
             return {'success': False, 'error': error_msg}
-        finally:
-            if conn:
-                conn.close()
-
 
     def show_payment_success_message(self, amount, deuda_anterior, resultado):
         """Muestra mensaje de éxito del pago con información detallada"""
@@ -1118,536 +965,33 @@ class CreditManagementWindow:
             print(f"Error en mensaje de éxito: {e}")
 
 
-    def process_payment_to_sales_exact(self, payment_amount):
-        """Procesa el pago aplicándolo exactamente a las ventas pendientes"""
-        try:
-            from config.database import get_connection
-            from datetime import datetime
-            
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            print(f"\n🏦 PROCESANDO PAGO EXACTO: ${payment_amount:,.2f} para {self.client.name}")
-            print("=" * 70)
-            
-            # PASO 1: Detectar estructura de la tabla
-            cursor.execute("PRAGMA table_info(sales)")
-            table_info = cursor.fetchall()
-            column_names = [column[1] for column in table_info]
-            
-            if 'payment_status' in column_names:
-                status_column = 'payment_status'
-            elif 'status' in column_names:
-                status_column = 'status'
-            else:
-                print("❌ ERROR: No se encontró columna de estado")
-                conn.close()
-                return {'total_updated': 0, 'sales_updated': [], 'error': 'No status column'}
-            
-            print(f"📊 Usando columna de estado: '{status_column}'")
-            
-            # PASO 2: Obtener ventas pendientes ordenadas cronológicamente
-            query = f'''
-                SELECT id, total, created_at, notes
-                FROM sales 
-                WHERE client_id = ? AND {status_column} = 'pending'
-                ORDER BY datetime(created_at) ASC
-            '''
-            
-            cursor.execute(query, (self.client.id,))
-            pending_sales = cursor.fetchall()
-            
-            print(f"📋 Ventas pendientes: {len(pending_sales)}")
-            
-            if not pending_sales:
-                print("ℹ️ No hay ventas pendientes - Pago aplicado como abono general")
-                conn.close()
-                return {'total_updated': 0, 'sales_updated': [], 'message': 'No pending sales'}
-            
-            # Mostrar ventas antes del procesamiento
-            total_pending = 0
-            for i, sale in enumerate(pending_sales, 1):
-                sale_total = float(sale[1])
-                total_pending += sale_total
-                print(f"   {i}. Venta #{sale[0]}: ${sale_total:,.2f} ({sale[2][:19]})")
-            
-            print(f"💰 Total pendiente en ventas: ${total_pending:,.2f}")
-            print(f"💳 Pago exacto a aplicar: ${payment_amount:,.2f}")
-            
-            # PASO 3: Aplicar el pago exactamente a las ventas
-            remaining_payment = payment_amount
-            updated_sales = []
-            sales_paid_complete = 0
-            sales_paid_partial = 0
-            
-            for sale in pending_sales:
-                if remaining_payment <= 0:
-                    print(f"   ⏹️ Pago agotado, ventas restantes sin cambios")
-                    break
-                    
-                sale_id = sale[0]
-                sale_total = float(sale[1])
-                sale_date = sale[2]
-                sale_notes = sale[3] or ""
-                
-                print(f"\n🔄 Procesando Venta #{sale_id}")
-                print(f"   💰 Debe actualmente: ${sale_total:,.2f}")
-                print(f"   💳 Pago disponible: ${remaining_payment:,.2f}")
-                
-                if remaining_payment >= sale_total:
-                    # ✅ PAGO COMPLETO - Marcar como pagada
-                    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M')
-                    updated_notes = f"{sale_notes} [PAGADA el {timestamp}]".strip()
-                    
-                    update_query = f'''
-                        UPDATE sales 
-                        SET {status_column} = 'paid',
-                            notes = ?,
-                            updated_at = datetime('now', 'localtime')
-                        WHERE id = ?
-                    '''
-                    cursor.execute(update_query, (updated_notes, sale_id))
-                    
-                    remaining_payment -= sale_total
-                    sales_paid_complete += 1
-                    
-                    updated_sales.append({
-                        'id': sale_id,
-                        'original_amount': sale_total,
-                        'amount_paid': sale_total,
-                        'remaining_debt': 0,
-                        'status': 'paid_complete',
-                        'date': sale_date[:19]
-                    })
-                    
-                    print(f"   ✅ PAGADA COMPLETAMENTE")
-                    print(f"   💰 Pago restante: ${remaining_payment:,.2f}")
-                    
-                else:
-                    # ⚠️ PAGO PARCIAL - Actualizar monto pendiente
-                    paid_amount = remaining_payment
-                    new_debt = sale_total - paid_amount
-                    
-                    print(f"   ⚠️ PAGO PARCIAL")
-                    print(f"   💳 Abono: ${paid_amount:,.2f}")
-                    print(f"   📊 Saldo pendiente: ${new_debt:,.2f}")
-                    
-                    # Actualizar la venta con el nuevo saldo pendiente
-                    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M')
-                    updated_notes = f"{sale_notes} [Abono ${paid_amount:,.2f} el {timestamp} - Saldo: ${new_debt:,.2f}]".strip()
-                    
-                    update_query = f'''
-                        UPDATE sales 
-                        SET total = ?,
-                            notes = ?,
-                            updated_at = datetime('now', 'localtime')
-                        WHERE id = ?
-                    '''
-                    cursor.execute(update_query, (new_debt, updated_notes, sale_id))
-                    
-                    sales_paid_partial += 1
-                    
-                    updated_sales.append({
-                        'id': sale_id,
-                        'original_amount': sale_total,
-                        'amount_paid': paid_amount,
-                        'remaining_debt': new_debt,
-                        'status': 'paid_partial',
-                        'date': sale_date[:19]
-                    })
-                    
-                    remaining_payment = 0  # Se agotó el pago exactamente
-                    print(f"   💳 Pago agotado exactamente")
-            
-            # PASO 4: Confirmar todos los cambios
-            conn.commit()
-            conn.close()
-            
-            # PASO 5: Resumen final
-            print(f"\n🎯 RESUMEN FINAL:")
-            print("=" * 50)
-            print(f"💰 Pago procesado: ${payment_amount:,.2f}")
-            print(f"✅ Ventas pagadas completamente: {sales_paid_complete}")
-            print(f"⚠️ Ventas con abono parcial: {sales_paid_partial}")
-            print(f"📊 Total ventas afectadas: {len(updated_sales)}")
-            print(f"💳 Pago restante: ${remaining_payment:,.2f} (debe ser $0.00)")
-            
-            if remaining_payment > 0.01:  # Tolerancia para decimales
-                print(f"⚠️ ADVERTENCIA: Quedó pago sin aplicar: ${remaining_payment:,.2f}")
-            
-            return {
-                'total_updated': len(updated_sales),
-                'sales_updated': updated_sales,
-                'sales_paid_complete': sales_paid_complete,
-                'sales_paid_partial': sales_paid_partial,
-                'remaining_payment': remaining_payment,
-                'status_column_used': status_column
-            }
-            
-        except Exception as e:
-            error_msg = f"Error al procesar pago exacto: {e}"
-            print(f"❌ {error_msg}")
-            if 'conn' in locals():
-                conn.rollback()
-                conn.close()
-            return {'total_updated': 0, 'sales_updated': [], 'error': error_msg}
-        
-    # Agregar estos dos métodos a la clase CreditManagementWindow
-
-    def update_sales_status_after_payment(self, payment_amount):
-        """Actualiza el estado de las ventas después de un pago"""
-        try:
-            from config.database import get_connection
-            from datetime import datetime
-            
-            # Refrescar datos del cliente
-            self.client = Client.get_by_id(self.client.id)
-            
-            # Si el cliente no tiene deuda, marcar todas las ventas pendientes como pagadas
-            if self.client.total_debt <= 0:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                # Detectar columna de estado
-                cursor.execute("PRAGMA table_info(sales)")
-                table_info = cursor.fetchall()
-                column_names = [column[1] for column in table_info]
-                
-                status_column = 'payment_status' if 'payment_status' in column_names else 'status'
-                
-                # Marcar ventas pendientes como pagadas
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M')
-                
-                update_query = f'''
-                    UPDATE sales 
-                    SET {status_column} = 'paid',
-                        notes = COALESCE(notes, '') || ' [SALDADA el {timestamp}]'
-                    WHERE client_id = ? AND {status_column} = 'pending'
-                '''
-                cursor.execute(update_query, (self.client.id,))
-                
-                conn.commit()
-                conn.close()
-                    
-        except Exception as e:
-            print(f"Error al actualizar ventas: {e}")
-
-    def show_simple_payment_success(self, amount, deuda_anterior, debt_reduced, excess_amount):
-        """Muestra mensaje de éxito simplificado"""
-        if debt_reduced >= deuda_anterior and deuda_anterior > 0:
-            if excess_amount > 0:
-                mensaje = (f"🎉 ¡DEUDA SALDADA!\n\n"
-                        f"💰 Pago: ${amount:,.2f}\n"
-                        f"💳 Deuda saldada: ${debt_reduced:,.2f}\n"
-                        f"💵 Crédito a favor: ${excess_amount:,.2f}")
-            else:
-                mensaje = (f"🎉 ¡DEUDA SALDADA!\n\n"
-                        f"💰 Pago: ${amount:,.2f}")
-        else:
-            nueva_deuda = deuda_anterior - debt_reduced
-            mensaje = (f"💳 ABONO REGISTRADO\n\n"
-                    f"💰 Abono: ${amount:,.2f}\n"
-                    f"💳 Saldo actual: ${nueva_deuda:,.2f}")
-        
-        messagebox.showinfo("Pago Procesado", mensaje)
-
-    def update_sales_payment_status(self, payment_amount):
-        """Actualiza el estado de las ventas pendientes a 'paid' basándose en el pago"""
-        try:
-            from config.database import get_connection
-            
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # Obtener ventas pendientes ordenadas por fecha
-            cursor.execute('''
-                SELECT id, total, created_at 
-                FROM sales 
-                WHERE client_id = ? AND status = 'pending'
-                ORDER BY created_at ASC
-            ''', (self.client.id,))
-            
-            pending_sales = cursor.fetchall()
-            
-            if not pending_sales:
-                conn.close()
-                return {'total_updated': 0, 'sales_updated': []}
-            
-            remaining_payment = payment_amount
-            updated_sales = []
-            
-            # Procesar cada venta pendiente
-            for sale in pending_sales:
-                if remaining_payment <= 0:
-                    break
-                    
-                sale_id = sale[0]
-                sale_total = float(sale[1])
-                
-                if remaining_payment >= sale_total:
-                    # Pago completo de esta venta
-                    cursor.execute('''
-                        UPDATE sales 
-                        SET status = 'paid', updated_at = datetime('now', 'localtime')
-                        WHERE id = ?
-                    ''', (sale_id,))
-                    
-                    remaining_payment -= sale_total
-                    updated_sales.append({
-                        'id': sale_id,
-                        'amount_paid': sale_total,
-                        'status': 'paid_complete'
-                    })
-                    
-                    print(f"✅ Venta #{sale_id} marcada como 'paid' - Monto: ${sale_total:,.2f}")
-                    
-                else:
-                    # Pago parcial - dividir la venta
-                    paid_amount = remaining_payment
-                    remaining_amount = sale_total - paid_amount
-                    
-                    # Actualizar la venta original con el monto pagado
-                    cursor.execute('''
-                        UPDATE sales 
-                        SET total = ?, status = 'paid', updated_at = datetime('now', 'localtime')
-                        WHERE id = ?
-                    ''', (paid_amount, sale_id))
-                    
-                    # Crear nueva venta con el monto restante
-                    cursor.execute('''
-                        INSERT INTO sales (client_id, total, status, notes, created_at, updated_at)
-                        VALUES (?, ?, 'pending', ?, ?, datetime('now', 'localtime'))
-                    ''', (
-                        self.client.id, 
-                        remaining_amount, 
-                        f"Saldo pendiente de venta #{sale_id}", 
-                        sale[2]  # Mantener la fecha original
-                    ))
-                    
-                    updated_sales.append({
-                        'id': sale_id,
-                        'amount_paid': paid_amount,
-                        'remaining': remaining_amount,
-                        'status': 'paid_partial'
-                    })
-                    
-                    remaining_payment = 0
-                    print(f"⚠️ Venta #{sale_id} pago parcial - Pagado: ${paid_amount:,.2f}, Restante: ${remaining_amount:,.2f}")
-            
-            # Confirmar cambios
-            conn.commit()
-            conn.close()
-            
-            print(f"🔄 Total de ventas actualizadas: {len(updated_sales)}")
-            
-            return {
-                'total_updated': len(updated_sales),
-                'sales_updated': updated_sales,
-                'remaining_payment': remaining_payment
-            }
-            
-        except Exception as e:
-            print(f"❌ Error al actualizar estado de ventas: {e}")
-            if conn:
-                conn.rollback()
-                conn.close()
-            return {'total_updated': 0, 'sales_updated': [], 'error': str(e)}
-
-
-
-    def update_pending_sales_to_paid(self):
-        """Actualiza las ventas pendientes a pagadas cuando la deuda se salda"""
-        try:
-            from config.database import get_connection
-            
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # Si el cliente no tiene deuda restante, marcar todas las ventas pendientes como pagadas
-            if self.client.total_debt == 0:
-                cursor.execute('''
-                    UPDATE sales 
-                    SET payment_status = 'paid', 
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE client_id = ? AND payment_status = 'pending'
-                ''', (self.client.id,))
-                
-                updated_sales = cursor.rowcount
-                conn.commit()
-                
-                if updated_sales > 0:
-                    print(f"✅ {updated_sales} ventas marcadas como pagadas para el cliente {self.client.name}")
-            
-            conn.close()
-            
-        except Exception as e:
-            print(f"Error al actualizar ventas pendientes: {e}")
-            # No mostrar error al usuario, es un proceso interno
-
-    # Agregar estos métodos a la clase CreditManagementWindow
-
-    def get_pending_sales(self):
-        """Obtiene las ventas pendientes del cliente - VERSIÓN CORREGIDA"""
-        try:
-            from config.database import get_connection
-            
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # CORRECCIÓN: Usar los nombres correctos de columnas
-            cursor.execute('''
-                SELECT id, total, created_at, notes
-                FROM sales 
-                WHERE client_id = ? AND status = 'pending'
-                ORDER BY created_at ASC
-            ''', (self.client.id,))
-            
-            # Convertir a diccionarios para fácil acceso
-            columns = [description[0] for description in cursor.description]
-            pending_sales = []
-            
-            for row in cursor.fetchall():
-                sale_dict = dict(zip(columns, row))
-                pending_sales.append(sale_dict)
-            
-            conn.close()
-            
-            print(f"📊 Ventas pendientes encontradas: {len(pending_sales)}")
-            for sale in pending_sales:
-                print(f"   - Venta #{sale['id']}: ${sale['total']:,.2f}")
-            
-            return pending_sales
-            
-        except Exception as e:
-            print(f"Error al obtener ventas pendientes: {e}")
-            return []
-
-    def mark_specific_sales_as_paid(self, payment_amount):
-        """Marca ventas específicas como pagadas basándose en el monto del pago"""
-        try:
-            from config.database import get_connection
-            
-            pending_sales = self.get_pending_sales()
-            if not pending_sales:
-                return []
-            
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            remaining_payment = payment_amount
-            updated_sales = []
-            
-            for sale in pending_sales:
-                if remaining_payment <= 0:
-                    break
-                    
-                sale_total = sale['total']  # Usar 'total' en lugar de 'total_amount'
-                
-                if remaining_payment >= sale_total:
-                    cursor.execute('''
-                        UPDATE sales 
-                        SET status = 'paid'
-                        WHERE id = ?
-                    ''', (sale['id'],))
-                    
-                    remaining_payment -= sale_total
-                    updated_sales.append({
-                        'id': sale['id'],
-                        'amount': sale_total,
-                        'date': sale['created_at'],
-                        'status': 'paid_complete'
-                    })
-                else:
-                    paid_amount = remaining_payment
-                    remaining_amount = sale_total - paid_amount
-                    
-                    cursor.execute('''
-                        UPDATE sales 
-                        SET status = 'paid',
-                            total = ?
-                        WHERE id = ?
-                    ''', (paid_amount, sale['id']))
-                    
-                    cursor.execute('''
-                        INSERT INTO sales (client_id, total, status, notes, created_at)
-                        VALUES (?, ?, 'pending', ?, ?)
-                    ''', (self.client.id, remaining_amount, 
-                        f"Pago parcial - Restante de venta #{sale['id']}", 
-                        sale['created_at']))
-                    
-                    updated_sales.append({
-                        'id': sale['id'],
-                        'amount': paid_amount,
-                        'date': sale['created_at'],
-                        'status': 'paid_partial',
-                        'remaining': remaining_amount
-                    })
-                    
-                    remaining_payment = 0
-            
-            conn.commit()
-            conn.close()
-            
-            return updated_sales
-            
-        except Exception as e:
-            print(f"Error al marcar ventas específicas como pagadas: {e}")
-            return []
-
     def show_payment_allocation_preview(self, amount):
         """Muestra cómo se distribuirá el pago entre las ventas pendientes"""
         try:
-            from config.database import get_connection
-            
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # Detectar columna de estado
-            cursor.execute("PRAGMA table_info(sales)")
-            table_info = cursor.fetchall()
-            column_names = [column[1] for column in table_info]
-            
-            status_column = 'payment_status' if 'payment_status' in column_names else 'status'
-            
-            # Obtener ventas pendientes
-            cursor.execute(f'''
-                SELECT id, total, created_at
-                FROM sales 
-                WHERE client_id = ? AND {status_column} = 'pending'
-                ORDER BY datetime(created_at) ASC
-            ''', (self.client.id,))
-            
-            pending_sales = cursor.fetchall()
-            conn.close()
+            allocations, exceso = plan_allocation(self.client.id, amount)
             
-            if not pending_sales:
-                if amount > 0:
+            if not allocations:
+                if amount <= 0:
+                    return "No hay ventas pendientes"
+                if exceso >= amount:
                     return f"💵 Todo el pago (${amount:,.2f}) se registrará como crédito a favor"
-                return "No hay ventas pendientes"
             
             allocation_text = ""
-            remaining_payment = amount
-            total_debt = sum(float(sale[1]) for sale in pending_sales)
-            
-            for i, sale in enumerate(pending_sales, 1):
-                if remaining_payment <= 0:
-                    allocation_text += f"⏸️ Venta #{sale[0]}: ${sale[1]:,.2f} - SIN CAMBIOS\n"
-                    continue
-                    
-                sale_total = float(sale[1])
-                sale_date = sale[2][:16]
-                
-                if remaining_payment >= sale_total:
-                    allocation_text += f"✅ Venta #{sale[0]} ({sale_date}): ${sale_total:,.2f} - PAGADA COMPLETA\n"
-                    remaining_payment -= sale_total
+            for item in allocations:
+                sale_date = item['date'][:16]
+                if item['status'] == 'paid':
+                    allocation_text += f"✅ Venta #{item['sale_id']} ({sale_date}): ${item['balance']:,.2f} - PAGADA COMPLETA\n"
                 else:
-                    saldo = sale_total - remaining_payment
-                    allocation_text += f"⚠️ Venta #{sale[0]} ({sale_date}): Abono ${remaining_payment:,.2f}, Saldo ${saldo:,.2f}\n"
-                    remaining_payment = 0
+                    allocation_text += (f"⚠️ Venta #{item['sale_id']} ({sale_date}): Abono ${item['amount']:,.2f}, "
+                                        f"Saldo ${item['remaining']:,.2f}\n")
+            
+            # Deuda que no está respaldada por ventas pendientes
+            sin_ventas = amount - exceso - sum(item['amount'] for item in allocations)
+            if sin_ventas > EPSILON:
+                allocation_text += f"💳 Abono a la deuda sin ventas pendientes: ${sin_ventas:,.2f}\n"
             
             # Agregar información del exceso si lo hay
-            if amount > total_debt:
-                exceso = amount - total_debt
+            if exceso > 0:
                 allocation_text += f"\n💵 Exceso como crédito: ${exceso:,.2f}"
             
             return allocation_text.strip()
@@ -1655,195 +999,15 @@ class CreditManagementWindow:
         except Exception as e:
             return f"Error al calcular distribución: {e}"
     
-    def process_payment_with_accumulation(self, payment_amount):
-        """Procesa el pago aplicándolo exactamente a las ventas pendientes"""
-        try:
-            from config.database import get_connection
-            from datetime import datetime
-            
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            print(f"\n💰 PROCESANDO PAGO CON ACUMULACIÓN: ${payment_amount:,.2f}")
-            print("=" * 60)
-            
-            # PASO 1: Detectar estructura de la tabla
-            cursor.execute("PRAGMA table_info(sales)")
-            table_info = cursor.fetchall()
-            column_names = [column[1] for column in table_info]
-            
-            if 'payment_status' in column_names:
-                status_column = 'payment_status'
-            elif 'status' in column_names:
-                status_column = 'status'
-            else:
-                print("❌ ERROR: No se encontró columna de estado")
-                conn.close()
-                return {'error': 'No status column found'}
-            
-            print(f"📊 Usando columna de estado: '{status_column}'")
-            
-            # PASO 2: Obtener ventas pendientes ordenadas cronológicamente
-            query = f'''
-                SELECT id, total, created_at, notes
-                FROM sales 
-                WHERE client_id = ? AND {status_column} = 'pending'
-                ORDER BY datetime(created_at) ASC
-            '''
-            
-            cursor.execute(query, (self.client.id,))
-            pending_sales = cursor.fetchall()
-            
-            print(f"📋 Ventas pendientes encontradas: {len(pending_sales)}")
-            
-            if not pending_sales:
-                print("ℹ️ No hay ventas pendientes")
-                # Si hay pago y no hay ventas pendientes, registrar como crédito a favor
-                if payment_amount > 0:
-                    self.handle_excess_credit(self.client.id, payment_amount)
-                conn.close()
-                return {'message': 'No pending sales', 'excess_credit': payment_amount}
-            
-            # PASO 3: Mostrar estado inicial
-            total_pending = sum(float(sale[1]) for sale in pending_sales)
-            print(f"💳 Total pendiente en ventas: ${total_pending:,.2f}")
-            print(f"💰 Pago a aplicar: ${payment_amount:,.2f}")
-            
-            for i, sale in enumerate(pending_sales, 1):
-                print(f"   {i}. Venta #{sale[0]}: ${float(sale[1]):,.2f} ({sale[2][:19]})")
-            
-            # PASO 4: Procesar el pago exactamente
-            remaining_payment = payment_amount
-            updated_sales = []
-            sales_paid_complete = 0
-            sales_paid_partial = 0
-            
-            for sale in pending_sales:
-                if remaining_payment <= 0:
-                    print(f"   ⏸️ Pago agotado, ventas restantes sin cambios")
-                    break
-                    
-                sale_id = sale[0]
-                sale_total = float(sale[1])
-                sale_date = sale[2]
-                sale_notes = sale[3] or ""
-                
-                print(f"\n📄 Procesando Venta #{sale_id}")
-                print(f"   💰 Debe actualmente: ${sale_total:,.2f}")
-                print(f"   💳 Pago disponible: ${remaining_payment:,.2f}")
-                
-                if remaining_payment >= sale_total:
-                    # ✅ PAGO COMPLETO - Marcar como pagada
-                    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M')
-                    updated_notes = f"{sale_notes} [PAGADA el {timestamp}]".strip()
-                    
-                    update_query = f'''
-                        UPDATE sales 
-                        SET {status_column} = 'paid',
-                            notes = ?,
-                            updated_at = datetime('now', 'localtime')
-                        WHERE id = ?
-                    '''
-                    cursor.execute(update_query, (updated_notes, sale_id))
-                    
-                    remaining_payment -= sale_total
-                    sales_paid_complete += 1
-                    
-                    updated_sales.append({
-                        'id': sale_id,
-                        'original_amount': sale_total,
-                        'amount_paid': sale_total,
-                        'remaining_debt': 0,
-                        'status': 'paid_complete',
-                        'date': sale_date[:19]
-                    })
-                    
-                    print(f"   ✅ PAGADA COMPLETAMENTE")
-                    print(f"   💰 Pago restante: ${remaining_payment:,.2f}")
-                    
-                else:
-                    # ⚠️ PAGO PARCIAL - Actualizar monto pendiente
-                    paid_amount = remaining_payment
-                    new_debt = sale_total - paid_amount
-                    
-                    print(f"   ⚠️ PAGO PARCIAL")
-                    print(f"   💳 Abono: ${paid_amount:,.2f}")
-                    print(f"   📊 Saldo pendiente: ${new_debt:,.2f}")
-                    
-                    # Actualizar la venta con el nuevo saldo pendiente
-                    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M')
-                    updated_notes = f"{sale_notes} [Abono ${paid_amount:,.2f} el {timestamp} - Saldo: ${new_debt:,.2f}]".strip()
-                    
-                    update_query = f'''
-                        UPDATE sales 
-                        SET total = ?,
-                            notes = ?,
-                            updated_at = datetime('now', 'localtime')
-                        WHERE id = ?
-                    '''
-                    cursor.execute(update_query, (new_debt, updated_notes, sale_id))
-                    
-                    sales_paid_partial += 1
-                    
-                    updated_sales.append({
-                        'id': sale_id,
-                        'original_amount': sale_total,
-                        'amount_paid': paid_amount,
-                        'remaining_debt': new_debt,
-                        'status': 'paid_partial',
-                        'date': sale_date[:19]
-                    })
-                    
-                    remaining_payment = 0  # Se agotó el pago exactamente
-                    print(f"   💳 Pago agotado exactamente")
-            
-            # PASO 5: Manejar exceso de pago como crédito a favor
-            if remaining_payment > 0:
-                print(f"\n💵 EXCESO DE PAGO: ${remaining_payment:,.2f}")
-                self.handle_excess_credit(self.client.id, remaining_payment)
-            
-            # PASO 6: Confirmar todos los cambios
-            conn.commit()
-            conn.close()
-            
-            # PASO 7: Resumen final
-            print(f"\n🎯 RESUMEN FINAL:")
-            print("=" * 50)
-            print(f"💰 Pago procesado: ${payment_amount:,.2f}")
-            print(f"✅ Ventas pagadas completamente: {sales_paid_complete}")
-            print(f"⚠️ Ventas con abono parcial: {sales_paid_partial}")
-            print(f"📊 Total ventas afectadas: {len(updated_sales)}")
-            print(f"💳 Exceso como crédito: ${remaining_payment:,.2f}")
-            
-            return {
-                'total_updated': len(updated_sales),
-                'sales_updated': updated_sales,
-                'sales_paid_complete': sales_paid_complete,
-                'sales_paid_partial': sales_paid_partial,
-                'excess_credit': remaining_payment,
-                'status_column_used': status_column
-            }
-            
-        except Exception as e:
-            error_msg = f"Error al procesar pago con acumulación: {e}"
-            print(f"❌ {error_msg}")
-            if 'conn' in locals():
-                conn.rollback()
-                conn.close()
-            return {'total_updated': 0, 'sales_updated': [], 'error': error_msg}
-    
     def view_history(self):
         """Muestra el historial del cliente"""
         ClientHistoryWindow(self.window, self.client)
     
     def refresh_and_close(self):
-        """Actualiza todas las ventanas y cierra esta ventana"""
-        # Actualizar ventana de clientes
-        self.clients_window.refresh_clients()
-        
-        # Actualizar todas las ventanas desde main_window si existe
-        if self.main_window:
-            self.main_window.refresh_all_windows()
+        """Actualiza la ventana de clientes y cierra esta ventana"""
+        # Actualizar ventana de clientes (solo este cliente). Las demás
+        # ventanas se enteran de los pagos por el bus de eventos.
+        self.clients_window.refresh_clients([self.client.id])
         
         # Cerrar ventana actual
         self.window.destroy()
@@ -1876,6 +1040,14 @@ class ClientHistoryWindow:
         
         # Cargar historial
         self.load_history()
+        subscribe_window(self.window, (SALE_SAVED, SALE_DELETED, PAYMENT_REGISTERED),
+                         self.on_data_changed)
+
+    def on_data_changed(self, changes):
+        """Relee la página visible si los eventos mencionan a este cliente"""
+        client_ids = changes.ids('clients')
+        if client_ids is None or self.selected_client.id in client_ids:
+            self.history_list.refresh()
 
     def close_window(self):
         """Cierra la ventana del historial del cliente"""
@@ -1892,7 +1064,8 @@ class ClientHistoryWindow:
             messagebox.showinfo("Información", "Seleccione una fila del historial primero")
             return
 
-        sale_id = self.row_sale_map.get(selected[0])
+        row = self.history_list.row(selected[0])
+        sale_id = row['sale_id'] if row else None
         if not sale_id:
             messagebox.showinfo(
                 "Sin venta asociada",
@@ -1936,9 +1109,10 @@ class ClientHistoryWindow:
         table_frame = ttk.Frame(main_frame)
         table_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 15))
         
-        # Crear Treeview
+        # Crear Treeview (lista virtual: solo las filas visibles)
         columns = ("Fecha", "Tipo", "Monto", "Descripción")
-        self.tree = ttk.Treeview(table_frame, columns=columns, show="headings", height=15)
+        self.history_list = VirtualTreeview(table_frame, columns, self.process_transaction_row, height=15)
+        self.tree = self.history_list.tree
         
         # Configurar columnas
         self.tree.heading("Fecha", text="Fecha")
@@ -1951,13 +1125,8 @@ class ClientHistoryWindow:
         self.tree.column("Monto", width=120, anchor="e")
         self.tree.column("Descripción", width=250, anchor="w")
         
-        # Scrollbars
-        v_scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=v_scrollbar.set)
-        
-        # Empaquetar tabla y scrollbars
-        self.tree.pack(side="left", fill="both", expand=True)
-        v_scrollbar.pack(side="right", fill="y")
+        # Empaquetar tabla y scrollbar
+        self.history_list.pack(fill="both", expand=True)
         
         # Configurar colores para diferentes tipos
         self.tree.tag_configure("debit", background="#ffebee")  # Rojo claro para débitos
@@ -1965,11 +1134,6 @@ class ClientHistoryWindow:
         self.tree.tag_configure('deuda', background='#ffdddd', foreground='black')  # Rojo claro
         self.tree.tag_configure('pago', background='#ddffdd', foreground='black')   # Verde claro
 
-        # Mapa fila -> sale_id, para poder abrir el detalle de la venta
-        # directamente desde el historial (sin tener que ir a buscarla
-        # manualmente a la lista de ventas).
-        self.row_sale_map = {}
-
         # Doble clic sobre una fila con venta asociada = ver detalle
         self.tree.bind('<Double-1>', self._on_history_row_double_click)
 
@@ -1997,39 +1161,31 @@ class ClientHistoryWindow:
             messagebox.showerror("Error", "Cliente no válido")
             return
 
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
+            self.configure_tree_styles()
 
-            # CORRECCIÓN: Incluir segundos en la fecha mostrada
-            cursor.execute('''
-                SELECT 
+            # CORRECCIÓN: Incluir segundos en la fecha mostrada. La lista
+            # solo lee de la base de datos las páginas que se ven.
+            self.history_list.set_source(KeysetQuery(
+                columns='''
                     strftime('%Y-%m-%d %H:%M:%S', created_at) as fecha_completa,
                     transaction_type as tipo,
                     amount as monto,
                     description as descripcion,
                     sale_id,
-                    created_at
-                FROM client_transactions
-                WHERE client_id = ?
-                ORDER BY datetime(created_at) ASC
-            ''', (self.selected_client.id,))
-
-            self.tree.delete(*self.tree.get_children())
-            self.row_sale_map = {}
-            self.configure_tree_styles()
-
-            for row in cursor.fetchall():
-                self.process_transaction_row(row)
+                    created_at,
+                    id
+                ''',
+                from_clause='client_transactions',
+                where='client_id = ?',
+                params=(self.selected_client.id,),
+                key=[('created_at', 'created_at', False), ('id', 'id', False)],
+            ))
 
         except sqlite3.Error as e:
             messagebox.showerror("Error de BD", f"No se pudo cargar el historial:\n{str(e)}")
         except Exception as e:
             messagebox.showerror("Error", f"Error inesperado:\n{str(e)}")
-        finally:
-            if conn:
-                conn.close()
 
     def configure_tree_styles(self):
         """Configura los estilos visuales para diferentes tipos de transacciones"""
@@ -2043,7 +1199,7 @@ class ClientHistoryWindow:
         self.tree.tag_configure('reversion', background='#fff8e8')
 
     def process_transaction_row(self, row):
-        """Procesa y muestra una fila individual del historial"""
+        """Convierte una fila del historial en (valores, tags) para la lista"""
         try:
             tipo_map = {
                 'debit': ('DEUDA', 'deuda'),
@@ -2075,26 +1231,15 @@ class ClientHistoryWindow:
             # CORRECCIÓN: Mostrar fecha completa con segundos
             fecha_display = fecha_completa  # Ya incluye segundos del SELECT
             
-            item_id = self.tree.insert('', 'end',
-                values=(
-                    fecha_display,
-                    tipo_display,
-                    monto_formateado,
-                    descripcion.strip()
-                ),
-                tags=(tag,)
+            # La venta asociada (si existe) queda en la fila (row['sale_id'])
+            # para poder abrir su detalle directamente desde esta ventana.
+            return (
+                (fecha_display, tipo_display, monto_formateado, descripcion.strip()),
+                (tag,)
             )
-
-            # Registrar la venta asociada (si existe) para poder abrir su
-            # detalle directamente desde esta ventana de historial.
-            if sale_id:
-                self.row_sale_map[item_id] = sale_id
         except Exception as e:
             print(f"Error al procesar transacción: {e}")
-            self.tree.insert('', 'end',
-                values=("Error", "Error", "$0.00", f"Error: {str(e)}"),
-                tags=('error',)
-            )
+            return ("Error", "Error", "$0.00", f"Error: {str(e)}"), ('error',)
             
     def configure_tree_tags(self):
         """Configura los estilos para diferentes tipos de transacciones"""
@@ -3,6 +3,8 @@ from tkinter import ttk, messagebox
 from models.expense import Expense
 from utils.validators import validate_required, validate_positive, safe_float_conversion
 from utils.formatters import format_currency, format_number
+from utils.events import subscribe_window, TABLES_CHANGED
+from utils.virtual_tree import VirtualTreeview
 from datetime import datetime
 
 class ExpensesWindow:
@@ -17,11 +19,16 @@ class ExpensesWindow:
         self.window.resizable(True, True)
         
         # Variables
-        self.expenses = []
         self.selected_expense = None
         
         self.setup_ui()
         self.load_data()
+        subscribe_window(self.window, TABLES_CHANGED, self.on_tables_changed)
+
+    def on_tables_changed(self, changes):
+        """Otro proceso modificó la base de datos: refrescar si tocó gastos"""
+        if 'expenses' in changes.ids('tables'):
+            self.update_expenses_tree()
     
     def setup_ui(self):
         """Configura la interfaz de usuario"""
@@ -180,9 +187,12 @@ class ExpensesWindow:
                                    font=('Arial', 10, 'bold'))
         self.count_label.pack(side=tk.LEFT)
         
-        # Treeview para mostrar gastos con mejor formato
+        # Treeview para mostrar gastos (lista virtual con colores alternos)
         columns = ('ID', 'Descripción', 'Monto', 'Fecha', 'Usuario')
-        self.expenses_tree = ttk.Treeview(main_frame, columns=columns, show='headings', height=15)
+        tree_frame = ttk.Frame(main_frame)
+        self.expenses_list = VirtualTreeview(tree_frame, columns, self._expense_row_values,
+                                             stripe_tags=('evenrow', 'oddrow'), height=15)
+        self.expenses_tree = self.expenses_list.tree
         
         # Configurar columnas con mejor espaciado
         self.expenses_tree.heading('ID', text='ID')
@@ -205,16 +215,17 @@ class ExpensesWindow:
         style.configure("Treeview", rowheight=25)
         style.configure("Treeview.Heading", font=('Arial', 10, 'bold'))
         
-        # Scrollbars
-        tree_frame = ttk.Frame(main_frame)
+        # Scrollbars (la vertical la maneja la lista virtual)
         tree_frame.pack(fill=tk.BOTH, expand=True)
         
-        v_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.expenses_tree.yview)
         h_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.HORIZONTAL, command=self.expenses_tree.xview)
-        self.expenses_tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
+        self.expenses_tree.configure(xscrollcommand=h_scrollbar.set)
         
-        self.expenses_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.expenses_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        # Configurar colores alternos
+        self.expenses_tree.tag_configure('evenrow', background='#f0f0f0')
+        self.expenses_tree.tag_configure('oddrow', background='white')
         
         # Bind para selección
         self.expenses_tree.bind('<<TreeviewSelect>>', self.on_expense_select)
@@ -233,61 +244,46 @@ class ExpensesWindow:
     def load_data(self):
         """Carga los datos de gastos"""
         try:
-            self.expenses = Expense.get_all()
-            self.update_expenses_tree()
+            self.show_expenses(Expense.list_query())
         except Exception as e:
             messagebox.showerror("Error", f"Error al cargar gastos: {str(e)}")
     
+    def show_expenses(self, query):
+        """Muestra en la lista los gastos de la consulta y sus totales"""
+        self.selected_expense = None
+        self.expenses_list.set_source(query)
+        self.update_expenses_tree()
+    
     def update_expenses_tree(self):
-        """Actualiza el árbol de gastos con formato mejorado"""
-        # Limpiar árbol
-        for item in self.expenses_tree.get_children():
-            self.expenses_tree.delete(item)
+        """Actualiza el árbol de gastos y las estadísticas (calculadas en SQL)"""
+        query = self.expenses_list.source
+        if query is None:
+            return
+        self.expenses_list.refresh()
         
-        total = 0
-        count = 0
+        stats = query.aggregate("COUNT(*) as count, COALESCE(SUM(amount), 0) as total")
         
-        # Agregar gastos
-        for expense in self.expenses:
-            try:
-                # Formatear fecha
-                if hasattr(expense, 'date') and expense.date:
-                    if isinstance(expense.date, str):
-                        date_str = expense.date
-                    else:
-                        date_str = expense.date.strftime("%Y-%m-%d %H:%M")
-                else:
-                    date_str = "N/A"
-                
-                # Formatear monto con separadores de miles
-                amount_formatted = format_currency(expense.amount)
-                
-                # Obtener nombre de usuario si está disponible
-                user_name = getattr(expense, 'user_name', 'N/A')
-                
-                # Insertar en árbol con colores alternos
-                item_id = self.expenses_tree.insert('', tk.END, values=(
-                    expense.id,
-                    expense.description,
-                    amount_formatted,
-                    date_str,
-                    user_name
-                ), tags=('evenrow' if count % 2 == 0 else 'oddrow',))
-                
-                total += expense.amount
-                count += 1
-                
-            except Exception as e:
-                print(f"Error procesando gasto {expense.id}: {e}")
-                continue
+        # Actualizar estadísticas
+        self.total_label.config(text=f"💰 Total: {format_currency(stats['total'])}")
+        self.count_label.config(text=f"📝 Gastos: {stats['count']:,}")
+    
+    def _expense_row_values(self, row):
+        """Valores de un gasto en la lista, con formato"""
+        expense = Expense._from_row(row)
         
-        # Configurar colores alternos
-        self.expenses_tree.tag_configure('evenrow', background='#f0f0f0')
-        self.expenses_tree.tag_configure('oddrow', background='white')
+        # Formatear fecha
+        if expense.date:
+            date_str = expense.date.strftime("%Y-%m-%d %H:%M")
+        else:
+            date_str = "N/A"
         
-        # Actualizar estadísticas
-        self.total_label.config(text=f"💰 Total: {format_currency(total)}")
-        self.count_label.config(text=f"📝 Gastos: {count:,}")
+        # Formatear monto con separadores de miles
+        amount_formatted = format_currency(expense.amount)
+        
+        # Obtener nombre de usuario si está disponible
+        user_name = getattr(expense, 'user_name', 'N/A')
+        
+        return (expense.id, expense.description, amount_formatted, date_str, user_name), ()
     
     def on_expense_select(self, event=None):
         """Maneja la selección de un gasto"""
@@ -296,15 +292,8 @@ class ExpensesWindow:
             self.selected_expense = None
             return
         
-        # Obtener ID del gasto seleccionado
-        item = self.expenses_tree.item(selection[0])
-        expense_id = item['values'][0]
-        
-        # Buscar gasto en la lista
-        for expense in self.expenses:
-            if expense.id == expense_id:
-                self.selected_expense = expense
-                break
+        row = self.expenses_list.row(selection[0])
+        self.selected_expense = Expense._from_row(row) if row else None
     
     def save_expense(self):
         """Guarda el gasto con validaciones mejoradas"""
@@ -548,7 +537,7 @@ class ExpensesWindow:
         ttk.Button(frame, text="Cerrar", command=details.destroy).pack(pady=20)
     
     def filter_expenses(self):
-        """Filtra los gastos por fecha"""
+        """Filtra los gastos por fecha (el filtro se aplica en la base de datos)"""
         date_from = self.date_from_var.get().strip()
         date_to = self.date_to_var.get().strip()
         
@@ -557,33 +546,15 @@ class ExpensesWindow:
             return
         
         try:
-            filtered_expenses = []
-            
-            for expense in Expense.get_all():
-                expense_date = expense.date
-                if isinstance(expense_date, str):
-                    expense_date = datetime.strptime(expense_date.split()[0], "%Y-%m-%d")
-                
-                include = True
-                
-                if date_from:
-                    from_date = datetime.strptime(date_from, "%Y-%m-%d")
-                    if expense_date < from_date:
-                        include = False
-                
-                if date_to and include:
-                    to_date = datetime.strptime(date_to, "%Y-%m-%d")
-                    if expense_date > to_date:
-                        include = False
-                
-                if include:
-                    filtered_expenses.append(expense)
+            for value in (date_from, date_to):
+                if value:
+                    datetime.strptime(value, "%Y-%m-%d")
             
-            self.expenses = filtered_expenses
-            self.update_expenses_tree()
+            self.show_expenses(Expense.list_query(start_date=date_from or None,
+                                                  end_date=date_to or None))
             
             messagebox.showinfo("Filtro Aplicado", 
-                f"Se encontraron {len(filtered_expenses)} gastos en el rango seleccionado")
+                f"Se encontraron {self.expenses_list.total} gastos en el rango seleccionado")
             
         except ValueError:
             messagebox.showerror("Error", "Formato de fecha inválido. Use YYYY-MM-DD")
@@ -593,4 +564,4 @@ class ExpensesWindow:
     def export_expenses(self):
         """Exporta la lista de gastos (función placeholder)"""
         messagebox.showinfo("Exportar", "Función de exportación en desarrollo\n\n"
-                           f"Se exportarían {len(self.expenses)} gastos")
\ No newline at end of file
+                           f"Se exportarían {self.expenses_list.total} gastos")
\ No newline at end of file
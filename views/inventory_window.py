@@ -1,8 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from config.database import get_connection
-from utils.ExcelImportWindow import ExcelImportWindow
-from views.users_window import UsersWindow
+from models.pagination import KeysetQuery, Conditions
+from utils.events import subscribe_window, PRODUCT_TOPICS
+from utils.virtual_tree import VirtualTreeview
 
 class InventoryWindow:
     def __init__(self, parent, user):
@@ -17,13 +18,14 @@ class InventoryWindow:
         self.center_window()
         
         # Variables
-        self.products = []
+        self.stats = None
         self.selected_product = None
         
         # UI
         self.setup_ui()
         self.refresh_products()
         self.window.protocol("WM_DELETE_WINDOW", self.on_closing)
+        subscribe_window(self.window, PRODUCT_TOPICS, lambda changes: self.refresh_products())
 
     def center_window(self):
         """Centra la ventana en la pantalla"""
@@ -105,7 +107,8 @@ class InventoryWindow:
         table_frame.pack(fill=tk.BOTH, expand=True)
         
         columns = ("ID", "Producto", "Precio", "Stock", "Valor Total")
-        self.tree = ttk.Treeview(table_frame, columns=columns, show="headings", height=16)
+        self.product_list = VirtualTreeview(table_frame, columns, self._product_row_values, height=16)
+        self.tree = self.product_list.tree
         
         # Config columnas
         col_config = [
@@ -120,13 +123,11 @@ class InventoryWindow:
             self.tree.heading(col, text=col)
             self.tree.column(col, width=width, anchor=anchor)
 
-        # Scrollbars
-        vsb = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        # Scrollbar horizontal (la vertical la maneja la lista virtual)
         hsb = ttk.Scrollbar(table_frame, orient="horizontal", command=self.tree.xview)
-        self.tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
+        self.tree.configure(xscrollcommand=hsb.set)
         
-        self.tree.grid(row=0, column=0, sticky="nsew")
-        vsb.grid(row=0, column=1, sticky="ns")
+        self.product_list.grid(row=0, column=0, sticky="nsew")
         hsb.grid(row=1, column=0, sticky="ew")
         table_frame.grid_rowconfigure(0, weight=1)
         table_frame.grid_columnconfigure(0, weight=1)
@@ -158,6 +159,7 @@ class InventoryWindow:
         if self.user.role != 'admin':
             messagebox.showwarning("Acceso denegado", "Solo los administradores pueden importar desde Excel")
             return
+        from utils.ExcelImportWindow import ExcelImportWindow
         ExcelImportWindow(self.window, self)
     
     def refresh_products(self):
@@ -167,64 +169,60 @@ class InventoryWindow:
             cursor = conn.cursor()
             
             cursor.execute('''
-                SELECT id, name, price, stock, (price * stock) as total_value
-                FROM products 
-                ORDER BY name
+                SELECT COUNT(*) as total_products,
+                       COALESCE(SUM(stock), 0) as total_items,
+                       COALESCE(SUM(price * stock), 0) as total_value,
+                       COALESCE(SUM(CASE WHEN stock > 0 AND stock <= 5 THEN 1 ELSE 0 END), 0) as low_stock,
+                       COALESCE(SUM(CASE WHEN stock = 0 THEN 1 ELSE 0 END), 0) as no_stock
+                FROM products
             ''')
             
-            self.products = cursor.fetchall()
+            self.stats = cursor.fetchone()
             conn.close()
             
-            self.populate_tree()
+            self.populate_tree(self.search_var.get())
             self.update_statistics()
             
         except Exception as e:
             messagebox.showerror("Error", f"Error al cargar productos: {e}")
     
-    def populate_tree(self, products=None):
-        """Llena el treeview con los productos"""
-        # Limpiar árbol
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        products_to_show = products if products is not None else self.products
-        
-        # Agregar productos
-        for product in products_to_show:
-            price_formatted = f"${product['price']:,.2f}"
-            total_value_formatted = f"${product['total_value']:,.2f}"
-            
-            # Color por stock
-            tags = []
-            if product['stock'] <= 5:
-                tags.append("low_stock")
-            elif product['stock'] == 0:
-                tags.append("no_stock")
-            
-            self.tree.insert("", "end", 
-                           values=(product['id'], product['name'], 
-                                 price_formatted, product['stock'], 
-                                 total_value_formatted),
-                           tags=tags)
+    def populate_tree(self, search_term=None):
+        """Llena el treeview con los productos (opcionalmente filtrados por nombre)"""
+        conditions = Conditions()
+        conditions.contains('name', search_term)
+        
+        self.product_list.set_source(KeysetQuery(
+            columns='id, name, price, stock, (price * stock) as total_value',
+            from_clause='products',
+            where=conditions.where,
+            params=conditions.params,
+            key=[('name', 'name', False), ('id', 'id', False)],
+        ))
         
         # Configurar colores
         self.tree.tag_configure("low_stock", background="#fff3cd")
         self.tree.tag_configure("no_stock", background="#f8d7da")
     
+    def _product_row_values(self, product):
+        """Valores y tags de un producto en la tabla"""
+        price_formatted = f"${product['price']:,.2f}"
+        total_value_formatted = f"${product['total_value']:,.2f}"
+        
+        # Color por stock
+        tags = []
+        if product['stock'] <= 5:
+            tags.append("low_stock")
+        elif product['stock'] == 0:
+            tags.append("no_stock")
+        
+        values = (product['id'], product['name'], 
+                  price_formatted, product['stock'], 
+                  total_value_formatted)
+        return values, tags
+    
     def on_search(self, *args):
         """Filtra productos por búsqueda"""
-        search_term = self.search_var.get().lower()
-        
-        if not search_term:
-            self.populate_tree()
-            return
-        
-        filtered_products = [
-            product for product in self.products
-            if search_term in product['name'].lower()
-        ]
-        
-        self.populate_tree(filtered_products)
+        self.populate_tree(self.search_var.get().strip())
     
     def on_select(self, event):
         """Maneja la selección de un producto"""
@@ -243,16 +241,16 @@ class InventoryWindow:
     
     def update_statistics(self):
         """Actualiza las estadísticas"""
-        if not self.products:
+        if not self.stats or not self.stats['total_products']:
             self.stats_label.config(text="No hay productos en el inventario")
             return
         
-        total_products = len(self.products)
-        total_items = sum(product['stock'] for product in self.products)
-        total_value = sum(product['total_value'] for product in self.products)
+        total_products = self.stats['total_products']
+        total_items = self.stats['total_items']
+        total_value = self.stats['total_value']
         
-        low_stock = sum(1 for product in self.products if 0 < product['stock'] <= 5)
-        no_stock = sum(1 for product in self.products if product['stock'] == 0)
+        low_stock = self.stats['low_stock']
+        no_stock = self.stats['no_stock']
         
         stats_text = f"Productos: {total_products} | Items totales: {total_items:,} | "
         stats_text += f"Valor total: ${total_value:,.2f} | "
@@ -1,8 +1,6 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from views.users_window import UsersWindow
-from views.losses_window import LossesWindow
-from utils.backup import backup_y_sync_drive
+from utils.query_profiler import profiler
 class MainWindow:
     def __init__(self, parent, user):
         self.parent = parent
@@ -100,7 +98,10 @@ class MainWindow:
         footer = tk.Frame(main_frame, bg='#343a40', height=40)
         footer.pack(fill=tk.X, side=tk.BOTTOM)
         ttk.Label(footer, text="© 2023 Charcutería HYE - Versión 1.0", 
-                foreground="white", background="#343a40").pack(pady=10)
+                foreground="white", background="#343a40").pack(side=tk.LEFT, padx=20, pady=10)
+        # Avance del backup en segundo plano
+        self.backup_status = ttk.Label(footer, text="", foreground="white", background="#343a40")
+        self.backup_status.pack(side=tk.RIGHT, padx=20, pady=10)
     
     def create_menu(self):
         """Crea el menú de la aplicación"""
@@ -137,6 +138,17 @@ class MainWindow:
             operations_menu.add_command(label="Gastos Operativos", command=self.open_expenses)
             operations_menu.add_command(label="Reportes", command=self.open_reports)
         
+        if self.user.role == 'admin':
+            # Menú Herramientas
+            tools_menu = tk.Menu(menubar, tearoff=0)
+            menubar.add_cascade(label="Herramientas", menu=tools_menu)
+            self.profiler_var = tk.BooleanVar(value=profiler.enabled)
+            tools_menu.add_checkbutton(label="Perfilar consultas SQL",
+                                       variable=self.profiler_var,
+                                       command=self.toggle_query_profiler)
+            tools_menu.add_command(label="Ver resumen de consultas",
+                                   command=self.show_query_profile)
+        
         # Menú Ayuda
         help_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Ayuda", menu=help_menu)
@@ -166,18 +178,78 @@ class MainWindow:
             self.parent.quit()
 
     def subir_a_google_drive(self):
+        """Inicia el backup en segundo plano; el avance se muestra en el pie"""
+        from utils.backup import backup_service
+        task = backup_service.run(self.parent, on_progress=self._on_backup_progress,
+                                  on_success=self._on_backup_done, on_error=self._on_backup_error)
+        if task is None:
+            messagebox.showinfo("Backup en curso", "Ya hay un backup en curso. Espere a que termine.")
+            return
+        self._on_backup_progress(0.0, "Iniciando backup…")
+
+    def _set_backup_status(self, text):
         try:
-            info = backup_y_sync_drive()
+            if self.backup_status.winfo_exists():
+                self.backup_status.config(text=text)
+        except tk.TclError:
+            pass  # La ventana se cerró mientras corría el backup
 
-            messagebox.showinfo(
-                "Google Drive actualizado",
-                f"✔ Backup creado:\n{info['backup']}\n\n"
-                f"✔ Base sincronizada:\n{info['sync']}\n\n"
-                f"Fecha: {info['fecha']}"
-            )
+    def _on_backup_progress(self, value, message):
+        self._set_backup_status(f"Backup {value * 100:.0f}% — {message}")
 
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+    def _on_backup_done(self, info):
+        self._set_backup_status("")
+        messagebox.showinfo(
+            "Google Drive actualizado",
+            f"✔ Backup creado:\n{info['backup']}\n\n"
+            f"✔ Base sincronizada:\n{info['sync']}\n\n"
+            f"Fecha: {info['fecha']} (verificación {info['verificacion']})"
+        )
+
+    def _on_backup_error(self, error):
+        self._set_backup_status("")
+        messagebox.showerror("Error", str(error))
+    
+    def toggle_query_profiler(self):
+        """Activa o desactiva el perfilador de consultas SQL"""
+        if self.profiler_var.get():
+            profiler.enable()
+        else:
+            profiler.disable()
+    
+    def show_query_profile(self):
+        """Muestra el resumen de las consultas más costosas"""
+        window = tk.Toplevel(self.parent)
+        window.title("Resumen de consultas SQL")
+        window.geometry("1000x500")
+        
+        text = tk.Text(window, wrap=tk.NONE, font=('Courier New', 9))
+        scroll_y = ttk.Scrollbar(window, orient=tk.VERTICAL, command=text.yview)
+        scroll_x = ttk.Scrollbar(window, orient=tk.HORIZONTAL, command=text.xview)
+        text.configure(yscrollcommand=scroll_y.set, xscrollcommand=scroll_x.set)
+        
+        buttons = ttk.Frame(window)
+        buttons.pack(side=tk.BOTTOM, fill=tk.X)
+        scroll_x.pack(side=tk.BOTTOM, fill=tk.X)
+        scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
+        text.pack(fill=tk.BOTH, expand=True)
+        
+        def refresh():
+            text.configure(state=tk.NORMAL)
+            text.delete('1.0', tk.END)
+            if profiler.enabled or profiler.get_stats():
+                text.insert(tk.END, profiler.report())
+            else:
+                text.insert(tk.END, "El perfilador está desactivado (Herramientas → Perfilar consultas SQL).")
+            text.configure(state=tk.DISABLED)
+        
+        def reset():
+            profiler.reset()
+            refresh()
+        
+        ttk.Button(buttons, text="Actualizar", command=refresh).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Button(buttons, text="Reiniciar", command=reset).pack(side=tk.LEFT, padx=5, pady=5)
+        refresh()
     
     def show_about(self):
         """Muestra información sobre el sistema"""
@@ -257,32 +329,6 @@ class MainWindow:
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo abrir clientes: {e}")
     
-    def refresh_all_windows(self):
-        """Refresca todas las ventanas abiertas"""
-        try:
-            # Refrescar ventana de ventas
-            if self.sales_window and hasattr(self.sales_window, 'window'):
-                try:
-                    if self.sales_window.window.winfo_exists():
-                        if hasattr(self.sales_window, 'refresh_sales'):
-                            self.sales_window.refresh_sales()
-                            print("✅ Ventana de ventas actualizada")
-                except:
-                    self.sales_window = None
-            
-            # Refrescar ventana de clientes
-            if self.clients_window and hasattr(self.clients_window, 'window'):
-                try:
-                    if self.clients_window.window.winfo_exists():
-                        if hasattr(self.clients_window, 'refresh_clients'):
-                            self.clients_window.refresh_clients()
-                            print("✅ Ventana de clientes actualizada")
-                except:
-                    self.clients_window = None
-                    
-        except Exception as e:
-            print(f"Error al refrescar ventanas: {e}")
-
     def open_inventory(self):
         """Abre la ventana de inventario"""
         from views.inventory_window import InventoryWindow
@@ -316,6 +362,7 @@ class MainWindow:
         """Abre la ventana de gestión de usuarios"""
         if self.user.role == 'admin':
             try:
+                from views.users_window import UsersWindow
                 UsersWindow(self.parent, self.user)
             except Exception as e:
                 messagebox.showerror("Error", f"No se pudo abrir gestión de usuarios: {e}")
@@ -1,11 +1,15 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from models.product import Product
+from models.product_catalog import product_catalog
 from models.purchase import Purchase
+from models.purchase_batch import save_purchase_batch
 from utils.validators import validate_number, validate_positive
-from datetime import datetime
 from config.database import get_connection
 from tkinter import simpledialog
+from models.pagination import KeysetQuery
+from utils.events import subscribe_window, event_bus, PURCHASE_BATCH_SAVED, PRODUCT_TOPICS
+from utils.virtual_tree import VirtualTreeview
 
 class PurchasesWindow:
     def __init__(self, parent, user):
@@ -32,7 +36,6 @@ class PurchasesWindow:
         
         # Variables de datos
         self.products = []
-        self.purchases = []
         self.current_batch = []
         self.filtered_products = []  # Lista de productos filtrados para búsqueda
         self.is_filtering = False  # Flag para controlar el filtrado
@@ -54,6 +57,13 @@ class PurchasesWindow:
         # Finalmente configurar la UI
         self.setup_ui()
         self.load_data()
+        subscribe_window(self.window, PRODUCT_TOPICS, self.on_data_changed)
+
+    def on_data_changed(self, changes):
+        """Actualiza productos y, si se guardaron compras, la lista de compras"""
+        self.load_products()
+        if PURCHASE_BATCH_SAVED in changes:
+            self.update_purchases_tree()
 
     def format_currency(self, amount):
         """Formatea un número como moneda con separadores de miles"""
@@ -242,17 +252,11 @@ class PurchasesWindow:
         
         if not search_text:
             # Mostrar todos los productos disponibles
-            product_names = [p.name for p in self.products]
-            self._update_combo_values(product_names)
+            self._update_combo_values(product_catalog.names())
             return
         
-        # Filtrar productos que coincidan
-        filtered_products = []
-        
-        for product in self.products:
-            product_name_lower = product.name.lower()
-            if search_text in product_name_lower:
-                filtered_products.append(product.name)
+        # Filtrar productos que coincidan (sin importar tildes), los más relevantes primero
+        filtered_products = [p.name for p in product_catalog.search(search_text)]
         
         # Actualizar lista de productos
         self._update_combo_values(filtered_products)
@@ -279,8 +283,7 @@ class PurchasesWindow:
         """Maneja el clic en el combo"""
         # Si está vacío, mostrar todos los productos
         if not self.product_var.get().strip():
-            product_names = [p.name for p in self.products]
-            self._update_combo_values(product_names)
+            self._update_combo_values(product_catalog.names())
 
     def _on_product_enter(self, event=None):
         """Maneja Enter en el campo de producto"""
@@ -298,13 +301,10 @@ class PurchasesWindow:
             return
         
         # Buscar producto exacto
-        selected_product = None
-        for product in self.products:
-            if product.name.lower() == product_name.lower():
-                selected_product = product
-                # Corregir capitalización
-                self.product_var.set(product.name)
-                break
+        selected_product = product_catalog.find(product_name)
+        if selected_product:
+            # Corregir capitalización
+            self.product_var.set(selected_product.name)
         
         if selected_product:
             # Enfocar siguiente campo (cantidad)
@@ -320,12 +320,8 @@ class PurchasesWindow:
         # Obtener el ID de la compra seleccionada
         purchase_id = self.purchases_tree.item(selected[0], 'values')[0]
         
-        # Buscar la compra en la lista de compras
-        purchase = None
-        for p in self.purchases:
-            if str(p.id) == str(purchase_id):
-                purchase = p
-                break
+        # Buscar la compra
+        purchase = Purchase.get_by_id(purchase_id)
         
         if not purchase:
             messagebox.showerror("Error", "No se encontró la compra seleccionada")
@@ -492,9 +488,10 @@ class PurchasesWindow:
         ttk.Button(controls_frame, text="Eliminar Compra", 
                 command=self.delete_purchase).pack(side=tk.LEFT, padx=5)
         
-        # Treeview para mostrar compras
+        # Treeview para mostrar compras (lista virtual: solo las filas visibles)
         columns = ('ID', 'Producto', 'Cantidad', 'Precio Unit.', 'Flete', 'IVA', 'Total', 'Factura', 'Fecha')
-        self.purchases_tree = ttk.Treeview(main_frame, columns=columns, show='headings')
+        self.purchases_list = VirtualTreeview(main_frame, columns, self._purchase_row_values)
+        self.purchases_tree = self.purchases_list.tree
         
         for col in columns:
             self.purchases_tree.heading(col, text=col)
@@ -509,27 +506,23 @@ class PurchasesWindow:
             else:
                 self.purchases_tree.column(col, width=120)
         
-        # Scrollbars
-        v_scrollbar = ttk.Scrollbar(main_frame, orient=tk.VERTICAL, command=self.purchases_tree.yview)
+        # Scrollbar horizontal (la vertical la maneja la lista virtual)
         h_scrollbar = ttk.Scrollbar(main_frame, orient=tk.HORIZONTAL, command=self.purchases_tree.xview)
-        self.purchases_tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
+        self.purchases_tree.configure(xscrollcommand=h_scrollbar.set)
         
-        self.purchases_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.purchases_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         h_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
 
     
     def show_all_products(self):
         """Muestra todos los productos disponibles"""
-        product_names = [p.name for p in self.products]
-        self.product_combo['values'] = product_names
+        self.product_combo['values'] = product_catalog.names()
 
     # 4. MODIFICAR el método load_products():
     def load_products(self):
         """Carga la lista de productos - MEJORADO"""
-        self.products = Product.get_all()
-        product_names = [product.name for product in self.products]
-        self.product_combo['values'] = product_names
+        self.products = product_catalog.ensure_current()
+        self.product_combo['values'] = product_catalog.names()
         print(f"Productos cargados para compras: {len(self.products)}")
 
     # 5. MODIFICAR el método add_to_batch() para validar mejor la selección:
@@ -578,16 +571,13 @@ class PurchasesWindow:
         
         product_found = None
         
-        # Búsqueda EXACTA (case-insensitive)
-        for product in self.products:
-            print(f"   Comparando: '{product.name}' vs '{product_name}'")  # DEBUG
-            if product.name.lower() == product_name.lower():
-                product_found = product
-                # Corregir capitalización
-                self.product_var.set(product.name)
-                product_name = product.name
-                print(f"✅ Producto encontrado: {product.name}")  # DEBUG
-                break
+        # Búsqueda EXACTA (sin importar mayúsculas ni tildes)
+        product_found = product_catalog.find(product_name)
+        if product_found:
+            # Corregir capitalización
+            self.product_var.set(product_found.name)
+            product_name = product_found.name
+            print(f"✅ Producto encontrado: {product_found.name}")  # DEBUG
         
         if not product_found:
             print(f"❌ Producto NO encontrado: '{product_name}'")  # DEBUG
@@ -608,10 +598,7 @@ class PurchasesWindow:
                     # Recargar productos
                     self.load_products()
                     # Buscar el producto recién creado
-                    for product in self.products:
-                        if product.name.lower() == product_name.lower():
-                            product_found = product
-                            break
+                    product_found = product_catalog.find(product_name)
             elif response is False:  # Cancelar y mostrar lista
                 print("🔄 Usuario eligió CANCELAR")  # DEBUG
                 messagebox.showinfo("Información", 
@@ -780,13 +767,10 @@ class PurchasesWindow:
             return 'break'
         
         # Buscar producto exacto
-        selected_product = None
-        for product in self.products:
-            if product.name.lower() == product_name.lower():
-                selected_product = product
-                # Corregir capitalización
-                self.product_var.set(product.name)
-                break
+        selected_product = product_catalog.find(product_name)
+        if selected_product:
+            # Corregir capitalización
+            self.product_var.set(selected_product.name)
         
         if selected_product:
             # Enfocar siguiente campo (cantidad)
@@ -794,10 +778,7 @@ class PurchasesWindow:
             self.window.after(50, lambda: self._focus_next_field())
         else:
             # Buscar coincidencias parciales
-            partial_matches = []
-            for product in self.products:
-                if product_name.lower() in product.name.lower():
-                    partial_matches.append(product)
+            partial_matches = product_catalog.search(product_name)
             
             if partial_matches:
                 # Mostrar opciones si hay coincidencias parciales
@@ -848,9 +829,9 @@ class PurchasesWindow:
         product_name = product_name.strip()
         
         # Buscar coincidencia exacta (case insensitive)
-        for product in self.products:
-            if product.name.lower() == product_name.lower():
-                return product, None
+        product = product_catalog.find(product_name)
+        if product:
+            return product, None
         
         # No se encontró coincidencia exacta
         return None, f"El producto '{product_name}' no existe en el inventario."
@@ -1042,13 +1023,11 @@ class PurchasesWindow:
     
     def load_products(self):
         """Carga la lista de productos"""
-        self.products = Product.get_all()
-        product_names = [product.name for product in self.products]
-        self.product_combo['values'] = product_names
+        self.products = product_catalog.ensure_current()
+        self.product_combo['values'] = product_catalog.names()
     
     def load_purchases(self):
         """Carga la lista de compras"""
-        self.purchases = Purchase.get_all()
         self.update_purchases_tree()
     
     def add_new_product(self):
@@ -1164,9 +1143,9 @@ class PurchasesWindow:
             purchase.invoice_number = invoice_number
             
             if purchase.save():
+                event_bus.publish(PURCHASE_BATCH_SAVED, purchases=[purchase.id], products=[])
                 messagebox.showinfo("Éxito", "Compra actualizada correctamente")
                 window.destroy()
-                self.load_data()
             else:
                 messagebox.showerror("Error", "No se pudo actualizar la compra")
         
@@ -1189,12 +1168,8 @@ class PurchasesWindow:
         if not messagebox.askyesno("Confirmar", "¿Está seguro de eliminar esta compra?"):
             return
         
-        # Buscar la compra en la lista de compras
-        purchase = None
-        for p in self.purchases:
-            if str(p.id) == str(purchase_id):
-                purchase = p
-                break
+        # Buscar la compra
+        purchase = Purchase.get_by_id(purchase_id)
         
         if not purchase:
             messagebox.showerror("Error", "No se encontró la compra seleccionada")
@@ -1287,81 +1262,24 @@ class PurchasesWindow:
         try:
             freight_total = float(self.freight_var.get() or 0)
             tax_total = float(self.tax_var.get() or 0)
-            num_products = len(self.current_batch)
-            tax_per_item = tax_total / num_products if num_products > 0 else 0
-
-            # Generar un lote_id único para todo este lote
-            lote_id = datetime.now().strftime("%Y%m%d%H%M%S")
-
-            saved_count = 0
-            invoice_number = self.current_batch[0].get('invoice_number', '') if self.current_batch else ''
-
-            for index, item in enumerate(self.current_batch):
-                # El flete total solo se registra en el primer ítem; los demás van en 0
-                shipping_this_item = freight_total if index == 0 else 0.0
-
-                product = Product.get_by_name(item['product_name'])
-                if not product:
-                    estimated_sale_price = item['unit_price'] * 1.3
-                    product = Product(name=item['product_name'],
-                                    price=estimated_sale_price, stock=0)
-                    if not product.save():
-                        messagebox.showerror("Error", f"No se pudo crear el producto {item['product_name']}")
-                        continue
-
-                product_total = item['subtotal'] + shipping_this_item + tax_per_item
-
-                purchase = Purchase(
-                    user_id=self.user.id,
-                    total=product_total,
-                    iva=tax_per_item,
-                    shipping=shipping_this_item,  # FLETE TOTAL solo en el primero
-                    date=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    invoice_number=invoice_number,
-                    supplier="Sin proveedor"
-                )
-
-                if purchase.save():
-                    conn = None
-                    try:
-                        conn = get_connection()
-                        cursor = conn.cursor()
-
-                        # Guardar lote_id y shipping_total en purchases
-                        cursor.execute('''
-                            UPDATE purchases SET lote_id = ?, shipping_total = ? WHERE id = ?
-                        ''', (lote_id, freight_total, purchase.id))
-
-                        cursor.execute('''
-                            INSERT INTO purchase_details (purchase_id, product_id, quantity, unit_cost, unit_price, subtotal)
-                            VALUES (?, ?, ?, ?, ?, ?)
-                        ''', (purchase.id, product.id, item['quantity'], item['unit_price'], item['unit_price'], item['subtotal']))
-
-                        cursor.execute('''
-                            UPDATE products SET cost_price = ? WHERE id = ?
-                        ''', (item['unit_price'], product.id))
+            invoice_number = self.current_batch[0].get('invoice_number', '')
 
-                        conn.commit()
-                        product.update_stock(item['quantity'])
-                        saved_count += 1
-                    except Exception as e:
-                        messagebox.showerror("Error", f"Error al guardar detalles: {e}")
-                    finally:
-                        if conn:
-                            conn.close()
+            # Todo el lote se guarda en una sola transacción
+            result = save_purchase_batch(self.current_batch, self.user.id,
+                                         freight_total=freight_total, tax_total=tax_total,
+                                         invoice_number=invoice_number)
+            tax_per_item = tax_total / len(self.current_batch)
 
-            if saved_count > 0:
-                messagebox.showinfo("Éxito",
-                    f"Se guardaron {saved_count} compras correctamente.\n\n"
-                    f"Lote ID: {lote_id}\n"
-                    f"• IVA total: {self.format_currency(tax_total)} → {self.format_currency(tax_per_item)} por producto\n"
-                    f"• Flete total: {self.format_currency(freight_total)} (registrado en el primer ítem del lote)")
+            messagebox.showinfo("Éxito",
+                f"Se guardaron {len(result['purchase_ids'])} compras correctamente.\n\n"
+                f"Lote ID: {result['lote_id']}\n"
+                f"• IVA total: {self.format_currency(tax_total)} → {self.format_currency(tax_per_item)} por producto\n"
+                f"• Flete total: {self.format_currency(freight_total)} (registrado en el primer ítem del lote)")
 
-                self.clear_batch()
-                self.load_data()
+            self.clear_batch()
 
         except Exception as e:
-            messagebox.showerror("Error", f"Error al guardar el lote: {e}")
+            messagebox.showerror("Error", f"Error al guardar el lote (no se guardó ninguna compra): {e}")
     
     def clear_batch(self):
         """Limpia el lote actual"""
@@ -1394,53 +1312,39 @@ class PurchasesWindow:
         # No limpiar el número de factura para mantener consistencia en el lote
     
     def update_purchases_tree(self):
-        """Actualiza el árbol de compras con números formateados"""
-        # Limpiar árbol
-        for item in self.purchases_tree.get_children():
-            self.purchases_tree.delete(item)
-        
-        # Agregar compras con formato mejorado
-        for purchase in self.purchases:
-            # Obtener detalles de la compra desde purchase_details
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT pd.*, p.name as product_name 
-                FROM purchase_details pd
-                JOIN products p ON pd.product_id = p.id
-                WHERE pd.purchase_id = ?
-            ''', (purchase.id,))
-            
-            details = cursor.fetchall()
-            conn.close()
-            
-            if details:
-                for detail in details:
-                    # Formatear fecha
-                    date_str = purchase.date if purchase.date else "N/A"
-                    
-                    # Insertar en árbol con números formateados
-                    self.purchases_tree.insert('', tk.END, values=(
-                        purchase.id,
-                        detail['product_name'],
-                        self.format_number(detail['quantity']),
-                        self.format_currency(detail['unit_price']),
-                        self.format_currency(purchase.shipping) if purchase.shipping else "$0",
-                        self.format_currency(purchase.iva) if purchase.iva else "$0",
-                        self.format_currency(purchase.total) if purchase.total else "$0",
-                        purchase.invoice_number or "N/A",
-                        date_str
-                    ))
-            else:
-                # Si no hay detalles, mostrar solo la información básica de la compra
-                self.purchases_tree.insert('', tk.END, values=(
-                    purchase.id,
-                    "N/A",
-                    "N/A",
-                    "N/A",
-                    self.format_currency(purchase.shipping) if purchase.shipping else "$0",
-                    self.format_currency(purchase.iva) if purchase.iva else "$0",
-                    self.format_currency(purchase.total) if purchase.total else "$0",
-                    purchase.invoice_number or "N/A",
-                    purchase.date if purchase.date else "N/A"
-                ))
\ No newline at end of file
+        """Actualiza el árbol de compras con números formateados (una fila por producto)"""
+        if self.purchases_list.source is None:
+            self.purchases_list.set_source(KeysetQuery(
+                columns='p.id AS purchase_id, COALESCE(pd.id, 0) AS detail_id, pd.id AS pd_id, '
+                        'pr.name AS product_name, pd.quantity, pd.unit_price, '
+                        'p.shipping, p.iva, p.total, p.invoice_number, p.date',
+                from_clause='purchases p '
+                            'LEFT JOIN purchase_details pd ON pd.purchase_id = p.id '
+                            'LEFT JOIN products pr ON pr.id = pd.product_id',
+                key=[('p.date', 'date', True), ('p.id', 'purchase_id', True),
+                     ('COALESCE(pd.id, 0)', 'detail_id', False)],
+                id_aliases=('purchase_id', 'detail_id'),
+            ))
+        else:
+            self.purchases_list.refresh()
+
+    def _purchase_row_values(self, row):
+        """Valores de una fila (compra + detalle) en la lista de compras"""
+        totals = (
+            self.format_currency(row['shipping']) if row['shipping'] else "$0",
+            self.format_currency(row['iva']) if row['iva'] else "$0",
+            self.format_currency(row['total']) if row['total'] else "$0",
+            row['invoice_number'] or "N/A",
+            row['date'] if row['date'] else "N/A"
+        )
+        if row['pd_id'] is not None:
+            values = (
+                row['purchase_id'],
+                row['product_name'] or "N/A",
+                self.format_number(row['quantity']),
+                self.format_currency(row['unit_price']),
+            ) + totals
+        else:
+            # Si no hay detalles, mostrar solo la información básica de la compra
+            values = (row['purchase_id'], "N/A", "N/A", "N/A") + totals
+        return values, ()
\ No newline at end of file
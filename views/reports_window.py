@@ -1,13 +1,14 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from models.sale import Sale
-from models.purchase import Purchase
-from models.expense import Expense
-from models.loss import Loss  # Agregar importación de Loss
 from utils.excel_exporter import ExcelExporter
 import os
 from config.database import get_connection
+from models.financial_report import FinancialSummary, get_financial_summary
+from models.reconciliation import reconcile_clients
 from utils.formatters import format_currency, format_number
+from utils.background import task_executor
+from utils.events import event_bus, PAYMENT_REGISTERED
 
 class ReportsWindow:
     def __init__(self, parent, user):
@@ -31,6 +32,10 @@ class ReportsWindow:
         # Luego configurar la UI
         self.setup_ui()
         
+        # Las consultas corren en segundo plano; al cerrar se cancelan
+        task_executor.add_listener(self._on_tasks_changed)
+        self.window.bind("<Destroy>", self._on_destroy, add="+")
+        
         # Finalmente cargar los datos
         self.load_financial_summary()
     
@@ -71,6 +76,44 @@ class ReportsWindow:
         export_tab = ttk.Frame(notebook)
         notebook.add(export_tab, text="📤 Exportar")
         self.setup_export_tab(export_tab)
+        
+        # Barra de estado con indicador de carga
+        status_frame = ttk.Frame(main_frame)
+        status_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        self.status_label = ttk.Label(status_frame, text="", font=("Arial", 9))
+        self.status_label.pack(side=tk.LEFT)
+        
+        self.progress_bar = ttk.Progressbar(status_frame, mode='indeterminate', length=150)
+
+    def _on_tasks_changed(self, owner, pending):
+        """Muestra u oculta el indicador de carga según las tareas pendientes"""
+        if owner is not self or not self.window.winfo_exists():
+            return
+        if pending:
+            self.status_label.config(text=f"Cargando datos... ({pending})")
+            if not self.progress_bar.winfo_ismapped():
+                self.progress_bar.pack(side=tk.RIGHT)
+                self.progress_bar.start(15)
+        else:
+            self.status_label.config(text="")
+            self.progress_bar.stop()
+            self.progress_bar.pack_forget()
+
+    def _on_destroy(self, event):
+        """Cancela las cargas pendientes al cerrar la ventana"""
+        if event.widget is self.window:
+            task_executor.remove_listener(self._on_tasks_changed)
+            task_executor.cancel_owner(self)
+
+    def run_in_background(self, func, on_success, error_title="Error"):
+        """Ejecuta func en segundo plano y entrega el resultado a on_success en el hilo de Tk"""
+        def on_error(error):
+            if self.window.winfo_exists():
+                messagebox.showerror("Error", f"{error_title}: {str(error)}", parent=self.window)
+        
+        return task_executor.submit(self.window, func, owner=self,
+                                    on_success=on_success, on_error=on_error)
 
     def setup_summary_tab(self, parent):
         """Configura la pestaña de resumen financiero con herramientas de diagnóstico MEJORADAS"""
@@ -339,52 +382,12 @@ class ReportsWindow:
     
     def load_financial_summary(self):
         """Carga y actualiza el resumen financiero con manejo mejorado de errores"""
-        try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # Obtener totales diferenciados
-            cursor.execute('''
-                SELECT 
-                    SUM(CASE WHEN status = 'paid' THEN total ELSE 0 END) as paid_sales,
-                    SUM(CASE WHEN status = 'pending' THEN total ELSE 0 END) as credit_sales,
-                    SUM(total) as total_sales
-                FROM sales
-            ''')
-            sales_data = cursor.fetchone()
-            
-            # Resto de cálculos
-            total_purchases = Purchase.get_total_purchases()
-            total_expenses = Expense.get_total_expenses()
-            total_losses = Loss.get_total_losses()
-            
-            # Actualizar UI con ambos tipos de ventas
-            self.financial_labels['sales'].config(
-                text=f"{format_currency(sales_data['paid_sales'])} (Pagadas)",
-                foreground="green"
-            )
-            
-            if 'credit_sales' in self.financial_labels:
-                self.financial_labels['credit_sales'].config(
-                    text=f"{format_currency(sales_data['credit_sales'])} (Fiadas)",
-                    foreground="orange"
-                )
-
-
-            # Obtener datos financieros básicos
-            financial_data = self._fetch_financial_data()
-            
-            # Calcular valores derivados
-            calculations = self._perform_calculations(financial_data)
-            
+        def show(summary):
             # Actualizar la interfaz de usuario
-            self._update_ui(financial_data, calculations)
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al cargar resumen: {str(e)}")
-        finally:
-            if conn:
-                conn.close()
+            self._update_ui(summary.as_dict(), summary.calculations())
+        
+        # Una sola lectura consistente de todos los totales, fuera del hilo de Tk
+        self.run_in_background(get_financial_summary, show, "Error al cargar resumen")
 
     def sync_client_sales_status_on_payment(client_id):
         """
@@ -432,7 +435,7 @@ class ReportsWindow:
                     SELECT id, total, created_at, {status_column}
                     FROM sales 
                     WHERE client_id = ?
-                    ORDER BY datetime(created_at) ASC
+                    ORDER BY created_at ASC
                 '''
                 cursor.execute(query, (client_id,))
                 all_sales = cursor.fetchall()
@@ -552,7 +555,7 @@ class ReportsWindow:
                     SELECT id, total, {status_column}, created_at, notes
                     FROM sales 
                     WHERE client_id = ?
-                    ORDER BY datetime(created_at) ASC
+                    ORDER BY created_at ASC
                 '''
                 cursor.execute(query, (client_id,))
                 client_sales = cursor.fetchall()
@@ -667,104 +670,7 @@ class ReportsWindow:
 
     def _fetch_financial_data(self):
         """Obtiene los datos financieros usando las columnas paid_amount y remaining_debt existentes"""
-        conn = None
-        try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # 1. CÁLCULO CORRECTO usando las columnas existentes
-            print("💰 Calculando ventas reales usando paid_amount y remaining_debt...")
-            
-            cursor.execute('''
-                SELECT 
-                    COALESCE(SUM(total), 0) as total_sales,
-                    COALESCE(SUM(COALESCE(paid_amount, 0)), 0) as actual_paid,
-                    COALESCE(SUM(COALESCE(remaining_debt, total)), 0) as actual_pending
-                FROM sales
-            ''')
-            
-            sales_data = cursor.fetchone()
-            total_sales = float(sales_data['total_sales'])
-            actual_paid = float(sales_data['actual_paid'])
-            actual_pending = float(sales_data['actual_pending'])
-            
-            # Verificación de consistencia
-            calculated_total = actual_paid + actual_pending
-            if abs(calculated_total - total_sales) > 0.01:  # Tolerancia de 1 centavo
-                print(f"⚠️ Inconsistencia detectada:")
-                print(f"   Total ventas: ${total_sales:,.2f}")
-                print(f"   Pagado + Pendiente: ${calculated_total:,.2f}")
-                print(f"   Diferencia: ${abs(calculated_total - total_sales):,.2f}")
-                
-                # Usar datos de transacciones como respaldo
-                cursor.execute('SELECT COALESCE(SUM(total_debt), 0) FROM clients')
-                current_debt = float(cursor.fetchone()[0])
-                actual_paid = total_sales - current_debt
-                actual_pending = current_debt
-                
-                print(f"   Usando método alternativo:")
-                print(f"   Pagado (corregido): ${actual_paid:,.2f}")
-                print(f"   Pendiente (corregido): ${actual_pending:,.2f}")
-            
-            print(f"📊 Resumen de ventas:")
-            print(f"   Total: ${total_sales:,.2f}")
-            print(f"   Pagado: ${actual_paid:,.2f}")
-            print(f"   Pendiente: ${actual_pending:,.2f}")
-            
-            # 2. Deuda actual para verificación
-            cursor.execute('SELECT COALESCE(SUM(total_debt), 0) FROM clients')
-            current_debt = float(cursor.fetchone()[0])
-            
-            # 3. Otros totales (sin cambios)
-            total_purchases = float(Purchase.get_total_purchases() or 0)
-            total_expenses = float(Expense.get_total_expenses() or 0)
-            total_losses = float(Loss.get_total_losses() or 0)
-            
-            # 4. Inventario vendido simple (solo cost_price)
-            cursor.execute('''
-                SELECT COALESCE(SUM(sd.quantity * p.cost_price), 0) as inventory_sold_simple
-                FROM sale_details sd
-                JOIN products p ON sd.product_id = p.id
-            ''')
-            inventory_result = cursor.fetchone()
-            inventory_sold = float(inventory_result[0] if inventory_result else 0)
-            
-            # 5. Calcular totales de flete e IVA
-            cursor.execute('''
-                SELECT 
-                    COALESCE(SUM(CASE WHEN shipping IS NOT NULL AND shipping != '' AND shipping != '0' 
-                                THEN CAST(shipping AS REAL) ELSE 0 END), 0) as total_freight,
-                    COALESCE(SUM(CASE WHEN iva IS NOT NULL AND iva != '' AND iva != '0' 
-                                THEN CAST(iva AS REAL) ELSE 0 END), 0) as total_iva
-                FROM purchases
-            ''')
-            additional_costs_result = cursor.fetchone()
-            total_freight = float(additional_costs_result[0] if additional_costs_result else 0)
-            total_iva = float(additional_costs_result[1] if additional_costs_result else 0)
-            
-            return {
-                'total_sales': total_sales,
-                'paid_sales': actual_paid,        # DINERO REALMENTE RECIBIDO
-                'credit_sales': actual_pending,   # DINERO PENDIENTE DE COBRO
-                'total_purchases': total_purchases,
-                'total_expenses': total_expenses,
-                'total_losses': total_losses,
-                'inventory_sold': inventory_sold,
-                'current_debt': current_debt,     # Para verificación
-                'total_freight': total_freight,
-                'total_iva': total_iva
-            }
-            
-        except Exception as e:
-            print(f"Error detallado en _fetch_financial_data: {str(e)}")
-            return {
-                'total_sales': 0.0, 'paid_sales': 0.0, 'credit_sales': 0.0,
-                'total_purchases': 0.0, 'total_expenses': 0.0, 'total_losses': 0.0,
-                'inventory_sold': 0.0, 'current_debt': 0.0, 'total_freight': 0.0, 'total_iva': 0.0
-            }
-        finally:
-            if conn:
-                conn.close()
+        return get_financial_summary().as_dict()
 
     def sync_sales_with_partial_payments(self):
         """Sincroniza los estados de ventas considerando pagos parciales correctamente"""
@@ -880,32 +786,9 @@ class ReportsWindow:
             if conn:
                 conn.close()
 
-    def _perform_calculations(self, data):
-        """Realiza los cálculos derivados con inventario vendido simple"""
-        # Efectivo = ventas pagadas - compras - gastos
-        cash_in_hand = data['paid_sales'] - data['total_purchases'] - data['total_expenses']
-        
-        # Inventario actual = compras - inventario vendido (solo cost_price) - pérdidas
-        current_inventory_value = data['total_purchases'] - data['inventory_sold'] - data['total_losses']
-        
-        return {
-            'cash_in_hand': cash_in_hand,
-            'current_inventory_value': max(0, current_inventory_value),  # No negativo
-        }
-
-
     def _perform_calculations(self, data):
         """Realiza los cálculos derivados"""
-        # Efectivo = ventas pagadas - compras - gastos
-        cash_in_hand = data['paid_sales'] - data['total_purchases'] - data['total_expenses']
-        
-        # Inventario actual = compras - inventario vendido - pérdidas
-        current_inventory_value = data['total_purchases'] - data['inventory_sold'] - data['total_losses'] - data['total_freight'] - data['total_iva']
-        
-        return {
-            'cash_in_hand': cash_in_hand,
-            'current_inventory_value': max(0, current_inventory_value),  # No negativo
-        }
+        return FinancialSummary(**data).calculations()
 
     def force_refresh_all_data(self):
         """Fuerza la actualización de todos los datos y ventanas"""
@@ -915,9 +798,8 @@ class ReportsWindow:
             # 1. Recalcular deudas de clientes
             self.recalculate_client_debts()
             
-            # 2. Actualizar todas las ventanas abiertas
-            if hasattr(self, 'refresh_all_windows'):
-                self.refresh_all_windows()
+            # 2. Avisar a las ventanas abiertas (cualquier cliente pudo cambiar)
+            event_bus.publish(PAYMENT_REGISTERED)
             
             # 3. Limpiar caché de reportes si existe
             if hasattr(self, 'reports_cache'):
@@ -935,42 +817,9 @@ class ReportsWindow:
     def recalculate_client_debts(self):
         """Recalcula todas las deudas de clientes basándose en transacciones"""
         try:
-            from config.database import get_connection
-            
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # Obtener todos los clientes
-            cursor.execute("SELECT id FROM clients")
-            client_ids = [row[0] for row in cursor.fetchall()]
-            
-            for client_id in client_ids:
-                # Calcular deuda real basada en transacciones
-                cursor.execute("""
-                    SELECT 
-                        COALESCE(SUM(CASE WHEN transaction_type = 'debit' THEN amount ELSE 0 END), 0) as debits,
-                        COALESCE(SUM(CASE WHEN transaction_type = 'credit' THEN amount ELSE 0 END), 0) as credits
-                    FROM client_transactions 
-                    WHERE client_id = ?
-                """, (client_id,))
-                
-                result = cursor.fetchone()
-                debits = float(result[0])
-                credits = float(result[1])
-                calculated_debt = max(0, debits - credits)
-                
-                # Actualizar cliente
-                cursor.execute("""
-                    UPDATE clients 
-                    SET total_debt = ?, updated_at = datetime('now', 'localtime')
-                    WHERE id = ?
-                """, (calculated_debt, client_id))
-            
-            conn.commit()
-            conn.close()
-            
-            print(f"✅ Deudas recalculadas para {len(client_ids)} clientes")
-            
+            result = reconcile_clients()
+            print(f"✅ Deudas recalculadas para {result['clients']} clientes "
+                  f"({len(result['debt_changes'])} cambiaron)")
         except Exception as e:
             print(f"Error recalculando deudas: {e}")
 
@@ -1047,14 +896,10 @@ class ReportsWindow:
             
             # 3. Actualizar ventana de clientes
             if hasattr(self, 'clients_window') and self.clients_window:
-                self.clients_window.refresh_clients()
+                self.clients_window.refresh_clients([self.client.id])
             
-            # 4. Actualizar todas las ventanas
-            if hasattr(self, 'main_window') and self.main_window:
-                if hasattr(self.main_window, 'force_refresh_all_data'):
-                    self.main_window.force_refresh_all_data()
-                elif hasattr(self.main_window, 'refresh_all_windows'):
-                    self.main_window.refresh_all_windows()
+            # 4. Avisar a las demás ventanas abiertas
+            event_bus.publish(PAYMENT_REGISTERED, clients=[self.client.id])
             
             print(f"🔄 Cliente actualizado: {self.client.name} - Deuda: ${self.client.total_debt:,.2f}")
             
@@ -1066,47 +911,7 @@ class ReportsWindow:
     def recalculate_single_client_debt(self):
         """Recalcula la deuda de un cliente específico"""
         try:
-            from config.database import get_connection
-            
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # Calcular deuda basada en transacciones
-            cursor.execute("""
-                SELECT 
-                    COALESCE(SUM(CASE WHEN transaction_type = 'debit' THEN amount ELSE 0 END), 0) as debits,
-                    COALESCE(SUM(CASE WHEN transaction_type = 'credit' THEN amount ELSE 0 END), 0) as credits
-                FROM client_transactions 
-                WHERE client_id = ?
-            """, (self.client.id,))
-            
-            result = cursor.fetchone()
-            debits = float(result[0])
-            credits = float(result[1])
-            calculated_debt = max(0, debits - credits)
-            
-            # Actualizar cliente
-            cursor.execute("""
-                UPDATE clients 
-                SET total_debt = ?, updated_at = datetime('now', 'localtime')
-                WHERE id = ?
-            """, (calculated_debt, self.client.id))
-            
-            # Si no hay deuda, marcar ventas como pagadas
-            if calculated_debt == 0:
-                cursor.execute("""
-                    UPDATE sales 
-                    SET status = 'paid', updated_at = datetime('now', 'localtime')
-                    WHERE client_id = ? AND status = 'pending'
-                """, (self.client.id,))
-                
-                updated_sales = cursor.rowcount
-                if updated_sales > 0:
-                    print(f"✅ {updated_sales} ventas marcadas como 'paid'")
-            
-            conn.commit()
-            conn.close()
-            
+            reconcile_clients([self.client.id])
         except Exception as e:
             print(f"Error recalculando deuda del cliente: {e}")
 
@@ -1282,16 +1087,19 @@ class ReportsWindow:
     
     def load_products_analysis(self):
         """Carga el análisis de productos más vendidos"""
+        # Limpiar árbol
+        for item in self.products_tree.get_children():
+            self.products_tree.delete(item)
+        
+        self.run_in_background(self._fetch_products_analysis, self._show_products_analysis,
+                               "Error al cargar análisis de productos")
+    
+    @staticmethod
+    def _fetch_products_analysis():
+        """Consulta los productos más vendidos (corre en segundo plano)"""
+        conn = get_connection()
         try:
-            # Limpiar árbol
-            for item in self.products_tree.get_children():
-                self.products_tree.delete(item)
-            
-            # Obtener datos de ventas por producto
-            conn = get_connection()
             cursor = conn.cursor()
-            
-            # Consulta para obtener productos más vendidos
             cursor.execute('''
                 SELECT p.id, p.name, 
                     SUM(sd.quantity) as total_quantity,
@@ -1303,38 +1111,40 @@ class ReportsWindow:
                 ORDER BY total_quantity DESC
                 LIMIT 20
             ''')
-            
-            products_data = cursor.fetchall()
+            return cursor.fetchall()
+        finally:
             conn.close()
-            
-            if not products_data:
-                self.products_tree.insert('', tk.END, values=("No hay datos disponibles", "", ""))
-                return
-            
-            # Insertar datos en el árbol
-            for product in products_data:
-                self.products_tree.insert('', tk.END, values=(
+    
+    def _show_products_analysis(self, products_data):
+        """Inserta los productos más vendidos en el árbol"""
+        for item in self.products_tree.get_children():
+            self.products_tree.delete(item)
+        
+        if not products_data:
+            self.products_tree.insert('', tk.END, values=("No hay datos disponibles", "", ""))
+            return
+        
+        for product in products_data:
+            self.products_tree.insert('', tk.END, values=(
                 product['name'],
                 format_number(product['total_quantity']),
                 format_currency(product['total_revenue'])))
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al cargar análisis de productos: {str(e)}")
-            # Insertar mensaje de error en el árbol
-            self.products_tree.insert('', tk.END, values=(f"Error: {str(e)}", "", ""))
     
     def load_clients_analysis(self):
         """Carga el análisis de clientes con deuda"""
+        # Limpiar árbol
+        for item in self.clients_tree.get_children():
+            self.clients_tree.delete(item)
+        
+        self.run_in_background(self._fetch_clients_analysis, self._show_clients_analysis,
+                               "Error al cargar análisis de clientes")
+    
+    @staticmethod
+    def _fetch_clients_analysis():
+        """Consulta los clientes con deuda (corre en segundo plano)"""
+        conn = get_connection()
         try:
-            # Limpiar árbol
-            for item in self.clients_tree.get_children():
-                self.clients_tree.delete(item)
-            
-            # Obtener datos de clientes con deuda
-            conn = get_connection()
             cursor = conn.cursor()
-            
-            # Consulta para obtener clientes con deuda
             cursor.execute('''
                 SELECT c.id, c.name, c.total_debt,
                     MAX(s.created_at) as last_purchase
@@ -1344,40 +1154,43 @@ class ReportsWindow:
                 GROUP BY c.id
                 ORDER BY c.total_debt DESC
             ''')
-            
-            clients_data = cursor.fetchall()
+            return cursor.fetchall()
+        finally:
             conn.close()
-            
-            if not clients_data:
-                self.clients_tree.insert('', tk.END, values=("No hay clientes con deuda", "", ""))
-                return
-            
-            # Insertar datos en el árbol
-            for client in clients_data:
-                last_purchase = client['last_purchase'] if client['last_purchase'] else "Sin compras"
-                
-                self.clients_tree.insert('', tk.END, values=(
-                    client['name'],
-                    format_currency(client['total_debt']),
-                    last_purchase
-                ))
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al cargar análisis de clientes: {str(e)}")
-            # Insertar mensaje de error en el árbol
-            self.clients_tree.insert('', tk.END, values=(f"Error: {str(e)}", "", ""))
+    
+    def _show_clients_analysis(self, clients_data):
+        """Inserta los clientes con deuda en el árbol"""
+        for item in self.clients_tree.get_children():
+            self.clients_tree.delete(item)
+        
+        if not clients_data:
+            self.clients_tree.insert('', tk.END, values=("No hay clientes con deuda", "", ""))
+            return
+        
+        for client in clients_data:
+            last_purchase = client['last_purchase'] if client['last_purchase'] else "Sin compras"
+            
+            self.clients_tree.insert('', tk.END, values=(
+                client['name'],
+                format_currency(client['total_debt']),
+                last_purchase
+            ))
     
     def load_losses_analysis(self):
         """Carga el análisis de pérdidas por producto - NUEVO"""
+        # Limpiar árbol
+        for item in self.losses_tree.get_children():
+            self.losses_tree.delete(item)
+        
+        self.run_in_background(self._fetch_losses_analysis, self._show_losses_analysis,
+                               "Error al cargar análisis de pérdidas")
+    
+    @staticmethod
+    def _fetch_losses_analysis():
+        """Consulta y agrupa las pérdidas por producto (corre en segundo plano)"""
+        conn = get_connection()
         try:
-            # Limpiar árbol
-            for item in self.losses_tree.get_children():
-                self.losses_tree.delete(item)
-            
-            # Obtener datos de pérdidas por producto
-            conn = get_connection()
             cursor = conn.cursor()
-            
             # Consulta para obtener pérdidas agrupadas por producto
             cursor.execute('''
                 SELECT p.name as product_name, 
@@ -1391,47 +1204,48 @@ class ReportsWindow:
                 ORDER BY total_cost DESC
                 LIMIT 20
             ''')
-            
             losses_data = cursor.fetchall()
+        finally:
             conn.close()
-            
-            if not losses_data:
-                self.losses_tree.insert('', tk.END, values=("No hay pérdidas registradas", "", "", ""))
-                return
-            
-            # Agrupar por producto para obtener el tipo principal de pérdida
-            product_losses = {}
-            for loss in losses_data:
-                product_name = loss['product_name']
-                if product_name not in product_losses:
-                    product_losses[product_name] = {
-                        'total_quantity': 0,
-                        'total_cost': 0,
-                        'main_type': loss['loss_type'],
-                        'max_cost': loss['total_cost']
-                    }
-                
-                product_losses[product_name]['total_quantity'] += loss['total_quantity']
-                product_losses[product_name]['total_cost'] += loss['total_cost']
-                
-                # Determinar el tipo principal (el que más costo ha generado)
-                if loss['total_cost'] > product_losses[product_name]['max_cost']:
-                    product_losses[product_name]['main_type'] = loss['loss_type']
-                    product_losses[product_name]['max_cost'] = loss['total_cost']
-            
-            # Insertar datos en el árbol
-            for product_name, data in sorted(product_losses.items(), key=lambda x: x[1]['total_cost'], reverse=True):
-                self.losses_tree.insert('', tk.END, values=(
-                    product_name,
-                    format_number(data['total_quantity']),
-                    format_currency(data['total_cost']),
-                    data['main_type']
-                ))
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al cargar análisis de pérdidas: {str(e)}")
-            # Insertar mensaje de error en el árbol
-            self.losses_tree.insert('', tk.END, values=(f"Error: {str(e)}", "", "", ""))
+        
+        # Agrupar por producto para obtener el tipo principal de pérdida
+        product_losses = {}
+        for loss in losses_data:
+            product_name = loss['product_name']
+            if product_name not in product_losses:
+                product_losses[product_name] = {
+                    'total_quantity': 0,
+                    'total_cost': 0,
+                    'main_type': loss['loss_type'],
+                    'max_cost': loss['total_cost']
+                }
+            
+            product_losses[product_name]['total_quantity'] += loss['total_quantity']
+            product_losses[product_name]['total_cost'] += loss['total_cost']
+            
+            # Determinar el tipo principal (el que más costo ha generado)
+            if loss['total_cost'] > product_losses[product_name]['max_cost']:
+                product_losses[product_name]['main_type'] = loss['loss_type']
+                product_losses[product_name]['max_cost'] = loss['total_cost']
+        
+        return sorted(product_losses.items(), key=lambda x: x[1]['total_cost'], reverse=True)
+    
+    def _show_losses_analysis(self, product_losses):
+        """Inserta las pérdidas por producto en el árbol"""
+        for item in self.losses_tree.get_children():
+            self.losses_tree.delete(item)
+        
+        if not product_losses:
+            self.losses_tree.insert('', tk.END, values=("No hay pérdidas registradas", "", "", ""))
+            return
+        
+        for product_name, data in product_losses:
+            self.losses_tree.insert('', tk.END, values=(
+                product_name,
+                format_number(data['total_quantity']),
+                format_currency(data['total_cost']),
+                data['main_type']
+            ))
     
     def export_sales(self):
         """Exporta las ventas a Excel"""
@@ -1571,85 +1385,8 @@ class ReportsWindow:
     def sync_sales_status_with_debt(self):
         """Sincroniza el estado de las ventas con la deuda real de los clientes"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # 1. Marcar como 'paid' todas las ventas de clientes sin deuda
-            cursor.execute('''
-                UPDATE sales 
-                SET status = 'paid', 
-                    paid_amount = total, 
-                    remaining_debt = 0
-                WHERE client_id IN (
-                    SELECT id FROM clients WHERE total_debt = 0
-                ) AND status = 'pending'
-            ''')
-            
-            updated_sales = cursor.rowcount
-            print(f"✅ {updated_sales} ventas marcadas como 'paid'")
-            
-            # 2. Para clientes con deuda > 0, marcar las ventas más antiguas como pagadas
-            # hasta que la suma coincida con la deuda real
-            cursor.execute('''
-                SELECT c.id, c.name, c.total_debt
-                FROM clients c
-                WHERE c.total_debt > 0
-            ''')
-            
-            clients_with_debt = cursor.fetchall()
-            
-            for client in clients_with_debt:
-                client_id = client['id']
-                current_debt = client['total_debt']
-                
-                # Obtener ventas pendientes ordenadas por fecha (más antiguas primero)
-                cursor.execute('''
-                    SELECT id, total, COALESCE(paid_amount, 0) as paid_amount
-                    FROM sales 
-                    WHERE client_id = ? AND status = 'pending'
-                    ORDER BY created_at ASC
-                ''', (client_id,))
-                
-                pending_sales = cursor.fetchall()
-                total_pending = sum(sale['total'] - sale['paid_amount'] for sale in pending_sales)
-                
-                if total_pending > current_debt:
-                    # Hay más ventas pendientes que deuda real
-                    # Marcar algunas como pagadas
-                    remaining_debt = current_debt
-                    
-                    for sale in pending_sales:
-                        sale_balance = sale['total'] - sale['paid_amount']
-                        
-                        if remaining_debt <= 0:
-                            # Esta venta debe estar completamente pagada
-                            cursor.execute('''
-                                UPDATE sales 
-                                SET status = 'paid', 
-                                    paid_amount = total, 
-                                    remaining_debt = 0
-                                WHERE id = ?
-                            ''', (sale['id'],))
-                            
-                        elif remaining_debt < sale_balance:
-                            # Esta venta está parcialmente pagada
-                            new_paid_amount = sale['total'] - remaining_debt
-                            cursor.execute('''
-                                UPDATE sales 
-                                SET paid_amount = ?, 
-                                    remaining_debt = ?
-                                WHERE id = ?
-                            ''', (new_paid_amount, remaining_debt, sale['id']))
-                            remaining_debt = 0
-                            
-                        else:
-                            # Esta venta sigue pendiente completamente
-                            remaining_debt -= sale_balance
-            
-            conn.commit()
-            conn.close()
-            
-            print(f"✅ Estados de ventas sincronizados para {len(clients_with_debt)} clientes con deuda")
+            result = reconcile_clients(recompute_debts=False)
+            print(f"✅ Estados de ventas sincronizados: {len(result['sale_changes'])} ventas actualizadas")
             
             # Recargar el resumen financiero
             self.load_financial_summary()
@@ -1658,9 +1395,6 @@ class ReportsWindow:
             
         except Exception as e:
             print(f"❌ Error al sincronizar estados: {e}")
-            if conn:
-                conn.rollback()
-                conn.close()
             return False
     
     def diagnose_inventory_discrepancy(self):
@@ -1,6 +1,6 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from models.product import Product
+from models.product_catalog import product_catalog
 from models.client import Client
 from models.sale import Sale
 from utils.validators import validate_number, validate_positive
@@ -10,8 +10,14 @@ from utils.formatters import format_number, format_currency
 from utils.validators import safe_float_conversion
 
 from config.database import get_connection
+from utils.events import (subscribe_window, event_bus, SALE_SAVED, SALE_DELETED,
+                          PAYMENT_REGISTERED, PRODUCT_TOPICS)
+from utils.virtual_tree import VirtualTreeview
 from views.sale_detail_window import SaleDetailWindow
 
+# Eventos que cambian la lista de ventas
+SALES_TOPICS = frozenset({SALE_SAVED, SALE_DELETED, PAYMENT_REGISTERED})
+
 class SalesWindow:
     def __init__(self, parent, user):
         self.parent = parent
@@ -24,7 +30,6 @@ class SalesWindow:
         # Variables
         self.products = []
         self.clients = []
-        self.sales = []
         self.sale_items = []  # Lista de productos en la venta actual
         self.filtered_products = []  # Lista de productos filtrados para búsqueda
         self.is_filtering = False  # Flag para controlar el filtrado
@@ -49,6 +54,7 @@ class SalesWindow:
         
         self.setup_ui()
         self.load_data()
+        subscribe_window(self.window, PRODUCT_TOPICS | SALES_TOPICS, self.on_data_changed)
     
     # REDISEÑO DE INTERFAZ DE VENTAS - SIN SCROLL
 # Reemplaza la función setup_ui() en sales_window.py
@@ -423,9 +429,10 @@ class SalesWindow:
         ttk.Button(controls_frame, text="Eliminar Venta", 
                   command=self.delete_sale).pack(side=tk.LEFT, padx=5)
         
-        # Treeview para mostrar ventas
+        # Treeview para mostrar ventas (lista virtual: solo las filas visibles)
         columns = ('ID', 'Cliente', 'Subtotal', 'Ajuste', 'Total', 'Estado', 'Tipo Pago', 'Fecha')
-        self.sales_tree = ttk.Treeview(main_frame, columns=columns, show='headings')
+        self.sales_list = VirtualTreeview(main_frame, columns, self._sale_row_values)
+        self.sales_tree = self.sales_list.tree
 
         # Configurar columnas
         for col in columns:
@@ -439,17 +446,12 @@ class SalesWindow:
             else:
                 self.sales_tree.column(col, width=150)
         
-        # Scrollbar
-        v_scrollbar = ttk.Scrollbar(main_frame, orient=tk.VERTICAL, command=self.sales_tree.yview)
-        self.sales_tree.configure(yscrollcommand=v_scrollbar.set)
-
         # NOTA: antes existía aquí un Frame vacío ("tree_frame") empaquetado con
         # fill=BOTH, expand=True por encima de la tabla. Al no contener nada,
         # ese frame igual reclamaba espacio vertical disponible y empujaba la
         # tabla hacia abajo, dejando el hueco entre los botones y la lista.
-        # Se elimina y la tabla/scrollbar se empacan directamente en main_frame.
-        self.sales_tree.pack(fill=tk.BOTH, expand=True)
-        v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # Se elimina y la lista (tabla + scrollbar) se empaca directamente en main_frame.
+        self.sales_list.pack(fill=tk.BOTH, expand=True)
 
         # Doble clic sobre una venta = ver el detalle directamente
         self.sales_tree.bind('<Double-1>', lambda e: self.view_sale_details())
@@ -475,26 +477,18 @@ class SalesWindow:
         
         if not search_text:
             # Mostrar todos los productos disponibles
-            available_products = [p.name for p in self.products if p.stock > 0]
-            self._update_combo_values(available_products)
+            self._update_combo_values(product_catalog.names(in_stock=True))
             self._clear_product_info()
             return
         
-        # Filtrar productos que coincidan
-        filtered_products = []
-        exact_match = None
-        
-        for product in self.products:
-            if product.stock > 0:  # Solo productos con stock
-                product_name_lower = product.name.lower()
-                if search_text in product_name_lower:
-                    filtered_products.append(product.name)
-                    # Verificar coincidencia exacta
-                    if product_name_lower == search_text:
-                        exact_match = product
+        # Filtrar productos con stock que coincidan (sin importar tildes), los más relevantes primero
+        matches = product_catalog.search(search_text, in_stock=True)
+        exact_match = product_catalog.find(search_text) if matches else None
+        if exact_match is not None and (exact_match.stock or 0) <= 0:
+            exact_match = None
         
         # Actualizar lista de productos
-        self._update_combo_values(filtered_products)
+        self._update_combo_values([p.name for p in matches])
         
         # SOLO cargar info si hay coincidencia exacta Y no estamos escribiendo
         if exact_match and not self._is_typing_actively():
@@ -510,10 +504,7 @@ class SalesWindow:
         """Determina si el usuario está escribiendo activamente"""
         # Si el texto actual no coincide exactamente con ningún producto, está escribiendo
         current_text = self.product_var.get().strip()
-        for product in self.products:
-            if product.name == current_text:
-                return False  # Coincidencia exacta, no está escribiendo
-        return True  # No hay coincidencia exacta, probablemente escribiendo
+        return product_catalog.get(current_text) is None
 
         # 5. AGREGA este método para verificar selección:
     def _verify_and_load_product(self):
@@ -524,21 +515,14 @@ class SalesWindow:
             return
         
         # Buscar producto exacto
-        selected_product = None
-        for product in self.products:
-            if product.name == product_name:
-                selected_product = product
-                break
+        selected_product = product_catalog.get(product_name)
         
         if selected_product:
             self._load_product_info(selected_product)
         else:
             # Si no es exacto, buscar el más cercano
-            closest_match = None
-            for product in self.products:
-                if product.stock > 0 and product.name.lower().startswith(product_name.lower()):
-                    closest_match = product
-                    break
+            candidates = product_catalog.starting_with(product_name, in_stock=True)
+            closest_match = candidates[0] if candidates else None
             
             if closest_match:
                 # Autocompletar con el producto más cercano
@@ -580,8 +564,7 @@ class SalesWindow:
         self._is_clicking = True
         # Si está vacío, mostrar todos los productos
         if not self.product_var.get().strip():
-            available_products = [p.name for p in self.products if p.stock > 0]
-            self._update_combo_values(available_products)
+            self._update_combo_values(product_catalog.names(in_stock=True))
         else:
             # Si hay texto, verificar si es un producto válido
             self.window.after(100, self._verify_and_load_product)  # Pequeño delay
@@ -683,13 +666,10 @@ class SalesWindow:
             return
         
         # Buscar producto exacto
-        selected_product = None
-        for product in self.products:
-            if product.name.lower() == product_name.lower():
-                selected_product = product
-                # Corregir capitalización
-                self.product_var.set(product.name)
-                break
+        selected_product = product_catalog.find(product_name)
+        if selected_product:
+            # Corregir capitalización
+            self.product_var.set(selected_product.name)
         
         if selected_product:
             self._load_product_info(selected_product)
@@ -705,11 +685,26 @@ class SalesWindow:
         self.load_clients()
         self.load_sales()
     
+    def on_data_changed(self, changes):
+        """
+        Actualiza la ventana según los eventos recibidos: productos si cambió
+        el stock y lista de ventas si cambiaron ventas o pagos (solo se
+        modifican las filas que cambiaron). Los clientes se recargan solo si
+        aparece uno que el combo todavía no conoce.
+        """
+        if changes.topics & PRODUCT_TOPICS:
+            self.load_products()
+        if changes.topics & SALES_TOPICS:
+            client_ids = changes.ids('clients')
+            if client_ids and not client_ids <= {client.id for client in self.clients}:
+                self.load_clients()
+            self.update_sales_tree()
+    
     def load_products(self):
         """Carga la lista de productos - MEJORADO CON DEBUG"""
-        self.products = Product.get_all()
+        self.products = product_catalog.ensure_current()
         # Filtrar solo productos con stock disponible
-        available_products = [p.name for p in self.products if p.stock > 0]
+        available_products = product_catalog.names(in_stock=True)
         self.product_combo['values'] = available_products
         print(f"Productos cargados: {len(self.products)} total, {len(available_products)} disponibles")
 
@@ -728,9 +723,8 @@ class SalesWindow:
         """Carga la lista de ventas"""
         try:
             print("Cargando ventas...")  # Debug
-            self.sales = Sale.get_all()
-            print(f"Ventas cargadas: {len(self.sales)}")  # Debug
             self.update_sales_tree()
+            print(f"Ventas cargadas: {self.sales_list.total}")  # Debug
         except Exception as e:
             print(f"Error al cargar ventas: {e}")
             messagebox.showerror("Error", f"Error al cargar ventas: {str(e)}")
@@ -742,8 +736,7 @@ class SalesWindow:
 
     def show_all_products(self):
         """Muestra todos los productos disponibles"""
-        available_products = [p.name for p in self.products if p.stock > 0]
-        self.product_combo['values'] = available_products
+        self.product_combo['values'] = product_catalog.names(in_stock=True)
 
     # 4. MODIFICAR el método on_product_selected() para manejar mejor la selección:
     def on_product_selected(self, event=None):
@@ -756,11 +749,7 @@ class SalesWindow:
             return
         
         # Buscar producto exacto
-        found_product = None
-        for product in self.products:
-            if product.name == product_name:
-                found_product = product
-                break
+        found_product = product_catalog.get(product_name)
         
         if found_product:
             print(f"Cargando info para: {found_product.name}, Stock: {found_product.stock}, Precio: {found_product.price}")  # Debug
@@ -811,13 +800,10 @@ class SalesWindow:
             return
         
         # Verificar que el producto existe exactamente como se escribió
-        product = None
-        for p in self.products:
-            if p.name.lower() == product_name.lower():
-                product = p
-                # Actualizar el nombre con la capitalización correcta
-                self.product_var.set(p.name)
-                break
+        product = product_catalog.find(product_name)
+        if product:
+            # Actualizar el nombre con la capitalización correcta
+            self.product_var.set(product.name)
         
         if not product:
             messagebox.showerror("Error", f"Producto '{product_name}' no encontrado.\nVerifique que el nombre sea exacto.")
@@ -960,8 +946,7 @@ class SalesWindow:
         self.subtotal_var.set("")
         self._last_search = ""
         # Mostrar todos los productos disponibles
-        available_products = [p.name for p in self.products if p.stock > 0]
-        self._update_combo_values(available_products)
+        self._update_combo_values(product_catalog.names(in_stock=True))
         
     def on_status_changed(self):
         """Maneja el cambio de estado de pago - ACTUALIZADO CON AJUSTES"""
@@ -1127,7 +1112,7 @@ class SalesWindow:
 
             # 2. Insertar detalles de venta (sin cambios)
             for item in self.sale_items:
-                product = next((p for p in self.products if p.id == item['product_id']), None)
+                product = product_catalog.get_by_id(item['product_id'])
                 if not product:
                     raise ValueError(f"Producto ID {item['product_id']} no encontrado")
 
@@ -1182,6 +1167,8 @@ class SalesWindow:
                 ))
 
             conn.commit()
+            event_bus.publish(SALE_SAVED, sales=[sale_id], clients=[client_id],
+                              products=[item['product_id'] for item in self.sale_items])
             
             # Mensaje de éxito con información del ajuste
             success_msg = f"Venta #{sale_id} guardada correctamente"
@@ -1193,7 +1180,6 @@ class SalesWindow:
             
             messagebox.showinfo("Éxito", success_msg)
             self.clear_all_form()
-            self.load_data()
 
         except Exception as e:
             if conn:
@@ -1243,11 +1229,7 @@ class SalesWindow:
             sale_id = self.sales_tree.item(selected[0], 'values')[0]
             
             # Buscar la venta
-            sale = None
-            for s in self.sales:
-                if str(s.id) == str(sale_id):
-                    sale = s
-                    break
+            sale = Sale.get_by_id(sale_id)
             
             if not sale:
                 messagebox.showerror("Error", "No se encontró la venta seleccionada")
@@ -1352,7 +1334,7 @@ class SalesWindow:
         
         try:
             sale_id = self.sales_tree.item(selected[0], 'values')[0]
-            sale = next((s for s in self.sales if str(s.id) == str(sale_id)), None)
+            sale = Sale.get_by_id(sale_id)
             
             if not sale:
                 messagebox.showerror("Error", "Venta no encontrada")
@@ -1394,14 +1376,16 @@ class SalesWindow:
                 conn.commit()
                 
                 # 4. Actualizar stock localmente
-                for detail in details:
-                    product = next((p for p in self.products if p.id == detail['product_id']), None)
+                restored = [(product_catalog.get_by_id(detail['product_id']), detail['quantity'])
+                            for detail in details]
+                for product, quantity in restored:
                     if product:
-                        product.stock += detail['quantity']
+                        product.stock += quantity
                         product.save()
                 
+                event_bus.publish(SALE_DELETED, sales=[sale.id], clients=[sale.client_id],
+                                  products=[detail['product_id'] for detail in details])
                 messagebox.showinfo("Éxito", "Venta eliminada correctamente")
-                self.load_data()
                 
             except Exception as e:
                 conn.rollback()
@@ -1414,35 +1398,43 @@ class SalesWindow:
             messagebox.showerror("Error", f"Error inesperado: {str(e)}")
     
     def update_sales_tree(self):
-        """Muestra las ventas con información de ajustes"""
-        for item in self.sales_tree.get_children():
-            self.sales_tree.delete(item)
-        
-        for sale in self.sales:
-            # Obtener nombre del cliente
-            client_name = "Venta al contado"
-            if sale.client_id:
-                client = next((c for c in self.clients if c.id == sale.client_id), None)
-                client_name = client.name if client else "Cliente no encontrado"
-            
-            # Validación para ventas fiadas
-            if sale.status == 'pending' and client_name == "Venta al contado":
-                client_name = "CLIENTE FALTANTE"
-            
-            # Calcular subtotal y ajuste
-            adjustment = getattr(sale, 'adjustment', 0) or 0
-            subtotal = sale.total - adjustment
-            
-            self.sales_tree.insert('', tk.END, values=(
-                sale.id,
-                client_name,
-                format_currency(subtotal),
-                format_currency(adjustment),
-                format_currency(sale.total),
-                "PENDIENTE" if sale.status == 'pending' else "PAGADO",
-                "Crédito" if sale.status == 'pending' else "Efectivo",
-                self._format_date(sale.created_at)
-            ), tags=('credit' if sale.status == 'pending' else 'paid',))
+        """Muestra las ventas con información de ajustes (más recientes primero)"""
+        if self.sales_list.source is None:
+            self.sales_list.set_source(Sale.list_query())
+        else:
+            self.sales_list.refresh()
+
+    def _sale_row_values(self, row):
+        """Valores y tags de una venta en la lista"""
+        # Mismo respaldo de estado que Sale.get_all
+        status = row['status'] if row['status'] is not None else 'paid'
+        if not status:
+            status = 'pending' if row['client_id'] else 'paid'
+
+        # Obtener nombre del cliente
+        client_name = "Venta al contado"
+        if row['client_id']:
+            client_name = row['client_name'] or "Cliente no encontrado"
+        
+        # Validación para ventas fiadas
+        if status == 'pending' and client_name == "Venta al contado":
+            client_name = "CLIENTE FALTANTE"
+        
+        # Calcular subtotal y ajuste
+        adjustment = row['adjustment'] or 0
+        subtotal = row['total'] - adjustment
+        
+        values = (
+            row['id'],
+            client_name,
+            format_currency(subtotal),
+            format_currency(adjustment),
+            format_currency(row['total']),
+            "PENDIENTE" if status == 'pending' else "PAGADO",
+            "Crédito" if status == 'pending' else "Efectivo",
+            self._format_date(row['created_at'])
+        )
+        return values, ('credit' if status == 'pending' else 'paid',)
 
     def _format_date(self, date_value):
         """Formatea la fecha de manera segura"""